@@ -24,6 +24,11 @@ load_dotenv(dotenv_path=env_path)
 # =============================================================================
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "").strip()
 OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5/forecast"
+OPENWEATHER_GEOCODE_URL = "http://api.openweathermap.org/geo/1.0/direct"
+# Upstream calls share one pooled client per worker, so a call reuses an idle
+# keep-alive connection instead of paying a new TCP + TLS handshake
+OPENWEATHER_MAX_CONNECTIONS = int(os.getenv("HEATGUARD_OPENWEATHER_MAX_CONNECTIONS", "20"))
+OPENWEATHER_KEEPALIVE_SECONDS = float(os.getenv("HEATGUARD_OPENWEATHER_KEEPALIVE", "60"))
 
 # Risk level mapping: numeric label -> human-readable string
 RISK_LABEL_TO_LEVEL: Dict[int, str] = {
@@ -54,6 +59,323 @@ MODEL_PATH = "models/heatguard_xgb_model.joblib"
 SCALER_PATH = "models/heatguard_scaler.joblib"
 FEATURE_COLUMNS_PATH = "models/feature_columns.joblib"
 
+# Score small batches with the NumPy-compiled copy of the tree ensemble
+# (app/services/tree_compiler.py); larger batches always go to XGBoost,
+# whose per-call setup only dominates at a handful of rows
+COMPILED_INFERENCE = os.getenv("HEATGUARD_COMPILED_INFERENCE", "1").strip().lower() not in ("0", "false", "no")
+COMPILED_MAX_ROWS = int(os.getenv("HEATGUARD_COMPILED_MAX_ROWS", "16"))
+
+# =============================================================================
+# Offline Scoring Jobs
+# =============================================================================
+# Uploaded files, job state and output parts (relative to the backend root)
+JOBS_DIR = os.getenv("HEATGUARD_JOBS_DIR", "jobs")
+# Worker processes scoring jobs; each processes one job at a time
+JOB_WORKERS = int(os.getenv("HEATGUARD_JOB_WORKERS", "1"))
+# Rows read, scored and written per batch; also the size of each output part
+JOB_BATCH_ROWS = int(os.getenv("HEATGUARD_JOB_BATCH_ROWS", "100000"))
+# Rows parsed and scored per batch by the streaming POST /predict/file endpoint
+FILE_BATCH_ROWS = int(os.getenv("HEATGUARD_FILE_BATCH_ROWS", "50000"))
+# Times a job is retried after its worker process died
+JOB_MAX_ATTEMPTS = 3
+JOB_MAX_UPLOAD_BYTES = int(os.getenv("HEATGUARD_JOB_MAX_UPLOAD_BYTES", str(2 * 1024 ** 3)))
+
+# =============================================================================
+# Model Registry Configuration
+# =============================================================================
+# Retrained models are deployed as models/<version>/ directories holding the
+# same artifact file names; the root-level artifacts are version "base".
+MODELS_DIR = "models"
+BASE_MODEL_VERSION = "base"
+# Pin the active version (empty: newest version directory, else "base")
+MODEL_VERSION = os.getenv("HEATGUARD_MODEL_VERSION", "").strip()
+# How often models/ is rescanned for new versions (0 disables hot reload)
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("HEATGUARD_MODEL_WATCH_INTERVAL", "30"))
+# Versions kept in memory for per-request pinning, including the active one
+MODEL_REGISTRY_MAX_LOADED = int(os.getenv("HEATGUARD_MODEL_MAX_LOADED", "3"))
+# "full" serves the regular model, "lite" the compressed variant built by
+# benchmarks/lite_model.py (MODEL_VERSION, if set, takes precedence). No lite
+# build ships with the repo; "lite" without models/lite/ fails at startup.
+MODEL_VARIANT = os.getenv("HEATGUARD_MODEL_VARIANT", "full").strip().lower()
+LITE_MODEL_VERSION = "lite"
+# Versions a request may pin (?model_version / X-Model-Version) besides the
+# ones already in memory; "*" allows every version under models/. Add "lite"
+# once a lite build exists.
+PINNABLE_MODEL_VERSIONS = [
+    v.strip() for v in os.getenv("HEATGUARD_PINNABLE_MODEL_VERSIONS", "base").split(",") if v.strip()
+]
+
+# Per-district tmax breakpoint tables (app/services/threshold_service.py),
+# built by benchmarks/thresholds.py next to each version's model file
+THRESHOLD_TABLE_FILE = "tmax_thresholds.npz"
+
+# Shadow evaluation: mirror a fraction of prediction batches to a secondary
+# version in the background and compare (empty version disables it)
+SHADOW_MODEL_VERSION = os.getenv("HEATGUARD_SHADOW_MODEL_VERSION", "").strip()
+SHADOW_SAMPLE_RATE = float(os.getenv("HEATGUARD_SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_WORKERS = int(os.getenv("HEATGUARD_SHADOW_WORKERS", "1"))
+# Batches waiting for the shadow pool beyond this are dropped, never queued
+SHADOW_MAX_PENDING = int(os.getenv("HEATGUARD_SHADOW_MAX_PENDING", "8"))
+# Large batches are subsampled to this many rows before shadow scoring
+SHADOW_MAX_ROWS = int(os.getenv("HEATGUARD_SHADOW_MAX_ROWS", "5000"))
+
+# =============================================================================
+# Response Compression
+# =============================================================================
+# Encodings offered to clients, in server preference order; codecs whose
+# library is not installed (zstandard, brotli) are skipped. Empty disables.
+COMPRESSION_ENCODINGS = [
+    e.strip().lower() for e in os.getenv("HEATGUARD_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()
+]
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("HEATGUARD_COMPRESSION_MIN_BYTES", "1024"))
+# Highest-ratio level of each codec that still compresses the large JSON and
+# CSV responses at >= 50 MB/s per core (see benchmarks/README.md)
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("HEATGUARD_COMPRESSION_ZSTD_LEVEL", "1"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("HEATGUARD_COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("HEATGUARD_COMPRESSION_GZIP_LEVEL", "1"))
+# Bodies (or streamed chunks) at least this large are compressed in a worker
+# thread so the event loop keeps serving other requests
+COMPRESSION_THREAD_MIN_BYTES = int(os.getenv("HEATGUARD_COMPRESSION_THREAD_MIN_BYTES", str(256 * 1024)))
+
+# =============================================================================
+# Startup Warm-up
+# =============================================================================
+# After startup, representative requests are run through the app in-process
+# (app/services/warmup_service.py) and /ready answers 200 only once they are
+# done; /health keeps reporting liveness throughout
+WARMUP_ENABLED = os.getenv("HEATGUARD_WARMUP", "1").strip().lower() not in ("0", "false", "no")
+# Points in the warm-up /predict/bulk request; above COMPILED_MAX_ROWS so
+# the XGBoost path is warmed as well as the compiled one
+WARMUP_BULK_ROWS = int(os.getenv("HEATGUARD_WARMUP_BULK_ROWS", "2000"))
+# Keep-alive connections to OpenWeather opened ahead of the first forecast
+# (0 skips; nothing is opened without an API key)
+WARMUP_HTTP_CONNECTIONS = int(os.getenv("HEATGUARD_WARMUP_HTTP_CONNECTIONS", "2"))
+
+# =============================================================================
+# Admission Control
+# =============================================================================
+# Requests are sorted into classes by path (app/services/admission_service.py);
+# each class has its own concurrency budget, wait queue and per-client rate.
+ADMISSION_ENABLED = os.getenv("HEATGUARD_ADMISSION", "1").strip().lower() not in ("0", "false", "no")
+# Requests running at once across all classes; a freed slot goes to the
+# interactive queue before the bulk one
+ADMISSION_MAX_CONCURRENT = int(os.getenv("HEATGUARD_ADMISSION_MAX_CONCURRENT", "32"))
+# Path prefixes, optionally "METHOD /prefix", of the bulk class; anything
+# not bulk or exempt is interactive. Map tiles stay interactive: they are
+# small, cached, and a map view fetches dozens at once.
+ADMISSION_BULK_PATHS = [
+    p.strip() for p in os.getenv(
+        "HEATGUARD_ADMISSION_BULK_PATHS",
+        "/predict/bulk,/predict/horizon,/predict/file,/heatmap/raster,/districts/risk-aggregate,"
+        "/districts/resolve,POST /jobs",
+    ).split(",") if p.strip()
+]
+# Never queued or limited: probes, docs and long-lived streams (which have
+# their own subscriber limit)
+ADMISSION_EXEMPT_PATHS = [
+    p.strip() for p in os.getenv(
+        "HEATGUARD_ADMISSION_EXEMPT_PATHS", "/health,/ready,/docs,/redoc,/openapi.json,/subscribe,/ws",
+    ).split(",") if p.strip()
+]
+ADMISSION_INTERACTIVE_CONCURRENCY = int(os.getenv("HEATGUARD_ADMISSION_INTERACTIVE_CONCURRENCY", "32"))
+ADMISSION_INTERACTIVE_QUEUE = int(os.getenv("HEATGUARD_ADMISSION_INTERACTIVE_QUEUE", "256"))
+ADMISSION_INTERACTIVE_TIMEOUT_SECONDS = float(os.getenv("HEATGUARD_ADMISSION_INTERACTIVE_TIMEOUT", "5"))
+ADMISSION_BULK_CONCURRENCY = int(os.getenv("HEATGUARD_ADMISSION_BULK_CONCURRENCY", "2"))
+ADMISSION_BULK_QUEUE = int(os.getenv("HEATGUARD_ADMISSION_BULK_QUEUE", "16"))
+ADMISSION_BULK_TIMEOUT_SECONDS = float(os.getenv("HEATGUARD_ADMISSION_BULK_TIMEOUT", "30"))
+# Bulk requests with a larger body are never queued: they run if a bulk slot
+# is free and are otherwise turned away (503 + Retry-After) before the body is read
+ADMISSION_LARGE_REQUEST_BYTES = int(os.getenv("HEATGUARD_ADMISSION_LARGE_REQUEST_BYTES", str(1024 * 1024)))
+# Per-client token buckets: sustained requests per second and burst size
+# (a rate of 0 disables the limit for that class)
+ADMISSION_INTERACTIVE_RATE = float(os.getenv("HEATGUARD_ADMISSION_INTERACTIVE_RATE", "50"))
+ADMISSION_INTERACTIVE_BURST = float(os.getenv("HEATGUARD_ADMISSION_INTERACTIVE_BURST", "100"))
+ADMISSION_BULK_RATE = float(os.getenv("HEATGUARD_ADMISSION_BULK_RATE", "2"))
+ADMISSION_BULK_BURST = float(os.getenv("HEATGUARD_ADMISSION_BULK_BURST", "10"))
+# Clients are told apart by this header if set (e.g. an API key), otherwise
+# by the first X-Forwarded-For hop if trusted, otherwise by the peer address
+ADMISSION_CLIENT_HEADER = os.getenv("HEATGUARD_ADMISSION_CLIENT_HEADER", "").strip().lower()
+ADMISSION_TRUST_FORWARDED = os.getenv("HEATGUARD_ADMISSION_TRUST_FORWARDED", "0").strip().lower() in ("1", "true", "yes")
+# Token buckets kept; the least recently seen clients are forgotten first
+ADMISSION_MAX_CLIENTS = int(os.getenv("HEATGUARD_ADMISSION_MAX_CLIENTS", "10000"))
+
+# =============================================================================
+# Request Tracing
+# =============================================================================
+# Per-request spans reported in a Server-Timing header (app/utils/tracing.py)
+TRACING_ENABLED = os.getenv("HEATGUARD_TRACING", "1").strip().lower() not in ("0", "false", "no")
+# Export finished traces as OTLP/JSON: "file", "otlp" (HTTP collector) or empty
+TRACE_EXPORT = os.getenv("HEATGUARD_TRACE_EXPORT", "").strip().lower()
+# Relative paths are under the backend root
+TRACE_EXPORT_PATH = os.getenv("HEATGUARD_TRACE_EXPORT_PATH", "traces/traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("HEATGUARD_TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Fraction of requests exported (requests with a sampled traceparent always are)
+TRACE_SAMPLE_RATE = float(os.getenv("HEATGUARD_TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("HEATGUARD_TRACE_SERVICE_NAME", "heatguard-api")
+
+# =============================================================================
+# Forecast / Prediction Cache
+# =============================================================================
+# In-process LRU (L1) in front of a store shared by all workers (L2):
+# "sqlite" (one file per host), "redis" (needs the redis package), "memory"
+# (in-process stand-in, for tests) or empty for L1 only
+CACHE_L2 = os.getenv("HEATGUARD_CACHE_L2", "sqlite").strip().lower()
+# Relative paths are under the backend root
+CACHE_SQLITE_PATH = os.getenv("HEATGUARD_CACHE_SQLITE_PATH", "cache/heatguard-cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("HEATGUARD_CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("HEATGUARD_CACHE_KEY_PREFIX", "heatguard:")
+CACHE_L1_MAX_ENTRIES = int(os.getenv("HEATGUARD_CACHE_L1_MAX_ENTRIES", "4096"))
+# L2 writes happen on a background thread; beyond this many waiting they are dropped
+CACHE_L2_MAX_PENDING_WRITES = int(os.getenv("HEATGUARD_CACHE_L2_MAX_PENDING", "256"))
+# Encoded values at least this large are zstd-compressed
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("HEATGUARD_CACHE_COMPRESS_MIN_BYTES", "512"))
+# OpenWeather refreshes its 5-day forecast every few hours
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("HEATGUARD_WEATHER_CACHE_TTL", "600"))
+GEOCODE_CACHE_TTL_SECONDS = float(os.getenv("HEATGUARD_GEOCODE_CACHE_TTL", "86400"))
+# Forecast requests are keyed on coordinates rounded to this many decimals
+# (2 decimals ~ 1 km, finer than the upstream model grid)
+WEATHER_CACHE_COORD_DECIMALS = int(os.getenv("HEATGUARD_WEATHER_CACHE_DECIMALS", "2"))
+# Scored batches of up to this many rows are cached per model version
+PREDICTION_CACHE_MAX_ROWS = int(os.getenv("HEATGUARD_PREDICTION_CACHE_MAX_ROWS", "64"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("HEATGUARD_PREDICTION_CACHE_TTL", "86400"))
+
+# =============================================================================
+# Forecast HTTP Caching
+# =============================================================================
+# /forecast/5days answers carry Cache-Control / Expires / ETag derived from
+# the next expected upstream refresh (app/services/forecast_service.py).
+# OpenWeather publishes its 5-day/3-hour forecast on a 3-hourly cycle; a
+# refresh becomes visible here at the latest WEATHER_CACHE_TTL_SECONDS later.
+FORECAST_HTTP_CACHE_ENABLED = os.getenv("HEATGUARD_FORECAST_HTTP_CACHE", "1").strip().lower() not in ("0", "false", "no")
+FORECAST_REFRESH_INTERVAL_SECONDS = float(os.getenv("HEATGUARD_FORECAST_REFRESH_INTERVAL", "10800"))
+# Upstream cycle start relative to 00:00 UTC
+FORECAST_REFRESH_OFFSET_SECONDS = float(os.getenv("HEATGUARD_FORECAST_REFRESH_OFFSET", "0"))
+# Scored forecasts kept per worker (location x model version)
+FORECAST_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("HEATGUARD_FORECAST_RESULT_CACHE_MAX_ENTRIES", "4096"))
+# > 0: for this long after expiry, serve the previous forecast at once and
+# rescore it in the background (also sent as the stale-while-revalidate
+# Cache-Control directive); 0 disables
+FORECAST_STALE_WHILE_REVALIDATE_SECONDS = float(os.getenv("HEATGUARD_FORECAST_STALE_WHILE_REVALIDATE", "0"))
+
+# =============================================================================
+# Place Name Resolution
+# =============================================================================
+# POST /districts/resolve (app/services/place_resolver.py): names are matched
+# against local indexes first; only misses go to the OpenWeather geocoder
+RESOLVE_MAX_NAMES = int(os.getenv("HEATGUARD_RESOLVE_MAX_NAMES", "5000"))
+# Geocoder calls in flight per batch; answers are cached (GEOCODE_CACHE_TTL_SECONDS)
+RESOLVE_GEOCODE_CONCURRENCY = int(os.getenv("HEATGUARD_RESOLVE_GEOCODE_CONCURRENCY", "8"))
+# Names the geocoder did not find are remembered this long (an empty answer
+# may also be an upstream error, so much shorter than the geocode TTL)
+RESOLVE_MISS_TTL_SECONDS = float(os.getenv("HEATGUARD_RESOLVE_MISS_TTL", "600"))
+
+# =============================================================================
+# Risk Subscriptions
+# =============================================================================
+# District forecasts are rescored once per cycle for all subscribers together;
+# the default matches the weather cache, so each cycle sees fresh forecasts
+SUBSCRIPTION_REFRESH_SECONDS = float(
+    os.getenv("HEATGUARD_SUBSCRIPTION_REFRESH", str(WEATHER_CACHE_TTL_SECONDS))
+)
+# Concurrent forecast fetches per cycle (only cache misses reach OpenWeather)
+SUBSCRIPTION_FETCH_CONCURRENCY = int(os.getenv("HEATGUARD_SUBSCRIPTION_FETCH_CONCURRENCY", "8"))
+SUBSCRIPTION_MAX_SUBSCRIBERS = int(os.getenv("HEATGUARD_SUBSCRIPTION_MAX_SUBSCRIBERS", "1000"))
+SUBSCRIPTION_MAX_DISTRICTS = int(os.getenv("HEATGUARD_SUBSCRIPTION_MAX_DISTRICTS", "1000"))
+# Undelivered messages per subscriber; a subscriber this far behind is resynced
+# with one snapshot instead
+SUBSCRIPTION_QUEUE_SIZE = int(os.getenv("HEATGUARD_SUBSCRIPTION_QUEUE_SIZE", "16"))
+# SSE comment / WebSocket ping interval, so proxies keep idle streams open
+SUBSCRIPTION_KEEPALIVE_SECONDS = float(os.getenv("HEATGUARD_SUBSCRIPTION_KEEPALIVE", "15"))
+
+# =============================================================================
+# Heat Alerts
+# =============================================================================
+# States always included in the refresh cycle, subscribers or not ("*" for
+# all); each located district costs one forecast fetch per cycle
+ALERT_STATES = [s.strip() for s in os.getenv("HEATGUARD_ALERT_STATES", "").split(",") if s.strip()]
+# District-days at or above this label (2 = Orange) are on alert
+ALERT_MIN_LABEL = int(os.getenv("HEATGUARD_ALERT_MIN_LABEL", "2"))
+# Threshold-crossing events kept in memory; the oldest are discarded first
+ALERT_LOG_SIZE = int(os.getenv("HEATGUARD_ALERT_LOG_SIZE", "10000"))
+
+# =============================================================================
+# Prediction History
+# =============================================================================
+# Forecast-derived district predictions (refresh cycle and /forecast/5days at
+# district coordinates) are appended to monthly column files under this
+# directory (relative to the backend root). Empty disables recording.
+HISTORY_DIR = os.getenv("HEATGUARD_HISTORY_DIR", "history").strip()
+# Buffered records are appended to disk this often, and on shutdown
+HISTORY_FLUSH_SECONDS = float(os.getenv("HEATGUARD_HISTORY_FLUSH_SECONDS", "30"))
+# Longest date range a /history query may cover
+HISTORY_MAX_QUERY_DAYS = int(os.getenv("HEATGUARD_HISTORY_MAX_QUERY_DAYS", "366"))
+
+# =============================================================================
+# Logging
+# =============================================================================
+LOG_LEVEL = os.getenv("HEATGUARD_LOG_LEVEL", "INFO").strip().upper()
+# "text" (human-readable lines) or "json" (one JSON object per line)
+LOG_FORMAT = os.getenv("HEATGUARD_LOG_FORMAT", "text").strip().lower()
+# Hand records to a background thread instead of writing from the event loop
+LOG_ASYNC = os.getenv("HEATGUARD_LOG_ASYNC", "1").strip().lower() not in ("0", "false", "no")
+# Records arriving while this many are waiting are dropped (and counted)
+LOG_QUEUE_SIZE = int(os.getenv("HEATGUARD_LOG_QUEUE_SIZE", "10000"))
+# One access log line per request (uvicorn's own access log stays off)
+ACCESS_LOG = os.getenv("HEATGUARD_ACCESS_LOG", "0").strip().lower() in ("1", "true", "yes")
+# Fraction of requests whose access and INFO/DEBUG logs are kept, per path
+# prefix, e.g. "/predict/bulk=0.01,/forecast=0.1" (longest prefix wins;
+# WARNING and above are never sampled away)
+LOG_SAMPLE_RATES: Dict[str, float] = {
+    prefix.strip(): float(rate)
+    for prefix, _, rate in (
+        item.partition("=") for item in os.getenv("HEATGUARD_LOG_SAMPLE_RATES", "").split(",") if "=" in item
+    )
+}
+LOG_SAMPLE_DEFAULT = float(os.getenv("HEATGUARD_LOG_SAMPLE_DEFAULT", "1.0"))
+
+# =============================================================================
+# Admin / Live Profiling
+# =============================================================================
+# /admin/profile/* endpoints (app/routers/admin.py); off unless explicitly enabled
+PROFILING_ENABLED = os.getenv("HEATGUARD_PROFILING", "0").strip().lower() in ("1", "true", "yes")
+# Shared secret expected in the X-Admin-Token header; admin endpoints refuse
+# every request while it is unset
+ADMIN_TOKEN = os.getenv("HEATGUARD_ADMIN_TOKEN", "").strip()
+PROFILE_MAX_SECONDS = float(os.getenv("HEATGUARD_PROFILE_MAX_SECONDS", "60"))
+# Stack sampling period; each sample briefly holds the GIL, so keep it >= 1 ms
+PROFILE_DEFAULT_INTERVAL_MS = float(os.getenv("HEATGUARD_PROFILE_INTERVAL_MS", "5"))
+PROFILE_MIN_INTERVAL_MS = 1.0
+# Frames kept per allocation traceback while tracemalloc runs
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("HEATGUARD_PROFILE_TRACEMALLOC_FRAMES", "10"))
+
+# Largest page (limit=) of the paginated endpoints (app/utils/fieldsets.py)
+PAGE_MAX_LIMIT = int(os.getenv("HEATGUARD_PAGE_MAX_LIMIT", "10000"))
+
+# Maximum rows passed to the model in one call by vectorized inference paths
+INFERENCE_CHUNK_SIZE = int(os.getenv("HEATGUARD_INFERENCE_CHUNK_SIZE", "65536"))
+
+# Upper bound on districts x dates x scenarios cells for /predict/horizon
+HORIZON_MAX_CELLS = int(os.getenv("HEATGUARD_HORIZON_MAX_CELLS", "2000000"))
+HORIZON_MAX_DAYS = int(os.getenv("HEATGUARD_HORIZON_MAX_DAYS", "366"))
+# Label-only horizons answered from a threshold table stay on the event loop
+# up to this many cells (a few ms); larger lookups run in a worker thread
+HORIZON_INLINE_LOOKUP_CELLS = int(os.getenv("HEATGUARD_HORIZON_INLINE_LOOKUP_CELLS", "100000"))
+
+# =============================================================================
+# Heatmap Raster Configuration
+# =============================================================================
+# Area the model is meaningful for (IMD all-India grid); cells outside are nodata.
+RASTER_BOUNDS = {"lat_min": 6.0, "lat_max": 38.0, "lon_min": 68.0, "lon_max": 98.0}
+RASTER_MAX_CELLS = int(os.getenv("HEATGUARD_RASTER_MAX_CELLS", "1000000"))
+RASTER_CACHE_SIZE = int(os.getenv("HEATGUARD_RASTER_CACHE_SIZE", "64"))
+RASTER_CACHE_TTL_SECONDS = int(os.getenv("HEATGUARD_RASTER_CACHE_TTL", "1800"))
+# "forecast" source: OpenWeather is sampled on a coarse anchor grid and each
+# raster cell takes the tmax of its nearest anchor.
+RASTER_FORECAST_ANCHOR_STEP = float(os.getenv("HEATGUARD_RASTER_ANCHOR_STEP", "2.0"))
+RASTER_FORECAST_MAX_ANCHORS = int(os.getenv("HEATGUARD_RASTER_MAX_ANCHORS", "64"))
+RASTER_FORECAST_CONCURRENCY = int(os.getenv("HEATGUARD_RASTER_FORECAST_CONCURRENCY", "8"))
+
 
 def get_risk_level(label: int) -> str:
     """
@@ -0,0 +1,78 @@
+"""
+HeatGuard API Request Dependencies
+
+Shared FastAPI dependencies used by several routers.
+"""
+
+import asyncio
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query, Response
+
+from app.config import ADMIN_TOKEN
+from app.services import model_service
+from app.services.model_registry import REGISTRY, ModelArtifacts
+
+MODEL_VERSION_HEADER = "X-Model-Version"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+async def get_model_artifacts(
+    response: Response,
+    model_version: Optional[str] = Query(None, description="Pin a model version for this request"),
+    x_model_version: Optional[str] = Header(None, alias=MODEL_VERSION_HEADER),
+) -> ModelArtifacts:
+    """
+    Resolve the model version for one request.
+
+    The version can be pinned with the `model_version` query parameter or the
+    `X-Model-Version` header; otherwise the active version is used. Only
+    versions already in memory or listed in HEATGUARD_PINNABLE_MODEL_VERSIONS
+    can be pinned, so clients cannot make the server load arbitrary versions.
+    The version that served the request is echoed back in `X-Model-Version`.
+
+    Raises:
+        HTTPException(503): If no model is loaded
+        HTTPException(403): If the pinned version may not be pinned
+        HTTPException(404): If the pinned version does not exist
+    """
+    version = model_version or x_model_version
+    if not model_service.is_model_loaded():
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Please try again later."
+        )
+
+    try:
+        active = model_service.get_artifacts()
+        if version and version != active.version:
+            if not REGISTRY.is_pinnable(version):
+                raise HTTPException(status_code=403, detail=f"Model version {version} cannot be pinned")
+            # A pinned version may need loading from disk; keep that off the event loop
+            artifacts = await asyncio.to_thread(model_service.get_artifacts, version)
+        else:
+            artifacts = active
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    response.headers[MODEL_VERSION_HEADER] = artifacts.version
+    return artifacts
+
+
+async def require_admin(
+    x_admin_token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER),
+) -> None:
+    """
+    Guard for operator-only endpoints.
+
+    Raises:
+        HTTPException(403): If no admin token is configured on the server
+        HTTPException(401): If the X-Admin-Token header is missing or wrong
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (HEATGUARD_ADMIN_TOKEN is not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token")
@@ -8,12 +8,28 @@ import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import API_DESCRIPTION, API_TITLE, API_VERSION
-from .routers import health, predict, forecast, districts
+from .middleware import AccessLogMiddleware, AdmissionMiddleware, CompressionMiddleware, TracingMiddleware
+from .routers import (
+    health, predict, forecast, districts, heatmap, models, jobs, admin, subscriptions, alerts, history,
+)
+from .services.cache_service import CACHE
+from .services.forecast_service import FORECASTS
+from .services.history_service import HISTORY
+from .services.job_service import JOBS
+from .services.model_registry import REGISTRY
+from .services.shadow_service import SHADOW
+from .services.subscription_service import BROADCASTER
+from .services.warmup_service import WARMUP
+from .services.weather_service import close_http_client
 from .services.model_service import load_artifacts
+from .utils import fieldsets
 from .utils.logging_utils import setup_logging
+from .utils.responses import FastJSONResponse
+from .utils.tracing import EXPORTER
 
 # Setup logging
 setup_logging()
@@ -25,7 +41,11 @@ async def lifespan(app: FastAPI):
     """
     Lifespan context manager for startup and shutdown events.
 
-    Loads model artifacts on startup.
+    Loads model artifacts on startup, watches models/ for new versions and
+    resumes scoring jobs left unfinished by the previous run. Risk
+    subscriptions are refreshed in the background while the app runs, and
+    buffered prediction history is flushed on shutdown. The warm-up runs in
+    the background after startup; /ready reports when it is done.
     """
     # Startup
     logger.info("Starting HeatGuard API...")
@@ -33,13 +53,28 @@ async def lifespan(app: FastAPI):
         load_artifacts()
         logger.info("Model artifacts loaded successfully")
     except Exception as e:
-        logger.error(f"Failed to load model artifacts: {e}")
+        logger.error("Failed to load model artifacts: %s", e)
         raise
+    REGISTRY.start_watcher()
+    JOBS.start()
+    HISTORY.start()
+    BROADCASTER.start()
+    WARMUP.start(app)
 
     yield
 
     # Shutdown
     logger.info("Shutting down HeatGuard API...")
+    await WARMUP.stop()
+    await FORECASTS.stop()
+    await BROADCASTER.stop()
+    await HISTORY.stop()
+    await REGISTRY.stop_watcher()
+    SHADOW.shutdown()
+    JOBS.shutdown()
+    EXPORTER.shutdown()
+    CACHE.shutdown()
+    await close_http_client()
 
 
 # Create FastAPI application
@@ -50,8 +85,24 @@ app = FastAPI(
     lifespan=lifespan,
     docs_url="/docs",
     redoc_url="/redoc",
+    # Wrapped in Default so routes with a response model keep FastAPI's
+    # direct Pydantic-to-JSON path; everything else is encoded with orjson
+    default_response_class=Default(FastJSONResponse),
 )
 
+# Per-route log sampling and access lines; inside tracing so log records
+# carry the request's trace id
+app.add_middleware(AccessLogMiddleware)
+
+# Per-request spans and the Server-Timing header; added early so it sits
+# inside compression and its timings exclude compression of the response body
+app.add_middleware(TracingMiddleware)
+
+# Interactive / bulk request classes with their own budgets and queues;
+# outside tracing so turned-away requests cost no spans, inside CORS so
+# 429 and 503 answers still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 # Add CORS middleware for frontend access
 app.add_middleware(
     CORSMiddleware,
@@ -59,13 +110,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors and counts (app/utils/fieldsets.py) are read by browser clients
+    expose_headers=fieldsets.EXPOSED_HEADERS,
 )
 
+# Negotiated zstd / brotli / gzip compression of JSON, CSV and text responses
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(health.router, prefix="", tags=["Health"])
 app.include_router(predict.router, prefix="", tags=["Predictions"])
 app.include_router(forecast.router, prefix="", tags=["Forecast"])
 app.include_router(districts.router, prefix="", tags=["Districts"])
+app.include_router(heatmap.router, prefix="", tags=["Heatmap"])
+app.include_router(models.router, prefix="", tags=["Models"])
+app.include_router(jobs.router, prefix="", tags=["Jobs"])
+app.include_router(subscriptions.router, prefix="", tags=["Subscriptions"])
+app.include_router(alerts.router, prefix="", tags=["Alerts"])
+app.include_router(history.router, prefix="", tags=["History"])
+app.include_router(admin.router, prefix="", tags=["Admin"])
 
 
 @app.get(
@@ -85,9 +148,18 @@ async def root():
         "version": API_VERSION,
         "docs": "/docs",
         "health": "/health",
+        "ready": "/ready",
         "endpoints": {
             "single_prediction": "POST /predict/single",
-            "bulk_prediction": "POST /predict/bulk"
+            "bulk_prediction": "POST /predict/bulk",
+            "heatmap_raster": "GET /heatmap/raster",
+            "heatmap_tiles": "GET /heatmap/tiles/{z}/{x}/{y}.png",
+            "scoring_jobs": "POST /jobs",
+            "risk_subscription": "GET /subscribe/risk (SSE), WS /ws/risk",
+            "heat_alerts": "GET /alerts",
+            "district_thresholds": "GET /districts/{district_id}/thresholds",
+            "resolve_places": "POST /districts/resolve",
+            "risk_history": "GET /history/by-state, GET /history/districts/{district_id}"
         },
         "risk_levels": {
             "0": "Green - Comfortable/warm",
@@ -0,0 +1,534 @@
+"""
+HTTP Middleware for HeatGuard API
+
+AccessLogMiddleware makes the per-request log sampling decision
+(app/utils/logging_utils.py) and writes one access line per kept request.
+
+TracingMiddleware opens a trace per request (app/utils/tracing.py), adds a
+Server-Timing header with the per-stage breakdown and hands the finished
+trace to the exporter.
+
+AdmissionMiddleware puts each request in a class (interactive, bulk or
+exempt) and holds it until the class has a free slot and the client has a
+token left (app/services/admission_service.py); rejections are answered
+with 429 or 503 and Retry-After before the request body is read.
+
+CompressionMiddleware compresses responses with the best encoding both the
+client (Accept-Encoding) and the server support: zstd, brotli or gzip.
+Small bodies, already encoded bodies and binary formats that do not shrink
+(PNG tiles, Parquet) are passed through untouched. Streamed responses are
+compressed chunk by chunk and flushed after every chunk, so clients still
+receive each chunk as soon as it is produced.
+"""
+
+import logging
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from anyio import to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import (
+    ACCESS_LOG,
+    ADMISSION_CLIENT_HEADER,
+    ADMISSION_TRUST_FORWARDED,
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_BYTES,
+    COMPRESSION_THREAD_MIN_BYTES,
+    COMPRESSION_ZSTD_LEVEL,
+    TRACING_ENABLED,
+)
+from app.services import admission_service
+from app.utils import logging_utils, tracing
+from app.utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("heatguard.access")
+
+# Media types worth compressing (prefix match on the lowercased Content-Type)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/problem+json",
+    "application/geo+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    # Raw heatmap rasters: one label byte per cell, long runs of equal values
+    "application/octet-stream",
+    "image/svg+xml",
+    "text/",
+)
+# Event streams must reach the client message by message, uncompressed
+INCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+class Encoder:
+    """One response's compressor; compress() output is decodable on arrival."""
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress a complete body in one call."""
+        return self.compress(data, flush=False) + self.finish()
+
+
+class GzipEncoder(Encoder):
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        # wbits 16 + 15: gzip container rather than raw zlib
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        out = self._obj.compress(data)
+        return out + self._obj.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        import brotli
+
+        self._obj = brotli.Compressor(quality=quality, mode=brotli.MODE_TEXT)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        out = self._obj.process(data)
+        return out + self._obj.flush() if flush else out
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class ZstdEncoder(Encoder):
+    def __init__(self, level: int = COMPRESSION_ZSTD_LEVEL):
+        import zstandard
+
+        self._zstd = zstandard
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        out = self._obj.compress(data)
+        return out + self._obj.flush(self._zstd.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self) -> bytes:
+        return self._obj.flush(self._zstd.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# Content-Encoding token -> (encoder class, module the codec needs)
+ENCODERS: Dict[str, tuple] = {
+    "zstd": (ZstdEncoder, "zstandard"),
+    "br": (BrotliEncoder, "brotli"),
+    "gzip": (GzipEncoder, "zlib"),
+}
+
+
+def available_encodings(preferred: Sequence[str]) -> List[str]:
+    """The encodings from preferred, in order, whose codec library imports."""
+    available = []
+    for name in preferred:
+        if name not in ENCODERS:
+            logger.warning("Ignoring unknown compression encoding %r", name)
+            continue
+        try:
+            __import__(ENCODERS[name][1])
+        except ImportError:
+            logger.info("Compression encoding %r disabled: %s is not installed", name, ENCODERS[name][1])
+            continue
+        available.append(name)
+    return available
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    The client's q-values win; among equally weighted codings the server's
+    order in available decides. Returns None when nothing acceptable is
+    available (the response is then sent as identity).
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").lower()
+    if content_type.startswith(INCOMPRESSIBLE_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+# Compressed copies of immutable bodies, by (cache key, encoding)
+_STATIC_CACHE: Dict[Tuple[str, str], bytes] = {}
+_STATIC_CACHE_MAX_ENTRIES = 256
+_STATIC_ENCODINGS: Optional[List[str]] = None
+
+
+def encode_static(key: str, body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """
+    Negotiate and compress a body that never changes for a given key,
+    compressing each (key, encoding) pair only once.
+
+    For routes that serve memoized bytes; the middleware passes the result
+    through untouched because Content-Encoding is already set.
+
+    Returns:
+        (body to send, Content-Encoding or None for identity)
+    """
+    global _STATIC_ENCODINGS
+    if _STATIC_ENCODINGS is None:
+        _STATIC_ENCODINGS = available_encodings(COMPRESSION_ENCODINGS)
+    encoding = negotiate(accept_encoding, _STATIC_ENCODINGS)
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    cached = _STATIC_CACHE.get((key, encoding))
+    if cached is None:
+        if len(_STATIC_CACHE) >= _STATIC_CACHE_MAX_ENTRIES:
+            _STATIC_CACHE.clear()
+        cached = _STATIC_CACHE[(key, encoding)] = ENCODERS[encoding][0]().encode(body)
+    return cached, encoding
+
+
+class CompressionMiddleware:
+    """
+    Negotiated zstd / brotli / gzip response compression.
+
+    Args:
+        app: The wrapped ASGI application
+        encodings: Content codings in server preference order
+        minimum_size: Complete bodies smaller than this are sent as-is
+        thread_min_size: Bodies or chunks at least this large are compressed
+                         in a worker thread instead of on the event loop
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        encodings: Sequence[str] = tuple(COMPRESSION_ENCODINGS),
+        minimum_size: int = COMPRESSION_MIN_BYTES,
+        thread_min_size: int = COMPRESSION_THREAD_MIN_BYTES,
+    ):
+        self.app = app
+        self.encodings = available_encodings(encodings)
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        if scope["method"] != "HEAD":
+            encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-response state: holds the start message until the first body chunk."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start: Optional[Message] = None
+        self.started = False
+        self.encoder: Optional[Encoder] = None
+
+    async def _run(self, fn: Callable[[bytes], bytes], data: bytes) -> bytes:
+        with tracing.span("compress", encoding=self.encoding, bytes=len(data)):
+            if len(data) >= self.middleware.thread_min_size:
+                return await to_thread.run_sync(fn, data)
+            return fn(data)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+        if not self.started:
+            self.started = True
+            await self._send_first(message)
+            return
+        if self.encoder is None:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        chunk = await self._run(self.encoder.compress, body) if body else b""
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_first(self, message: Message) -> None:
+        start = self.start
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        negotiable = start["status"] not in (204, 304) and is_compressible(headers.get("content-type"))
+        if negotiable and "accept-encoding" not in headers.get("vary", "").lower():
+            # Caches must key compressible responses on Accept-Encoding even
+            # when this client got the identity version, or a body the route
+            # encoded itself (encode_static)
+            headers.add_vary_header("Accept-Encoding")
+        compressible = negotiable and "content-encoding" not in headers
+        if not compressible or self.encoding is None or (not more_body and len(body) < self.middleware.minimum_size):
+            await self.downstream(start)
+            await self.downstream(message)
+            return
+
+        encoder = ENCODERS[self.encoding][0]()
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # A strong validator names exact bytes; the encoded body differs
+            headers["ETag"] = f"W/{etag}"
+
+        if not more_body:
+            compressed = await self._run(encoder.encode, body)
+            headers["Content-Length"] = str(len(compressed))
+            await self.downstream(start)
+            await self.downstream({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed: the compressed length is unknown up front
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        self.encoder = encoder
+        await self.downstream(start)
+        chunk = await self._run(encoder.compress, body) if body else b""
+        if chunk:
+            await self.downstream({"type": "http.response.body", "body": chunk, "more_body": True})
+
+
+class TracingMiddleware:
+    """
+    Per-request tracing with a Server-Timing response header.
+
+    Args:
+        app: The wrapped ASGI application
+        enabled: Trace requests at all (otherwise a plain pass-through)
+        exporter: Receives every finished trace; exports the sampled ones
+    """
+
+    def __init__(self, app: ASGIApp, enabled: bool = TRACING_ENABLED,
+                 exporter: Optional[tracing.TraceExporter] = None):
+        self.app = app
+        self.enabled = enabled
+        self.exporter = exporter or tracing.EXPORTER
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace = tracing.start_trace(f"{scope['method']} {scope['path']}", traceparent)
+        trace.root.attributes.update({"http.request.method": scope["method"], "url.path": scope["path"]})
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.response_start_ns = time.perf_counter_ns()
+                trace.root.attributes["http.response.status_code"] = message["status"]
+                # Raw header list append: cheaper than MutableHeaders per request
+                raw = message.setdefault("headers", [])
+                raw.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                if trace.sampled and self.exporter.enabled:
+                    raw.append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+            await send(message)
+
+        token = tracing.activate(trace)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception as e:
+            trace.root.error = type(e).__name__
+            raise
+        finally:
+            tracing.deactivate(token)
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                trace.root.name = f"{scope['method']} {route.path}"
+                trace.root.attributes["http.route"] = route.path
+            trace.finish()
+            self.exporter.submit(trace)
+
+
+class AccessLogMiddleware:
+    """
+    Per-request log sampling and structured access lines.
+
+    The keep/drop decision is made once per request from the path, so a
+    request's access line and its INFO/DEBUG records are kept or dropped
+    together. A plain pass-through when access logging is off and no
+    sampling rule is configured.
+
+    Args:
+        app: The wrapped ASGI application
+        access_log: Write one INFO line per kept request
+        sampler: Per-path sampling rates (default: the configured SAMPLER)
+    """
+
+    def __init__(self, app: ASGIApp, access_log: bool = ACCESS_LOG,
+                 sampler: Optional[logging_utils.LogSampler] = None):
+        self.app = app
+        self.access_log = access_log
+        self.sampler = sampler or logging_utils.SAMPLER
+        self.enabled = access_log or self.sampler.active
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        sampled = self.sampler.sample(scope["path"])
+        token = logging_utils.set_request_sampled(sampled)
+        if not (sampled and self.access_log):
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                logging_utils.reset_request_sampled(token)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            route = scope.get("route")
+            access_logger.info(
+                "%s %s %d %.1fms", scope["method"], scope["path"], status, elapsed_ms,
+                extra={
+                    "http": {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": getattr(route, "path", None),
+                        "status": status,
+                        "duration_ms": round(elapsed_ms, 3),
+                        "client": scope["client"][0] if scope.get("client") else None,
+                    },
+                },
+            )
+            logging_utils.reset_request_sampled(token)
+
+
+class AdmissionMiddleware:
+    """
+    Admission control in front of the routes.
+
+    A request holds its slot until the response has been sent in full, so
+    streamed bulk responses keep counting against the bulk budget while
+    they stream. WebSockets and exempt paths pass straight through.
+
+    Args:
+        app: The wrapped ASGI application
+        controller: Classes and limits (default: the configured ADMISSION)
+        client_header: Lowercased header naming the client (e.g. an API key)
+        trust_forwarded: Take the client address from X-Forwarded-For
+    """
+
+    def __init__(self, app: ASGIApp, controller: Optional[admission_service.AdmissionController] = None,
+                 client_header: str = ADMISSION_CLIENT_HEADER, trust_forwarded: bool = ADMISSION_TRUST_FORWARDED):
+        self.app = app
+        self.controller = controller or admission_service.ADMISSION
+        self.client_header = client_header.encode("latin-1")
+        self.trust_forwarded = trust_forwarded
+
+    def _client(self, scope: Scope) -> str:
+        if self.client_header or self.trust_forwarded:
+            for name, value in scope["headers"]:
+                if self.client_header and name == self.client_header:
+                    return "key:" + value.decode("latin-1")
+                if self.trust_forwarded and name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",", 1)[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        controller = self.controller
+        if scope["type"] != "http" or not controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        name = controller.classify(scope["method"], scope["path"])
+        if name == admission_service.EXEMPT:
+            controller.exempt += 1
+            await self.app(scope, receive, send)
+            return
+
+        content_length = None
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit():
+            content_length = int(length)
+        try:
+            controller.check_rate(controller.classes[name], self._client(scope))
+            await controller.acquire(name, content_length)
+        except admission_service.AdmissionRejected as exc:
+            await self._reject(exc, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(name, time.perf_counter() - started)
+
+    @staticmethod
+    async def _reject(exc: admission_service.AdmissionRejected, send: Send) -> None:
+        if exc.status_code == 429:
+            detail = f"Rate limit exceeded for {exc.request_class} requests"
+        else:
+            detail = f"Server busy with {exc.request_class} requests; retry later"
+        body = dumps({"detail": detail, "request_class": exc.request_class, "reason": exc.reason})
+        await send({
+            "type": "http.response.start",
+            "status": exc.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", admission_service.retry_after_header(exc.retry_after).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -2,6 +2,6 @@
 HeatGuard API Routers Package
 """
 
-from . import health, predict, forecast, districts
+from . import health, predict, forecast, districts, heatmap, models, jobs
 
-__all__ = ["health", "predict", "forecast", "districts"]
+__all__ = ["health", "predict", "forecast", "districts", "heatmap", "models", "jobs"]
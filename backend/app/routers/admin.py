@@ -0,0 +1,163 @@
+"""
+Admin Router for HeatGuard API
+
+Operator-only diagnostics for a live worker: a sampling CPU profile in the
+collapsed-stack format and a tracemalloc allocation snapshot. The endpoints
+return 404 unless HEATGUARD_PROFILING is enabled and require the
+X-Admin-Token header.
+
+    curl -H "X-Admin-Token: $TOKEN" "$API/admin/profile/cpu?seconds=30" > cpu.folded
+    flamegraph.pl cpu.folded > cpu.svg      # or drop cpu.folded on speedscope.app
+
+With several uvicorn workers each request profiles only the worker that
+served it; offline scoring jobs run in their own processes and are not seen.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from app.config import (
+    PROFILE_DEFAULT_INTERVAL_MS,
+    PROFILE_MAX_SECONDS,
+    PROFILE_MIN_INTERVAL_MS,
+    PROFILING_ENABLED,
+)
+from app.dependencies import require_admin
+from app.services.profiler_service import PROFILER, ProfilerBusyError
+from app.utils.tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+
+async def require_profiling() -> None:
+    """Hide the profiling endpoints entirely unless enabled in config."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+router = APIRouter(route_class=TracedRoute, dependencies=[Depends(require_profiling), Depends(require_admin)])
+
+# Diagnostics must never be cached or transformed by intermediaries
+_NO_STORE = {"Cache-Control": "no-store"}
+
+
+class CpuProfileResponse(BaseModel):
+    """Response model for a CPU profile in JSON form."""
+    pid: int
+    duration_seconds: float
+    interval_ms: float
+    ticks: int
+    samples: int
+    idle_samples: int
+    missed_ticks: int
+    distinct_stacks: int
+    overhead_ratio: float
+    collapsed: str
+
+
+class AllocationSite(BaseModel):
+    """Live allocations attributed to one source line or traceback."""
+    traceback: List[str]
+    size_bytes: int
+    size_diff_bytes: int
+    count: int
+    count_diff: int
+
+
+class MemoryProfileResponse(BaseModel):
+    """Response model for a tracemalloc snapshot."""
+    pid: int
+    duration_seconds: float
+    traced_current_bytes: int
+    traced_peak_bytes: int
+    tracemalloc_overhead_bytes: int
+    group_by: str
+    top: List[AllocationSite]
+
+
+@router.get(
+    "/admin/profile/cpu",
+    summary="Sample CPU Profile",
+    description="Sample every thread's stack for a while and return flamegraph-compatible collapsed stacks.",
+    responses={200: {"content": {"text/plain": {}}}},
+)
+async def cpu_profile(
+    seconds: float = Query(10.0, gt=0.0, le=PROFILE_MAX_SECONDS, description="Sampling window"),
+    interval_ms: float = Query(PROFILE_DEFAULT_INTERVAL_MS, ge=PROFILE_MIN_INTERVAL_MS, le=1000.0,
+                               description="Sampling period"),
+    include_idle: bool = Query(False, description="Keep samples of threads parked in select/lock waits"),
+    by_line: bool = Query(False, description="One frame per source line instead of per function"),
+    format: Literal["folded", "json"] = Query("folded", description="Collapsed-stack text or JSON with stats"),
+):
+    """
+    Profile this worker for `seconds` while it keeps serving traffic.
+
+    The folded output has one `thread;outer (file:line);...;leaf (file:line) count`
+    line per distinct stack. Sampling statistics (samples, missed ticks, and
+    the share of wall time spent sampling) are returned in `X-Profile-*`
+    headers, or in the body with `format=json`. Only one CPU profile runs per
+    worker at a time; a second request gets 409.
+    """
+    try:
+        sampler = PROFILER.start_cpu(interval_ms / 1000.0, include_idle, by_line)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        # Also runs on client disconnect, so the sampler never outlives the request
+        collapsed, stats = PROFILER.finish_cpu(sampler)
+
+    if format == "json":
+        return CpuProfileResponse(pid=os.getpid(), collapsed=collapsed, **stats)
+
+    headers = {f"X-Profile-{key.replace('_', '-').title()}": str(value) for key, value in stats.items()}
+    headers.update(_NO_STORE)
+    headers["Content-Disposition"] = f'attachment; filename="heatguard-cpu-{os.getpid()}-{int(time.time())}.folded"'
+    return PlainTextResponse(collapsed, headers=headers)
+
+
+@router.get(
+    "/admin/profile/memory",
+    response_model=MemoryProfileResponse,
+    summary="Allocation Snapshot",
+    description="Trace allocations with tracemalloc for a while and report where live memory was allocated.",
+)
+async def memory_profile(
+    seconds: float = Query(10.0, gt=0.0, le=PROFILE_MAX_SECONDS, description="Tracing window"),
+    group_by: Literal["lineno", "filename", "traceback"] = Query("lineno"),
+    top: int = Query(50, ge=1, le=1000, description="Allocation sites returned"),
+) -> Dict[str, Any]:
+    """
+    Allocation snapshot of this worker.
+
+    tracemalloc only sees allocations made while it runs, so the report
+    covers memory allocated during the window and still alive at its end,
+    largest growth first. `traced_peak_bytes` is the peak of traced memory
+    during the window. Allocation-heavy paths run noticeably slower while
+    tracing is on; it is switched off again when the window ends, unless
+    the process was started with tracemalloc already enabled.
+    """
+    try:
+        baseline = PROFILER.start_memory()
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    started = time.perf_counter()
+    try:
+        await asyncio.sleep(seconds)
+    except BaseException:
+        PROFILER.cancel_memory()
+        raise
+    duration = time.perf_counter() - started
+    # Snapshots of a busy heap take a while to group; keep that off the event loop
+    report = await asyncio.to_thread(PROFILER.finish_memory, baseline, group_by, top)
+    return {"pid": os.getpid(), "duration_seconds": round(duration, 3), **report}
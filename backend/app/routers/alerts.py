@@ -0,0 +1,106 @@
+"""
+Alerts Router for HeatGuard API
+
+Threshold-crossing events from the incremental alert engine
+(app/services/alert_service.py) and the district-days currently on alert.
+Districts are covered while they are subscribed to (/subscribe/risk) or
+listed in HEATGUARD_ALERT_STATES.
+
+    # Poll for new events, remembering the last id seen
+    curl "$API/alerts?after_id=$LAST_ID&min_level=Red"
+"""
+
+import logging
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.config import RISK_LABEL_TO_LEVEL
+from app.services.alert_service import ALERTS
+from app.utils.tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TracedRoute)
+
+_LEVEL_TO_LABEL = {level.lower(): label for label, level in RISK_LABEL_TO_LEVEL.items()}
+
+
+class AlertEvent(BaseModel):
+    """One threshold crossing of a district-day's risk label."""
+    id: int
+    time: str
+    kind: Literal["raised", "escalated", "deescalated", "cleared"]
+    district_id: str
+    name: str
+    state: str
+    date: str
+    tmax_c: float
+    risk_label: int
+    risk_level: str
+    previous_risk_label: Optional[int] = None
+    previous_risk_level: Optional[str] = None
+    probability: float
+    model_version: str
+
+
+class AlertEventsResponse(BaseModel):
+    events: List[AlertEvent]
+    # Pass as after_id on the next poll
+    last_id: int
+    # Set when events after the requested after_id have already left the log
+    truncated: bool
+
+
+class ActiveAlert(BaseModel):
+    district_id: str
+    name: str
+    state: str
+    date: str
+    risk_label: int
+    risk_level: str
+    probability: float
+
+
+def _min_label(min_level: Optional[str]) -> Optional[int]:
+    if min_level is None:
+        return None
+    label = _LEVEL_TO_LABEL.get(min_level.strip().lower())
+    if label is None:
+        raise HTTPException(status_code=422, detail=f"Unknown risk level: {min_level}")
+    return label
+
+
+@router.get("/alerts", response_model=AlertEventsResponse)
+async def list_alert_events(
+    after_id: int = Query(0, ge=0, description="Only events with a larger id"),
+    state: Optional[str] = Query(None),
+    district_id: Optional[str] = Query(None),
+    kind: Optional[Literal["raised", "escalated", "deescalated", "cleared"]] = Query(None),
+    min_level: Optional[str] = Query(None, description="Green, Yellow, Orange or Red"),
+    limit: int = Query(100, ge=1, le=1000),
+) -> AlertEventsResponse:
+    """
+    Threshold-crossing events, oldest first.
+
+    `raised` is a district-day reaching the alert level (Orange by default),
+    `escalated` / `deescalated` a move between levels at or above it, and
+    `cleared` a drop below it. The log keeps the most recent
+    HEATGUARD_ALERT_LOG_SIZE events of this worker.
+    """
+    events = ALERTS.events(after_id, state, district_id, kind, _min_label(min_level), limit)
+    # A short page means every matching event up to the newest was returned
+    last_id = events[-1]["id"] if len(events) == limit else max(after_id, ALERTS.last_event_id)
+    oldest = ALERTS.oldest_event_id
+    return AlertEventsResponse(
+        events=events,
+        last_id=last_id,
+        truncated=oldest is not None and after_id + 1 < oldest,
+    )
+
+
+@router.get("/alerts/active", response_model=List[ActiveAlert])
+async def list_active_alerts(state: Optional[str] = Query(None)):
+    """District-days whose latest score is at or above the alert level."""
+    return ALERTS.active(state)
@@ -4,18 +4,27 @@ Districts Router for HeatGuard API
 Provides endpoints for district metadata and configuration.
 """
 
-import json
-import hashlib
+import asyncio
 import uuid
-from pathlib import Path
+from datetime import date as date_type, timedelta
 from typing import List, Dict, Optional
 
-from fastapi import APIRouter, Query
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 
+from app.config import HORIZON_MAX_DAYS, RESOLVE_MAX_NAMES, RISK_LABEL_TO_LEVEL, get_risk_level
+from app.dependencies import get_model_artifacts
+from app.middleware import encode_static
+from app.services import district_store, place_resolver, threshold_service
+from app.services.date_utils import date_range_array
+from app.services.model_registry import ModelArtifacts
 from app.services.weather_service import search_location_by_name
+from app.utils import fieldsets
+from app.utils.responses import dumps
+from app.utils.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 class VulnerabilityMetrics(BaseModel):
@@ -35,132 +44,155 @@ class DistrictMetadata(BaseModel):
     vulnerability: VulnerabilityMetrics
 
 
-# Locate the backend project root and load the two JSON files
-# backend/app/routers/districts.py -> parents[0]=routers, [1]=app, [2]=backend
-BASE_DIR = Path(__file__).resolve().parents[2]
-DISTRICTS_PATH = BASE_DIR / "data" / "districts.json"
-GEO_PATH = BASE_DIR / "data" / "District-Geocodes.json"
+class RiskAggregateRequest(BaseModel):
+    """Batch risk outputs to join with district population, as parallel columns."""
+    district_ids: List[str]
+    risk_labels: List[int]
 
-ALL_DISTRICTS: List[DistrictMetadata] = []
 
-
-def norm(s: str) -> str:
-    return s.strip().lower() if s else ""
-
-
-def generate_vulnerability(state: str, district: str) -> VulnerabilityMetrics:
-    """Deterministic vulnerability generator so values are stable."""
-    key = f"{state}-{district}".encode("utf-8")
-    h = int(hashlib.sha256(key).hexdigest(), 16)
-    elderly = 8 + (h % 9)              # 8–16%
-    outdoor = 20 + ((h // 10) % 21)    # 20–40%
-    slum = 10 + ((h // 100) % 21)      # 10–30%
-    return VulnerabilityMetrics(
-        elderlyPopulation=float(elderly),
-        outdoorWorkers=float(outdoor),
-        slumPopulation=float(slum),
+class StateRiskAggregate(BaseModel):
+    state: str
+    districts: int
+    population: int
+    population_by_level: Dict[str, int]
+    population_at_risk: int           # Orange + Red
+    elderly_at_risk: int
+    outdoor_workers_at_risk: int
+    slum_population_at_risk: int
+    density_weighted_risk: float      # mean risk label weighted by population density
+
+
+class RiskAggregateResponse(BaseModel):
+    states: List[StateRiskAggregate]
+    unmatched_district_ids: List[str]
+
+
+class ResolveRequest(BaseModel):
+    """Place names to resolve, optionally qualified with a state ("Aurangabad, Bihar")."""
+    names: List[str]
+    geocode: bool = True   # send names unknown locally to the geocoder
+
+
+class ResolvedPlace(BaseModel):
+    query: str
+    status: str                               # "matched", "ambiguous" or "unmatched"
+    source: Optional[str] = None              # "district", "headquarters", "place" or "geocoder"
+    district_id: Optional[str] = None
+    name: Optional[str] = None
+    state: Optional[str] = None
+    coordinates: Optional[List[float]] = None  # [lat, lon] of the place, else of the district
+    candidates: List[str] = []                 # all matching district ids when ambiguous
+
+
+class ResolveResponse(BaseModel):
+    results: List[ResolvedPlace]
+    matched: int
+    ambiguous: int
+    unmatched: int
+    geocoder_calls: int
+
+
+class LevelThreshold(BaseModel):
+    risk_label: int
+    risk_level: str
+    # Lowest tmax at this level or above; null when it applies at any tmax or is never reached
+    min_tmax_c: Optional[float]
+    reachable: bool
+
+
+class DayThresholds(BaseModel):
+    date: date_type
+    levels: List[LevelThreshold]
+    # Only with the tmax_c query parameter
+    tmax_c: Optional[float] = None
+    risk_label: Optional[int] = None
+    risk_level: Optional[str] = None
+    degrees_to_next_level: Optional[float] = None
+    degrees_until_red: Optional[float] = None
+
+
+class DistrictThresholdsResponse(BaseModel):
+    district_id: str
+    name: str
+    state: str
+    coordinates: List[float]  # [lat, lon]
+    model_version: str
+    source: str               # "table" (precomputed) or "model"
+    days: List[DayThresholds]
+
+
+# Selectable with fields= on /districts and /districts/by-state, in response
+# order; id is always included
+DISTRICT_FIELDS = ("id", "name", "state", "coordinates", "population", "area", "density", "vulnerability")
+
+
+def _records_response(request: Request, key: str, rows: np.ndarray, fields: Optional[str],
+                      limit: Optional[int], cursor: Optional[str]) -> Response:
+    """
+    District records, optionally trimmed to fields and paginated.
+
+    Whole lists are memoized per field selection, and also per content
+    encoding; pages are encoded per request.
+    """
+    store = district_store.get_store()
+    selected = fieldsets.parse_fields(fields, DISTRICT_FIELDS, always=("id",))
+    names = None if selected is None else fieldsets.ordered(selected, DISTRICT_FIELDS)
+    page = fieldsets.paginate(len(rows), f"/districts:{key}", limit, cursor)
+    if names is not None:
+        key = f"{key}|{','.join(names)}"
+    headers = page.headers(request)
+    if page.paginated:
+        body = dumps(store.records(rows[page.start:page.end], names))
+        return Response(body, media_type="application/json", headers=headers)
+
+    # id(store): a reloaded store must not be served from the old store's entries
+    body, encoding = encode_static(
+        f"districts:{id(store)}:{key}", store.records_json(key, rows, names), request.headers.get("accept-encoding", "")
     )
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
 
 
-def load_district_data():
-    """Load district data from JSON files."""
-    global ALL_DISTRICTS
-
-    if not DISTRICTS_PATH.exists() or not GEO_PATH.exists():
-        # Fallback or warning if files are missing
-        print(f"WARNING: District data files not found at {DISTRICTS_PATH} or {GEO_PATH}")
-        return
-
-    try:
-        with DISTRICTS_PATH.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            # Handle structure: {"districts": [...]}
-            if isinstance(data, dict) and "districts" in data:
-                districts_raw = data["districts"]
-            else:
-                districts_raw = data
-
-        with GEO_PATH.open("r", encoding="utf-8") as f:
-            geo_raw = json.load(f)
-
-        # Build a lookup for geocodes keyed by a normalised district name
-        geo_index: Dict[str, Dict] = {}
-        for row in geo_raw:
-            # Inspect keys in District-Geocodes.json and adapt:
-            name = norm(row.get("district") or row.get("District") or row.get("name") or row.get("District_Name", ""))
-            if not name:
-                continue
-            geo_index[name] = row
-
-        # Build ALL_DISTRICTS by merging districts.json with geocodes
-        districts: List[DistrictMetadata] = []
-        for row in districts_raw:
-            state = row.get("state", "Unknown")
-            district_name = row.get("district", "Unknown")
-            pop = row.get("population")
-            area = row.get("area")
-            density = row.get("density")
-
-            geo_row = geo_index.get(norm(district_name))
-            if geo_row:
-                try:
-                    lat = float(geo_row.get("lat") or geo_row.get("latitude") or geo_row.get("Latitude") or 0)
-                    lon = float(geo_row.get("lon") or geo_row.get("longitude") or geo_row.get("Longitude") or 0)
-                except (ValueError, TypeError):
-                    lat, lon = 0.0, 0.0
-            else:
-                lat, lon = 0.0, 0.0  # fallback if no geocode found
-
-            vuln = generate_vulnerability(state, district_name)
-
-            # Generate ID
-            state_code = row.get('stateCode') or state[:2]
-            dist_code = row.get('districtCode') or district_name[:4]
-            dist_id = f"{state_code.lower()}_{dist_code.lower()}"
-
-            districts.append(DistrictMetadata(
-                id=dist_id,
-                name=district_name,
-                state=state,
-                coordinates=[lat, lon],
-                population=pop,
-                area=area,
-                density=density,
-                vulnerability=vuln,
-            ))
-
-        ALL_DISTRICTS = districts
-        print(f"Loaded {len(ALL_DISTRICTS)} districts.")
-
-    except Exception as e:
-        print(f"Error loading district data: {e}")
-
-
-# Load data on module import
-load_district_data()
+_FIELDS_QUERY = Query(None, description="Comma-separated district fields to return (default: all; id is always included)")
+_LIMIT_QUERY = Query(None, description="Districts per page (default: all)")
+_CURSOR_QUERY = Query(None, description="X-Next-Cursor header of the previous page")
 
 
 @router.get("/districts", response_model=List[DistrictMetadata])
-async def get_districts():
-    return ALL_DISTRICTS
+async def get_districts(
+    request: Request,
+    fields: Optional[str] = _FIELDS_QUERY,
+    limit: Optional[int] = _LIMIT_QUERY,
+    cursor: Optional[str] = _CURSOR_QUERY,
+):
+    return _records_response(request, "all", district_store.get_store().all_rows(), fields, limit, cursor)
 
 
 @router.get("/districts/by-state", response_model=List[DistrictMetadata])
-async def get_districts_by_state(state: str = Query(..., min_length=2)):
-    s = state.lower()
-    return [d for d in ALL_DISTRICTS if d.state.lower() == s]
+async def get_districts_by_state(
+    request: Request,
+    state: str = Query(..., min_length=2),
+    fields: Optional[str] = _FIELDS_QUERY,
+    limit: Optional[int] = _LIMIT_QUERY,
+    cursor: Optional[str] = _CURSOR_QUERY,
+):
+    store = district_store.get_store()
+    key = f"state:{district_store.norm(state)}"
+    return _records_response(request, key, store.rows_for_state(state), fields, limit, cursor)
 
 
 @router.get("/districts/states", response_model=List[str])
 async def get_states():
     """Return a list of all available states."""
-    return sorted(list(set(d.state for d in ALL_DISTRICTS)))
+    return district_store.get_store().state_names()
 
 
 @router.get("/districts/search", response_model=List[DistrictMetadata])
 async def search_districts(q: str = Query(..., min_length=2)):
     results = await search_location_by_name(q)
-    districts: List[DistrictMetadata] = []
+    store = district_store.get_store()
+    districts: List[Dict] = []
     seen_district_ids = set()
 
     for res in results:
@@ -171,32 +203,151 @@ async def search_districts(q: str = Query(..., min_length=2)):
         coords = [res.get("lat"), res.get("lon")]
 
         # Attempt to find existing district data to populate stats
-        match = next((d for d in ALL_DISTRICTS
-                      if norm(d.name) == norm(name) and norm(d.state) == norm(state_name)), None)
+        row = store.find(name, state_name)
 
-        if match:
+        if row is not None:
             # Deduplicate: if we already have this district in the results, skip
-            if match.id in seen_district_ids:
+            if store.ids[row] in seen_district_ids:
                 continue
-            seen_district_ids.add(match.id)
+            seen_district_ids.add(store.ids[row])
 
-            pop = match.population
-            area = match.area
-            density = match.density
-
-            vuln = generate_vulnerability(state_name, name)
             dist_id = f"search_{uuid.uuid4().hex[:8]}"
-            districts.append(DistrictMetadata(
-                id=dist_id,
-                name=match.name,
-                state=match.state,
-                coordinates=coords,
-                population=pop,
-                area=area,
-                density=density,
-                vulnerability=vuln,
-            ))
+            districts.append(store.record(row, id=dist_id, coordinates=coords))
         # Else: Skip results that don't match any known district in our database
         # This filters out "hallucinated" or irrelevant locations from the geocoder (e.g. Karur, Maharashtra)
 
     return districts
+
+
+@router.post("/districts/resolve", response_model=ResolveResponse)
+async def resolve_districts(req: ResolveRequest):
+    """
+    Resolve a list of place names to district ids and coordinates.
+
+    Each distinct name is matched against the district names, district
+    headquarters and the geocoded towns and cities of the local data; a
+    name that exists in several states (without a state qualifier) comes
+    back as "ambiguous" with all candidate ids. Only names none of these
+    know are sent to the geocoder, a few at a time and cached.
+    """
+    if len(req.names) > RESOLVE_MAX_NAMES:
+        raise HTTPException(status_code=422, detail=f"At most {RESOLVE_MAX_NAMES} names per request")
+    return await place_resolver.resolve_names(req.names, geocode=req.geocode)
+
+
+@router.post("/districts/risk-aggregate", response_model=RiskAggregateResponse)
+async def risk_aggregate(req: RiskAggregateRequest):
+    """
+    Join batch risk outputs with district population and vulnerability.
+
+    Takes parallel `district_ids` / `risk_labels` columns (for example from
+    `/predict/bulk` or one date/scenario slice of `/predict/horizon`) and
+    returns state-level population-at-risk rollups, including the elderly,
+    outdoor-worker and slum populations living in Orange/Red districts.
+    """
+    if len(req.district_ids) != len(req.risk_labels):
+        raise HTTPException(status_code=422, detail="district_ids and risk_labels must have the same length")
+
+    store = district_store.get_store()
+    rows = store.rows_for_ids(req.district_ids)
+    labels = np.asarray(req.risk_labels, dtype=np.int64)
+    if labels.size and (labels.min() < 0 or labels.max() > 3):
+        raise HTTPException(status_code=422, detail="risk_labels must be between 0 and 3")
+
+    matched = rows >= 0
+    unmatched = [req.district_ids[i] for i in np.nonzero(~matched)[0]]
+    return RiskAggregateResponse(
+        states=[StateRiskAggregate(**s) for s in store.aggregate_state_risk(rows[matched], labels[matched])],
+        unmatched_district_ids=unmatched,
+    )
+
+
+def _day_thresholds(day: date_type, thresholds: np.ndarray, breakpoints: np.ndarray,
+                    tmax_c: Optional[float]) -> DayThresholds:
+    unreachable = len(thresholds) + 1
+    levels = []
+    for k, interval in enumerate(breakpoints.tolist(), start=1):
+        min_tmax = threshold_service.breakpoint_tmax(thresholds, interval)
+        levels.append(LevelThreshold(
+            risk_label=k,
+            risk_level=get_risk_level(k),
+            min_tmax_c=round(min_tmax, 2) if min_tmax is not None else None,
+            reachable=interval < unreachable,
+        ))
+    result = DayThresholds(date=day, levels=levels)
+    if tmax_c is None:
+        return result
+
+    interval = int(np.searchsorted(thresholds, tmax_c, side="right"))
+    label = int((breakpoints <= interval).sum())
+
+    def degrees_to(level: int) -> Optional[float]:
+        if label >= level:
+            return 0.0
+        target = levels[level - 1]
+        return round(target.min_tmax_c - tmax_c, 2) if target.reachable else None
+
+    top = max(RISK_LABEL_TO_LEVEL)
+    result.tmax_c = tmax_c
+    result.risk_label = label
+    result.risk_level = get_risk_level(label)
+    result.degrees_to_next_level = degrees_to(label + 1) if label < top else None
+    result.degrees_until_red = degrees_to(top)
+    return result
+
+
+@router.get("/districts/{district_id}/thresholds", response_model=DistrictThresholdsResponse)
+async def get_district_thresholds(
+    district_id: str,
+    start: Optional[date_type] = Query(None, description="First date (default: today)"),
+    days: int = Query(5, ge=1, le=HORIZON_MAX_DAYS, description="Number of dates"),
+    tmax_c: Optional[float] = Query(None, ge=-60, le=70, description="Also place this tmax on the scale"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+):
+    """
+    The tmax at which a district reaches each risk level, per date.
+
+    For a fixed district and date the risk level only depends on tmax, so
+    each level starts at one temperature breakpoint (`min_tmax_c`). With
+    `tmax_c` each date also reports the level of that temperature and how
+    many degrees warmer it must get to reach the next level and Red.
+
+    Answered from the model version's precomputed threshold table
+    (benchmarks/thresholds.py) when available, else by scoring the model
+    across its tmax thresholds (`source` tells which).
+    """
+    store = district_store.get_store()
+    row = store.row(district_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Unknown district id: {district_id}")
+    lat, lon = float(store.lat[row]), float(store.lon[row])
+    if lat == 0 and lon == 0:
+        raise HTTPException(status_code=404, detail=f"No coordinates for district: {district_id}")
+
+    first = start or date_type.today()
+    dates = date_range_array(first, first + timedelta(days=days - 1))
+    table = threshold_service.get_table(artifacts)
+    if table is not None and table.located[row]:
+        thresholds, breakpoints, source = table.thresholds, table.row_breakpoints(row, dates), "table"
+    else:
+        try:
+            # A few hundred ms of model calls over the tmax grid; keep it off the event loop
+            thresholds, breakpoints = await asyncio.to_thread(
+                threshold_service.compute_breakpoints, artifacts, lat, lon, dates
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        source = "model"
+
+    return DistrictThresholdsResponse(
+        district_id=store.ids[row],
+        name=store.name(row),
+        state=store.state(row),
+        coordinates=[lat, lon],
+        model_version=artifacts.version,
+        source=source,
+        days=[
+            _day_thresholds(day, thresholds, breakpoints[i], tmax_c)
+            for i, day in enumerate(dates.tolist())
+        ],
+    )
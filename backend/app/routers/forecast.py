@@ -5,24 +5,62 @@ Provides endpoints for weather forecast-based heat risk predictions.
 """
 
 import logging
-from typing import List
+import time
+from typing import Dict, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
-from app.schemas import Forecast5DaysResponse, ForecastDay, ForecastLocation
-from app.services.weather_service import fetch_openweather_forecast, extract_daily_max_temps
-from app.services.date_utils import compute_day_of_year, compute_month
-from app.services.model_service import is_model_loaded, predict_risk_batch
+from app.dependencies import MODEL_VERSION_HEADER, get_model_artifacts
+from app.schemas import Forecast5DaysResponse, ForecastLocation
+from app.services.forecast_service import FORECASTS, forecast_etag, matching_tag, next_change
+from app.services.weather_service import fetch_openweather_forecast
+from app.services.model_registry import ModelArtifacts
+from app.utils import fieldsets
+from app.utils.responses import FastJSONResponse
+from app.utils.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+# Selectable with fields= on /forecast/5days, in response order
+FORECAST_FIELDS = ("date", "tmax_c", "risk_label", "risk_level", "humidity", "probabilities")
+
+
+def _cache_headers(etag: str, expires_at: float) -> Dict[str, str]:
+    headers = FORECASTS.cache_headers(etag, expires_at)
+    if headers:
+        # A pinned model version changes the body under the same URL
+        headers["Vary"] = MODEL_VERSION_HEADER
+    return headers
+
+
+def _not_modified(tag: str, expires_at: float, version: str) -> Response:
+    """
+    304 for a matching If-None-Match tag.
+
+    Repeats the validator as the client has it (weak when the 200 was
+    compressed), the serving model version and the full Vary of the 200,
+    which the compression middleware adds to compressible responses but
+    not to a bodiless 304.
+    """
+    FORECASTS.not_modified += 1
+    headers = _cache_headers(tag, expires_at)
+    headers["Vary"] = f"{MODEL_VERSION_HEADER}, Accept-Encoding"
+    headers[MODEL_VERSION_HEADER] = version
+    return Response(status_code=304, headers=headers)
 
 
 @router.get("/forecast/5days", response_model=Forecast5DaysResponse)
 async def forecast_5days(
+    request: Request,
+    response: Response,
     lat: float = Query(..., ge=-90.0, le=90.0, description="Latitude of the location"),
     lon: float = Query(..., ge=-180.0, le=180.0, description="Longitude of the location"),
+    fields: Optional[str] = Query(None, description="Comma-separated forecast day fields to return (default: all)"),
+    limit: Optional[int] = Query(None, description="Forecast days per page (default: all)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
 ) -> Forecast5DaysResponse:
     """
     Fetch 5-day weather forecast from OpenWeather and compute heat risk for each day.
@@ -40,78 +78,63 @@ async def forecast_5days(
     - **lat**: Latitude of the location (-90 to 90)
     - **lon**: Longitude of the location (-180 to 180)
 
+    - **fields**: e.g. `date,risk_level` to trim each forecast day
+    - **limit** / **cursor**: page through the forecast days
+
+    **Caching:** answers are cacheable until the next expected upstream
+    refresh (`Cache-Control`, `Expires`) and carry an `ETag`; a request with
+    a matching `If-None-Match` gets 304 without the model being run.
+
     **Returns:**
     - Location coordinates
     - List of daily forecasts with risk predictions
     """
-    # Check if model is loaded
-    if not is_model_loaded():
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. Please try again later."
-        )
-
+    selected = fieldsets.parse_fields(fields, FORECAST_FIELDS)
+    if_none_match = request.headers.get("if-none-match")
     try:
-        # Fetch forecast from OpenWeather
-        logger.info(f"Fetching 5-day forecast for lat={lat}, lon={lon}")
-        openweather_json = await fetch_openweather_forecast(lat, lon)
-
-        # Extract location name if available
-        city_name = openweather_json.get("city", {}).get("name", "Unknown Location")
-
-        # Extract daily max temperatures
-        daily_temps = extract_daily_max_temps(openweather_json)
-
-        if not daily_temps:
-            raise HTTPException(
-                status_code=502,
-                detail="No forecast data available from OpenWeather"
-            )
-
-        # Prepare features for batch prediction
-        features_list = []
-        for day_data in daily_temps:
-            forecast_date = day_data["date"]
-            tmax_c = day_data["tmax_c"]
-
-            features = {
-                "tmax_c": tmax_c,
-                "day_of_year": compute_day_of_year(forecast_date),
-                "month": compute_month(forecast_date),
-                "lat": lat,
-                "lon": lon,
-            }
-            features_list.append(features)
-
-        # Run batch risk prediction
-        risk_results = predict_risk_batch(features_list)
-
-        # Build response
-        forecast_days: List[ForecastDay] = []
-        for i, day_data in enumerate(daily_temps):
-            risk_data = risk_results[i]
-
-            forecast_day = ForecastDay(
-                date=day_data["date"],
-                tmax_c=day_data["tmax_c"],
-                humidity=day_data.get("humidity"),
-                risk_label=risk_data["risk_label"],
-                risk_level=risk_data["risk_level"],
-                probabilities=risk_data.get("probabilities")
+        cached = FORECASTS.lookup(lat, lon, artifacts)
+        if cached is not None:
+            result, stale = cached
+        else:
+            logger.info("Fetching 5-day forecast for lat=%s, lon=%s", lat, lon)
+            openweather_json = await fetch_openweather_forecast(lat, lon)
+            # Revalidation needs only the cached upstream forecast, not the model
+            etag = forecast_etag(artifacts, lat, lon, openweather_json)
+            tag = FORECASTS.enabled and matching_tag(if_none_match, etag)
+            if tag:
+                return _not_modified(tag, next_change(time.time()), artifacts.version)
+            result, stale = await FORECASTS.compute(lat, lon, artifacts, openweather_json), False
+            logger.info("Successfully generated %d day forecast for lat=%s, lon=%s", len(result.days), lat, lon)
+
+        tag = FORECASTS.enabled and matching_tag(if_none_match, result.etag)
+        if tag:
+            return _not_modified(tag, result.expires_at, artifacts.version)
+
+        # Every day is scored (and recorded) even when only a page is returned:
+        # the forecast is a single upstream call and a five-row model batch
+        page = fieldsets.paginate(len(result.days), f"/forecast/5days:{lat}:{lon}", limit, cursor)
+        forecast_days = result.days[page.start:page.end]
+        location = ForecastLocation(lat=lat, lon=lon, name=result.city_name)
+        headers = {**page.headers(request), **_cache_headers(result.etag, result.expires_at)}
+        if selected is not None:
+            return FastJSONResponse(
+                {
+                    "location": location.model_dump(),
+                    "forecast": [day.model_dump(include=selected) for day in forecast_days],
+                },
+                headers={**headers, MODEL_VERSION_HEADER: artifacts.version},
             )
-            forecast_days.append(forecast_day)
-
-        logger.info(f"Successfully generated {len(forecast_days)} day forecast for lat={lat}, lon={lon}")
 
+        response.headers.update(headers)
         return Forecast5DaysResponse(
-            location=ForecastLocation(lat=lat, lon=lon, name=city_name),
+            location=location,
             forecast=forecast_days
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error generating forecast: {e}", exc_info=True)
+        logger.error("Error generating forecast: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
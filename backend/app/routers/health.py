@@ -4,12 +4,23 @@ Health Check Router for HeatGuard API
 Provides health check endpoints for monitoring and deployment platforms.
 """
 
-from fastapi import APIRouter
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Response
+from pydantic import BaseModel
 
 from app.schemas import HealthResponse
+from app.services.admission_service import ADMISSION
+from app.services.alert_service import ALERTS
+from app.services.cache_service import CACHE
+from app.services.forecast_service import FORECASTS
+from app.services.history_service import HISTORY
 from app.services.model_service import is_model_loaded
+from app.services.subscription_service import BROADCASTER
+from app.services.warmup_service import WARMUP
+from app.utils.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 @router.get(
@@ -29,3 +40,221 @@ async def health_check() -> HealthResponse:
         status="ok",
         model_loaded=is_model_loaded()
     )
+
+
+class ReadinessResponse(BaseModel):
+    """Response model for the readiness probe."""
+    ready: bool
+    status: str
+    model_loaded: bool
+    warmup_enabled: bool
+    warmup_ms: Optional[float] = None
+    steps_ms: Dict[str, float]
+    errors: Dict[str, str]
+
+
+@router.get(
+    "/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness Check",
+    description="200 once the worker has loaded its model and finished warming up, 503 before that and while shutting down.",
+    responses={503: {"model": ReadinessResponse, "description": "Not ready to take traffic"}},
+)
+async def readiness_check(response: Response) -> ReadinessResponse:
+    """
+    Readiness probe for load balancers and orchestrators.
+
+    Unlike /health, which answers as soon as the process is up, this only
+    turns 200 after the startup warm-up (app/services/warmup_service.py) has
+    run representative requests, so the first real requests do not pay for
+    lazy setup. `errors` lists warm-up steps that failed; the worker is
+    still ready, with those paths cold.
+    """
+    stats = WARMUP.stats()
+    if not stats["ready"]:
+        response.status_code = 503
+    return ReadinessResponse(**stats)
+
+
+class CacheStatsResponse(BaseModel):
+    """Response model for forecast/prediction cache statistics."""
+    l2_backend: Optional[str] = None
+    l2_writes_dropped: int
+    namespaces: Dict[str, Dict[str, Any]]
+
+
+@router.get(
+    "/health/cache",
+    response_model=CacheStatsResponse,
+    summary="Cache Statistics",
+    description="Hit ratios per cache namespace and tier (in-process L1, shared L2)."
+)
+async def cache_stats() -> CacheStatsResponse:
+    """
+    Cache statistics of this worker since startup.
+
+    Each namespace (`weather`, `predictions`) reports L1 hits, misses,
+    entries, evictions and expirations, and L2 hits, misses and errors.
+    L2 is only consulted on an L1 miss, so its hit ratio is that of the
+    lookups L1 could not serve.
+    """
+    return CacheStatsResponse(**CACHE.stats())
+
+
+class ForecastCacheStatsResponse(BaseModel):
+    """Response model for scored forecast cache statistics."""
+    enabled: bool
+    entries: int
+    hits: int
+    misses: int
+    stale_served: int
+    background_refreshes: int
+    refresh_errors: int
+    not_modified: int
+    stale_while_revalidate_s: float
+
+
+@router.get(
+    "/health/forecast-cache",
+    response_model=ForecastCacheStatsResponse,
+    summary="Forecast Cache Statistics",
+    description="Scored /forecast/5days results reused, served stale, refreshed and answered 304."
+)
+async def forecast_cache_stats() -> ForecastCacheStatsResponse:
+    """
+    Statistics of this worker's scored forecast cache since startup.
+
+    `stale_served` counts expired results served while they were rescored
+    in the background (stale-while-revalidate), and `not_modified` the
+    conditional requests answered 304.
+    """
+    return ForecastCacheStatsResponse(**FORECASTS.stats())
+
+
+class SubscriptionStatsResponse(BaseModel):
+    """Response model for risk subscription statistics."""
+    subscribers: int
+    subscriber_groups: int
+    watched_districts: int
+    refresh_seconds: float
+    cycle: int
+    generated_at: Optional[str] = None
+    model_version: Optional[str] = None
+    last_cycle_seconds: Optional[float] = None
+    district_days_scored: int
+    changes: int
+    messages_encoded: int
+    messages_queued: int
+    resyncs: int
+    fetch_errors: int
+
+
+@router.get(
+    "/health/subscriptions",
+    response_model=SubscriptionStatsResponse,
+    summary="Subscription Statistics",
+    description="Connected risk subscribers and the cost of the shared refresh cycle."
+)
+async def subscription_stats() -> SubscriptionStatsResponse:
+    """
+    Risk subscription statistics of this worker since startup.
+
+    `messages_encoded` counts JSON encodings, one per group of subscribers
+    watching the same districts per cycle; `messages_queued` counts
+    deliveries. `resyncs` counts subscribers sent a snapshot because they
+    fell SUBSCRIPTION_QUEUE_SIZE messages behind.
+    """
+    return SubscriptionStatsResponse(**BROADCASTER.stats())
+
+
+class AlertEngineStatsResponse(BaseModel):
+    """Response model for alert engine statistics."""
+    min_label: int
+    states: List[str]
+    tracked_district_days: int
+    model_version: Optional[str] = None
+    batches: int
+    rows_seen: int
+    rows_rescored: int
+    rescore_ratio: Optional[float] = None
+    events_total: int
+    events_logged: int
+    oldest_event_id: Optional[int] = None
+    last_event_id: int
+
+
+@router.get(
+    "/health/alerts",
+    response_model=AlertEngineStatsResponse,
+    summary="Alert Engine Statistics",
+    description="How much of each refresh the incremental alert engine actually rescored."
+)
+async def alert_engine_stats() -> AlertEngineStatsResponse:
+    """
+    Alert engine statistics of this worker since startup.
+
+    `rescore_ratio` is the share of district-days handed to the engine whose
+    inputs had changed and went to the model; the rest reused their
+    previous score.
+    """
+    return AlertEngineStatsResponse(**ALERTS.stats())
+
+
+class HistoryStatsResponse(BaseModel):
+    """Response model for prediction history statistics."""
+    enabled: bool
+    path: Optional[str] = None
+    partitions: int
+    rows_on_disk: int
+    bytes_on_disk: int
+    records_offered: int
+    records_buffered: int
+    records_written: int
+    records_pending: int
+    dedup_ratio: Optional[float] = None
+    flushes: int
+    flush_errors: int
+
+
+@router.get(
+    "/health/history",
+    response_model=HistoryStatsResponse,
+    summary="Prediction History Statistics",
+    description="Size of the recorded prediction history and how much of it deduplication skipped."
+)
+async def history_stats() -> HistoryStatsResponse:
+    """
+    Prediction history statistics; the disk figures cover every worker.
+
+    `dedup_ratio` is the share of predictions offered by this worker that
+    were skipped because the same (district, date, model version) was
+    already recorded with the same label and tmax.
+    """
+    return HistoryStatsResponse(**HISTORY.stats())
+
+
+class AdmissionStatsResponse(BaseModel):
+    """Response model for admission control statistics."""
+    enabled: bool
+    max_concurrent: int
+    active: int
+    exempt_requests: int
+    clients_tracked: int
+    classes: Dict[str, Dict[str, Any]]
+
+
+@router.get(
+    "/health/admission",
+    response_model=AdmissionStatsResponse,
+    summary="Admission Control Statistics",
+    description="Per request class: running and queued requests, rejections, queue wait and latency percentiles."
+)
+async def admission_stats() -> AdmissionStatsResponse:
+    """
+    Admission control statistics of this worker.
+
+    Per class (interactive, bulk): requests running and waiting now,
+    totals admitted and queued, rejections by reason, and p50/p95/p99 of
+    the recent queue waits and of the time admitted requests ran.
+    """
+    return AdmissionStatsResponse(**ADMISSION.stats())
@@ -0,0 +1,105 @@
+"""
+Heatmap Router for HeatGuard API
+
+Provides gridded heat risk rasters for map rendering.
+"""
+
+import logging
+from datetime import date as date_type
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+
+from app.config import RASTER_MAX_CELLS
+from app.dependencies import MODEL_VERSION_HEADER, get_model_artifacts
+from app.services import raster_service
+from app.services.model_registry import ModelArtifacts
+from app.utils.tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TracedRoute)
+
+RASTER_LAYOUT = "uint8[height,width] risk_label (255=nodata); float16le[height,width] probability"
+
+
+@router.get("/heatmap/raster")
+async def heatmap_raster(
+    lat_min: float = Query(..., ge=-90.0, le=90.0),
+    lat_max: float = Query(..., ge=-90.0, le=90.0),
+    lon_min: float = Query(..., ge=-180.0, le=180.0),
+    lon_max: float = Query(..., ge=-180.0, le=180.0),
+    resolution: float = Query(0.25, gt=0.0, le=10.0, description="Cell size in degrees"),
+    date: Optional[date_type] = Query(None, description="Date to score (defaults to today)"),
+    source: Literal["constant", "forecast"] = Query("constant", description="Temperature field source"),
+    tmax_c: Optional[float] = Query(None, description="Uniform tmax for source=constant"),
+    fmt: Literal["bin", "png"] = Query("bin", alias="format", description="Binary bands or palette PNG"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+) -> Response:
+    """
+    Score a regular lat/lon grid over a bounding box.
+
+    The grid is built and scored server-side; results are cached per
+    (bbox, resolution, date, source).
+
+    **Formats:**
+    - **bin**: `application/octet-stream` with a uint8 risk-label band followed by
+      a float16 (little-endian) probability band, both row-major and north-up.
+      Grid geometry is returned in `X-Raster-*` headers.
+    - **png**: 8-bit palette PNG of risk labels (Green/Yellow/Orange/Red,
+      transparent outside the model's coverage).
+    """
+    if lat_min >= lat_max or lon_min >= lon_max:
+        raise HTTPException(status_code=422, detail="Bounding box must satisfy min < max")
+
+    lats, lons = raster_service.bbox_axes(lat_min, lat_max, lon_min, lon_max, resolution)
+    if len(lats) * len(lons) > RASTER_MAX_CELLS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Grid of {len(lats)}x{len(lons)} cells exceeds the limit of {RASTER_MAX_CELLS}; "
+                   "use a coarser resolution or a smaller bounding box"
+        )
+
+    used_date = date if date is not None else date_type.today()
+    cache_key = ("bbox", lat_min, lat_max, lon_min, lon_max, resolution)
+    raster = await raster_service.build_raster(cache_key, lats, lons, used_date, source, tmax_c, artifacts)
+
+    headers = {
+        "X-Raster-Width": str(len(lons)),
+        "X-Raster-Height": str(len(lats)),
+        "X-Raster-BBox": f"{lat_min},{lat_max},{lon_min},{lon_max}",
+        "X-Raster-Resolution": str(resolution),
+        "X-Raster-Date": used_date.isoformat(),
+        MODEL_VERSION_HEADER: artifacts.version,
+    }
+    if fmt == "png":
+        return Response(raster_service.encode_png(raster), media_type="image/png", headers=headers)
+
+    headers["X-Raster-Layout"] = RASTER_LAYOUT
+    return Response(raster_service.encode_binary(raster), media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/heatmap/tiles/{z}/{x}/{y}.png")
+async def heatmap_tile(
+    z: int = Path(..., ge=0, le=12),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    date: Optional[date_type] = Query(None, description="Date to score (defaults to today)"),
+    source: Literal["constant", "forecast"] = Query("constant", description="Temperature field source"),
+    tmax_c: Optional[float] = Query(None, description="Uniform tmax for source=constant"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+) -> Response:
+    """
+    Render a 256x256 Web Mercator (XYZ) risk tile for slippy-map clients.
+    """
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    used_date = date if date is not None else date_type.today()
+    lats, lons = raster_service.tile_axes(z, x, y)
+    raster = await raster_service.build_raster(("tile", z, x, y), lats, lons, used_date, source, tmax_c, artifacts)
+    return Response(
+        raster_service.encode_png(raster),
+        media_type="image/png",
+        headers={"X-Raster-Date": used_date.isoformat(), MODEL_VERSION_HEADER: artifacts.version},
+    )
@@ -0,0 +1,158 @@
+"""
+History Router for HeatGuard API
+
+Range queries over the recorded forecast-derived district predictions
+(app/services/history_service.py): one district's daily series, or a
+state's daily rollup aggregated over its districts.
+"""
+
+import asyncio
+from datetime import date as date_type, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.config import HISTORY_MAX_QUERY_DAYS, get_risk_level
+from app.services import district_store, history_service
+from app.services.history_service import HISTORY
+from app.utils.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+DEFAULT_DAYS = 60
+
+
+class HistoryDay(BaseModel):
+    date: date_type
+    tmax_c: float
+    risk_label: int
+    risk_level: str
+    probability: Optional[float] = None
+    model_version: str
+    recorded_at: int          # Unix time the prediction was recorded
+
+
+class DistrictHistoryResponse(BaseModel):
+    district_id: str
+    name: str
+    state: str
+    start: date_type
+    end: date_type
+    days: List[HistoryDay]
+
+
+class StateHistoryDay(BaseModel):
+    date: date_type
+    districts_reported: int
+    districts_by_level: Dict[str, int]
+    mean_risk_label: float
+    max_risk_label: int
+    population_at_risk: int   # population of districts at Orange or Red
+    mean_tmax_c: float
+    max_tmax_c: float
+
+
+class StateHistoryResponse(BaseModel):
+    state: str
+    districts: int
+    start: date_type
+    end: date_type
+    days: List[StateHistoryDay]
+
+
+def _date_range(start: Optional[date_type], end: Optional[date_type]) -> Tuple[date_type, date_type]:
+    """
+    Resolve the query range; by default the DEFAULT_DAYS days up to today.
+
+    Raises:
+        HTTPException: 503 if history is disabled, 422 for an invalid range
+    """
+    if not HISTORY.enabled:
+        raise HTTPException(status_code=503, detail="Prediction history is disabled (HEATGUARD_HISTORY_DIR)")
+    end = end or date_type.today()
+    start = start or end - timedelta(days=DEFAULT_DAYS - 1)
+    if end < start:
+        raise HTTPException(status_code=422, detail="end must not be before start")
+    if (end - start).days + 1 > HISTORY_MAX_QUERY_DAYS:
+        raise HTTPException(status_code=422, detail=f"Date range exceeds {HISTORY_MAX_QUERY_DAYS} days")
+    return start, end
+
+
+@router.get("/history/districts/{district_id}", response_model=DistrictHistoryResponse)
+async def district_history(
+    district_id: str,
+    start: Optional[date_type] = Query(None, description="First date (default: 60 days before end)"),
+    end: Optional[date_type] = Query(None, description="Last date (default: today)"),
+    model_version: Optional[str] = Query(None, description="Only predictions of this model version"),
+):
+    """
+    Recorded daily risk of one district.
+
+    Each date carries the most recently recorded prediction for it, i.e.
+    the forecast closest to the day itself.
+    """
+    start, end = _date_range(start, end)
+    store = district_store.get_store()
+    row = store.row(district_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Unknown district id: {district_id}")
+
+    records = await asyncio.to_thread(HISTORY.read, [district_id], start, end, model_version)
+    versions = records["versions"]
+    return DistrictHistoryResponse(
+        district_id=district_id,
+        name=store.name(row),
+        state=store.state(row),
+        start=start,
+        end=end,
+        days=[
+            HistoryDay(
+                date=history_service.day_date(day),
+                tmax_c=round(float(tmax), 2),
+                risk_label=int(label),
+                risk_level=get_risk_level(label),
+                probability=round(float(probability), 4) if probability == probability else None,
+                model_version=versions[version],
+                recorded_at=int(recorded),
+            )
+            for day, tmax, label, probability, version, recorded in zip(
+                records["date"].tolist(), records["tmax"].tolist(), records["label"].tolist(),
+                records["probability"].tolist(), records["version"].tolist(), records["recorded"].tolist(),
+            )
+        ],
+    )
+
+
+@router.get("/history/by-state", response_model=StateHistoryResponse)
+async def state_history(
+    state: str = Query(..., min_length=2),
+    start: Optional[date_type] = Query(None, description="First date (default: 60 days before end)"),
+    end: Optional[date_type] = Query(None, description="Last date (default: today)"),
+    model_version: Optional[str] = Query(None, description="Only predictions of this model version"),
+):
+    """
+    Daily risk rollup over a state's districts.
+
+    Per date: how many districts have a recorded prediction, how many are
+    at each level, the mean and highest label and tmax, and the population
+    living in districts at Orange or Red. Dates without any recorded
+    prediction are left out.
+    """
+    start, end = _date_range(start, end)
+    store = district_store.get_store()
+    rows = store.rows_for_state(state)
+    if not len(rows):
+        raise HTTPException(status_code=404, detail=f"No districts found for state '{state}'")
+
+    def rollup():
+        records = HISTORY.read([store.ids[r] for r in rows.tolist()], start, end, model_version)
+        return history_service.state_daily(records, start, end)
+
+    return StateHistoryResponse(
+        state=store.state(int(rows[0])),
+        districts=len(rows),
+        start=start,
+        end=end,
+        days=[StateHistoryDay(**day) for day in await asyncio.to_thread(rollup)],
+    )
@@ -0,0 +1,174 @@
+"""
+Jobs Router for HeatGuard API
+
+Submit, monitor and download large offline scoring jobs over CSV or
+Parquet files. Jobs run in background worker processes and survive
+server restarts.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from app.config import JOB_BATCH_ROWS, JOB_MAX_UPLOAD_BYTES
+from app.dependencies import get_model_artifacts
+from app.services import tabular_service
+from app.services.job_service import JOBS
+from app.services.model_registry import ModelArtifacts
+from app.utils.tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TracedRoute)
+
+
+class JobPart(BaseModel):
+    """One committed output part of a job."""
+    index: int
+    rows: int
+    bytes: int
+    url: str
+
+
+class JobResponse(BaseModel):
+    """Status and progress of a scoring job."""
+    id: str
+    state: str
+    format: str
+    filename: Optional[str] = None
+    model_version: str
+    batch_rows: int
+    created_at: float
+    updated_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempts: int
+    rows_total: Optional[int] = None
+    rows_processed: int
+    progress: Optional[float] = None
+    parts: List[JobPart]
+    error: Optional[str] = None
+
+
+def _to_response(job: Dict[str, Any]) -> JobResponse:
+    progress = None
+    if job["state"] == "completed":
+        progress = 1.0
+    elif job["rows_total"]:
+        progress = round(min(job["rows_processed"] / job["rows_total"], 1.0), 4)
+    parts = [
+        JobPart(**part, url=f"/jobs/{job['id']}/output/{part['index']}")
+        for part in job["parts"]
+    ]
+    return JobResponse(**{**job, "parts": parts, "progress": progress})
+
+
+def _get_job(job_id: str) -> Dict[str, Any]:
+    try:
+        return JOBS.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit Scoring Job",
+    description="Upload a CSV or Parquet file and score it in the background."
+)
+async def submit_job(
+    file: UploadFile = File(..., description="CSV or Parquet file with lat, lon, tmax_c and date columns"),
+    batch_rows: int = Form(JOB_BATCH_ROWS, ge=1000, le=1_000_000, description="Rows per output part"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+) -> JobResponse:
+    """
+    Queue an offline scoring job.
+
+    The file needs `lat`, `lon` and `tmax_c` columns plus either `date`
+    (YYYY-MM-DD) or `day_of_year` and `month`; other columns are passed
+    through. The job is pinned to the model version that served this request.
+    Poll `GET /jobs/{id}` for progress and download each finished part from
+    `GET /jobs/{id}/output/{index}`, in the same format as the upload.
+    """
+    try:
+        fmt = tabular_service.detect_format(file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if file.size is not None and file.size > JOB_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {JOB_MAX_UPLOAD_BYTES} bytes")
+
+    # The multipart parser has already spooled the upload; copying it into the
+    # job directory is blocking file I/O, so keep it off the event loop
+    job = await asyncio.to_thread(JOBS.submit, file.file, fmt, file.filename, artifacts, batch_rows)
+    logger.info("Queued scoring job %s (%s, model %s)", job["id"], fmt, artifacts.version)
+    return _to_response(job)
+
+
+@router.get(
+    "/jobs",
+    response_model=List[JobResponse],
+    summary="List Scoring Jobs",
+    description="All scoring jobs on this server, oldest first."
+)
+async def list_jobs() -> List[JobResponse]:
+    return [_to_response(job) for job in await asyncio.to_thread(JOBS.list)]
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="Scoring Job Status",
+    description="State, progress and finished output parts of one job."
+)
+async def get_job(job_id: str) -> JobResponse:
+    return _to_response(_get_job(job_id))
+
+
+@router.get(
+    "/jobs/{job_id}/output/{index}",
+    summary="Download Job Output Part",
+    description="One finished output part, in the same format as the upload.",
+    responses={200: {"content": {"text/csv": {}, "application/vnd.apache.parquet": {}}}},
+)
+async def get_job_output(job_id: str, index: int) -> FileResponse:
+    """
+    Parts are numbered from 0 and each holds up to `batch_rows` input rows
+    in input order, with `risk_label`, `risk_level` and `risk_probability`
+    appended. Parts become available as soon as they are written.
+    """
+    job = _get_job(job_id)
+    if not any(part["index"] == index for part in job["parts"]):
+        raise HTTPException(status_code=404, detail=f"Output part {index} of job {job_id} is not available")
+    path = JOBS.store.part_path(job, index)
+    return FileResponse(
+        path,
+        media_type=tabular_service.MEDIA_TYPES[job["format"]],
+        filename=f"{job_id}-part-{index:05d}.{job['format']}",
+    )
+
+
+@router.post(
+    "/jobs/{job_id}/cancel",
+    response_model=JobResponse,
+    summary="Cancel Scoring Job",
+    description="Stop a queued or running job; parts written so far stay available."
+)
+async def cancel_job(job_id: str) -> JobResponse:
+    _get_job(job_id)
+    return _to_response(await asyncio.to_thread(JOBS.cancel, job_id))
+
+
+@router.delete(
+    "/jobs/{job_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Delete Scoring Job",
+    description="Cancel the job if needed and delete its upload and output."
+)
+async def delete_job(job_id: str) -> None:
+    _get_job(job_id)
+    await asyncio.to_thread(JOBS.delete, job_id)
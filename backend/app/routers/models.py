@@ -0,0 +1,97 @@
+"""
+Models Router for HeatGuard API
+
+Provides endpoints for inspecting the versioned model registry.
+"""
+
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+
+from app.dependencies import require_admin
+from app.services.model_registry import REGISTRY
+from app.services.shadow_service import SHADOW
+from app.utils.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+
+class ModelVersionsResponse(BaseModel):
+    """Response model for the model registry listing."""
+    active: Optional[str] = None
+    loaded: List[str]
+    available: List[str]
+
+
+@router.get(
+    "/models",
+    response_model=ModelVersionsResponse,
+    summary="Model Versions",
+    description="List model versions found on disk, loaded in memory, and currently active."
+)
+async def list_models() -> ModelVersionsResponse:
+    """
+    Model registry status.
+
+    Loaded versions, and available ones listed in
+    HEATGUARD_PINNABLE_MODEL_VERSIONS, can be pinned per request with the
+    `model_version` query parameter or the `X-Model-Version` header.
+    """
+    return ModelVersionsResponse(**REGISTRY.versions())
+
+
+class ShadowStatsResponse(BaseModel):
+    """Response model for shadow evaluation statistics."""
+    enabled: bool
+    shadow_version: Optional[str] = None
+    sample_rate: float
+    primary_versions: Dict[str, int]
+    batches_sampled: int
+    batches_dropped: int
+    batches_skipped: int
+    pending: int
+    errors: int
+    rows_compared: int
+    label_agreement: Optional[float] = None
+    mean_probability_drift: Optional[float] = None
+    max_probability_drift: Optional[float] = None
+    mean_shadow_batch_ms: Optional[float] = None
+    confusion: Optional[List[List[int]]] = None
+
+
+@router.get(
+    "/models/shadow",
+    response_model=ShadowStatsResponse,
+    summary="Shadow Evaluation Stats",
+    description="Agreement and probability drift between the serving model and the shadow version."
+)
+async def shadow_stats() -> ShadowStatsResponse:
+    """
+    Shadow evaluation statistics since startup or the last reset.
+
+    `label_agreement` is the share of sampled rows where both versions
+    assign the same risk label; probability drift is the total-variation
+    distance between the two class distributions per row. `confusion` is
+    indexed as [primary_label][shadow_label]. POST /models/shadow/reset
+    starts a fresh comparison window.
+    """
+    return ShadowStatsResponse(**SHADOW.stats())
+
+
+@router.post(
+    "/models/shadow/reset",
+    response_model=ShadowStatsResponse,
+    dependencies=[Depends(require_admin)],
+    summary="Reset Shadow Evaluation",
+    description="Return the shadow evaluation statistics and start a fresh comparison window (admin only)."
+)
+async def reset_shadow_stats() -> ShadowStatsResponse:
+    """
+    Shadow evaluation statistics up to now, then reset them.
+
+    Requires the X-Admin-Token header.
+    """
+    stats = ShadowStatsResponse(**SHADOW.stats())
+    SHADOW.reset()
+    return stats
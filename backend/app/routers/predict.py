@@ -4,25 +4,34 @@ Prediction Router for HeatGuard API
 Provides endpoints for heat risk predictions.
 """
 
+import asyncio
+import hashlib
 import logging
 from datetime import date as date_type
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 
 import numpy as np
-import pandas as pd
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from app.config import FILE_BATCH_ROWS, HORIZON_INLINE_LOOKUP_CELLS, HORIZON_MAX_CELLS, HORIZON_MAX_DAYS
+from app.dependencies import MODEL_VERSION_HEADER, get_model_artifacts
+
 from app.schemas import (
     PredictRequest,
     PredictResponse,
 )
-from app.services.date_utils import compute_day_of_year, compute_month
-from app.services import model_service
+from app.services.date_utils import compute_day_of_year, compute_month, date_range_array
+from app.services import district_store, horizon_service, model_service, tabular_service, threshold_service
+from app.services.model_registry import ModelArtifacts
+from app.utils import fieldsets
+from app.utils.responses import FastJSONResponse
+from app.utils.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 RISK_MAP = {0: "Green", 1: "Yellow", 2: "Orange", 3: "Red"}
 
@@ -52,8 +61,36 @@ class PredictBulkResponse(BaseModel):
     results: List[PredictionResult]
 
 
+# Selectable with fields= on /predict/bulk, in response order
+BULK_FIELDS = ("lat", "lon", "date", "tmax_c", "risk_label", "risk_level", "probabilities")
+
+
+class HorizonRequest(BaseModel):
+    """Districts x dates x tmax scenarios to score in one call."""
+    district_ids: Optional[List[str]] = None
+    state: Optional[str] = None
+    start_date: date_type
+    end_date: date_type
+    # Either one uniform tmax per scenario, or a (scenarios x dates) matrix
+    tmax_c: Union[List[float], List[List[float]]]
+    include_probabilities: bool = False
+
+
+class HorizonResponse(BaseModel):
+    """Dense result indexed as [district][date][scenario]."""
+    district_ids: List[str]
+    dates: List[date_type]
+    n_scenarios: int
+    shape: List[int]
+    risk_labels: List[List[List[int]]]
+    probabilities: Optional[List[List[List[float]]]] = None
+
+
 @router.post("/predict/single", response_model=PredictResponse)
-async def predict_single(req: PredictRequest) -> PredictResponse:
+async def predict_single(
+    req: PredictRequest,
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+) -> PredictResponse:
     """
     Predict heat risk for a single location.
 
@@ -65,12 +102,6 @@ async def predict_single(req: PredictRequest) -> PredictResponse:
     - **tmax_c**: Maximum temperature in Celsius
     - **date**: Date for prediction (optional, defaults to today)
     """
-    if not model_service.is_model_loaded():
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. Please try again later."
-        )
-
     try:
         # Use provided date or default to today
         used_date = req.date if req.date is not None else date_type.today()
@@ -85,7 +116,7 @@ async def predict_single(req: PredictRequest) -> PredictResponse:
         }
 
         # Get prediction
-        prediction = model_service.predict_risk(features)
+        prediction = model_service.predict_risk(features, artifacts)
 
         # Return response
         return PredictResponse(
@@ -99,63 +130,73 @@ async def predict_single(req: PredictRequest) -> PredictResponse:
         )
 
     except ValueError as e:
-        logger.error(f"Prediction error: {e}")
+        logger.error("Prediction error: %s", e)
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error during prediction: {e}")
+        logger.error("Unexpected error during prediction: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.post("/predict/bulk", response_model=PredictBulkResponse)
-async def predict_bulk(req: PredictBulkRequest):
+async def predict_bulk(
+    req: PredictBulkRequest,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(
+        None, description="Comma-separated result fields to return (default: all). "
+                          "Without probabilities the model only computes labels."),
+    limit: Optional[int] = Query(None, description="Results per page (default: all points)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+):
     """
     Predict heat risk for multiple locations in bulk.
     Uses vectorized operations for efficiency.
-    """
-    if not model_service.is_model_loaded():
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. Please try again later."
-        )
 
+    With `limit`, only that many points are scored per call: post the same
+    points again with the `cursor` from the X-Next-Cursor header for the
+    next page.
+    """
     if not req.points:
         return PredictBulkResponse(results=[])
 
-    # Access model artifacts directly for bulk processing
-    scaler = model_service.SCALER
-    model = model_service.MODEL
-    feature_columns = model_service.FEATURE_COLUMNS
-
-    if scaler is None or model is None or feature_columns is None:
-         raise HTTPException(status_code=503, detail="Model artifacts not fully loaded.")
+    selected = fieldsets.parse_fields(fields, BULK_FIELDS)
+    query = "/predict/bulk"
+    if limit is not None or cursor:
+        # Bind cursors to these exact points and fields, not just the batch size
+        names = "*" if selected is None else ",".join(fieldsets.ordered(selected, BULK_FIELDS))
+        query = f"/predict/bulk:{_points_digest(req.points)}:{names}"
+    page = fieldsets.paginate(len(req.points), query, limit, cursor)
+    points = req.points[page.start:page.end]
+    with_probabilities = selected is None or "probabilities" in selected
+    feature_columns = artifacts.feature_columns
 
     try:
-        # Build DataFrame of features
-        rows = []
-        for p in req.points:
-            dayofyear = p.date.timetuple().tm_yday
-            month = p.date.month
-            rows.append({
-                "tmax_c": p.tmax_c,
-                "day_of_year": dayofyear,
-                "month": month,
-                "lat": p.lat,
-                "lon": p.lon,
-            })
-
-        X = pd.DataFrame(rows)
-
-        # Reorder columns to match feature_columns
-        # This ensures the order is exactly what the model expects
-        X = X[feature_columns]
-
-        X_scaled = scaler.transform(X)
-
-        preds = model.predict(X_scaled)
-        proba = model.predict_proba(X_scaled)
+        # Build the raw feature matrix column by column
+        columns = {
+            "tmax_c": [p.tmax_c for p in points],
+            "day_of_year": [p.date.timetuple().tm_yday for p in points],
+            "month": [p.date.month for p in points],
+            "lat": [p.lat for p in points],
+            "lon": [p.lon for p in points],
+        }
+        # Column order must be exactly what the model expects
+        X = np.column_stack([np.asarray(columns[c], dtype=np.float64) for c in feature_columns])
+
+        if with_probabilities:
+            proba = model_service.predict_proba_matrix(X, artifacts=artifacts)
+            preds = proba.argmax(axis=1)
+        else:
+            proba = None
+            preds = model_service.predict_labels_matrix(X, artifacts=artifacts)
+
+        if selected is not None:
+            names = fieldsets.ordered(selected, BULK_FIELDS)
+            return FastJSONResponse({"results": _sparse_results(points, preds, proba, names)},
+                                    headers={**page.headers(request), MODEL_VERSION_HEADER: artifacts.version})
 
         results: List[PredictionResult] = []
-        for idx, p in enumerate(req.points):
+        for idx, p in enumerate(points):
             label_int = int(preds[idx])
             probs_row = proba[idx]
             probs_dict = {str(i): float(probs_row[i]) for i in range(len(probs_row))}
@@ -169,8 +210,179 @@ async def predict_bulk(req: PredictBulkRequest):
                 probabilities=probs_dict,
             ))
 
+        page.apply(response, request)
         return PredictBulkResponse(results=results)
 
     except Exception as e:
-        logger.error(f"Bulk prediction error: {e}")
+        logger.error("Bulk prediction error: %s", e)
         raise HTTPException(status_code=500, detail=f"Bulk prediction failed: {str(e)}")
+
+
+def _points_digest(points: List[PredictPoint]) -> str:
+    """Digest of a bulk request's points, for its pagination cursors."""
+    values = np.array([(p.date.toordinal(), p.lat, p.lon, p.tmax_c) for p in points], dtype=np.float64)
+    return hashlib.blake2b(values.tobytes(), digest_size=8).hexdigest()
+
+
+def _sparse_results(points: List[PredictPoint], labels: np.ndarray, proba: Optional[np.ndarray],
+                    names: List[str]) -> List[Dict]:
+    """Result dicts holding only the requested fields, built column by column."""
+    labels_list = labels.tolist()
+    values = []
+    for name in names:
+        if name == "risk_label":
+            values.append(labels_list)
+        elif name == "risk_level":
+            values.append([RISK_MAP.get(label, "Unknown") for label in labels_list])
+        elif name == "probabilities":
+            values.append([{str(i): p for i, p in enumerate(row)} for row in proba.tolist()])
+        else:
+            values.append([getattr(p, name) for p in points])
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+@router.post("/predict/horizon", response_model=HorizonResponse)
+async def predict_horizon(
+    req: HorizonRequest,
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+):
+    """
+    Score every district x date x tmax scenario in one call.
+
+    The cross product is expanded lazily on the server and scored in
+    bounded-memory chunks, so callers only send the axes.
+
+    - **district_ids** or **state**: Districts to score (ids take precedence)
+    - **start_date**, **end_date**: Inclusive date range
+    - **tmax_c**: A list of scenario temperatures applied to every date, or a
+      matrix with one row per scenario and one column per date
+    - **include_probabilities**: Also return the probability of each label
+
+    `risk_labels[i][j][s]` is the label for `district_ids[i]`, `dates[j]`
+    and scenario `s`.
+
+    Label-only requests for located districts are answered from the model
+    version's tmax threshold table when one has been built
+    (benchmarks/thresholds.py), without calling the model.
+    """
+    store = district_store.get_store()
+    if req.district_ids:
+        rows = store.rows_for_ids(req.district_ids)
+        unknown = [req.district_ids[i] for i in np.nonzero(rows < 0)[0]]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown district ids: {unknown[:20]}")
+    elif req.state:
+        rows = store.rows_for_state(req.state)
+        if not len(rows):
+            raise HTTPException(status_code=404, detail=f"No districts found for state '{req.state}'")
+    else:
+        raise HTTPException(status_code=422, detail="Provide district_ids or state")
+
+    if req.end_date < req.start_date:
+        raise HTTPException(status_code=422, detail="end_date must not be before start_date")
+    dates = date_range_array(req.start_date, req.end_date)
+    if len(dates) > HORIZON_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"Date range exceeds {HORIZON_MAX_DAYS} days")
+
+    try:
+        tmax = np.asarray(req.tmax_c, dtype=np.float64)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="tmax_c matrix rows must all have the same length")
+    if tmax.ndim == 1:
+        tmax = np.repeat(tmax[:, None], len(dates), axis=1)
+    if tmax.ndim != 2 or tmax.shape[1] != len(dates) or tmax.shape[0] == 0:
+        raise HTTPException(
+            status_code=422,
+            detail=f"tmax_c must be a non-empty list or a (scenarios x {len(dates)}) matrix"
+        )
+
+    n_cells = len(rows) * len(dates) * tmax.shape[0]
+    if n_cells > HORIZON_MAX_CELLS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Request expands to {n_cells} cells, above the limit of {HORIZON_MAX_CELLS}"
+        )
+
+    # Labels alone are a breakpoint lookup when the version has a threshold table
+    table = None if req.include_probabilities else threshold_service.get_table(artifacts)
+    if table is not None and table.covers(rows):
+        if n_cells <= HORIZON_INLINE_LOOKUP_CELLS:
+            labels = table.horizon_labels(rows, dates, tmax)
+        else:
+            labels = await asyncio.to_thread(table.horizon_labels, rows, dates, tmax)
+        probabilities = None
+    else:
+        lats, lons = store.coordinates(rows)
+        try:
+            labels, probabilities = await asyncio.to_thread(
+                horizon_service.score_horizon, lats, lons, dates, tmax, req.include_probabilities,
+                artifacts=artifacts,
+            )
+        except Exception as e:
+            logger.error("Horizon prediction error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Horizon prediction failed: {str(e)}")
+
+    # Dense arrays are encoded straight from numpy; re-validating millions
+    # of cells through the response model would dominate the request.
+    return FastJSONResponse(headers={"X-Model-Version": artifacts.version}, content={
+        "district_ids": [store.ids[r] for r in rows],
+        "dates": [str(d) for d in dates],
+        "n_scenarios": int(tmax.shape[0]),
+        "shape": list(labels.shape),
+        "risk_labels": np.ascontiguousarray(labels),
+        "probabilities": np.round(probabilities, 6) if probabilities is not None else None,
+    })
+
+
+@router.post(
+    "/predict/file",
+    summary="Score CSV or Parquet File",
+    description="Upload station data as CSV or Parquet and get the same file back with risk columns.",
+    responses={200: {"content": {"text/csv": {}, "application/vnd.apache.parquet": {}}}},
+)
+async def predict_file(
+    file: UploadFile = File(..., description="CSV or Parquet file with lat, lon, tmax_c and date columns"),
+    batch_rows: int = Query(FILE_BATCH_ROWS, ge=100, le=1_000_000, description="Rows parsed and scored per batch"),
+    artifacts: ModelArtifacts = Depends(get_model_artifacts),
+):
+    """
+    Score an uploaded file and stream it back in the same format.
+
+    The file needs `lat`, `lon` and `tmax_c` columns plus either `date`
+    (YYYY-MM-DD) or `day_of_year` and `month`; other columns are passed
+    through. `risk_label`, `risk_level` and `risk_probability` are appended.
+
+    The upload is parsed and scored `batch_rows` rows at a time and each
+    batch is sent as soon as it is ready. Problems in the first batch are
+    reported as 422; a bad row in a later batch ends the stream early, so
+    use `POST /jobs` for very large or untrusted files.
+    """
+    try:
+        fmt = tabular_service.detect_format(file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    frames = tabular_service.iter_frames(file.file, fmt, batch_rows)
+
+    def score_first():
+        first = next(frames, None)
+        if first is None or first.empty:
+            raise ValueError("Uploaded file has no rows")
+        return tabular_service.score_frame(first, artifacts)
+
+    # Score the first batch before committing to a 200 so bad input is a clean 422
+    try:
+        first = await asyncio.to_thread(score_first)
+    except ValueError as e:
+        frames.close()
+        raise HTTPException(status_code=422, detail=str(e))
+
+    stem = (file.filename or "upload").rsplit(".", 1)[0]
+    return StreamingResponse(
+        tabular_service.stream_scored(first, frames, fmt, artifacts),
+        media_type=tabular_service.MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{stem}-scored.{fmt}"',
+            MODEL_VERSION_HEADER: artifacts.version,
+        },
+    )
@@ -0,0 +1,166 @@
+"""
+Subscriptions Router for HeatGuard API
+
+Server push of district forecast risk, as an alternative to polling
+`/predict/bulk` and `/forecast/5days` per district. A client subscribes to
+one state or to a list of district ids and receives:
+
+- a `snapshot` message with every known district-day for its districts, and
+- an `update` message per refresh cycle with only the district-days whose
+  risk label changed (each carrying `previous_risk_label`).
+
+Both transports carry the same JSON messages:
+
+    curl -N "$API/subscribe/risk?state=Tamil%20Nadu"          # Server-Sent Events
+    websocat "$WS/ws/risk?district_ids=tn_ch,tn_cgl"             # WebSocket
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketState
+
+from app.config import SUBSCRIPTION_KEEPALIVE_SECONDS, SUBSCRIPTION_MAX_DISTRICTS
+from app.services import district_store
+from app.services.subscription_service import BROADCASTER, CLOSED, Subscriber, SubscriptionLimitError
+from app.utils.tracing import TracedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TracedRoute)
+
+_STATE_DESCRIPTION = "State whose districts to watch"
+_IDS_DESCRIPTION = "Comma-separated district ids to watch (instead of state)"
+
+
+def resolve_rows(state: Optional[str], district_ids: Optional[str]) -> Tuple[np.ndarray, List[str]]:
+    """
+    District rows for a subscription to a state or to a list of ids.
+
+    Returns:
+        Tuple of (rows, unmatched district ids)
+
+    Raises:
+        HTTPException: 422 unless exactly one of state / district_ids is given
+            or if too many ids are given, 404 if nothing matches
+    """
+    if (state is None) == (district_ids is None):
+        raise HTTPException(status_code=422, detail="Give exactly one of state or district_ids")
+    store = district_store.get_store()
+    if state is not None:
+        rows = store.rows_for_state(state)
+        if not len(rows):
+            raise HTTPException(status_code=404, detail=f"Unknown state: {state}")
+        return rows, []
+
+    ids = list(dict.fromkeys(i.strip() for i in district_ids.split(",") if i.strip()))
+    if len(ids) > SUBSCRIPTION_MAX_DISTRICTS:
+        raise HTTPException(status_code=422,
+                            detail=f"At most {SUBSCRIPTION_MAX_DISTRICTS} districts per subscription")
+    rows = store.rows_for_ids(ids)
+    matched = rows >= 0
+    if not matched.any():
+        raise HTTPException(status_code=404, detail="None of the district ids are known")
+    return rows[matched], [ids[i] for i in np.nonzero(~matched)[0]]
+
+
+async def _subscribe(rows: np.ndarray, unmatched: List[str]) -> Subscriber:
+    try:
+        return await BROADCASTER.subscribe(rows, unmatched)
+    except SubscriptionLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+
+@router.get(
+    "/subscribe/risk",
+    summary="Subscribe to District Risk (SSE)",
+    description="Server-Sent Events stream of risk changes for a state or a list of districts.",
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def subscribe_risk_sse(
+    state: Optional[str] = Query(None, min_length=2, description=_STATE_DESCRIPTION),
+    district_ids: Optional[str] = Query(None, description=_IDS_DESCRIPTION),
+):
+    """
+    Stream `snapshot` and then `update` events until the client disconnects.
+
+    Each event's `data:` is one JSON message. A comment line is sent every
+    SUBSCRIPTION_KEEPALIVE_SECONDS so idle connections survive proxies. A
+    client that falls far behind is sent a fresh `snapshot` instead of the
+    updates it missed; a reconnecting client also starts from a snapshot.
+    """
+    rows, unmatched = resolve_rows(state, district_ids)
+    subscriber = await _subscribe(rows, unmatched)
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                message = await subscriber.next(SUBSCRIPTION_KEEPALIVE_SECONDS)
+                if message is CLOSED:
+                    return
+                if message is None:
+                    yield b": keepalive\n\n"
+                    continue
+                event, payload = message
+                yield b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+        finally:
+            BROADCASTER.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx would otherwise hold events back in its buffer
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/risk")
+async def subscribe_risk_ws(
+    websocket: WebSocket,
+    state: Optional[str] = Query(None, min_length=2, description=_STATE_DESCRIPTION),
+    district_ids: Optional[str] = Query(None, description=_IDS_DESCRIPTION),
+):
+    """
+    WebSocket variant of /subscribe/risk: one text frame per JSON message.
+
+    Invalid subscriptions are closed with code 1008 (policy violation) and
+    the reason; a full worker closes with 1013 (try again later).
+    """
+    try:
+        rows, unmatched = resolve_rows(state, district_ids)
+        subscriber = await _subscribe(rows, unmatched)
+    except HTTPException as e:
+        # Accepted first, so the client sees the close code and reason rather than a bare 403
+        await websocket.accept()
+        await websocket.close(code=1013 if e.status_code == 503 else 1008, reason=str(e.detail))
+        return
+
+    async def watch_disconnect() -> None:
+        # Clients send nothing; reading is only how a disconnect is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except (WebSocketDisconnect, RuntimeError):
+            subscriber.reset(CLOSED)
+
+    await websocket.accept()
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while True:
+            message = await subscriber.next()
+            if message is CLOSED:
+                break
+            await websocket.send_text(message[1].decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        BROADCASTER.unsubscribe(subscriber)
+    # Reached on server shutdown too; a client that already left needs no close frame
+    if websocket.client_state == WebSocketState.CONNECTED:
+        await websocket.close()
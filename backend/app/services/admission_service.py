@@ -0,0 +1,331 @@
+"""
+Admission Control Service for HeatGuard API
+
+Keeps a burst of bulk traffic (large `/predict/bulk` batches, horizons,
+file uploads, state fan-outs) from starving the interactive endpoints and
+the health probes that load balancers use.
+
+Every request is put in a class by its path:
+
+- exempt: health probes, docs and long-lived streams; never held back
+- interactive: everything else (single predictions, forecasts, districts)
+- bulk: ADMISSION_BULK_PATHS
+
+Each class has a concurrency budget and a bounded wait queue, and all
+classes share ADMISSION_MAX_CONCURRENT running slots. When a slot frees up
+it goes to the interactive queue first. A request that cannot be queued
+(queue full, or a large bulk body while the bulk budget is in use) or
+that waits past its class timeout is turned away with 503 and a
+Retry-After estimated from the queue, before any of its body is read. Each
+client also has a token bucket per class; running out gives 429.
+
+All of this is per worker process and runs on its event loop, so no locks
+are needed.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    ADMISSION_BULK_BURST,
+    ADMISSION_BULK_CONCURRENCY,
+    ADMISSION_BULK_PATHS,
+    ADMISSION_BULK_QUEUE,
+    ADMISSION_BULK_RATE,
+    ADMISSION_BULK_TIMEOUT_SECONDS,
+    ADMISSION_ENABLED,
+    ADMISSION_EXEMPT_PATHS,
+    ADMISSION_INTERACTIVE_BURST,
+    ADMISSION_INTERACTIVE_CONCURRENCY,
+    ADMISSION_INTERACTIVE_QUEUE,
+    ADMISSION_INTERACTIVE_RATE,
+    ADMISSION_INTERACTIVE_TIMEOUT_SECONDS,
+    ADMISSION_LARGE_REQUEST_BYTES,
+    ADMISSION_MAX_CLIENTS,
+    ADMISSION_MAX_CONCURRENT,
+)
+
+logger = logging.getLogger(__name__)
+
+EXEMPT = "exempt"
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Rejection reasons
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+TOO_LARGE_WHILE_BUSY = "large_request_deferred"
+RATE_LIMITED = "rate_limited"
+
+# Recent waits and latencies kept per class for percentiles
+_SAMPLES = 2048
+
+
+class AdmissionRejected(Exception):
+    """A request turned away before running."""
+
+    def __init__(self, request_class: str, reason: str, status_code: int, retry_after: float):
+        super().__init__(f"{request_class} request rejected: {reason}")
+        self.request_class = request_class
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class RequestClass:
+    """Budget, queue and counters of one request class."""
+    name: str
+    priority: int               # lower is served first
+    max_concurrent: int
+    max_queue: int
+    queue_timeout: float
+    rate: float                 # per-client tokens per second (0: unlimited)
+    burst: float
+    active: int = 0
+    waiters: Deque[asyncio.Future] = field(default_factory=deque)
+    admitted: int = 0
+    queued: int = 0
+    rejected: Dict[str, int] = field(default_factory=dict)
+    wait_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=_SAMPLES))
+    latency_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=_SAMPLES))
+
+    def reject(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        def percentiles(samples: Deque[float]) -> Dict[str, Optional[float]]:
+            if not samples:
+                return {"p50": None, "p95": None, "p99": None}
+            p50, p95, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 95, 99])
+            return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+        return {
+            "priority": self.priority,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "queue_wait_ms": percentiles(self.wait_ms),
+            "latency_ms": percentiles(self.latency_ms),
+        }
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 on success, else seconds until they are available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+def _parse_rules(entries: List[str]) -> List[Tuple[Optional[str], str]]:
+    rules = []
+    for entry in entries:
+        method, _, prefix = entry.rpartition(" ")
+        rules.append((method.strip().upper() or None, prefix.strip()))
+    return rules
+
+
+def _matches(rules: List[Tuple[Optional[str], str]], method: str, path: str) -> bool:
+    return any((m is None or m == method) and (path == p or path.startswith(p.rstrip("/") + "/") or
+                                               (p.endswith("/") and path.startswith(p)))
+               for m, p in rules)
+
+
+class AdmissionController:
+    """Per-worker request classes, shared slots and per-client rate limits."""
+
+    def __init__(self, enabled: bool = ADMISSION_ENABLED, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 bulk_paths: Optional[List[str]] = None, exempt_paths: Optional[List[str]] = None,
+                 large_request_bytes: int = ADMISSION_LARGE_REQUEST_BYTES, max_clients: int = ADMISSION_MAX_CLIENTS):
+        self.enabled = enabled
+        self.max_concurrent = max(max_concurrent, 1)
+        self.large_request_bytes = large_request_bytes
+        self.max_clients = max_clients
+        self._bulk_rules = _parse_rules(ADMISSION_BULK_PATHS if bulk_paths is None else bulk_paths)
+        self._exempt_rules = _parse_rules(ADMISSION_EXEMPT_PATHS if exempt_paths is None else exempt_paths)
+        self.classes: Dict[str, RequestClass] = {
+            INTERACTIVE: RequestClass(
+                INTERACTIVE, 0, ADMISSION_INTERACTIVE_CONCURRENCY, ADMISSION_INTERACTIVE_QUEUE,
+                ADMISSION_INTERACTIVE_TIMEOUT_SECONDS, ADMISSION_INTERACTIVE_RATE, ADMISSION_INTERACTIVE_BURST,
+            ),
+            BULK: RequestClass(
+                BULK, 1, ADMISSION_BULK_CONCURRENCY, ADMISSION_BULK_QUEUE,
+                ADMISSION_BULK_TIMEOUT_SECONDS, ADMISSION_BULK_RATE, ADMISSION_BULK_BURST,
+            ),
+        }
+        self._by_priority = sorted(self.classes.values(), key=lambda c: c.priority)
+        self.active = 0
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.exempt = 0
+
+    # -- classification ----------------------------------------------------
+
+    def classify(self, method: str, path: str) -> str:
+        if _matches(self._exempt_rules, method, path):
+            return EXEMPT
+        if _matches(self._bulk_rules, method, path):
+            return BULK
+        return INTERACTIVE
+
+    # -- rate limits -------------------------------------------------------
+
+    def check_rate(self, request_class: RequestClass, client: str) -> None:
+        """
+        Raises:
+            AdmissionRejected: 429 when the client's bucket for the class is empty
+        """
+        if request_class.rate <= 0:
+            return
+        now = time.monotonic()
+        key = (request_class.name, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(request_class.rate, request_class.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take(now)
+        if wait:
+            request_class.reject(RATE_LIMITED)
+            raise AdmissionRejected(request_class.name, RATE_LIMITED, 429, wait)
+
+    # -- slots -------------------------------------------------------------
+
+    def _can_run(self, request_class: RequestClass) -> bool:
+        return request_class.active < request_class.max_concurrent and self.active < self.max_concurrent
+
+    def _first_in_line(self, request_class: RequestClass) -> bool:
+        # Nobody of this or a higher priority is already waiting
+        return not any(c.waiters for c in self._by_priority if c.priority <= request_class.priority)
+
+    def _grant(self, request_class: RequestClass) -> None:
+        request_class.active += 1
+        request_class.admitted += 1
+        self.active += 1
+
+    def retry_after(self, request_class: RequestClass) -> float:
+        """Seconds until a request joining the queue now would likely start."""
+        if request_class.latency_ms:
+            mean_s = sum(request_class.latency_ms) / len(request_class.latency_ms) / 1000.0
+        else:
+            mean_s = 1.0
+        ahead = len(request_class.waiters) + 1
+        return ahead * mean_s / max(request_class.max_concurrent, 1)
+
+    async def acquire(self, name: str, content_length: Optional[int] = None) -> float:
+        """
+        Wait for a running slot of a class.
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            AdmissionRejected: 503 if the queue is full, a large bulk request
+                arrives while the bulk budget is in use, or the wait times out
+        """
+        request_class = self.classes[name]
+        if self._can_run(request_class) and self._first_in_line(request_class):
+            self._grant(request_class)
+            request_class.wait_ms.append(0.0)
+            return 0.0
+
+        large = content_length is not None and content_length > self.large_request_bytes
+        if name == BULK and large:
+            request_class.reject(TOO_LARGE_WHILE_BUSY)
+            raise AdmissionRejected(name, TOO_LARGE_WHILE_BUSY, 503, self.retry_after(request_class))
+        if len(request_class.waiters) >= request_class.max_queue:
+            request_class.reject(QUEUE_FULL)
+            raise AdmissionRejected(name, QUEUE_FULL, 503, self.retry_after(request_class))
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        request_class.waiters.append(waiter)
+        request_class.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), request_class.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the timeout fired; take the slot after all
+                pass
+            else:
+                waiter.cancel()
+                self._remove(request_class, waiter)
+                request_class.reject(QUEUE_TIMEOUT)
+                raise AdmissionRejected(name, QUEUE_TIMEOUT, 503, self.retry_after(request_class))
+        except asyncio.CancelledError:
+            # Client went away while queued; hand a slot it was just granted on
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)
+            else:
+                waiter.cancel()
+                self._remove(request_class, waiter)
+            raise
+        waited = time.perf_counter() - started
+        request_class.wait_ms.append(waited * 1000.0)
+        return waited
+
+    def _remove(self, request_class: RequestClass, waiter: asyncio.Future) -> None:
+        try:
+            request_class.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, name: str, latency: Optional[float] = None) -> None:
+        """Free a slot and hand it on, highest-priority queue first."""
+        request_class = self.classes[name]
+        request_class.active -= 1
+        self.active -= 1
+        if latency is not None:
+            request_class.latency_ms.append(latency * 1000.0)
+        for candidate in self._by_priority:
+            while candidate.waiters and self._can_run(candidate):
+                waiter = candidate.waiters.popleft()
+                if waiter.done():
+                    continue
+                self._grant(candidate)
+                waiter.set_result(None)
+
+    # -- reporting ---------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "exempt_requests": self.exempt,
+            "clients_tracked": len(self._buckets),
+            "classes": {name: c.stats() for name, c in self.classes.items()},
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, min(int(math.ceil(seconds)), 300)))
+
+
+ADMISSION = AdmissionController()
@@ -0,0 +1,253 @@
+"""
+Heat Alert Service for HeatGuard API
+
+Incremental scoring of district-day forecasts with threshold-crossing
+events. The engine remembers the feature vector, label and probability of
+every (district, date) it has scored. When a refresh cycle hands it new
+forecasts it compares the feature vectors and only sends the rows whose
+inputs changed (or which the current model artifacts have not scored yet,
+e.g. after a new version or a same-name hot reload) to the model;
+unchanged rows reuse their previous result.
+
+Whenever a district-day's label moves across ALERT_MIN_LABEL (Orange by
+default), or between levels above it, an event is appended to a bounded
+in-memory log that `/alerts` queries. Events carry increasing ids, so a
+consumer can poll with `after_id` and never see an event twice.
+
+score() runs in a worker thread during refresh cycles, so the memo and the
+log are guarded by a lock that the event-loop readers (events, active)
+take only long enough to copy them.
+"""
+
+import itertools
+import logging
+import threading
+from collections import deque
+from datetime import date, datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import ALERT_LOG_SIZE, ALERT_MIN_LABEL, ALERT_STATES, get_risk_level
+from app.services import district_store, model_service
+from app.services.model_registry import ModelArtifacts
+
+logger = logging.getLogger(__name__)
+
+# Event kinds
+RAISED = "raised"            # below the threshold (or unseen) -> at or above it
+ESCALATED = "escalated"      # higher level, both at or above the threshold
+DEESCALATED = "deescalated"  # lower level, both at or above the threshold
+CLEARED = "cleared"          # at or above the threshold -> below it
+
+
+def crossing_kind(previous: Optional[int], label: int, min_label: int) -> Optional[str]:
+    """Event kind for a label change, or None if it crosses no alert boundary."""
+    was = previous is not None and previous >= min_label
+    now = label >= min_label
+    if now and not was:
+        return RAISED
+    if was and not now:
+        return CLEARED
+    if was and now and label != previous:
+        return ESCALATED if label > previous else DEESCALATED
+    return None
+
+
+class AlertEngine:
+    """Per-(district, date) score memo and threshold-crossing event log."""
+
+    def __init__(self, min_label: int = ALERT_MIN_LABEL, log_size: int = ALERT_LOG_SIZE,
+                 states: Optional[List[str]] = None):
+        self.min_label = min_label
+        self.states = list(ALERT_STATES if states is None else states)
+        # (district row, ISO date) -> (raw feature vector, label, probability,
+        # artifacts token of the model that scored it)
+        self._scores: Dict[Tuple[int, str], Tuple[np.ndarray, int, float, str]] = {}
+        # Last version scored, for stats
+        self._version: Optional[str] = None
+        self._log: Deque[Dict[str, Any]] = deque(maxlen=max(log_size, 1))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.rows_seen = 0
+        self.rows_rescored = 0
+        self.batches = 0
+        self.events_total = 0
+
+    # -- scope -------------------------------------------------------------
+
+    def watched_rows(self) -> np.ndarray:
+        """District rows of ALERT_STATES, scored every cycle even without subscribers."""
+        store = district_store.get_store()
+        if not self.states:
+            return np.empty(0, dtype=np.int64)
+        if "*" in self.states:
+            return store.all_rows()
+        return np.unique(np.concatenate([store.rows_for_state(s) for s in self.states]).astype(np.int64))
+
+    # -- scoring -----------------------------------------------------------
+
+    def score(self, rows: np.ndarray, days: List[str], X: np.ndarray,
+              artifacts: Optional[ModelArtifacts] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Labels and probabilities for district-days, rescoring only changed inputs.
+
+        Args:
+            rows: (n,) district rows
+            days: n ISO dates, parallel to rows
+            X: (n, n_features) raw features in artifacts.feature_columns order
+            artifacts: Model version to use (default: the active version)
+
+        Returns:
+            Tuple of (labels, probability of each label): int64 and float32 arrays
+        """
+        artifacts = artifacts or model_service.get_artifacts()
+        n = len(days)
+        keys = list(zip(rows.tolist(), days))
+        previous = [self._scores.get(key) for key in keys]
+        labels = np.empty(n, dtype=np.int64)
+        probability = np.empty(n, dtype=np.float32)
+        changed = np.ones(n, dtype=bool)
+
+        # Another model (a new version, or the same name hot-reloaded with new
+        # files) may label identical inputs differently, so scores are only
+        # reused under the artifacts token they were computed with
+        token = model_service.artifacts_token(artifacts)
+        known = np.fromiter((p is not None and p[3] == token for p in previous), dtype=bool, count=n)
+        idx = np.nonzero(known)[0]
+        if len(idx):
+            same = (np.stack([previous[i][0] for i in idx]) == X[idx]).all(axis=1)
+            for i in idx[same].tolist():
+                labels[i], probability[i] = previous[i][1], previous[i][2]
+            changed[idx[same]] = False
+
+        rescore = np.nonzero(changed)[0]
+        if len(rescore):
+            proba = model_service.predict_proba_matrix(X[rescore], artifacts=artifacts, shadow=False)
+            labels[rescore] = proba.argmax(axis=1)
+            probability[rescore] = proba[np.arange(len(rescore)), labels[rescore]]
+        self._version = artifacts.version
+        self.rows_seen += n
+        self.rows_rescored += len(rescore)
+        self.batches += 1
+
+        tmax_column = artifacts.feature_columns.index("tmax_c")
+        with self._lock:
+            for i in rescore.tolist():
+                label = int(labels[i])
+                old = previous[i]
+                self._scores[keys[i]] = (X[i].copy(), label, float(probability[i]), token)
+                kind = crossing_kind(old[1] if old is not None else None, label, self.min_label)
+                if kind is not None:
+                    self._emit(kind, keys[i], label, old[1] if old is not None else None,
+                               float(X[i, tmax_column]), float(probability[i]), artifacts.version)
+            self._prune()
+        return labels, probability
+
+    def _prune(self) -> None:
+        # Days that have left the forecast window can no longer change
+        today = date.today().isoformat()
+        for key in [k for k in self._scores if k[1] < today]:
+            del self._scores[key]
+
+    # -- events ------------------------------------------------------------
+
+    def _emit(self, kind: str, key: Tuple[int, str], label: int, previous: Optional[int],
+              tmax_c: float, probability: float, model_version: str) -> None:
+        store = district_store.get_store()
+        row, day = key
+        event = {
+            "id": next(self._ids),
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "kind": kind,
+            "district_id": store.ids[row],
+            "name": store.name(row),
+            "state": store.state(row),
+            "date": day,
+            "tmax_c": round(tmax_c, 1),
+            "risk_label": label,
+            "risk_level": get_risk_level(label),
+            "previous_risk_label": previous,
+            "previous_risk_level": get_risk_level(previous) if previous is not None else None,
+            "probability": round(probability, 4),
+            "model_version": model_version,
+        }
+        self._log.append(event)
+        self.events_total += 1
+        if kind in (RAISED, ESCALATED):
+            logger.info("Heat alert %s: %s (%s) %s is %s", kind, event["name"], event["state"],
+                        day, event["risk_level"])
+
+    def events(self, after_id: int = 0, state: Optional[str] = None, district_id: Optional[str] = None,
+               kind: Optional[str] = None, min_label: Optional[int] = None,
+               limit: int = 100) -> List[Dict[str, Any]]:
+        """Logged events with id > after_id matching the filters, oldest first."""
+        state = district_store.norm(state) if state else None
+        with self._lock:
+            log = list(self._log)
+        matched = []
+        for event in log:
+            if event["id"] <= after_id:
+                continue
+            if state and district_store.norm(event["state"]) != state:
+                continue
+            if district_id and event["district_id"] != district_id:
+                continue
+            if kind and event["kind"] != kind:
+                continue
+            if min_label is not None and event["risk_label"] < min_label:
+                continue
+            matched.append(event)
+            if len(matched) >= limit:
+                break
+        return matched
+
+    def active(self, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """District-days currently at or above the alert threshold, by date then district."""
+        store = district_store.get_store()
+        state = district_store.norm(state) if state else None
+        with self._lock:
+            scores = list(self._scores.items())
+        active = []
+        for (row, day), (_, label, probability, _) in sorted(scores, key=lambda kv: (kv[0][1], kv[0][0])):
+            if label < self.min_label:
+                continue
+            if state and district_store.norm(store.state(row)) != state:
+                continue
+            active.append({
+                "district_id": store.ids[row],
+                "name": store.name(row),
+                "state": store.state(row),
+                "date": day,
+                "risk_label": label,
+                "risk_level": get_risk_level(label),
+                "probability": round(probability, 4),
+            })
+        return active
+
+    @property
+    def last_event_id(self) -> int:
+        return self._log[-1]["id"] if self._log else 0
+
+    @property
+    def oldest_event_id(self) -> Optional[int]:
+        return self._log[0]["id"] if self._log else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "min_label": self.min_label,
+            "states": self.states,
+            "tracked_district_days": len(self._scores),
+            "model_version": self._version,
+            "batches": self.batches,
+            "rows_seen": self.rows_seen,
+            "rows_rescored": self.rows_rescored,
+            "rescore_ratio": round(self.rows_rescored / self.rows_seen, 4) if self.rows_seen else None,
+            "events_total": self.events_total,
+            "events_logged": len(self._log),
+            "oldest_event_id": self.oldest_event_id,
+            "last_event_id": self.last_event_id,
+        }
+
+
+ALERTS = AlertEngine()
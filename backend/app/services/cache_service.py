@@ -0,0 +1,700 @@
+"""
+Cache Service for HeatGuard API
+
+Two-tier cache for upstream forecasts and scored predictions:
+
+- L1: an in-process LRU with per-entry expiry holding decoded values, so a
+  hit costs a dict lookup.
+- L2: a store shared by every worker on the host (SQLite in WAL mode) or by
+  every instance (a Redis-protocol server), which also survives restarts.
+  MemoryBackend is an in-process stand-in with the same interface.
+
+Values cross L2 in a compact tagged binary encoding: JSON-compatible values
+as orjson, NumPy arrays as dtype/shape plus raw bytes, zstd-compressed above
+CACHE_COMPRESS_MIN_BYTES, with the absolute expiry in the header so an L2
+hit refills L1 for exactly the remaining lifetime. Pickle is deliberately
+not used: a shared L2 must not be able to execute code in the API.
+
+Scored predictions are kept in L1 only (namespace(..., shared=False)):
+they are looked up synchronously inside model calls, where an L2 read
+would block the event loop, and there is one entry per distinct input.
+
+L2 writes are handed to a single background thread and dropped when it falls
+behind, so a slow or unreachable L2 never delays a response; L2 errors are
+counted and treated as misses.
+"""
+
+import asyncio
+import logging
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    CACHE_COMPRESS_MIN_BYTES,
+    CACHE_KEY_PREFIX,
+    CACHE_L1_MAX_ENTRIES,
+    CACHE_L2,
+    CACHE_L2_MAX_PENDING_WRITES,
+    CACHE_REDIS_URL,
+    CACHE_SQLITE_PATH,
+)
+from app.utils.responses import dumps, loads
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# -- binary encoding ----------------------------------------------------------
+#
+# byte 0: value kind   (J = JSON-compatible, N = NumPy array)
+# byte 1: compression  (- = none, z = zstd, d = zlib deflate)
+# bytes 2-9: expiry as a little-endian float64 Unix time
+# rest: payload; for arrays a JSON header {"dtype", "shape"}, a newline, the raw data
+
+_HEADER = struct.Struct("<ccd")
+_KIND_JSON, _KIND_ARRAY = b"J", b"N"
+_RAW, _ZSTD, _DEFLATE = b"-", b"z", b"d"
+
+_zstd_local = threading.local()
+
+
+def _compress(payload: bytes) -> Tuple[bytes, bytes]:
+    if len(payload) < CACHE_COMPRESS_MIN_BYTES:
+        return _RAW, payload
+    if zstandard is not None:
+        # Compressor objects are not thread-safe; keep one per thread
+        compressor = getattr(_zstd_local, "compressor", None)
+        if compressor is None:
+            compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=3)
+        return _ZSTD, compressor.compress(payload)
+    return _DEFLATE, zlib.compress(payload, 6)
+
+
+def _decompress(codec: bytes, payload: bytes) -> bytes:
+    if codec == _RAW:
+        return payload
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd-compressed cache entry but zstandard is not installed")
+        decompressor = getattr(_zstd_local, "decompressor", None)
+        if decompressor is None:
+            decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(payload)
+    if codec == _DEFLATE:
+        return zlib.decompress(payload)
+    raise ValueError(f"Unknown cache compression {codec!r}")
+
+
+def encode_value(value: Any, expires_at: float) -> bytes:
+    """
+    Encode a JSON-compatible value or a NumPy array for L2.
+
+    Raises:
+        TypeError: If the value is neither
+    """
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        header = dumps({"dtype": array.dtype.str, "shape": list(array.shape)})
+        kind, payload = _KIND_ARRAY, header + b"\n" + array.tobytes()
+    else:
+        kind, payload = _KIND_JSON, dumps(value)
+    codec, payload = _compress(payload)
+    return _HEADER.pack(kind, codec, expires_at) + payload
+
+
+def decode_value(blob: bytes) -> Tuple[Any, float]:
+    """Inverse of encode_value(); returns (value, expires_at)."""
+    kind, codec, expires_at = _HEADER.unpack_from(blob)
+    payload = _decompress(codec, blob[_HEADER.size:])
+    if kind == _KIND_ARRAY:
+        header, _, data = payload.partition(b"\n")
+        meta = loads(header)
+        array = np.frombuffer(data, dtype=np.dtype(meta["dtype"])).reshape(meta["shape"])
+        return array, expires_at
+    if kind == _KIND_JSON:
+        return loads(payload), expires_at
+    raise ValueError(f"Unknown cache value kind {kind!r}")
+
+
+# -- L1 -----------------------------------------------------------------------
+
+class LRUCache:
+    """Thread-safe LRU of decoded values with an absolute expiry per entry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# -- L2 backends --------------------------------------------------------------
+
+class CacheBackend:
+    """Shared byte store with per-key TTL."""
+
+    name = "none"
+    # Whether calls may block on I/O (async callers then use a worker thread)
+    blocking = True
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def write_many(self, sets: List[Tuple[str, bytes, float]], deletes: List[str]) -> None:
+        """Apply a batch of writes; backends override this to use one round trip."""
+        for key, value, ttl_seconds in sets:
+            self.set(key, value, ttl_seconds)
+        for key in deletes:
+            self.delete(key)
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """In-process stand-in for a shared L2 (tests and single-worker setups)."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl_seconds, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    One SQLite file shared by all worker processes on a host.
+
+    WAL mode lets readers proceed during a write; each thread keeps its own
+    connections. Expired rows are ignored on read and purged periodically.
+    """
+
+    name = "sqlite"
+    # A local WAL read takes tens of microseconds, far less than a
+    # worker-thread round trip on a busy loop. Reads use a connection without
+    # a busy timeout, so a locked database (recovery, a checkpoint) is a miss
+    # rather than a stall of the event loop.
+    blocking = False
+    PURGE_EVERY_WRITES = 1000
+
+    def __init__(self, path: Path, busy_timeout_ms: int = 200):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3
+
+            conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_ms / 1000.0,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _read_connection(self):
+        conn = getattr(self._local, "read_conn", None)
+        if conn is None:
+            import sqlite3
+
+            # WAL mode is persistent in the file (set by the first _connection)
+            conn = sqlite3.connect(str(self.path), timeout=0, isolation_level=None, check_same_thread=False)
+            self._local.read_conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        import sqlite3
+
+        try:
+            row = self._read_connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            if getattr(e, "sqlite_errorcode", None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED):
+                return None
+            raise
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self.write_many([(key, value, ttl_seconds)], [])
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def write_many(self, sets: List[Tuple[str, bytes, float]], deletes: List[str]) -> None:
+        # One transaction per batch: the per-commit cost dominates single-row writes
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, now + ttl_seconds) for key, value, ttl_seconds in sets],
+            )
+            if deletes:
+                conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in deletes])
+        self._writes += len(sets)
+        if self._writes >= self.PURGE_EVERY_WRITES:
+            self._writes = 0
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class RedisBackend(CacheBackend):
+    """Redis (or any RESP-compatible server) shared across hosts; needs the redis package."""
+
+    name = "redis"
+
+    def __init__(self, url: str, socket_timeout: float = 0.1):
+        import redis
+
+        # Short timeouts: a slow L2 must degrade to a miss, not stall requests
+        self._client = redis.Redis.from_url(url, socket_timeout=socket_timeout,
+                                            socket_connect_timeout=socket_timeout)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._client.set(key, value, px=max(int(ttl_seconds * 1000), 1))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def write_many(self, sets: List[Tuple[str, bytes, float]], deletes: List[str]) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for key, value, ttl_seconds in sets:
+            pipe.set(key, value, px=max(int(ttl_seconds * 1000), 1))
+        if deletes:
+            pipe.delete(*deletes)
+        pipe.execute()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_backend(kind: str) -> Optional[CacheBackend]:
+    """
+    Build the configured L2 backend, or None for L1 only.
+
+    A backend that cannot be set up (missing package, unwritable path) is
+    logged and skipped rather than failing startup.
+    """
+    if not kind or kind == "none":
+        return None
+    try:
+        if kind == "memory":
+            return MemoryBackend()
+        if kind == "sqlite":
+            path = Path(CACHE_SQLITE_PATH)
+            if not path.is_absolute():
+                path = Path(__file__).resolve().parents[2] / path
+            return SQLiteBackend(path)
+        if kind == "redis":
+            return RedisBackend(CACHE_REDIS_URL)
+    except Exception as e:
+        logger.warning("Cache L2 backend %r unavailable, using L1 only: %s", kind, e)
+        return None
+    logger.warning("Unknown HEATGUARD_CACHE_L2 %r; expected sqlite, redis or memory", kind)
+    return None
+
+
+# -- two-tier cache -----------------------------------------------------------
+
+class _TierStats:
+    __slots__ = ("hits", "misses", "errors")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class L2Writer:
+    """
+    Background thread applying L2 writes in batches.
+
+    Writes queue up while a batch is being applied and the next batch takes
+    all of them (encoded here, off the request path) in one backend call.
+    Writes beyond max_pending waiting are dropped.
+    """
+
+    BATCH_MAX = 256
+
+    def __init__(self, max_pending: int = CACHE_L2_MAX_PENDING_WRITES):
+        self.max_pending = max_pending
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.batches = 0
+
+    def submit(self, cache: "TwoTierCache", key: str, value: Any = None,
+               expires_at: float = 0.0, ttl_seconds: float = 0.0) -> None:
+        """Queue a set (or, with value None, a delete) of a full L2 key."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="heatguard-cache", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((cache, key, value, expires_at, ttl_seconds))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch = []
+            while True:
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+                if len(batch) >= self.BATCH_MAX:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._apply(batch)
+
+    def _apply(self, batch: List[tuple]) -> None:
+        by_backend: Dict[int, Tuple[CacheBackend, List, List, List["TwoTierCache"]]] = {}
+        for cache, key, value, expires_at, ttl_seconds in batch:
+            backend = cache.backend
+            if backend is None:
+                continue
+            entry = by_backend.setdefault(id(backend), (backend, [], [], []))
+            entry[3].append(cache)
+            if value is None:
+                entry[2].append(key)
+                continue
+            try:
+                entry[1].append((key, encode_value(value, expires_at), ttl_seconds))
+            except Exception as e:
+                cache._l2_error("encode", e)
+        for backend, sets, deletes, caches in by_backend.values():
+            try:
+                backend.write_many(sets, deletes)
+            except Exception as e:
+                for cache in set(caches):
+                    cache._l2_error("write", e)
+        self.batches += 1
+
+    def shutdown(self) -> None:
+        """Apply queued writes, then stop the thread."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=10)
+
+
+class TwoTierCache:
+    """
+    One namespace of the cache (e.g. "weather", "predictions").
+
+    Values must be JSON-compatible or NumPy arrays. They are shared between
+    callers on L1 hits, so treat them as read-only (arrays are returned
+    non-writeable).
+    """
+
+    def __init__(self, namespace: str, backend: Optional[CacheBackend], writer: L2Writer,
+                 l1_max_entries: int = CACHE_L1_MAX_ENTRIES, prefix: str = CACHE_KEY_PREFIX):
+        self.namespace = namespace
+        self.backend = backend
+        self.writer = writer
+        self.l1 = LRUCache(l1_max_entries)
+        self._prefix = f"{prefix}{namespace}:"
+        self._l1_stats = _TierStats()
+        self._l2_stats = _TierStats()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.sets = 0
+
+    def _l2_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        if self.backend is None:
+            return None
+        try:
+            blob = self.backend.get(self._prefix + key)
+            if blob is None:
+                self._l2_stats.misses += 1
+                return None
+            value, expires_at = decode_value(blob)
+        except Exception as e:
+            self._l2_error("read", e)
+            return None
+        if expires_at <= time.time():
+            self._l2_stats.misses += 1
+            return None
+        self._l2_stats.hits += 1
+        return value, expires_at
+
+    def _l2_error(self, op: str, e: Exception) -> None:
+        self._l2_stats.errors += 1
+        if self._l2_stats.errors == 1 or self._l2_stats.errors % 100 == 0:
+            logger.warning("Cache L2 %s failed for %s (%d errors so far): %s",
+                           op, self.namespace, self._l2_stats.errors, e)
+
+    def _fill_l1(self, key: str, value: Any, expires_at: float) -> Any:
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+        self.l1.put(key, value, expires_at)
+        return value
+
+    def _l1_get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is None:
+            self._l1_stats.misses += 1
+        else:
+            self._l1_stats.hits += 1
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        """L1, then L2 (blocking); None on a miss in both."""
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+        found = self._l2_get(key)
+        if found is None:
+            return None
+        return self._fill_l1(key, *found)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for async callers; a blocking L2 is queried on a worker thread."""
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+        if self.backend is None:
+            return None
+        if self.backend.blocking:
+            found = await asyncio.to_thread(self._l2_get, key)
+        else:
+            found = self._l2_get(key)
+        if found is None:
+            return None
+        return self._fill_l1(key, *found)
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store in L1 now and in L2 from the background writer."""
+        if ttl_seconds <= 0:
+            return
+        expires_at = time.time() + ttl_seconds
+        self._fill_l1(key, value, expires_at)
+        self.sets += 1
+        if self.backend is not None:
+            self.writer.submit(self, self._prefix + key, value, expires_at, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.l1.delete(key)
+        if self.backend is not None:
+            self.writer.submit(self, self._prefix + key)
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Any]], ttl_seconds: float) -> Any:
+        """
+        Cached value, or the result of `load()` stored for `ttl_seconds`.
+
+        Concurrent misses for the same key in this process share one load.
+        A None result is returned but not cached; exceptions propagate to
+        every waiter and nothing is cached.
+        """
+        value = await self.aget(key)
+        if value is not None:
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so an exception nobody else awaited is not logged
+            future.exception()
+            raise
+        else:
+            if value is not None:
+                self.set(key, value, ttl_seconds)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "l1": {**self._l1_stats.as_dict(), "entries": len(self.l1), "max_entries": self.l1.max_entries,
+                   "evictions": self.l1.evictions, "expirations": self.l1.expirations},
+            "l2": {**self._l2_stats.as_dict(), "backend": self.backend.name if self.backend else None},
+            "sets": self.sets,
+        }
+
+
+class CacheManager:
+    """Creates namespaces over one shared L2 backend and write-behind thread."""
+
+    def __init__(self, backend_kind: str = CACHE_L2):
+        self.backend_kind = backend_kind
+        self._backend: Optional[CacheBackend] = None
+        self._backend_ready = False
+        self.writer = L2Writer()
+        self._namespaces: Dict[str, TwoTierCache] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> Optional[CacheBackend]:
+        # Created on first use, so importing the app does not touch the disk
+        if not self._backend_ready:
+            with self._lock:
+                if not self._backend_ready:
+                    self._backend = create_backend(self.backend_kind)
+                    self._backend_ready = True
+        return self._backend
+
+    def use_backend(self, kind: str) -> None:
+        """
+        Select the L2 backend kind before first use (e.g. "memory" for benchmarks).
+
+        Raises:
+            RuntimeError: If the backend has already been created
+        """
+        with self._lock:
+            if self._backend_ready and kind != self.backend_kind:
+                raise RuntimeError(f"Cache L2 backend {self.backend_kind!r} is already in use")
+            self.backend_kind = kind
+
+    def namespace(self, name: str, shared: bool = True) -> TwoTierCache:
+        """
+        The cache for one namespace, created on first use.
+
+        With shared=False the namespace lives in L1 only. For callers on the
+        request path that cannot await an L2 round trip, and for values
+        too numerous to persist.
+        """
+        cache = self._namespaces.get(name)
+        if cache is None:
+            backend = self.backend if shared else None
+            with self._lock:
+                cache = self._namespaces.setdefault(name, TwoTierCache(name, backend, self.writer))
+        return cache
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "l2_backend": self._backend.name if self._backend is not None else None,
+            "l2_writes_dropped": self.writer.dropped,
+            "namespaces": {name: cache.stats() for name, cache in sorted(self._namespaces.items())},
+        }
+
+    def shutdown(self) -> None:
+        self.writer.shutdown()
+        if self._backend is not None:
+            self._backend.close()
+
+
+CACHE = CacheManager()
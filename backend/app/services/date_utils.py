@@ -5,7 +5,9 @@ Provides helper functions for date-related computations.
 """
 
 from datetime import date, datetime
-from typing import Optional
+from typing import Optional, Tuple
+
+import numpy as np
 
 
 def compute_day_of_year(d: date) -> int:
@@ -64,3 +66,34 @@ def get_date_features(d: Optional[date] = None) -> dict:
         "day_of_year": compute_day_of_year(target_date),
         "month": compute_month(target_date)
     }
+
+
+def date_range_array(start: date, end: date) -> np.ndarray:
+    """
+    Build an inclusive range of dates as a numpy datetime64[D] array.
+
+    Args:
+        start: First date
+        end: Last date (inclusive)
+
+    Returns:
+        datetime64[D] array from start to end
+    """
+    return np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1, dtype="datetime64[D]")
+
+
+def compute_date_features_array(dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized day_of_year and month for an array of dates.
+
+    Args:
+        dates: Array convertible to datetime64[D]
+
+    Returns:
+        Tuple of (day_of_year, month) int64 arrays, matching
+        compute_day_of_year and compute_month element-wise
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    day_of_year = (days - days.astype("datetime64[Y]")).astype(np.int64) + 1
+    month = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return day_of_year, month
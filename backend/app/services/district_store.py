@@ -0,0 +1,485 @@
+"""
+District Store for HeatGuard API
+
+Compact columnar in-memory store for district metadata. Coordinates,
+population, area, density and vulnerability live in NumPy arrays, and
+names/states are interned string tables; response models are only built
+at the serialization edge.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import RISK_LABEL_TO_LEVEL
+from app.utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Locate the backend project root and the two JSON files
+# backend/app/services/district_store.py -> parents[0]=services, [1]=app, [2]=backend
+BASE_DIR = Path(__file__).resolve().parents[2]
+DISTRICTS_PATH = BASE_DIR / "data" / "districts.json"
+GEO_PATH = BASE_DIR / "data" / "District-Geocodes.json"
+
+# Levels counted as "at risk" in population rollups (Orange, Red)
+AT_RISK_MIN_LABEL = 2
+
+# Encoded record lists memoized per store (queries x field selections)
+_JSON_CACHE_MAX_ENTRIES = 1024
+
+# The vulnerability generator only ever looks at h % 9, (h // 10) % 21 and
+# (h // 100) % 21, all of which are determined by h modulo lcm(9, 2100).
+_VULN_HASH_MODULUS = 6300
+
+
+def norm(s: str) -> str:
+    return s.strip().lower() if s else ""
+
+
+_PARENTHESIZED = re.compile(r"\([^)]*\)")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# Trailing words that do not change which place is meant
+_PLACE_SUFFIXES = (" district", " city")
+
+
+def normalize_place(s: str) -> str:
+    """
+    Looser key than norm() for matching place names across sources.
+
+    Drops accents, parenthesized qualifiers ("Agra (M Corp.)"), punctuation
+    and a trailing "district" / "city", so "Thoothukkudi District",
+    "thoothukkudi" and "Thoothukkudi (M Corp.)" share one key.
+    """
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii").lower()
+    s = " ".join(_NON_ALNUM.sub(" ", _PARENTHESIZED.sub(" ", s)).split())
+    for suffix in _PLACE_SUFFIXES:
+        if s.endswith(suffix) and len(s) > len(suffix):
+            s = s[:-len(suffix)]
+    return s
+
+
+class NameMatch(NamedTuple):
+    """Result of DistrictStore.match_name."""
+    source: str                                   # "district", "headquarters" or "place"
+    rows: List[int]                               # candidate rows, best first
+    coordinates: Optional[Tuple[float, float]]    # of the place itself, for "place" matches
+
+
+def vulnerability_hash(state: str, district: str) -> int:
+    """Reduced SHA-256 of "state-district" used to derive stable vulnerability values."""
+    key = f"{state}-{district}".encode("utf-8")
+    return int.from_bytes(hashlib.sha256(key).digest(), "big") % _VULN_HASH_MODULUS
+
+
+def vulnerability_columns(h: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Vectorized vulnerability percentages from reduced district hashes.
+
+    Args:
+        h: int64 array of vulnerability_hash values
+
+    Returns:
+        Dict of float32 arrays keyed like VulnerabilityMetrics fields
+    """
+    return {
+        "elderlyPopulation": (8 + h % 9).astype(np.float32),            # 8–16%
+        "outdoorWorkers": (20 + (h // 10) % 21).astype(np.float32),     # 20–40%
+        "slumPopulation": (10 + (h // 100) % 21).astype(np.float32),    # 10–30%
+    }
+
+
+def _optional_int(value: float) -> Optional[int]:
+    return None if np.isnan(value) else int(value)
+
+
+class DistrictStore:
+    """
+    Immutable columnar district table.
+
+    Row i of every column describes the same district; rows keep the order
+    of districts.json. Unknown population/area/density are NaN.
+    """
+
+    __slots__ = (
+        "ids", "name_table", "name_idx", "state_table", "state_idx",
+        "lat", "lon", "population", "area", "density",
+        "elderly_pct", "outdoor_workers_pct", "slum_pct",
+        "_row_by_id", "_rows_by_state", "_row_by_name_state", "_row_by_coordinates", "_json_cache",
+        "_rows_by_place", "_rows_by_headquarters", "_headquarters_keys", "_places", "_located", "_located_coordinates",
+    )
+
+    def __init__(self, ids: List[str], names: List[str], states: List[str],
+                 lat: np.ndarray, lon: np.ndarray, population: np.ndarray,
+                 area: np.ndarray, density: np.ndarray, vulnerability: Dict[str, np.ndarray],
+                 headquarters: Optional[List[str]] = None,
+                 places: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.ids = [sys.intern(i) for i in ids]
+        self.name_table, name_idx = np.unique(np.array(names, dtype=object), return_inverse=True)
+        self.name_table = [sys.intern(str(n)) for n in self.name_table]
+        self.name_idx = name_idx.astype(np.int32)
+        self.state_table, state_idx = np.unique(np.array(states, dtype=object), return_inverse=True)
+        self.state_table = [sys.intern(str(s)) for s in self.state_table]
+        self.state_idx = state_idx.astype(np.int32)
+
+        self.lat = lat
+        self.lon = lon
+        self.population = population
+        self.area = area
+        self.density = density
+        self.elderly_pct = vulnerability["elderlyPopulation"]
+        self.outdoor_workers_pct = vulnerability["outdoorWorkers"]
+        self.slum_pct = vulnerability["slumPopulation"]
+
+        # First occurrence wins for the handful of duplicate generated ids
+        self._row_by_id: Dict[str, int] = {}
+        self._row_by_name_state: Dict[Tuple[str, str], int] = {}
+        self._row_by_coordinates: Dict[Tuple[float, float], int] = {}
+        for i, district_id in enumerate(self.ids):
+            self._row_by_id.setdefault(district_id, i)
+            self._row_by_name_state.setdefault((norm(names[i]), norm(states[i])), i)
+            if lat[i] != 0 or lon[i] != 0:
+                self._row_by_coordinates.setdefault((float(lat[i]), float(lon[i])), i)
+
+        self._rows_by_state: Dict[str, np.ndarray] = {
+            norm(state): np.nonzero(self.state_idx == s)[0]
+            for s, state in enumerate(self.state_table)
+        }
+        self._json_cache: Dict[str, bytes] = {}
+
+        # Name indexes for match_name(), keyed by normalize_place(); a name
+        # shared by districts of several states maps to all of them
+        self._rows_by_place: Dict[str, List[int]] = {}
+        self._rows_by_headquarters: Dict[str, List[int]] = {}
+        self._headquarters_keys = [normalize_place(hq) for hq in headquarters or [""] * len(names)]
+        for i, name in enumerate(names):
+            self._rows_by_place.setdefault(normalize_place(name), []).append(i)
+            self._rows_by_headquarters.setdefault(self._headquarters_keys[i], []).append(i)
+        self._rows_by_place.pop("", None)
+        self._rows_by_headquarters.pop("", None)
+        # Geocoded towns and cities (District-Geocodes.json) by normalized name
+        self._places: Dict[str, Tuple[float, float]] = dict(places or {})
+        # Rows with known coordinates (including place-index fallbacks), for nearest()
+        coordinates = [self.place_coordinates(i) for i in range(len(self.ids))]
+        self._located = np.array([i for i, c in enumerate(coordinates) if c is not None], dtype=np.int64)
+        self._located_coordinates = np.array(
+            [coordinates[i] for i in self._located], dtype=np.float64
+        ).reshape(-1, 2)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def empty(cls) -> "DistrictStore":
+        empty_f = np.empty(0, dtype=np.float64)
+        empty_v = np.empty(0, dtype=np.float32)
+        return cls([], [], [], empty_f, empty_f, empty_f, empty_f, empty_f,
+                   {"elderlyPopulation": empty_v, "outdoorWorkers": empty_v, "slumPopulation": empty_v})
+
+    @classmethod
+    def from_files(cls, districts_path: Path = DISTRICTS_PATH, geo_path: Path = GEO_PATH) -> "DistrictStore":
+        """
+        Build the store by merging districts.json with District-Geocodes.json.
+
+        Raises:
+            FileNotFoundError: If either data file is missing
+        """
+        with districts_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+            # Handle structure: {"districts": [...]}
+            if isinstance(data, dict) and "districts" in data:
+                districts_raw = data["districts"]
+            else:
+                districts_raw = data
+
+        with geo_path.open("r", encoding="utf-8") as f:
+            geo_raw = json.load(f)
+
+        # Build a lookup for geocodes keyed by a normalised district name,
+        # and the looser place index used by match_name()
+        geo_index: Dict[str, Dict] = {}
+        places: Dict[str, Tuple[float, float]] = {}
+        for row in geo_raw:
+            raw_name = row.get("district") or row.get("District") or row.get("name") or row.get("District_Name", "")
+            name = norm(raw_name)
+            if not name:
+                continue
+            geo_index[name] = row
+            try:
+                coords = (float(row.get("lat") or row.get("latitude") or row.get("Latitude")),
+                          float(row.get("lon") or row.get("longitude") or row.get("Longitude")))
+            except (ValueError, TypeError):
+                continue
+            # The plain name precedes its "(M Corp.)" etc. variants in the file; first wins
+            places.setdefault(normalize_place(raw_name), coords)
+
+        n = len(districts_raw)
+        ids: List[str] = []
+        names: List[str] = []
+        states: List[str] = []
+        headquarters: List[str] = []
+        lat = np.zeros(n, dtype=np.float64)
+        lon = np.zeros(n, dtype=np.float64)
+        population = np.full(n, np.nan)
+        area = np.full(n, np.nan)
+        density = np.full(n, np.nan)
+        hashes = np.empty(n, dtype=np.int64)
+
+        for i, row in enumerate(districts_raw):
+            state = row.get("state", "Unknown")
+            district_name = row.get("district", "Unknown")
+            for column, key in ((population, "population"), (area, "area"), (density, "density")):
+                if row.get(key) is not None:
+                    column[i] = row[key]
+
+            geo_row = geo_index.get(norm(district_name))
+            if geo_row:
+                try:
+                    lat[i] = float(geo_row.get("lat") or geo_row.get("latitude") or geo_row.get("Latitude") or 0)
+                    lon[i] = float(geo_row.get("lon") or geo_row.get("longitude") or geo_row.get("Longitude") or 0)
+                except (ValueError, TypeError):
+                    lat[i], lon[i] = 0.0, 0.0
+
+            hashes[i] = vulnerability_hash(state, district_name)
+
+            state_code = row.get("stateCode") or state[:2]
+            dist_code = row.get("districtCode") or district_name[:4]
+            ids.append(f"{state_code.lower()}_{dist_code.lower()}")
+            names.append(district_name)
+            states.append(state)
+            headquarters.append(row.get("headquarters") or "")
+
+        return cls(ids, names, states, lat, lon, population, area, density, vulnerability_columns(hashes),
+                   headquarters=headquarters, places=places)
+
+    # ------------------------------------------------------------------
+    # Queries (all return row indices)
+    # ------------------------------------------------------------------
+
+    def row(self, district_id: str) -> Optional[int]:
+        return self._row_by_id.get(district_id)
+
+    def rows_for_ids(self, district_ids: List[str]) -> np.ndarray:
+        """Row index per id, -1 where unknown."""
+        return np.fromiter((self._row_by_id.get(i, -1) for i in district_ids),
+                           dtype=np.int64, count=len(district_ids))
+
+    def rows_for_state(self, state: str) -> np.ndarray:
+        return self._rows_by_state.get(norm(state), np.empty(0, dtype=np.int64))
+
+    def find(self, name: str, state: str) -> Optional[int]:
+        return self._row_by_name_state.get((norm(name), norm(state)))
+
+    def row_at(self, lat: float, lon: float) -> Optional[int]:
+        """Row of the district geocoded at exactly these coordinates, if any."""
+        return self._row_by_coordinates.get((lat, lon))
+
+    def nearest(self, lat: float, lon: float) -> Optional[int]:
+        """Row of the located district closest to a point (equirectangular distance)."""
+        if not len(self._located):
+            return None
+        dlat = self._located_coordinates[:, 0] - lat
+        dlon = (self._located_coordinates[:, 1] - lon) * np.cos(np.radians(lat))
+        return int(self._located[np.argmin(dlat * dlat + dlon * dlon)])
+
+    def match_name(self, name: str, state: Optional[str] = None) -> Optional[NameMatch]:
+        """
+        Resolve a free-text place name against the local indexes.
+
+        District names are tried first, then district headquarters, then the
+        geocoded towns and cities (mapped to the nearest geocoded district).
+        With a state, candidates in that state are preferred; other states'
+        candidates are only returned when none match.
+
+        Returns:
+            The match, or None when no index knows the name
+        """
+        key = normalize_place(name)
+        if not key:
+            return None
+        for source, index in (("district", self._rows_by_place), ("headquarters", self._rows_by_headquarters)):
+            rows = index.get(key)
+            if rows:
+                if state:
+                    in_state = [r for r in rows if norm(self.state(r)) == norm(state)]
+                    rows = in_state or rows
+                return NameMatch(source, rows, None)
+        coords = self._places.get(key)
+        if coords is not None:
+            row = self.nearest(*coords)
+            if row is not None:
+                return NameMatch("place", [row], coords)
+        return None
+
+    def place_coordinates(self, row: int) -> Optional[Tuple[float, float]]:
+        """
+        Coordinates of a district, falling back to the place index.
+
+        Districts whose name has no exact entry in District-Geocodes.json
+        have (0, 0) in the lat/lon columns; the looser place index often
+        still knows the district or its headquarters town.
+        """
+        if self.lat[row] != 0 or self.lon[row] != 0:
+            return float(self.lat[row]), float(self.lon[row])
+        coords = self._places.get(normalize_place(self.name(row)))
+        if coords is None and self._headquarters_keys[row]:
+            coords = self._places.get(self._headquarters_keys[row])
+        return coords
+
+    def all_rows(self) -> np.ndarray:
+        return np.arange(len(self.ids))
+
+    def state_names(self) -> List[str]:
+        return sorted(self.state_table)
+
+    def name(self, row: int) -> str:
+        return self.name_table[self.name_idx[row]]
+
+    def state(self, row: int) -> str:
+        return self.state_table[self.state_idx[row]]
+
+    def coordinates(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.lat[rows], self.lon[rows]
+
+    # ------------------------------------------------------------------
+    # Serialization edge
+    # ------------------------------------------------------------------
+
+    def record(self, row: int, **overrides: Any) -> Dict[str, Any]:
+        """Plain dict shaped like DistrictMetadata for one row."""
+        record = {
+            "id": self.ids[row],
+            "name": self.name(row),
+            "state": self.state(row),
+            "coordinates": [float(self.lat[row]), float(self.lon[row])],
+            "population": _optional_int(self.population[row]),
+            "area": _optional_int(self.area[row]),
+            "density": _optional_int(self.density[row]),
+            "vulnerability": {
+                "elderlyPopulation": float(self.elderly_pct[row]),
+                "outdoorWorkers": float(self.outdoor_workers_pct[row]),
+                "slumPopulation": float(self.slum_pct[row]),
+            },
+        }
+        record.update(overrides)
+        return record
+
+    def records(self, rows: np.ndarray, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Records for rows, trimmed to fields (in DistrictMetadata order) if given."""
+        if fields is None:
+            return [self.record(int(r)) for r in rows]
+        return [{f: record[f] for f in fields} for record in map(self.record, rows.tolist())]
+
+    def records_json(self, key: str, rows: np.ndarray, fields: Optional[Sequence[str]] = None) -> bytes:
+        """
+        JSON-encoded records for rows, memoized under key.
+
+        The store is immutable, so encoded responses for fixed queries
+        (all districts, one state, optionally trimmed to some fields) can be
+        reused for the store's lifetime. Keys must identify the rows and the
+        fields; callers do not memoize arbitrary pages. Once
+        _JSON_CACHE_MAX_ENTRIES bodies are memoized, further ones are encoded
+        per call.
+        """
+        cached = self._json_cache.get(key)
+        if cached is None:
+            cached = dumps(self.records(rows, fields))
+            if len(self._json_cache) < _JSON_CACHE_MAX_ENTRIES:
+                self._json_cache[key] = cached
+        return cached
+
+    # ------------------------------------------------------------------
+    # Aggregation
+    # ------------------------------------------------------------------
+
+    def aggregate_state_risk(self, rows: np.ndarray, labels: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Population-weighted risk rollup per state in one vectorized pass.
+
+        Args:
+            rows: int array of row indices
+            labels: int array of risk labels (0-3), parallel to rows
+
+        Returns:
+            One dict per state present in rows, sorted by state name
+        """
+        n_states, n_levels = len(self.state_table), len(RISK_LABEL_TO_LEVEL)
+        state = self.state_idx[rows]
+        pop = np.nan_to_num(self.population[rows])
+        pop_at_risk = np.where(labels >= AT_RISK_MIN_LABEL, pop, 0.0)
+
+        def per_state(weights: np.ndarray) -> np.ndarray:
+            return np.bincount(state, weights=weights, minlength=n_states)
+
+        by_level = np.bincount(state * n_levels + labels, weights=pop,
+                               minlength=n_states * n_levels).reshape(n_states, n_levels)
+        district_counts = np.bincount(state, minlength=n_states)
+        population = per_state(pop)
+        population_at_risk = per_state(pop_at_risk)
+        elderly = per_state(pop_at_risk * self.elderly_pct[rows] / 100.0)
+        workers = per_state(pop_at_risk * self.outdoor_workers_pct[rows] / 100.0)
+        slum = per_state(pop_at_risk * self.slum_pct[rows] / 100.0)
+        density = np.nan_to_num(self.density[rows])
+        density_total = per_state(density)
+        density_risk = per_state(density * labels)
+
+        return [
+            {
+                "state": self.state_table[s],
+                "districts": int(district_counts[s]),
+                "population": int(population[s]),
+                "population_by_level": {
+                    RISK_LABEL_TO_LEVEL[lvl]: int(by_level[s, lvl]) for lvl in range(n_levels)
+                },
+                "population_at_risk": int(population_at_risk[s]),
+                "elderly_at_risk": int(round(elderly[s])),
+                "outdoor_workers_at_risk": int(round(workers[s])),
+                "slum_population_at_risk": int(round(slum[s])),
+                "density_weighted_risk": (
+                    round(float(density_risk[s] / density_total[s]), 4) if density_total[s] else 0.0
+                ),
+            }
+            for s in np.nonzero(district_counts)[0]
+        ]
+
+
+# Global store, replaced wholesale by load_district_store()
+DISTRICTS: DistrictStore = DistrictStore.empty()
+
+
+def load_district_store() -> DistrictStore:
+    """Load district data from the JSON files into the global DISTRICTS store."""
+    global DISTRICTS
+
+    if not DISTRICTS_PATH.exists() or not GEO_PATH.exists():
+        logger.warning("District data files not found at %s or %s", DISTRICTS_PATH, GEO_PATH)
+        return DISTRICTS
+
+    try:
+        DISTRICTS = DistrictStore.from_files()
+        logger.info("Loaded %d districts.", len(DISTRICTS))
+    except Exception as e:
+        logger.error("Error loading district data: %s", e)
+    return DISTRICTS
+
+
+def get_store() -> DistrictStore:
+    """Return the current district store."""
+    return DISTRICTS
+
+
+# Load data on module import
+load_district_store()
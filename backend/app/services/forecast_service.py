@@ -0,0 +1,270 @@
+"""
+Forecast Results for HeatGuard API
+
+A scored 5-day forecast only changes when one of its inputs does: the
+OpenWeather forecast (republished on a fixed cycle, and picked up here
+within WEATHER_CACHE_TTL_SECONDS), the model version, or the local date
+(days before today are dropped). next_change() predicts the earliest of
+these, and /forecast/5days turns it into Cache-Control / Expires, so
+browsers and CDNs reuse an answer until it can actually differ.
+
+The ETag is a digest of the same inputs (model artifacts, coordinates,
+date and the upstream forecast itself), so every worker derives the same tag
+for the same forecast and a conditional request can be answered 304 as
+soon as the cached upstream forecast is at hand, before any scoring.
+
+FORECASTS keeps the scored result per location and model artifacts until
+its expiry. With FORECAST_STALE_WHILE_REVALIDATE_SECONDS set, an expired
+result is still served for that long while it is rescored in the
+background, so requests right after an upstream refresh do not wait on
+OpenWeather and the model.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from email.utils import formatdate
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.config import (
+    FORECAST_HTTP_CACHE_ENABLED,
+    FORECAST_REFRESH_INTERVAL_SECONDS,
+    FORECAST_REFRESH_OFFSET_SECONDS,
+    FORECAST_RESULT_CACHE_MAX_ENTRIES,
+    FORECAST_STALE_WHILE_REVALIDATE_SECONDS,
+    WEATHER_CACHE_TTL_SECONDS,
+)
+from app.schemas import ForecastDay
+from app.services import district_store
+from app.services.cache_service import LRUCache
+from app.services.date_utils import compute_day_of_year, compute_month
+from app.services.history_service import HISTORY
+from app.services.model_registry import ModelArtifacts
+from app.services.model_service import artifacts_token, predict_risk_batch
+from app.services.weather_service import extract_daily_max_temps, fetch_openweather_forecast
+from app.utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ForecastResult:
+    """One scored forecast, shared by every request for its location and model version."""
+    city_name: str
+    days: List[ForecastDay]
+    etag: str           # quoted strong validator
+    expires_at: float   # epoch seconds of the next expected change
+
+
+def next_change(now: float) -> float:
+    """
+    Epoch seconds at which a forecast scored at `now` may next differ.
+
+    The next upstream refresh (FORECAST_REFRESH_INTERVAL_SECONDS cycle from
+    FORECAST_REFRESH_OFFSET_SECONDS past midnight UTC) plus the weather cache
+    TTL, or the next local midnight if that comes first.
+    """
+    lag = FORECAST_REFRESH_OFFSET_SECONDS + WEATHER_CACHE_TTL_SECONDS
+    interval = FORECAST_REFRESH_INTERVAL_SECONDS
+    upstream = (math.floor((now - lag) / interval) + 1) * interval + lag
+    midnight = datetime.combine(date.fromtimestamp(now) + timedelta(days=1), dt_time()).timestamp()
+    return min(upstream, midnight)
+
+
+def forecast_etag(artifacts: ModelArtifacts, lat: float, lon: float, payload: Dict[str, Any]) -> str:
+    """Strong ETag of the forecast scored from an upstream payload."""
+    digest = hashlib.blake2b(digest_size=12)
+    # The artifacts token, not the name: a same-name hot reload changes the answers
+    digest.update(f"{artifacts_token(artifacts)}|{lat!r}|{lon!r}|{date.today().isoformat()}|".encode("utf-8"))
+    digest.update(dumps(payload.get("list", [])))
+    return f'"{digest.hexdigest()}"'
+
+
+def matching_tag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """
+    The entity tag of an If-None-Match header that matches etag (weak comparison).
+
+    The compression middleware weakens the ETags of encoded bodies, so the
+    W/ prefix is ignored on both sides. The tag is returned as the client
+    sent it, i.e. as the 200 it is revalidating carried it, so a 304 can
+    repeat the same validator.
+
+    Returns:
+        The matching tag, etag itself for "*", or None when nothing matches
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    opaque = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.removeprefix("W/") == opaque:
+            return tag
+    return None
+
+
+class ForecastResults:
+    """Scored forecasts per (lat, lon, model artifacts), with optional stale-while-revalidate."""
+
+    def __init__(self, enabled: bool = FORECAST_HTTP_CACHE_ENABLED,
+                 max_entries: int = FORECAST_RESULT_CACHE_MAX_ENTRIES,
+                 stale_seconds: float = FORECAST_STALE_WHILE_REVALIDATE_SECONDS):
+        self.enabled = enabled
+        self.stale_seconds = max(stale_seconds, 0.0)
+        # Entries outlive their expiry by the stale window; the LRU drops them after it
+        self._results = LRUCache(max_entries if enabled else 0)
+        self._refreshing: Set[Tuple[float, float, str]] = set()  # (lat, lon, artifacts token)
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.not_modified = 0
+
+    def lookup(self, lat: float, lon: float, artifacts: ModelArtifacts) -> Optional[Tuple[ForecastResult, bool]]:
+        """
+        The cached result and whether it is past its expiry.
+
+        A stale result is rescored in the background (once per key at a time).
+        """
+        if not self.enabled:
+            return None
+        key = (lat, lon, artifacts_token(artifacts))
+        result: Optional[ForecastResult] = self._results.get(key)
+        now = time.time()
+        if result is None or now >= result.expires_at + self.stale_seconds:
+            self.misses += 1
+            return None
+        if now < result.expires_at:
+            self.hits += 1
+            return result, False
+        self.stale_served += 1
+        if key not in self._refreshing:
+            self._refreshing.add(key)
+            task = asyncio.create_task(self._refresh(key, lat, lon, artifacts))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return result, True
+
+    async def _refresh(self, key: Tuple[float, float, str], lat: float, lon: float,
+                       artifacts: ModelArtifacts) -> None:
+        try:
+            await self.compute(lat, lon, artifacts)
+            self.refreshes += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The stale result keeps being served until its window ends
+            self.refresh_errors += 1
+            logger.warning("Background forecast refresh for %s,%s failed: %s", lat, lon, e)
+        finally:
+            self._refreshing.discard(key)
+
+    async def compute(self, lat: float, lon: float, artifacts: ModelArtifacts,
+                      payload: Optional[Dict[str, Any]] = None) -> ForecastResult:
+        """
+        Fetch (unless given), score and cache the forecast for a location.
+
+        Forecasts requested at a district's own coordinates are also
+        recorded in its prediction history.
+
+        Raises:
+            HTTPException(502): If the upstream forecast has no usable days
+        """
+        if payload is None:
+            payload = await fetch_openweather_forecast(lat, lon)
+        now = time.time()
+        etag = forecast_etag(artifacts, lat, lon, payload)
+        city_name = payload.get("city", {}).get("name", "Unknown Location")
+
+        daily_temps = extract_daily_max_temps(payload)
+        if not daily_temps:
+            raise HTTPException(
+                status_code=502,
+                detail="No forecast data available from OpenWeather"
+            )
+
+        features_list = [
+            {
+                "tmax_c": day_data["tmax_c"],
+                "day_of_year": compute_day_of_year(day_data["date"]),
+                "month": compute_month(day_data["date"]),
+                "lat": lat,
+                "lon": lon,
+            }
+            for day_data in daily_temps
+        ]
+        risk_results = predict_risk_batch(features_list, artifacts)
+        days = [
+            ForecastDay(
+                date=day_data["date"],
+                tmax_c=day_data["tmax_c"],
+                humidity=day_data.get("humidity"),
+                risk_label=risk_data["risk_label"],
+                risk_level=risk_data["risk_level"],
+                probabilities=risk_data.get("probabilities"),
+            )
+            for day_data, risk_data in zip(daily_temps, risk_results)
+        ]
+
+        store = district_store.get_store()
+        row = store.row_at(lat, lon)
+        if row is not None:
+            HISTORY.record(
+                [store.ids[row]] * len(days),
+                np.array([day.date for day in days], dtype="datetime64[D]"),
+                np.array([day.tmax_c for day in days]),
+                np.array([day.risk_label for day in days]),
+                np.array([(day.probabilities or {}).get(str(day.risk_label), np.nan) for day in days]),
+                artifacts.version,
+            )
+
+        result = ForecastResult(city_name, days, etag, next_change(now))
+        if self.enabled:
+            self._results.put((lat, lon, artifacts_token(artifacts)), result, result.expires_at + self.stale_seconds)
+        return result
+
+    def cache_headers(self, etag: str, expires_at: float) -> Dict[str, str]:
+        """Cache-Control, Expires and ETag for a forecast valid until expires_at."""
+        if not self.enabled:
+            return {}
+        cache_control = f"public, max-age={max(int(expires_at - time.time()), 0)}"
+        if self.stale_seconds:
+            cache_control += f", stale-while-revalidate={int(self.stale_seconds)}"
+        return {
+            "Cache-Control": cache_control,
+            "Expires": formatdate(expires_at, usegmt=True),
+            "ETag": etag,
+        }
+
+    async def stop(self) -> None:
+        """Cancel background refreshes still running."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._results),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "background_refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "not_modified": self.not_modified,
+            "stale_while_revalidate_s": self.stale_seconds,
+        }
+
+
+FORECASTS = ForecastResults()
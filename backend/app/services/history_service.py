@@ -0,0 +1,550 @@
+"""
+Prediction History Service for HeatGuard API
+
+Append-only, columnar store of forecast-derived district predictions, so
+risk trends ("the last 60 days of Rajasthan") can be read back instead of
+recomputed from forecasts that are long gone.
+
+Layout under HISTORY_DIR, partitioned by the month of the predicted date:
+
+    history/2025-05/<segment>/keys.json      district ids and model versions
+    history/2025-05/<segment>/district.col   int32 code into keys.json districts
+    history/2025-05/<segment>/date.col       int32 days since 1970-01-01
+    ...                                      version, label, tmax, probability, recorded
+
+Each process appends to its own segment (named after its start time and
+pid), so several workers never interleave writes to one file. Column files
+are raw little-endian arrays, read back with np.memmap; a reader takes the
+shortest column's length, so a flush in progress is never half-read.
+
+Records are keyed by (district, date, model version). A prediction identical
+to the last one recorded for its key is skipped, so refresh cycles that
+rescore unchanged forecasts add nothing. A changed prediction is appended,
+and queries keep the most recently recorded record per key. Once all dates
+of a month are past, compact() merges its segments into one holding only
+those latest records, sorted by district.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import HISTORY_DIR, HISTORY_FLUSH_SECONDS, RISK_LABEL_TO_LEVEL
+from app.services import district_store
+from app.services.model_registry import get_project_root
+
+logger = logging.getLogger(__name__)
+
+# Column name -> on-disk dtype, in the order columns are appended
+COLUMNS: Dict[str, str] = {
+    "district": "<i4",
+    "date": "<i4",
+    "version": "<i2",
+    "label": "u1",
+    "tmax": "<f4",
+    "probability": "<f4",
+    "recorded": "<i8",
+}
+
+_EPOCH = date(1970, 1, 1)
+# Segment name of a closed month merged by HistoryStore.compact
+COMPACTED = "compacted"
+
+
+def day_number(d: date) -> int:
+    return (d - _EPOCH).days
+
+
+def day_date(n: int) -> date:
+    return _EPOCH + timedelta(days=n)
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(d: date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+class Segment:
+    """One writer's column files inside one monthly partition."""
+
+    def __init__(self, path: Path, sorted_by_district: bool = False):
+        self.path = path
+        # Compacted segments are written ordered by district code (see HistoryStore.compact)
+        self.sorted_by_district = sorted_by_district
+        self.districts: List[str] = []
+        self.versions: List[str] = []
+        self._district_codes: Dict[str, int] = {}
+        self._version_codes: Dict[str, int] = {}
+        self._keys_written = (0, 0)
+
+    # -- writing -----------------------------------------------------------
+
+    def _codes(self, values: Sequence[str], table: List[str], index: Dict[str, int]) -> np.ndarray:
+        out = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(table)
+                table.append(value)
+            out[i] = code
+        return out
+
+    def append(self, district_ids: Sequence[str], versions: Sequence[str], columns: Dict[str, np.ndarray]) -> None:
+        columns = dict(columns,
+                       district=self._codes(district_ids, self.districts, self._district_codes),
+                       version=self._codes(versions, self.versions, self._version_codes))
+        self.path.mkdir(parents=True, exist_ok=True)
+        # The dictionary goes first, so no reader sees a code it cannot resolve
+        if self._keys_written != (len(self.districts), len(self.versions)):
+            tmp_path = self.path / "keys.json.tmp"
+            tmp_path.write_text(json.dumps({"districts": self.districts, "versions": self.versions,
+                                            "sorted": self.sorted_by_district}))
+            os.replace(tmp_path, self.path / "keys.json")
+            self._keys_written = (len(self.districts), len(self.versions))
+        for name, dtype in COLUMNS.items():
+            with open(self.path / f"{name}.col", "ab") as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+    # -- reading -----------------------------------------------------------
+
+    @staticmethod
+    def read(path: Path) -> Optional[Tuple[Dict[str, List[str]], Dict[str, np.ndarray]]]:
+        """Keys and memory-mapped columns of a segment, or None if it holds no rows."""
+        try:
+            keys = json.loads((path / "keys.json").read_text())
+            sizes = {name: (path / f"{name}.col").stat().st_size // np.dtype(dtype).itemsize
+                     for name, dtype in COLUMNS.items()}
+        except (FileNotFoundError, ValueError):
+            return None
+        n = min(sizes.values())
+        if not n:
+            return None
+        return keys, {
+            name: np.memmap(path / f"{name}.col", dtype=dtype, mode="r", shape=(n,))
+            for name, dtype in COLUMNS.items()
+        }
+
+
+class HistoryStore:
+    """Buffered appender and range reader for the prediction history."""
+
+    def __init__(self, root: Optional[Path], flush_seconds: float = HISTORY_FLUSH_SECONDS):
+        self.root = root
+        self.flush_seconds = flush_seconds
+        self.segment_name = f"{int(time.time())}-{os.getpid()}"
+        self._segments: Dict[str, Segment] = {}
+        # (district id, day number, version) -> (label, tmax) last recorded by this process
+        self._last: Dict[Tuple[str, int, str], Tuple[int, float]] = {}
+        self._buffer: List[Tuple[List[str], List[str], Dict[str, np.ndarray]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._seeded = False
+        self.records_offered = 0
+        self.records_buffered = 0
+        self.records_written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        """Seed the dedup index from disk and start the periodic flush."""
+        if not self.enabled or self._task is not None:
+            return
+        self._seed()
+        if self.flush_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Recording prediction history under %s", self.root)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self.enabled:
+            await asyncio.to_thread(self.flush)
+
+    async def _run(self) -> None:
+        compacted_on = None
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await asyncio.to_thread(self.flush)
+            if compacted_on != date.today():
+                compacted_on = date.today()
+                try:
+                    await asyncio.to_thread(self.compact)
+                except Exception as e:
+                    logger.error("Prediction history compaction failed: %s", e, exc_info=True)
+
+    def _seed(self) -> None:
+        # Forecast days still open to revision, as last recorded by any process
+        if self._seeded:
+            return
+        self._seeded = True
+        start = date.today() - timedelta(days=1)
+        try:
+            records = self.read(None, start, start + timedelta(days=16))
+        except Exception as e:
+            logger.warning("Could not read recent prediction history: %s", e)
+            return
+        ids, versions = records["district_ids"], records["versions"]
+        for k in range(len(records["date"])):
+            key = (ids[records["district"][k]], int(records["date"][k]), versions[records["version"][k]])
+            self._last[key] = (int(records["label"][k]), float(records["tmax"][k]))
+
+    # -- writing -----------------------------------------------------------
+
+    def record(self, district_ids: Sequence[str], dates: np.ndarray, tmax: np.ndarray, labels: np.ndarray,
+               probability: np.ndarray, version: str) -> int:
+        """
+        Buffer district-day predictions, skipping ones already recorded unchanged.
+
+        Args:
+            district_ids: n district ids
+            dates: (n,) datetime64[D] predicted dates
+            tmax, labels, probability: (n,) forecast tmax, label and its probability
+            version: Model version that produced the labels
+
+        Returns:
+            Number of records buffered
+        """
+        if not self.enabled or not len(district_ids):
+            return 0
+        days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+        tmax = np.asarray(tmax, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.uint8)
+        keep = np.zeros(len(days), dtype=bool)
+        with self._lock:
+            for k, (district_id, day, label, t) in enumerate(zip(district_ids, days.tolist(),
+                                                                 labels.tolist(), tmax.tolist())):
+                key = (district_id, day, version)
+                if self._last.get(key) != (label, t):
+                    self._last[key] = (label, t)
+                    keep[k] = True
+            self.records_offered += len(days)
+            idx = np.nonzero(keep)[0]
+            if not len(idx):
+                return 0
+            ids = [district_ids[i] for i in idx.tolist()]
+            self._buffer.append((ids, [version] * len(idx), {
+                "date": days[idx],
+                "label": labels[idx],
+                "tmax": tmax[idx],
+                "probability": np.asarray(probability, dtype=np.float32)[idx],
+                "recorded": np.full(len(idx), int(time.time()), dtype=np.int64),
+            }))
+            self.records_buffered += len(idx)
+        return len(idx)
+
+    def flush(self) -> int:
+        """Append buffered records to their monthly partitions."""
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, []
+                self._prune()
+            if not buffer:
+                return 0
+            ids = [i for b in buffer for i in b[0]]
+            versions = [v for b in buffer for v in b[1]]
+            columns = {name: np.concatenate([b[2][name] for b in buffer]) for name in buffer[0][2]}
+            months = columns["date"].astype("datetime64[D]").astype("datetime64[M]")
+            written = 0
+            try:
+                for month in np.unique(months):
+                    idx = np.nonzero(months == month)[0]
+                    name = str(month)
+                    segment = self._segments.get(name)
+                    if segment is None:
+                        segment = self._segments[name] = Segment(self.root / name / self.segment_name)
+                    segment.append([ids[i] for i in idx.tolist()], [versions[i] for i in idx.tolist()],
+                                   {k: v[idx] for k, v in columns.items()})
+                    written += len(idx)
+            except OSError as e:
+                self.flush_errors += 1
+                logger.error("Prediction history flush failed after %d of %d records: %s",
+                             written, len(ids), e)
+            self.records_written += written
+            self.flushes += 1
+            return written
+
+    def _prune(self) -> None:
+        # Past days are never predicted again
+        oldest = day_number(date.today()) - 1
+        for key in [k for k in self._last if k[1] < oldest]:
+            del self._last[key]
+
+    def compact(self, today: Optional[date] = None) -> int:
+        """
+        Merge each closed month into one segment sorted by district.
+
+        A month is closed once all its dates are past, so no process appends
+        to it any more. Superseded records are dropped (the latest per
+        district, date and version is kept), and district queries then
+        binary-search the sorted segment instead of scanning it. The merged
+        segment is renamed into place before the segments it replaces are
+        deleted, so readers see every record throughout.
+
+        Returns:
+            Number of partitions compacted
+        """
+        if not self.enabled or not self.root.is_dir():
+            return 0
+        cutoff = (today or date.today()) - timedelta(days=1)
+        compacted = 0
+        for partition in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            try:
+                month = date(int(partition.name[:4]), int(partition.name[5:7]), 1)
+            except ValueError:
+                continue
+            segments = _segment_dirs(partition)
+            if _next_month(month) > cutoff or [p.name for p in segments] in ([], [COMPACTED]):
+                continue
+
+            records = self._read_paths(segments, None, day_number(month),
+                                       day_number(_next_month(month)) - 1, None, per_version=True)
+            tmp_path = partition / f"{COMPACTED}.tmp-{self.segment_name}"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            merged = Segment(tmp_path, sorted_by_district=True)
+            ids, versions = records["district_ids"], records["versions"]
+            merged.append([ids[i] for i in records["district"].tolist()],
+                          [versions[i] for i in records["version"].tolist()],
+                          {name: records[name] for name in ("date", "label", "tmax", "probability", "recorded")})
+
+            target = partition / COMPACTED
+            replaced = [p for p in segments if p.name != COMPACTED]
+            if target.exists():
+                old_path = partition / f"{COMPACTED}.old-{self.segment_name}"
+                os.rename(target, old_path)
+                replaced.append(old_path)
+            os.rename(tmp_path, target)
+            for path in replaced:
+                shutil.rmtree(path, ignore_errors=True)
+            self._segments.pop(partition.name, None)
+            compacted += 1
+            logger.info("Compacted prediction history %s: %d segments into %d rows",
+                        partition.name, len(segments), len(records["date"]))
+        return compacted
+
+    # -- reading -----------------------------------------------------------
+
+    def _segment_paths(self, start: date, end: date) -> Iterator[Path]:
+        month = _month_start(start)
+        while month <= end:
+            partition = self.root / partition_name(month)
+            if partition.is_dir():
+                yield from _segment_dirs(partition)
+            month = _next_month(month)
+
+    def read(self, district_ids: Optional[Sequence[str]], start: date, end: date,
+             version: Optional[str] = None, per_version: bool = False) -> Dict[str, Any]:
+        """
+        The latest record per (district, date[, version]) in a date range.
+
+        Only the monthly partitions overlapping [start, end] are opened, and
+        only rows of the requested districts are copied out of them. Buffered
+        records are flushed first, so a read sees everything recorded so far.
+
+        Args:
+            district_ids: Districts to read (None: every recorded district)
+            start, end: Inclusive date range
+            version: Only this model version (default: the latest record of
+                any version per district-day)
+            per_version: Keep the latest record of every version instead
+
+        Returns:
+            Dict of column arrays ("district" and "version" index into the
+            returned "district_ids" / "versions" lists), sorted by district
+            then date
+        """
+        self.flush()
+        return self._read_paths(list(self._segment_paths(start, end)), district_ids,
+                                day_number(start), day_number(end), version, per_version)
+
+    def _read_paths(self, paths: List[Path], district_ids: Optional[Sequence[str]], first: int, last: int,
+                    version: Optional[str], per_version: bool) -> Dict[str, Any]:
+        wanted: Optional[Dict[str, int]] = (
+            {d: i for i, d in enumerate(dict.fromkeys(district_ids))} if district_ids is not None else None
+        )
+        out_ids: List[str] = list(wanted) if wanted is not None else []
+        out_id_codes: Dict[str, int] = dict(wanted) if wanted is not None else {}
+        out_versions: List[str] = []
+        parts: List[Dict[str, np.ndarray]] = []
+
+        for path in paths:
+            segment = Segment.read(path)
+            if segment is None:
+                continue
+            keys, columns = segment
+            if wanted is None:
+                for d in keys["districts"]:
+                    out_id_codes.setdefault(d, len(out_id_codes))
+                out_ids = list(out_id_codes)
+            district_map = np.array([out_id_codes.get(d, -1) for d in keys["districts"]], dtype=np.int64)
+            version_map = np.full(len(keys["versions"]), -1, dtype=np.int64)
+            for i, v in enumerate(keys["versions"]):
+                if version is None or v == version:
+                    if v not in out_versions:
+                        out_versions.append(v)
+                    version_map[i] = out_versions.index(v)
+
+            days = columns["date"]
+            if wanted is not None and keys.get("sorted"):
+                # Binary search for each district's run instead of scanning the segment
+                codes = np.nonzero(district_map >= 0)[0]
+                lo = np.searchsorted(columns["district"], codes, side="left")
+                hi = np.searchsorted(columns["district"], codes, side="right")
+                idx = np.concatenate([np.arange(a, b) for a, b in zip(lo.tolist(), hi.tolist())] or [[]])
+                idx = idx.astype(np.int64)
+                idx = idx[(days[idx] >= first) & (days[idx] <= last)]
+            else:
+                idx = np.nonzero((days >= first) & (days <= last))[0]
+            if not len(idx):
+                continue
+            district = district_map[columns["district"][idx]]
+            version_code = version_map[columns["version"][idx]]
+            keep = (district >= 0) & (version_code >= 0)
+            idx = idx[keep]
+            parts.append({
+                "district": district[keep],
+                "date": np.asarray(days[idx]),
+                "version": version_code[keep],
+                "label": np.asarray(columns["label"][idx]),
+                "tmax": np.asarray(columns["tmax"][idx]),
+                "probability": np.asarray(columns["probability"][idx]),
+                "recorded": np.asarray(columns["recorded"][idx]),
+            })
+
+        result = {name: np.concatenate([p[name] for p in parts]) if parts else np.empty(0, dtype=dtype)
+                  for name, dtype in COLUMNS.items()}
+        result = _latest(result, per_version)
+        result["district_ids"] = out_ids
+        result["versions"] = out_versions
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        partitions, rows, size = 0, 0, 0
+        if self.enabled and self.root.is_dir():
+            for partition in self.root.iterdir():
+                if not partition.is_dir():
+                    continue
+                partitions += 1
+                for segment in partition.iterdir():
+                    for name, dtype in COLUMNS.items():
+                        column = segment / f"{name}.col"
+                        if column.exists():
+                            size += column.stat().st_size
+                            if name == "date":
+                                rows += column.stat().st_size // np.dtype(dtype).itemsize
+        return {
+            "enabled": self.enabled,
+            "path": str(self.root) if self.enabled else None,
+            "partitions": partitions,
+            "rows_on_disk": rows,
+            "bytes_on_disk": size,
+            "records_offered": self.records_offered,
+            "records_buffered": self.records_buffered,
+            "records_written": self.records_written,
+            "records_pending": sum(len(b[0]) for b in self._buffer),
+            "dedup_ratio": round(1 - self.records_buffered / self.records_offered, 4) if self.records_offered else None,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
+
+
+def _segment_dirs(partition: Path) -> List[Path]:
+    # Names with a dot are compactions in progress or being replaced
+    return sorted(p for p in partition.iterdir() if p.is_dir() and "." not in p.name)
+
+
+def _latest(columns: Dict[str, np.ndarray], per_version: bool = False) -> Dict[str, np.ndarray]:
+    """Keep the last-recorded row per (district, date[, version]), sorted by district then date."""
+    n = len(columns["date"])
+    if not n:
+        return columns
+    # Within a key, order by recorded time, then by read order for records of
+    # the same second; later segments may hold older records
+    keys = [columns["date"], columns["district"]]
+    if per_version:
+        keys.insert(0, columns["version"])
+    order = np.lexsort([np.arange(n), columns["recorded"]] + keys)
+    last = np.ones(n, dtype=bool)
+    changed = np.zeros(n - 1, dtype=bool)
+    for key in keys:
+        sorted_key = key[order]
+        changed |= sorted_key[1:] != sorted_key[:-1]
+    last[:-1] = changed
+    keep = order[last]
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def state_daily(records: Dict[str, Any], start: date, end: date) -> List[Dict[str, Any]]:
+    """
+    Per-day rollup of district records: counts per level, mean/max label and
+    tmax, and the population of districts at Orange or above.
+    """
+    store = district_store.get_store()
+    n_days = day_number(end) - day_number(start) + 1
+    n_levels = len(RISK_LABEL_TO_LEVEL)
+    d = (records["date"] - day_number(start)).astype(np.int64)
+    labels = records["label"].astype(np.int64)
+    tmax = records["tmax"].astype(np.float64)
+    rows = store.rows_for_ids(records["district_ids"])[records["district"]]
+    population = np.where(rows >= 0, np.nan_to_num(store.population[np.maximum(rows, 0)]), 0.0)
+
+    count = np.bincount(d, minlength=n_days)
+    by_level = np.bincount(d * n_levels + labels, minlength=n_days * n_levels).reshape(n_days, n_levels)
+    label_sum = np.bincount(d, weights=labels, minlength=n_days)
+    tmax_sum = np.bincount(d, weights=tmax, minlength=n_days)
+    at_risk = np.bincount(d, weights=population * (labels >= 2), minlength=n_days)
+    max_label = np.full(n_days, -1, dtype=np.int64)
+    np.maximum.at(max_label, d, labels)
+    max_tmax = np.full(n_days, -np.inf)
+    np.maximum.at(max_tmax, d, tmax)
+
+    days = []
+    for i in np.nonzero(count)[0].tolist():
+        days.append({
+            "date": start + timedelta(days=i),
+            "districts_reported": int(count[i]),
+            "districts_by_level": {RISK_LABEL_TO_LEVEL[k]: int(by_level[i, k]) for k in range(n_levels)},
+            "mean_risk_label": round(float(label_sum[i] / count[i]), 3),
+            "max_risk_label": int(max_label[i]),
+            "population_at_risk": int(at_risk[i]),
+            "mean_tmax_c": round(float(tmax_sum[i] / count[i]), 2),
+            "max_tmax_c": round(float(max_tmax[i]), 2),
+        })
+    return days
+
+
+def _history_root() -> Optional[Path]:
+    if not HISTORY_DIR:
+        return None
+    path = Path(HISTORY_DIR)
+    return path if path.is_absolute() else get_project_root() / path
+
+
+HISTORY = HistoryStore(_history_root())
@@ -0,0 +1,110 @@
+"""
+Horizon Service for HeatGuard API
+
+Scores districts x dates x tmax-scenario cross products without
+materializing the full feature matrix.
+"""
+
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import INFERENCE_CHUNK_SIZE
+from app.services import model_service
+from app.services.date_utils import compute_date_features_array
+from app.services.model_registry import ModelArtifacts
+
+logger = logging.getLogger(__name__)
+
+
+def iter_horizon_chunks(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    dates: np.ndarray,
+    tmax: np.ndarray,
+    feature_columns: List[str],
+    chunk_size: int = INFERENCE_CHUNK_SIZE,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Lazily expand the districts x dates x scenarios cross product into feature blocks.
+
+    The flat cell index k maps to (district, date, scenario) in C order,
+    i.e. k = (i * n_dates + j) * n_scenarios + s, so each block can be written
+    straight into a dense (n_districts, n_dates, n_scenarios) result.
+
+    Args:
+        lats: (n_districts,) latitudes
+        lons: (n_districts,) longitudes
+        dates: (n_dates,) datetime64[D] array
+        tmax: (n_scenarios, n_dates) tmax in Celsius
+        feature_columns: Column order expected by the model
+        chunk_size: Maximum rows per yielded block
+
+    Yields:
+        (start, X) where X is the raw feature matrix for flat cells
+        [start, start + len(X)) with columns in feature_columns order
+    """
+    n_districts, n_dates, n_scenarios = len(lats), len(dates), tmax.shape[0]
+    day_of_year, month = compute_date_features_array(dates)
+    total = n_districts * n_dates * n_scenarios
+
+    for start in range(0, total, chunk_size):
+        k = np.arange(start, min(start + chunk_size, total), dtype=np.int64)
+        district_idx, rem = np.divmod(k, n_dates * n_scenarios)
+        date_idx, scenario_idx = np.divmod(rem, n_scenarios)
+
+        columns: Dict[str, np.ndarray] = {
+            "tmax_c": tmax[scenario_idx, date_idx],
+            "day_of_year": day_of_year[date_idx],
+            "month": month[date_idx],
+            "lat": lats[district_idx],
+            "lon": lons[district_idx],
+        }
+        yield start, np.column_stack(
+            [columns[c] for c in feature_columns]
+        ).astype(np.float64)
+
+
+def score_horizon(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    dates: np.ndarray,
+    tmax: np.ndarray,
+    with_probabilities: bool = False,
+    chunk_size: Optional[int] = None,
+    artifacts: Optional[ModelArtifacts] = None,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Score a districts x dates x scenarios cross product in bounded-memory chunks.
+
+    Args:
+        lats, lons: (n_districts,) coordinates
+        dates: (n_dates,) datetime64[D] array
+        tmax: (n_scenarios, n_dates) tmax in Celsius
+        with_probabilities: Also return the probability of each assigned label
+        chunk_size: Maximum rows per model call (default: INFERENCE_CHUNK_SIZE)
+        artifacts: Model version to use (default: the active version)
+
+    Returns:
+        Tuple of (labels, probabilities): uint8 and float32 arrays of shape
+        (n_districts, n_dates, n_scenarios); probabilities is None unless requested
+    """
+    artifacts = artifacts or model_service.get_artifacts()
+    shape = (len(lats), len(dates), tmax.shape[0])
+    labels = np.empty(shape, dtype=np.uint8)
+    probabilities = np.empty(shape, dtype=np.float32) if with_probabilities else None
+    flat_labels = labels.reshape(-1)
+    flat_probabilities = probabilities.reshape(-1) if probabilities is not None else None
+
+    for start, X in iter_horizon_chunks(lats, lons, dates, tmax, artifacts.feature_columns,
+                                        chunk_size or INFERENCE_CHUNK_SIZE):
+        proba = model_service.predict_proba_matrix(X, chunk_size=len(X), artifacts=artifacts)
+        chunk_labels = proba.argmax(axis=1)
+        end = start + len(X)
+        flat_labels[start:end] = chunk_labels
+        if flat_probabilities is not None:
+            flat_probabilities[start:end] = proba[np.arange(len(X)), chunk_labels]
+
+    logger.info("Scored horizon of %d districts x %d dates x %d scenarios", *shape)
+    return labels, probabilities
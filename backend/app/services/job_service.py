@@ -0,0 +1,329 @@
+"""
+Job Service for HeatGuard API
+
+Runs large offline scoring jobs over uploaded CSV or Parquet files on a
+process pool. Each job lives in its own directory under JOBS_DIR:
+
+    <job_id>/job.json            state, progress and output part index
+    <job_id>/input.<fmt>         the uploaded file
+    <job_id>/output/part-NNNNN.<fmt>
+    <job_id>/cancel              present once cancellation was requested
+
+Workers stream the input in JOB_BATCH_ROWS batches and commit one output
+part per batch (part file first, then job.json), so memory stays bounded
+and an interrupted job resumes from its last committed part when the
+server starts again.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from app.config import JOB_BATCH_ROWS, JOB_MAX_ATTEMPTS, JOB_WORKERS, JOBS_DIR
+from app.services.model_registry import ModelArtifacts, get_project_root
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class JobStore:
+    """Job directories and their job.json records on local disk."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def job_dir(self, job_id: str) -> Path:
+        if not _JOB_ID.match(job_id):
+            raise KeyError(job_id)
+        return self.root / job_id
+
+    def input_path(self, job: Dict[str, Any]) -> Path:
+        return self.root / job["id"] / f"input.{job['format']}"
+
+    def part_path(self, job: Dict[str, Any], index: int) -> Path:
+        return self.root / job["id"] / "output" / f"part-{index:05d}.{job['format']}"
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return (self.root / job_id / "cancel").exists()
+
+    def request_cancel(self, job_id: str) -> None:
+        (self.job_dir(job_id) / "cancel").touch()
+
+    def create(self, fmt: str, filename: Optional[str], model_version: str, batch_rows: int) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        (self.root / job_id / "output").mkdir(parents=True)
+        now = time.time()
+        return {
+            "id": job_id,
+            "state": QUEUED,
+            "format": fmt,
+            "filename": filename,
+            "model_version": model_version,
+            "batch_rows": batch_rows,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "attempts": 0,
+            "rows_total": None,
+            "rows_processed": 0,
+            "parts": [],
+            "error": None,
+        }
+
+    def read(self, job_id: str) -> Dict[str, Any]:
+        """Raises KeyError if the job does not exist."""
+        try:
+            with open(self.job_dir(job_id) / "job.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(job_id)
+
+    def write(self, job: Dict[str, Any]) -> None:
+        """Atomically replace job.json."""
+        job["updated_at"] = time.time()
+        path = self.root / job["id"] / "job.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.root.is_dir():
+            return []
+        jobs = []
+        for entry in self.root.iterdir():
+            if entry.is_dir() and _JOB_ID.match(entry.name):
+                try:
+                    jobs.append(self.read(entry.name))
+                except (KeyError, ValueError):
+                    continue
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def delete(self, job_id: str) -> None:
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+# -- worker process ----------------------------------------------------------
+
+# Artifacts loaded by this worker process, by version
+_WORKER_ARTIFACTS: Dict[str, ModelArtifacts] = {}
+
+
+def _worker_artifacts(version: str) -> ModelArtifacts:
+    from app.services.model_registry import load_version
+
+    artifacts = _WORKER_ARTIFACTS.get(version)
+    if artifacts is None:
+        artifacts = _WORKER_ARTIFACTS[version] = load_version(version)
+    return artifacts
+
+
+def run_job(root: str, job_id: str) -> str:
+    """
+    Process one job to completion, resuming after its last committed part.
+
+    Runs inside a pool worker process.
+
+    Returns:
+        The job's final state
+    """
+    from app.services import tabular_service
+
+    store = JobStore(Path(root))
+    job = store.read(job_id)
+    if job["state"] in TERMINAL_STATES:
+        return job["state"]
+
+    job["state"] = RUNNING
+    job["started_at"] = job["started_at"] or time.time()
+    store.write(job)
+
+    try:
+        artifacts = _worker_artifacts(job["model_version"])
+        input_path = str(store.input_path(job))
+        if job["rows_total"] is None:
+            job["rows_total"] = tabular_service.count_rows(input_path, job["format"])
+            store.write(job)
+
+        start = len(job["parts"])
+        frames = tabular_service.iter_frames(input_path, job["format"], job["batch_rows"], skip_batches=start)
+        for index, frame in enumerate(frames, start=start):
+            if store.cancel_requested(job_id):
+                job["state"] = CANCELLED
+                break
+            scored = tabular_service.score_frame(frame, artifacts, shadow=False)
+
+            part_path = store.part_path(job, index)
+            tmp_path = part_path.with_name(part_path.name + ".tmp")
+            tabular_service.write_frame(scored, str(tmp_path), job["format"])
+            os.replace(tmp_path, part_path)
+
+            job["parts"].append({"index": index, "rows": len(scored), "bytes": part_path.stat().st_size})
+            job["rows_processed"] += len(scored)
+            store.write(job)
+        else:
+            job["state"] = COMPLETED
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        job["state"] = FAILED
+        job["error"] = f"Batch {len(job['parts'])}: {e}"
+    except Exception as e:
+        job["state"] = FAILED
+        job["error"] = f"Batch {len(job['parts'])}: unexpected error: {e}"
+
+    job["finished_at"] = time.time()
+    store.write(job)
+    return job["state"]
+
+
+# -- server side -------------------------------------------------------------
+
+class JobManager:
+    """Dispatches stored jobs to a process pool and recovers them on startup."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that holds uvicorn, asyncio and OpenMP threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def start(self) -> None:
+        """Re-dispatch jobs that were queued or running when the server stopped."""
+        self.store.root.mkdir(parents=True, exist_ok=True)
+        recovered = [job for job in self.store.list() if job["state"] in (QUEUED, RUNNING)]
+        for job in recovered:
+            self._dispatch(job)
+        if recovered:
+            logger.info("Resumed %d unfinished scoring job(s)", len(recovered))
+
+    def submit(self, upload: BinaryIO, fmt: str, filename: Optional[str], artifacts: ModelArtifacts,
+               batch_rows: int = JOB_BATCH_ROWS) -> Dict[str, Any]:
+        """
+        Store an uploaded file as a new job and queue it.
+
+        Args:
+            upload: Binary file object positioned at the start of the upload
+            fmt: "csv" or "parquet"
+            filename: Original file name, for display only
+            artifacts: Model version the job is pinned to
+            batch_rows: Rows per processed batch and output part
+        """
+        job = self.store.create(fmt, filename, artifacts.version, batch_rows)
+        with open(self.store.input_path(job), "wb") as f:
+            shutil.copyfileobj(upload, f, 1 << 20)
+        self._dispatch(job)
+        return job
+
+    def _dispatch(self, job: Dict[str, Any]) -> None:
+        job["attempts"] += 1
+        self.store.write(job)
+        with self._lock:
+            future = self._get_pool().submit(run_job, str(self.store.root), job["id"])
+            self._futures[job["id"]] = future
+        future.add_done_callback(lambda f, job_id=job["id"]: self._on_done(job_id, f))
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(job_id) is future:
+                del self._futures[job_id]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            return
+
+        try:
+            job = self.store.read(job_id)
+        except KeyError:
+            return
+        if isinstance(error, BrokenProcessPool):
+            # A worker died (OOM kill, segfault); the pool is unusable from here on
+            with self._lock:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+            if job["attempts"] < self.max_attempts and job["state"] not in TERMINAL_STATES:
+                logger.warning("Scoring job %s lost its worker; retrying", job_id)
+                self._dispatch(job)
+                return
+        logger.error("Scoring job %s failed: %s", job_id, error)
+        job["state"] = FAILED
+        job["error"] = f"Worker failed: {error}"
+        job["finished_at"] = time.time()
+        self.store.write(job)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Raises KeyError if the job does not exist."""
+        return self.store.read(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return self.store.list()
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a job. Queued jobs stop immediately; running jobs stop before
+        their next batch. Finished jobs are returned unchanged.
+        """
+        job = self.store.read(job_id)
+        if job["state"] in TERMINAL_STATES:
+            return job
+        self.store.request_cancel(job_id)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            job = self.store.read(job_id)
+            job["state"] = CANCELLED
+            job["finished_at"] = time.time()
+            self.store.write(job)
+        return job
+
+    def delete(self, job_id: str) -> None:
+        """Cancel a job if needed and remove its files."""
+        self.cancel(job_id)
+        self.store.delete(job_id)
+
+    def shutdown(self) -> None:
+        """Stop the workers without waiting; unfinished jobs resume on next start."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._futures.clear()
+        if pool is None:
+            return
+        # Terminate rather than join: a running job may have hours left, and
+        # everything it committed so far is already on disk
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+
+def _jobs_root() -> Path:
+    path = Path(JOBS_DIR)
+    return path if path.is_absolute() else get_project_root() / path
+
+
+JOBS = JobManager(JobStore(_jobs_root()))
@@ -0,0 +1,278 @@
+"""
+Model Compression for HeatGuard API
+
+Builds the "lite" model variant: a pruned copy of the XGBoost ensemble that
+keeps only the first boosting rounds and rescales their leaf values so the
+truncated ensemble's class probabilities track the full model's.
+
+Boosting rounds are added in order of decreasing marginal value, so the
+leading rounds already fix the argmax almost everywhere; what the later
+rounds mostly do is sharpen the margins. A single leaf-value factor restores
+that sharpness, which keeps probability drift small at a fraction of the
+trees. The result is a plain XGBClassifier that loads through the normal
+registry path.
+
+Agreement alone is not enough to accept a candidate: a truncated ensemble
+errs towards the lower classes, and a missed Orange/Red day is what the
+alerts exist to catch. A candidate is therefore also rejected if it puts
+any calibration row that the full model rates ALERT_MIN_LABEL or above
+into a lower class (max_alert_downgrades).
+"""
+
+import copy
+import json
+import logging
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from app.config import ALERT_MIN_LABEL
+
+logger = logging.getLogger(__name__)
+
+# Round counts tried, smallest first, when searching for the lite variant
+CANDIDATE_ROUNDS = (5, 10, 15, 20, 30, 40, 60, 80, 100, 150, 200)
+
+
+def sample_inputs(feature_columns: List[str], n: int = 20000, seed: int = 0) -> pd.DataFrame:
+    """
+    Draw a representative raw feature sample for calibration and evaluation.
+
+    Locations are real district coordinates, dates span one year and tmax
+    covers the 15-50 C range the API sees in practice.
+    """
+    from app.services.district_store import get_store
+
+    rng = np.random.default_rng(seed)
+    store = get_store()
+    lats, lons = store.coordinates(store.all_rows())
+    known = (lats != 0) | (lons != 0)
+    lats, lons = lats[known], lons[known]
+    picks = rng.integers(0, len(lats), n)
+
+    offsets = rng.integers(0, 365, n)
+    days = [date(2024, 1, 1) + timedelta(days=int(o)) for o in offsets]
+    columns = {
+        "tmax_c": rng.uniform(15.0, 50.0, n),
+        "day_of_year": np.array([d.timetuple().tm_yday for d in days], dtype=np.float64),
+        "month": np.array([d.month for d in days], dtype=np.float64),
+        "lat": lats[picks].astype(np.float64),
+        "lon": lons[picks].astype(np.float64),
+    }
+    return pd.DataFrame({c: columns[c] for c in feature_columns})
+
+
+def _scale_leaves(booster: xgb.Booster, factor: float) -> xgb.Booster:
+    """Return a copy of booster with every leaf value multiplied by factor."""
+    model = json.loads(booster.save_raw("json"))
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        left = tree["left_children"]
+        for field in ("split_conditions", "base_weights"):
+            values = tree[field]
+            for node, child in enumerate(left):
+                if child == -1:
+                    values[node] *= factor
+    scaled = xgb.Booster()
+    scaled.load_model(bytearray(json.dumps(model).encode()))
+    return scaled
+
+
+def _softmax(margins: np.ndarray) -> np.ndarray:
+    z = margins - margins.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _drift(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Per-row total-variation distance between two class distributions."""
+    return 0.5 * np.abs(a - b).sum(axis=1)
+
+
+def _fit_leaf_factor(base_margin: np.ndarray, margins: np.ndarray, reference: np.ndarray,
+                     max_factor: float) -> Tuple[float, float]:
+    """
+    Find the leaf-value factor that minimises mean drift from reference.
+
+    Scaling leaves by t turns margins m into b + t * (m - b), where b is the
+    per-class base margin, so the search runs on cached margins.
+    """
+    leaf_sum = margins - base_margin
+    best = (1.0, float(_drift(_softmax(margins), reference).mean()))
+    for factor in np.geomspace(1.0, max(max_factor, 1.0 + 1e-6), 160):
+        drift = float(_drift(_softmax(base_margin + factor * leaf_sum), reference).mean())
+        if drift < best[1]:
+            best = (float(factor), drift)
+    return best
+
+
+def _with_booster(model: Any, booster: xgb.Booster, n_rounds: int) -> Any:
+    lite = copy.deepcopy(model)
+    lite._Booster = booster
+    lite.set_params(n_estimators=n_rounds)
+    return lite
+
+
+def _alert_downgrades(reference_labels: np.ndarray, labels: np.ndarray, alert_min_label: int) -> int:
+    """Rows the reference rates alert_min_label or above that labels put in a lower class."""
+    return int(((reference_labels >= alert_min_label) & (labels < reference_labels)).sum())
+
+
+def compress_model(model: Any, scaler: Any, X: pd.DataFrame, min_agreement: float = 0.999,
+                   max_drift: float = 0.005, max_alert_downgrades: int = 0,
+                   alert_min_label: int = ALERT_MIN_LABEL,
+                   candidate_rounds: Sequence[int] = CANDIDATE_ROUNDS) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build the smallest pruned ensemble that matches the full model closely enough.
+
+    Args:
+        model: Fitted XGBClassifier
+        scaler: Fitted scaler used in front of the model
+        X: Raw calibration features (see sample_inputs)
+        min_agreement: Required share of rows with the same risk label
+        max_drift: Allowed mean total-variation distance of probabilities
+        max_alert_downgrades: Allowed rows the full model rates alert_min_label
+            or above that the candidate puts in a lower class
+        alert_min_label: Lowest label that raises an alert
+        candidate_rounds: Round counts to try, smallest first
+
+    Returns:
+        Tuple of (lite XGBClassifier, build info); the full model is returned
+        unchanged if no candidate meets all targets
+    """
+    booster = model.get_booster()
+    total_rounds = booster.num_boosted_rounds()
+    dmatrix = xgb.DMatrix(scaler.transform(X))
+    reference = booster.predict(dmatrix)
+    reference_labels = reference.argmax(axis=1)
+
+    for n_rounds in candidate_rounds:
+        if n_rounds >= total_rounds:
+            break
+        pruned = booster[:n_rounds]
+        margins = pruned.predict(dmatrix, output_margin=True)
+        base_margin = _scale_leaves(pruned, 0.0).predict(dmatrix, output_margin=True)
+        # The kept rounds cannot stand in for more than the whole ensemble
+        factor, _ = _fit_leaf_factor(base_margin, margins, reference, total_rounds / n_rounds)
+
+        lite_booster = _scale_leaves(pruned, factor)
+        proba = lite_booster.predict(dmatrix)
+        labels = proba.argmax(axis=1)
+        agreement = float((labels == reference_labels).mean())
+        drift = float(_drift(proba, reference).mean())
+        downgrades = _alert_downgrades(reference_labels, labels, alert_min_label)
+        logger.info(
+            "Pruned to %d rounds (leaf factor %.2f): agreement %.5f, mean drift %.5f, "
+            "alert downgrades %d",
+            n_rounds, factor, agreement, drift, downgrades,
+        )
+        if agreement >= min_agreement and drift <= max_drift and downgrades <= max_alert_downgrades:
+            info = {
+                "rounds": n_rounds,
+                "full_rounds": total_rounds,
+                "leaf_factor": round(factor, 4),
+                "calibration_rows": len(X),
+                "calibration_agreement": round(agreement, 6),
+                "calibration_mean_drift": round(drift, 6),
+                "calibration_alert_downgrades": downgrades,
+            }
+            return _with_booster(model, lite_booster, n_rounds), info
+
+    logger.warning("No pruned ensemble met the targets; keeping all %d rounds", total_rounds)
+    return model, {"rounds": total_rounds, "full_rounds": total_rounds, "leaf_factor": 1.0,
+                   "calibration_rows": len(X)}
+
+
+def compare_models(full: Any, lite: Any, scaler: Any, X: pd.DataFrame,
+                   alert_min_label: int = ALERT_MIN_LABEL) -> Dict[str, Any]:
+    """
+    Agreement and probability drift of lite against full on raw features X.
+
+    Disagreements are split by direction: "under_predicted" rows got a lower
+    label from lite than from full, "over_predicted" a higher one, and
+    "alert_under_predicted" counts the under-predicted rows the full model
+    rates alert_min_label or above. "disagreements" maps "full->lite" label
+    pairs to their row counts.
+    """
+    X_scaled = scaler.transform(X)
+    full_proba = full.predict_proba(X_scaled)
+    lite_proba = lite.predict_proba(X_scaled)
+    full_labels = full_proba.argmax(axis=1)
+    lite_labels = lite_proba.argmax(axis=1)
+    drift = _drift(full_proba, lite_proba)
+    n_classes = full_proba.shape[1]
+
+    per_class = {}
+    per_class_under = {}
+    for label in range(n_classes):
+        mask = full_labels == label
+        if mask.any():
+            per_class[str(label)] = round(float((lite_labels[mask] == label).mean()), 6)
+            per_class_under[str(label)] = round(float((lite_labels[mask] < label).mean()), 6)
+    disagree = full_labels != lite_labels
+    confusion = np.bincount(full_labels * n_classes + lite_labels,
+                            minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+    return {
+        "rows": len(X),
+        "label_agreement": round(float((~disagree).mean()), 6),
+        "per_class_agreement": per_class,
+        "per_class_under_prediction": per_class_under,
+        "under_predicted": int((lite_labels < full_labels).sum()),
+        "over_predicted": int((lite_labels > full_labels).sum()),
+        "alert_under_predicted": _alert_downgrades(full_labels, lite_labels, alert_min_label),
+        "disagreements": {
+            f"{a}->{b}": int(confusion[a, b])
+            for a in range(n_classes) for b in range(n_classes)
+            if a != b and confusion[a, b]
+        },
+        "max_label_distance": int(np.abs(full_labels - lite_labels).max()) if len(X) else 0,
+        "mean_probability_drift": round(float(drift.mean()), 6),
+        "p99_probability_drift": round(float(np.percentile(drift, 99)), 6),
+        "max_probability_drift": round(float(drift.max()), 6),
+        "confusion": confusion.tolist(),
+    }
+
+
+def measure_latency(model: Any, scaler: Any, X: pd.DataFrame, batch_sizes: Sequence[int],
+                    repeats: int = 20, threads: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Time scaler + predict_proba the way model_service runs it.
+
+    Args:
+        model: XGBClassifier to time
+        scaler: Fitted scaler
+        X: Raw feature pool; batches are taken from its head
+        batch_sizes: Batch sizes to time
+        repeats: Timed calls per batch size (the fastest half is averaged)
+        threads: XGBoost thread count (None keeps the model's setting)
+
+    Returns:
+        Mapping of batch size to batch and per-row latency in microseconds
+    """
+    if threads is not None:
+        model = copy.deepcopy(model)
+        model.set_params(n_jobs=threads)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for batch_size in batch_sizes:
+        batch = X.iloc[:batch_size]
+        model.predict_proba(scaler.transform(batch))  # warm
+        timings = []
+        for _ in range(max(repeats, 2)):
+            started = time.perf_counter()
+            model.predict_proba(scaler.transform(batch))
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        best = float(np.mean(timings[: max(1, len(timings) // 2)]))
+        results[str(batch_size)] = {
+            "batch_us": round(best * 1e6, 1),
+            "per_row_us": round(best * 1e6 / len(batch), 3),
+        }
+    return results
+
+
+def tree_count(model: Any) -> int:
+    return len(model.get_booster().get_dump())
@@ -0,0 +1,388 @@
+"""
+Model Registry for HeatGuard API
+
+Discovers versioned model artifacts under models/, loads and warms new
+versions in the background and swaps the active version atomically.
+
+Layout:
+    models/heatguard_xgb_model.joblib          -> version "base"
+    models/<version>/heatguard_xgb_model.joblib -> version "<version>"
+
+A version directory may omit the scaler or feature-columns file, in which
+case the base files are used. Readers take one reference to an immutable
+ModelArtifacts bundle per request (RCU style): a swap only rebinds the
+active reference, so in-flight requests finish on the version they started
+with and old versions are freed once no request holds them.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.config import (
+    BASE_MODEL_VERSION,
+    COMPILED_INFERENCE,
+    FEATURE_COLUMNS_PATH,
+    LITE_MODEL_VERSION,
+    MODEL_PATH,
+    MODEL_REGISTRY_MAX_LOADED,
+    MODEL_VARIANT,
+    MODEL_VERSION,
+    MODEL_WATCH_INTERVAL_SECONDS,
+    MODELS_DIR,
+    PINNABLE_MODEL_VERSIONS,
+    SCALER_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+Fingerprint = Tuple[Tuple[str, int, int], ...]
+
+
+@dataclass(frozen=True)
+class ModelArtifacts:
+    """One immutable, fully loaded model version."""
+    version: str
+    model: Any
+    scaler: Any
+    feature_columns: List[str]
+    fingerprint: Fingerprint = field(compare=False)
+    loaded_at: float = field(compare=False, default_factory=time.time)
+    # tree_compiler.CompiledEnsemble, or None when disabled or not compilable
+    compiled: Any = field(compare=False, default=None)
+
+
+def get_project_root() -> Path:
+    """Get the project root directory."""
+    # This file is at app/services/model_registry.py
+    return Path(__file__).parent.parent.parent
+
+
+def _artifact_paths(version: str) -> Tuple[Path, Path, Path]:
+    root = get_project_root()
+    base = (root / MODEL_PATH, root / SCALER_PATH, root / FEATURE_COLUMNS_PATH)
+    if version == BASE_MODEL_VERSION:
+        return base
+    version_dir = root / MODELS_DIR / version
+    return tuple(
+        version_dir / default.name if (version_dir / default.name).exists() else default
+        for default in base
+    )
+
+
+def _fingerprint(paths: Tuple[Path, ...]) -> Fingerprint:
+    parts = []
+    for path in paths:
+        stat = path.stat()
+        parts.append((str(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(parts)
+
+
+def discover_versions() -> Dict[str, Fingerprint]:
+    """
+    Scan models/ for available versions.
+
+    Returns:
+        Mapping of version name to a fingerprint of its artifact files
+    """
+    root = get_project_root()
+    versions: Dict[str, Fingerprint] = {}
+    model_name = Path(MODEL_PATH).name
+
+    if (root / MODEL_PATH).exists():
+        versions[BASE_MODEL_VERSION] = _fingerprint(_artifact_paths(BASE_MODEL_VERSION))
+
+    models_dir = root / MODELS_DIR
+    if models_dir.is_dir():
+        for entry in sorted(models_dir.iterdir()):
+            if entry.is_dir() and (entry / model_name).exists():
+                try:
+                    versions[entry.name] = _fingerprint(_artifact_paths(entry.name))
+                except FileNotFoundError:
+                    continue
+    return versions
+
+
+def warm_up(artifacts: ModelArtifacts, rows: int = 64) -> None:
+    """
+    Run a representative batch through a freshly loaded version.
+
+    Pays XGBoost's lazy allocations before the version takes traffic.
+    """
+    mean = getattr(artifacts.scaler, "mean_", None)
+    scale = getattr(artifacts.scaler, "scale_", None)
+    n_features = len(artifacts.feature_columns)
+    if mean is None or scale is None:
+        mean, scale = np.zeros(n_features), np.ones(n_features)
+    offsets = np.linspace(-2.0, 2.0, rows)[:, None]
+    X = pd.DataFrame(mean + offsets * scale, columns=artifacts.feature_columns)
+    proba = artifacts.model.predict_proba(artifacts.scaler.transform(X))
+    if artifacts.compiled is not None:
+        compiled_proba = artifacts.compiled.predict_proba(artifacts.scaler.transform(X))
+        if not np.array_equal(proba.argmax(axis=1), compiled_proba.argmax(axis=1)):
+            raise ValueError("Compiled ensemble disagrees with XGBoost on the warm-up batch")
+
+
+def _compile(version: str, model: Any) -> Any:
+    if not COMPILED_INFERENCE:
+        return None
+    from app.services.tree_compiler import compile_model
+
+    try:
+        return compile_model(model)
+    except Exception as e:
+        logger.warning("Model version %s not compiled, using XGBoost only: %s", version, e)
+        return None
+
+
+def load_version(version: str) -> ModelArtifacts:
+    """
+    Load and warm one model version from disk.
+
+    Raises:
+        FileNotFoundError: If any artifact file is not found
+    """
+    model_path, scaler_path, feature_columns_path = _artifact_paths(version)
+    for path in (model_path, scaler_path, feature_columns_path):
+        if not path.exists():
+            raise FileNotFoundError(f"Artifact file not found: {path}")
+
+    fingerprint = _fingerprint((model_path, scaler_path, feature_columns_path))
+    started = time.perf_counter()
+    logger.info("Loading model version %s from %s", version, model_path.parent)
+    model = joblib.load(model_path)
+    artifacts = ModelArtifacts(
+        version=version,
+        model=model,
+        scaler=joblib.load(scaler_path),
+        feature_columns=list(joblib.load(feature_columns_path)),
+        fingerprint=fingerprint,
+        compiled=_compile(version, model),
+    )
+    try:
+        warm_up(artifacts)
+    except ValueError as e:
+        logger.error("Model version %s: %s; serving it with XGBoost only", version, e)
+        artifacts = replace(artifacts, compiled=None)
+        warm_up(artifacts)
+    logger.info(
+        "Model version %s loaded and warmed in %.0f ms (%d features, %s)",
+        version, (time.perf_counter() - started) * 1000, len(artifacts.feature_columns),
+        "compiled" if artifacts.compiled is not None else "xgboost only",
+    )
+    return artifacts
+
+
+class ModelRegistry:
+    """Holds loaded versions and the active reference."""
+
+    def __init__(self, max_loaded: int = MODEL_REGISTRY_MAX_LOADED):
+        self.max_loaded = max_loaded
+        self._active: Optional[ModelArtifacts] = None
+        self._loaded: "OrderedDict[str, ModelArtifacts]" = OrderedDict()
+        self._available: Dict[str, Fingerprint] = {}
+        self._pending: Dict[str, Fingerprint] = {}
+        self._lock = threading.Lock()
+        # One lock per version, so concurrent pins of a version load it once
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+
+    # -- reads (lock-free) -------------------------------------------------
+
+    @property
+    def active(self) -> Optional[ModelArtifacts]:
+        return self._active
+
+    def get(self, version: Optional[str] = None) -> ModelArtifacts:
+        """
+        Return the active version, or a pinned one (loading it on demand).
+
+        A loaded non-active version is only returned while it matches the
+        fingerprint of its files from the watcher's last scan of models/;
+        otherwise it is reloaded (or forgotten, if its files are gone).
+        models/ is only rescanned here for versions the last scan did not see.
+
+        Raises:
+            ValueError: If nothing is loaded yet
+            KeyError: If the pinned version does not exist
+        """
+        active = self._active
+        if version is None or (active is not None and version == active.version):
+            if active is None:
+                raise ValueError("Model artifacts not loaded. Call load_artifacts() first.")
+            return active
+
+        fingerprint = self._available.get(version)
+        if fingerprint is None:
+            # Possibly deployed since the last scan
+            self._available = available = discover_versions()
+            fingerprint = available.get(version)
+        if fingerprint is None:
+            with self._lock:
+                self._loaded.pop(version, None)
+            raise KeyError(version)
+        artifacts = self._loaded.get(version)
+        if artifacts is not None and artifacts.fingerprint == fingerprint:
+            return artifacts
+        return self._load_and_keep(version, fingerprint)
+
+    def is_pinnable(self, version: str) -> bool:
+        """Whether a request may pin version: already in memory, or allowed by PINNABLE_MODEL_VERSIONS."""
+        active = self._active
+        return (
+            (active is not None and version == active.version)
+            or version in self._loaded
+            or version in PINNABLE_MODEL_VERSIONS
+            or "*" in PINNABLE_MODEL_VERSIONS
+        )
+
+    def versions(self) -> Dict[str, Any]:
+        active = self._active
+        return {
+            "active": active.version if active else None,
+            "loaded": list(self._loaded.keys()),
+            "available": sorted(self._available.keys()),
+        }
+
+    # -- writes ----------------------------------------------------------
+
+    def _load_and_keep(self, version: str, fingerprint: Fingerprint) -> ModelArtifacts:
+        with self._lock:
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+        with load_lock:
+            # Another request may have loaded these files while this one waited
+            artifacts = self._loaded.get(version)
+            if artifacts is not None and artifacts.fingerprint == fingerprint:
+                return artifacts
+            artifacts = load_version(version)
+            with self._lock:
+                self._loaded[version] = artifacts
+                self._loaded.move_to_end(version)
+                self._evict()
+        return artifacts
+
+    def _evict(self) -> None:
+        active_version = self._active.version if self._active else None
+        while len(self._loaded) > self.max_loaded:
+            victim = next((v for v in self._loaded if v != active_version), None)
+            if victim is None:
+                break
+            del self._loaded[victim]
+
+    def activate(self, artifacts: ModelArtifacts) -> None:
+        """Atomically make a loaded version the active one."""
+        with self._lock:
+            previous = self._active
+            self._loaded[artifacts.version] = artifacts
+            self._loaded.move_to_end(artifacts.version)
+            self._active = artifacts
+            self._evict()
+        logger.info(
+            "Active model version: %s (was %s)",
+            artifacts.version, previous.version if previous else None,
+        )
+
+    def choose_version(self, available: Dict[str, Fingerprint]) -> Optional[str]:
+        """
+        Pick the version that should be active.
+
+        MODEL_VERSION pins it and MODEL_VARIANT="lite" pins the compressed
+        variant; otherwise the most recently written version directory wins,
+        falling back to the base artifacts.
+        """
+        pinned = MODEL_VERSION or (LITE_MODEL_VERSION if MODEL_VARIANT == "lite" else "")
+        if pinned:
+            return pinned if pinned in available else None
+        candidates = [v for v in available if v not in (BASE_MODEL_VERSION, LITE_MODEL_VERSION)]
+        if candidates:
+            return max(candidates, key=lambda v: max(part[2] for part in available[v]))
+        return BASE_MODEL_VERSION if BASE_MODEL_VERSION in available else None
+
+    def load_initial(self) -> ModelArtifacts:
+        """Synchronously load the version that should be active at startup."""
+        self._available = discover_versions()
+        version = self.choose_version(self._available)
+        if version is None and not MODEL_VERSION and MODEL_VARIANT == "lite":
+            raise FileNotFoundError(
+                f"HEATGUARD_MODEL_VARIANT=lite, but no lite build exists under "
+                f"{MODELS_DIR}/{LITE_MODEL_VERSION}/. Build one with `python -m benchmarks.lite_model build` "
+                f"(it writes nothing when no candidate meets its acceptance criteria) "
+                f"or unset HEATGUARD_MODEL_VARIANT"
+            )
+        if version is None:
+            raise FileNotFoundError(
+                f"No model artifacts found (pinned version: {MODEL_VERSION or 'none'}, "
+                f"variant: {MODEL_VARIANT})"
+            )
+        artifacts = load_version(version)
+        self.activate(artifacts)
+        return artifacts
+
+    def refresh(self) -> Optional[ModelArtifacts]:
+        """
+        Rescan models/ and hot-swap if the preferred version is new or changed.
+
+        A version is only loaded once its fingerprint has been identical on two
+        consecutive scans, so half-copied artifacts are never picked up.
+
+        Returns:
+            The newly activated version, or None if nothing changed
+        """
+        available = discover_versions()
+        self._available = available
+        version = self.choose_version(available)
+        if version is None:
+            return None
+
+        fingerprint = available[version]
+        active = self._active
+        if active is not None and active.version == version and active.fingerprint == fingerprint:
+            self._pending.pop(version, None)
+            return None
+
+        if self._pending.get(version) != fingerprint:
+            self._pending[version] = fingerprint
+            return None
+
+        del self._pending[version]
+        artifacts = load_version(version)
+        self.activate(artifacts)
+        return artifacts
+
+    # -- background watcher ----------------------------------------------
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error("Model registry refresh failed: %s", e, exc_info=True)
+
+    def start_watcher(self, interval: float = MODEL_WATCH_INTERVAL_SECONDS) -> None:
+        """Start polling models/ for new versions (no-op if interval <= 0)."""
+        if interval <= 0 or self._watch_task is not None:
+            return
+        self._watch_task = asyncio.get_running_loop().create_task(self._watch(interval))
+        logger.info("Watching %s for new model versions every %gs", MODELS_DIR, interval)
+
+    async def stop_watcher(self) -> None:
+        task, self._watch_task = self._watch_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+REGISTRY = ModelRegistry()
@@ -2,87 +2,78 @@
 Model Service for HeatGuard API
 
 Handles loading and inference with the heat risk prediction model.
+
+Small batches (up to PREDICTION_CACHE_MAX_ROWS rows, i.e. single points and
+5-day forecasts) are cached per model version in the two-tier cache, keyed
+on a hash of the raw feature matrix.
 """
 
+import functools
+import hashlib
 import logging
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import joblib
 import numpy as np
 import pandas as pd
+import xgboost as xgb
 
 from app.config import (
-    FEATURE_COLUMNS_PATH,
-    MODEL_PATH,
-    SCALER_PATH,
+    COMPILED_MAX_ROWS,
+    INFERENCE_CHUNK_SIZE,
+    PREDICTION_CACHE_MAX_ROWS,
+    PREDICTION_CACHE_TTL_SECONDS,
     get_risk_level,
 )
+from app.services.cache_service import CACHE
+from app.services.model_registry import REGISTRY, ModelArtifacts, get_project_root  # noqa: F401
+from app.services.shadow_service import SHADOW
+from app.utils.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
-# Global variables for model artifacts
-MODEL: Optional[Any] = None
-SCALER: Optional[Any] = None
-FEATURE_COLUMNS: Optional[List[str]] = None
-
-
-def get_project_root() -> Path:
-    """Get the project root directory."""
-    # This file is at app/services/model_service.py
-    # Project root is two levels up
-    return Path(__file__).parent.parent.parent
 
-
-def load_artifacts() -> None:
+def load_artifacts() -> ModelArtifacts:
     """
-    Load model artifacts (model, scaler, feature columns) from disk.
+    Load the active model version (model, scaler, feature columns) from disk.
 
-    This function should be called once at application startup.
+    This function should be called once at application startup; later
+    versions are picked up by the registry watcher without a restart.
 
     Raises:
         FileNotFoundError: If any artifact file is not found
         Exception: If loading fails for any other reason
     """
-    global MODEL, SCALER, FEATURE_COLUMNS
-
-    project_root = get_project_root()
+    return REGISTRY.load_initial()
 
-    model_path = project_root / MODEL_PATH
-    scaler_path = project_root / SCALER_PATH
-    feature_columns_path = project_root / FEATURE_COLUMNS_PATH
 
-    logger.info(f"Loading model from: {model_path}")
-    if not model_path.exists():
-        raise FileNotFoundError(f"Model file not found: {model_path}")
-    MODEL = joblib.load(model_path)
-    logger.info("Model loaded successfully")
+def is_model_loaded() -> bool:
+    """Check if the model artifacts are loaded."""
+    return REGISTRY.active is not None
 
-    logger.info(f"Loading scaler from: {scaler_path}")
-    if not scaler_path.exists():
-        raise FileNotFoundError(f"Scaler file not found: {scaler_path}")
-    SCALER = joblib.load(scaler_path)
-    logger.info("Scaler loaded successfully")
 
-    logger.info(f"Loading feature columns from: {feature_columns_path}")
-    if not feature_columns_path.exists():
-        raise FileNotFoundError(f"Feature columns file not found: {feature_columns_path}")
-    FEATURE_COLUMNS = joblib.load(feature_columns_path)
-    logger.info(f"Feature columns loaded: {FEATURE_COLUMNS}")
+def get_artifacts(version: Optional[str] = None) -> ModelArtifacts:
+    """
+    Return the artifacts for one request: the active version, or a pinned one.
 
+    Callers should fetch this once per request and pass it along so that a
+    concurrent hot-swap cannot mix versions within a request.
 
-def is_model_loaded() -> bool:
-    """Check if the model artifacts are loaded."""
-    return MODEL is not None and SCALER is not None and FEATURE_COLUMNS is not None
+    Raises:
+        ValueError: If no model is loaded
+        KeyError: If a pinned version does not exist
+    """
+    return REGISTRY.get(version)
 
 
-def predict_risk(features: Dict[str, float]) -> Dict[str, Any]:
+@traced("model.predict")
+def predict_risk(features: Dict[str, float], artifacts: Optional[ModelArtifacts] = None) -> Dict[str, Any]:
     """
     Predict heat risk for given features (single instance).
 
     Args:
-        features: Dictionary with keys matching FEATURE_COLUMNS.
+        features: Dictionary with keys matching the feature columns.
                   Required features: tmax_c, day_of_year, month, lat, lon
+        artifacts: Model version to use (default: the active version)
 
     Returns:
         Dictionary containing:
@@ -93,43 +84,40 @@ def predict_risk(features: Dict[str, float]) -> Dict[str, Any]:
     Raises:
         ValueError: If required features are missing or model not loaded
     """
-    if not is_model_loaded():
-        raise ValueError("Model artifacts not loaded. Call load_artifacts() first.")
+    artifacts = artifacts or get_artifacts()
+    model, feature_columns = artifacts.model, artifacts.feature_columns
 
     # Validate that all required features are present
     missing_features = []
-    for col in FEATURE_COLUMNS:
+    for col in feature_columns:
         if col not in features:
             missing_features.append(col)
 
     if missing_features:
         # For unknown features, default to 0 (with a warning)
         # This allows the model to work even if feature_columns.joblib has extra features
-        logger.warning(f"Missing features (defaulting to 0): {missing_features}")
+        logger.warning("Missing features (defaulting to 0): %s", missing_features)
         for col in missing_features:
             features[col] = 0.0
 
     # Build DataFrame with correct column order
     df = pd.DataFrame([features])
-    df = df[FEATURE_COLUMNS]  # Ensure correct column order
-
-    logger.debug(f"Input features DataFrame:\n{df}")
+    df = df[feature_columns]  # Ensure correct column order
 
-    # Scale features
-    X_scaled = SCALER.transform(df)
+    # Lazy %-args: the DataFrame is only rendered if DEBUG is enabled
+    logger.debug("Input features DataFrame:\n%s", df)
 
-    # Get predictions
-    risk_label = int(MODEL.predict(X_scaled)[0])
-    risk_level = get_risk_level(risk_label)
+    X = df.to_numpy(dtype=np.float64)
 
-    # Get probabilities (if available)
+    # Get probabilities (if available) and derive the label from them
     probabilities = None
-    if hasattr(MODEL, 'predict_proba'):
-        try:
-            proba = MODEL.predict_proba(X_scaled)[0]
-            probabilities = {str(i): float(p) for i, p in enumerate(proba)}
-        except Exception as e:
-            logger.warning(f"Could not get prediction probabilities: {e}")
+    if hasattr(model, 'predict_proba'):
+        proba = predict_proba_cached(X, artifacts)[0]
+        risk_label = int(proba.argmax())
+        probabilities = {str(i): float(p) for i, p in enumerate(proba)}
+    else:
+        risk_label = int(model.predict(scale_features(X, artifacts))[0])
+    risk_level = get_risk_level(risk_label)
 
     return {
         "risk_label": risk_label,
@@ -138,18 +126,21 @@ def predict_risk(features: Dict[str, float]) -> Dict[str, Any]:
     }
 
 
-def predict_risk_batch(features_list: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+@traced("model.predict")
+def predict_risk_batch(features_list: List[Dict[str, float]],
+                       artifacts: Optional[ModelArtifacts] = None) -> List[Dict[str, Any]]:
     """
     Predict heat risk for a batch of feature sets.
 
     Args:
-        features_list: List of dictionaries, each with keys matching FEATURE_COLUMNS.
+        features_list: List of dictionaries, each with keys matching the feature columns.
+        artifacts: Model version to use (default: the active version)
 
     Returns:
         List of dictionaries containing risk_label, risk_level, and probabilities for each input.
     """
-    if not is_model_loaded():
-        raise ValueError("Model artifacts not loaded. Call load_artifacts() first.")
+    artifacts = artifacts or get_artifacts()
+    model, feature_columns = artifacts.model, artifacts.feature_columns
 
     if not features_list:
         return []
@@ -158,32 +149,26 @@ def predict_risk_batch(features_list: List[Dict[str, float]]) -> List[Dict[str,
     df = pd.DataFrame(features_list)
 
     # Handle missing columns
-    missing_cols = [col for col in FEATURE_COLUMNS if col not in df.columns]
+    missing_cols = [col for col in feature_columns if col not in df.columns]
     if missing_cols:
-        logger.warning(f"Batch prediction missing columns (defaulting to 0): {missing_cols}")
+        logger.warning("Batch prediction missing columns (defaulting to 0): %s", missing_cols)
         for col in missing_cols:
             df[col] = 0.0
 
     # Ensure correct column order
-    df = df[FEATURE_COLUMNS]
-
-    # Scale features
-    X_scaled = SCALER.transform(df)
+    df = df[feature_columns]
 
-    # Get predictions
-    risk_labels = MODEL.predict(X_scaled)
+    X = df.to_numpy(dtype=np.float64)
 
-    # Get probabilities if available
+    # Get probabilities if available and derive the labels from them
     all_probabilities = []
-    if hasattr(MODEL, 'predict_proba'):
-        try:
-            probas = MODEL.predict_proba(X_scaled)
-            for p in probas:
-                all_probabilities.append({str(i): float(val) for i, val in enumerate(p)})
-        except Exception as e:
-            logger.warning(f"Could not get batch prediction probabilities: {e}")
-            all_probabilities = [None] * len(features_list)
+    if hasattr(model, 'predict_proba'):
+        probas = predict_proba_cached(X, artifacts)
+        risk_labels = probas.argmax(axis=1)
+        for p in probas:
+            all_probabilities.append({str(i): float(val) for i, val in enumerate(p)})
     else:
+        risk_labels = model.predict(scale_features(X, artifacts))
         all_probabilities = [None] * len(features_list)
 
     results = []
@@ -196,3 +181,201 @@ def predict_risk_batch(features_list: List[Dict[str, float]]) -> List[Dict[str,
         })
 
     return results
+
+
+def scale_features(X: np.ndarray, artifacts: Optional[ModelArtifacts] = None) -> np.ndarray:
+    """
+    Standardize a raw feature matrix without a DataFrame round-trip.
+
+    Args:
+        X: 2-D float array whose columns are in feature-column order
+        artifacts: Model version to use (default: the active version)
+
+    Returns:
+        Scaled float64 array, identical to scaler.transform(X)
+    """
+    artifacts = artifacts or get_artifacts()
+    scaler = artifacts.scaler
+    X = np.asarray(X, dtype=np.float64)
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    if mean is None and scale is None:
+        # Not a StandardScaler-like object; fall back to its own transform
+        return scaler.transform(pd.DataFrame(X, columns=artifacts.feature_columns))
+    if mean is not None and getattr(scaler, "with_mean", True):
+        X = X - mean
+    if scale is not None and getattr(scaler, "with_std", True):
+        X = X / scale
+    return X
+
+
+def predict_proba_scaled(X_scaled: np.ndarray, artifacts: ModelArtifacts) -> np.ndarray:
+    """
+    Class probabilities for already-scaled features.
+
+    Batches of up to COMPILED_MAX_ROWS rows go to the NumPy-compiled ensemble
+    when the version has one (same labels, no XGBoost call setup); larger
+    batches go to XGBoost.
+    """
+    if artifacts.compiled is not None and len(X_scaled) <= COMPILED_MAX_ROWS:
+        with span("model.inference", rows=len(X_scaled), engine="compiled"):
+            return artifacts.compiled.predict_proba(X_scaled)
+    with span("model.inference", rows=len(X_scaled), engine="xgboost"):
+        return artifacts.model.predict_proba(X_scaled)
+
+
+@functools.lru_cache(maxsize=32)
+def _version_token(version: str, fingerprint: Tuple) -> str:
+    # Artifact sizes and mtimes, so a redeployed version never reuses old scores
+    return hashlib.blake2b(repr((version, fingerprint)).encode(), digest_size=8).hexdigest()
+
+
+def artifacts_token(artifacts: ModelArtifacts) -> str:
+    """
+    Identifies the exact artifacts of a model version.
+
+    Unlike the version name it changes when a version is hot-reloaded with
+    new files under the same name, so memoized results keyed on it are not
+    reused across such a reload.
+    """
+    return f"{artifacts.version}:{_version_token(artifacts.version, artifacts.fingerprint)}"
+
+
+def prediction_cache_key(X: np.ndarray, artifacts: ModelArtifacts) -> str:
+    """Cache key for the scores of a raw feature matrix under one model version."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    digest = hashlib.blake2b(X.data, digest_size=16).hexdigest()
+    return f"{artifacts_token(artifacts)}:{X.shape[0]}x{X.shape[1]}:{digest}"
+
+
+def predict_proba_cached(X: np.ndarray, artifacts: ModelArtifacts, shadow: bool = True) -> np.ndarray:
+    """
+    Class probabilities for a raw (unscaled) feature matrix, via the prediction cache.
+
+    Batches larger than PREDICTION_CACHE_MAX_ROWS skip the cache. The cache
+    is per-process (L1 only): lookups run synchronously inside model calls,
+    where an L2 round trip would block the event loop, and every distinct
+    input would otherwise add a row to the shared store. Only freshly scored
+    batches are offered to shadow evaluation.
+
+    Returns:
+        (n_rows, n_classes) array; read-only when it came from the cache
+    """
+    cacheable = len(X) <= PREDICTION_CACHE_MAX_ROWS and PREDICTION_CACHE_TTL_SECONDS > 0
+    if cacheable:
+        cache = CACHE.namespace("predictions", shared=False)
+        key = prediction_cache_key(X, artifacts)
+        with span("model.cache") as lookup:
+            proba = cache.get(key)
+            lookup.set("cache.hit", proba is not None)
+        if proba is not None:
+            return proba
+
+    proba = predict_proba_scaled(scale_features(X, artifacts), artifacts)
+    if shadow:
+        SHADOW.submit(X, proba, artifacts)
+    if cacheable:
+        cache.set(key, proba, PREDICTION_CACHE_TTL_SECONDS)
+    return proba
+
+
+@traced("model.predict")
+def predict_proba_matrix(X: np.ndarray, chunk_size: Optional[int] = None,
+                         artifacts: Optional[ModelArtifacts] = None, shadow: bool = True) -> np.ndarray:
+    """
+    Predict class probabilities for a raw feature matrix in bounded-memory chunks.
+
+    Args:
+        X: 2-D float array of shape (n_rows, n_features), columns in
+           feature-column order, unscaled
+        chunk_size: Maximum rows scored per model call (default: INFERENCE_CHUNK_SIZE)
+        artifacts: Model version to use (default: the active version)
+        shadow: Offer the batch to shadow evaluation (off for offline jobs)
+
+    Returns:
+        float32 array of shape (n_rows, n_classes)
+
+    Raises:
+        ValueError: If the model is not loaded or X has the wrong width
+    """
+    artifacts = artifacts or get_artifacts()
+    model, feature_columns = artifacts.model, artifacts.feature_columns
+
+    X = np.asarray(X)
+    if X.ndim != 2 or X.shape[1] != len(feature_columns):
+        raise ValueError(f"Expected feature matrix with {len(feature_columns)} columns, got shape {X.shape}")
+
+    n_rows = X.shape[0]
+    if 0 < n_rows <= PREDICTION_CACHE_MAX_ROWS:
+        return np.asarray(predict_proba_cached(X, artifacts, shadow), dtype=np.float32)
+
+    chunk_size = chunk_size or INFERENCE_CHUNK_SIZE
+    out: Optional[np.ndarray] = None
+    for start in range(0, n_rows, chunk_size):
+        proba = predict_proba_scaled(scale_features(X[start:start + chunk_size], artifacts), artifacts)
+        if out is None:
+            out = np.empty((n_rows, proba.shape[1]), dtype=np.float32)
+        out[start:start + len(proba)] = proba
+
+    if out is None:
+        n_classes = len(getattr(model, "classes_", [])) or 1
+        out = np.empty((0, n_classes), dtype=np.float32)
+    if shadow:
+        SHADOW.submit(X, out, artifacts)
+    return out
+
+
+def predict_labels_scaled(X_scaled: np.ndarray, artifacts: ModelArtifacts) -> np.ndarray:
+    """
+    Risk labels for already-scaled features, without class probabilities.
+
+    Both engines take the argmax of the raw class margins, which is the
+    argmax of the probabilities without the softmax. For XGBoost batches
+    tree traversal dominates, so this saves little model time.
+    """
+    if artifacts.compiled is not None and len(X_scaled) <= COMPILED_MAX_ROWS:
+        with span("model.inference", rows=len(X_scaled), engine="compiled", output="label"):
+            return artifacts.compiled.predict_margin(X_scaled).argmax(axis=1).astype(np.uint8)
+    with span("model.inference", rows=len(X_scaled), engine="xgboost", output="label"):
+        margins = artifacts.model.get_booster().predict(xgb.DMatrix(X_scaled), output_margin=True)
+        return margins.argmax(axis=1).astype(np.uint8)
+
+
+@traced("model.predict")
+def predict_labels_matrix(X: np.ndarray, chunk_size: Optional[int] = None,
+                          artifacts: Optional[ModelArtifacts] = None) -> np.ndarray:
+    """
+    Risk labels for a raw feature matrix, for callers that need no probabilities.
+
+    Small batches still go through the prediction cache (and so shadow
+    evaluation) like predict_proba_matrix. Larger batches keep no
+    (n_rows, n_classes) probability matrix and are not offered to shadow
+    evaluation, which compares probabilities.
+
+    Args:
+        X: 2-D float array of shape (n_rows, n_features), columns in
+           feature-column order, unscaled
+        chunk_size: Maximum rows scored per model call (default: INFERENCE_CHUNK_SIZE)
+        artifacts: Model version to use (default: the active version)
+
+    Returns:
+        uint8 array of shape (n_rows,)
+
+    Raises:
+        ValueError: If the model is not loaded or X has the wrong width
+    """
+    artifacts = artifacts or get_artifacts()
+    X = np.asarray(X)
+    if X.ndim != 2 or X.shape[1] != len(artifacts.feature_columns):
+        raise ValueError(f"Expected feature matrix with {len(artifacts.feature_columns)} columns, got shape {X.shape}")
+
+    n_rows = X.shape[0]
+    if 0 < n_rows <= PREDICTION_CACHE_MAX_ROWS:
+        return predict_proba_cached(X, artifacts).argmax(axis=1).astype(np.uint8)
+
+    chunk_size = chunk_size or INFERENCE_CHUNK_SIZE
+    labels = np.empty(n_rows, dtype=np.uint8)
+    for start in range(0, n_rows, chunk_size):
+        chunk = X[start:start + chunk_size]
+        labels[start:start + len(chunk)] = predict_labels_scaled(scale_features(chunk, artifacts), artifacts)
+    return labels
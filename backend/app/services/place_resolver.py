@@ -0,0 +1,165 @@
+"""
+Place Name Resolution for HeatGuard API
+
+Resolves batches of free-text place names ("Pune", "Aurangabad, Bihar",
+"Abohar (M Cl)") to district ids and coordinates. Each distinct name is
+looked up once in the district store's normalized-name indexes (district
+names, headquarters towns, geocoded towns and cities); only names none of
+them know are sent to the OpenWeather geocoder, a bounded number at a
+time. Geocoder answers go through the shared weather cache, and names the
+geocoder answered without an Indian match are remembered for a while, so a
+list imported again is not looked up upstream again. Upstream errors are
+not remembered.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.config import RESOLVE_GEOCODE_CONCURRENCY, RESOLVE_MISS_TTL_SECONDS
+from app.services import district_store
+from app.services.cache_service import CACHE
+from app.services.weather_service import search_location_by_name
+
+logger = logging.getLogger(__name__)
+
+MATCHED = "matched"
+AMBIGUOUS = "ambiguous"
+UNMATCHED = "unmatched"
+
+# Trailing qualifiers that name the country rather than a state
+_COUNTRY_QUALIFIERS = {"in", "ind", "india"}
+
+
+def split_query(query: str) -> Tuple[str, Optional[str]]:
+    """Split "Name, State[, India]" into the name and an optional state."""
+    parts = [p.strip() for p in query.split(",")]
+    while len(parts) > 1 and district_store.norm(parts[-1]) in _COUNTRY_QUALIFIERS:
+        parts.pop()
+    name = parts[0]
+    state = parts[1] if len(parts) > 1 and parts[1] else None
+    return name, state
+
+
+def _result(query: str, status: str, source: Optional[str] = None, rows: Sequence[int] = (),
+            coordinates: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    store = district_store.get_store()
+    result: Dict[str, Any] = {
+        "query": query,
+        "status": status,
+        "source": source,
+        "district_id": None,
+        "name": None,
+        "state": None,
+        "coordinates": None,
+        "candidates": [store.ids[r] for r in rows] if len(rows) > 1 else [],
+    }
+    if rows:
+        row = rows[0]
+        coordinates = coordinates or store.place_coordinates(row)
+        result.update(district_id=store.ids[row], name=store.name(row), state=store.state(row))
+    if coordinates is not None:
+        result["coordinates"] = [float(coordinates[0]), float(coordinates[1])]
+    return result
+
+
+def _from_geocoder(query: str, state: Optional[str], answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Map the first Indian geocoder answer (in the requested state, if any) to a district."""
+    store = district_store.get_store()
+    answers = [a for a in answers if a.get("country") == "IN" and a.get("lat") is not None]
+    if state:
+        answers = [a for a in answers if district_store.norm(a.get("state")) == district_store.norm(state)] or answers
+    if not answers:
+        return _result(query, UNMATCHED)
+
+    answer = answers[0]
+    coordinates = (float(answer["lat"]), float(answer["lon"]))
+    row = store.find(answer.get("name", ""), answer.get("state", ""))
+    if row is None:
+        match = store.match_name(answer.get("name", ""), answer.get("state"))
+        if match is not None and match.source != "place":
+            rows = [r for r in match.rows if not answer.get("state")
+                    or district_store.norm(store.state(r)) == district_store.norm(answer["state"])]
+            row = rows[0] if rows else None
+    if row is None:
+        row = store.nearest(*coordinates)
+    if row is None:
+        return _result(query, UNMATCHED, coordinates=coordinates)
+    return _result(query, MATCHED, "geocoder", [row], coordinates)
+
+
+async def resolve_names(names: Sequence[str], geocode: bool = True) -> Dict[str, Any]:
+    """
+    Resolve place names to districts.
+
+    Args:
+        names: Place names, optionally qualified with a state ("Name, State")
+        geocode: Send names the local indexes do not know to the geocoder
+
+    Returns:
+        Dict with one result per input name (in input order) and counts
+    """
+    store = district_store.get_store()
+    resolved: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    misses: Dict[Tuple[str, str], Tuple[str, Optional[str]]] = {}
+
+    keys = []
+    for query in names:
+        name, state = split_query(query)
+        key = (district_store.normalize_place(name), district_store.norm(state))
+        keys.append(key)
+        if key in resolved or key in misses:
+            continue
+        match = store.match_name(name, state)
+        if match is None:
+            misses[key] = (name, state)
+        else:
+            status = AMBIGUOUS if len(match.rows) > 1 else MATCHED
+            resolved[key] = _result(query, status, match.source, match.rows, match.coordinates)
+
+    geocoder_calls = 0
+    if misses and geocode:
+        cache = CACHE.namespace("places")
+        semaphore = asyncio.Semaphore(RESOLVE_GEOCODE_CONCURRENCY)
+        unavailable = False
+
+        async def lookup(key: Tuple[str, str], name: str, state: Optional[str]) -> None:
+            nonlocal geocoder_calls, unavailable
+            query = f"{name},{state},IN" if state else f"{name},IN"
+            miss_key = "miss:" + " ".join(query.lower().split())
+            if await cache.aget(miss_key):
+                return
+            async with semaphore:
+                if unavailable:
+                    return
+                geocoder_calls += 1
+                try:
+                    # strict: an error must not look like "no such place" and be remembered
+                    answers = await search_location_by_name(query, strict=True)
+                except HTTPException as e:
+                    if e.status_code == 502:
+                        logger.warning("Geocoding %r failed: %s", name, e.detail)
+                        return
+                    # Not configured: every further call would fail the same way
+                    logger.warning("Geocoder unavailable for place resolution: %s", e.detail)
+                    unavailable = True
+                    return
+                except Exception as e:
+                    logger.warning("Geocoding %r failed: %s", name, e)
+                    return
+            resolved[key] = result = _from_geocoder(name, state, answers)
+            if result["status"] == UNMATCHED:
+                cache.set(miss_key, True, RESOLVE_MISS_TTL_SECONDS)
+
+        await asyncio.gather(*(lookup(key, name, state) for key, (name, state) in misses.items()))
+
+    results = []
+    counts = {MATCHED: 0, AMBIGUOUS: 0, UNMATCHED: 0}
+    for query, key in zip(names, keys):
+        result = resolved.get(key)
+        result = _result(query, UNMATCHED) if result is None else {**result, "query": query}
+        counts[result["status"]] += 1
+        results.append(result)
+    return {"results": results, **counts, "geocoder_calls": geocoder_calls}
@@ -0,0 +1,286 @@
+"""
+Live Profiling Service for HeatGuard API
+
+Diagnoses CPU and memory behaviour of a running worker without restarting it
+or attaching external tools.
+
+CPU: a daemon thread samples every thread's Python stack with
+sys._current_frames() at a fixed interval and counts identical stacks. The
+result is written in the collapsed ("folded") format read by flamegraph.pl,
+speedscope and inferno: one `frame;frame;...;leaf count` line per stack, root
+first. Sampling is statistical, so the serving threads are never paused or
+instrumented; the only cost is the sampler holding the GIL for a few tens of
+microseconds per tick.
+
+Memory: tracemalloc is started for the profiling window (unless it is already
+running) and the allocations that are still alive at the end are grouped by
+source line or traceback. tracemalloc slows every allocation while it runs,
+which is why it is only switched on for the requested window.
+"""
+
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.config import PROFILE_TRACEMALLOC_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Deeper stacks are truncated at the root end
+MAX_STACK_DEPTH = 128
+
+# (file name, function) of leaf frames where a thread is parked rather than
+# running: the event loop's selector, lock/condition waits, idle pool workers
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_BACKEND_ROOT = str(Path(__file__).resolve().parents[2])
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile of the same kind is already running."""
+
+
+def _short_path(filename: str) -> str:
+    """Trim a source path to something readable in a flamegraph frame."""
+    if filename.startswith(_BACKEND_ROOT):
+        return filename[len(_BACKEND_ROOT) + 1:]
+    for marker in ("site-packages/", "dist-packages/"):
+        idx = filename.rfind(marker)
+        if idx != -1:
+            return filename[idx + len(marker):]
+    return filename.rsplit("/", 1)[-1]
+
+
+class StackSampler:
+    """Samples all thread stacks on a background thread until stopped."""
+
+    def __init__(self, interval_seconds: float, include_idle: bool = False, by_line: bool = False):
+        self.interval = interval_seconds
+        self.include_idle = include_idle
+        self.by_line = by_line
+        self._counts: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="heatguard-profiler", daemon=True)
+        self.ticks = 0
+        self.samples = 0
+        self.idle_samples = 0
+        self.missed_ticks = 0
+        self.sampling_seconds = 0.0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.stopped_at = time.perf_counter()
+
+    def _frame_label(self, code, lineno: int) -> str:
+        key = (code, lineno) if self.by_line else code
+        label = self._labels.get(key)
+        if label is None:
+            line = lineno if self.by_line else code.co_firstlineno
+            # ';' separates frames in the folded format
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{line})".replace(";", ":")
+            self._labels[key] = label
+        return label
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        thread_names: Dict[int, str] = {}
+        names_refreshed = 0.0
+        next_tick = time.perf_counter()
+        while True:
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay < 0:
+                # The sampler fell behind (GIL contention); skip ticks, never burst
+                skipped = int(-delay // self.interval) + 1
+                self.missed_ticks += skipped
+                next_tick += skipped * self.interval
+                delay = next_tick - time.perf_counter()
+            if self._stop.wait(max(delay, 0.0)):
+                return
+
+            t0 = time.perf_counter()
+            if t0 - names_refreshed > 1.0:
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+                names_refreshed = t0
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (code.co_filename.rsplit("/", 1)[-1], code.co_name) in _IDLE_LEAVES:
+                    self.idle_samples += 1
+                    continue
+                stack: List[Tuple[Any, int]] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append((frame.f_code, frame.f_lineno if self.by_line else 0))
+                    frame = frame.f_back
+                self._counts[(thread_names.get(ident, str(ident)), tuple(stack))] += 1
+                self.samples += 1
+            del frames
+            self.ticks += 1
+            self.sampling_seconds += time.perf_counter() - t0
+
+    def collapsed(self) -> str:
+        """Folded stacks, heaviest first, each rooted at its thread name."""
+        merged: Counter = Counter()
+        for (thread_name, stack), count in self._counts.items():
+            frames = [thread_name.replace(";", ":")]
+            frames.extend(self._frame_label(code, lineno) for code, lineno in reversed(stack))
+            merged[";".join(frames)] += count
+        return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+    def stats(self) -> Dict[str, Any]:
+        wall = (self.stopped_at or time.perf_counter()) - self.started_at
+        return {
+            "duration_seconds": round(wall, 3),
+            "interval_ms": self.interval * 1000.0,
+            "ticks": self.ticks,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "missed_ticks": self.missed_ticks,
+            "distinct_stacks": len(self._counts),
+            # Share of wall time the sampler itself held the GIL
+            "overhead_ratio": round(self.sampling_seconds / wall, 5) if wall > 0 else 0.0,
+        }
+
+
+class LiveProfiler:
+    """Runs at most one CPU and one memory profile at a time per worker."""
+
+    def __init__(self, tracemalloc_frames: int = PROFILE_TRACEMALLOC_FRAMES):
+        self.tracemalloc_frames = tracemalloc_frames
+        self._cpu_lock = threading.Lock()
+        self._memory_lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    # -- CPU ---------------------------------------------------------------
+
+    def start_cpu(self, interval_seconds: float, include_idle: bool = False,
+                  by_line: bool = False) -> StackSampler:
+        """
+        Start sampling stacks; pair with finish_cpu().
+
+        Raises:
+            ProfilerBusyError: If a CPU profile is already running
+        """
+        if not self._cpu_lock.acquire(blocking=False):
+            raise ProfilerBusyError("A CPU profile is already running on this worker")
+        try:
+            sampler = StackSampler(interval_seconds, include_idle, by_line)
+            sampler.start()
+        except Exception:
+            self._cpu_lock.release()
+            raise
+        logger.info("CPU profile started (interval %.1f ms)", interval_seconds * 1000.0)
+        return sampler
+
+    def finish_cpu(self, sampler: StackSampler) -> Tuple[str, Dict[str, Any]]:
+        """Stop the sampler; returns the folded stacks and sampling stats."""
+        try:
+            sampler.stop()
+        finally:
+            self._cpu_lock.release()
+        stats = sampler.stats()
+        logger.info("CPU profile finished: %d samples, %d stacks, overhead %.2f%%",
+                    stats["samples"], stats["distinct_stacks"], stats["overhead_ratio"] * 100.0)
+        return sampler.collapsed(), stats
+
+    # -- memory ------------------------------------------------------------
+
+    def start_memory(self) -> tracemalloc.Snapshot:
+        """
+        Start tracemalloc if needed and take the baseline snapshot.
+
+        Raises:
+            ProfilerBusyError: If a memory profile is already running
+        """
+        if not self._memory_lock.acquire(blocking=False):
+            raise ProfilerBusyError("A memory profile is already running on this worker")
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.tracemalloc_frames)
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            return tracemalloc.take_snapshot()
+        except Exception:
+            self._stop_memory()
+            raise
+
+    def finish_memory(self, baseline: tracemalloc.Snapshot, group_by: str = "lineno",
+                      top: int = 50) -> Dict[str, Any]:
+        """
+        Compare the live allocations against the baseline and stop tracing.
+
+        Args:
+            baseline: Snapshot returned by start_memory()
+            group_by: "lineno", "filename" or "traceback"
+            top: Number of allocation sites returned, largest growth first
+
+        Returns:
+            Traced memory totals and the top allocation sites
+        """
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            overhead = tracemalloc.get_tracemalloc_memory()
+        finally:
+            self._stop_memory()
+
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+        diffs = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), group_by)
+        diffs.sort(key=lambda d: (d.size_diff, d.size), reverse=True)
+        sites = [
+            {
+                "traceback": [f"{_short_path(f.filename)}:{f.lineno}" for f in d.traceback],
+                "size_bytes": d.size,
+                "size_diff_bytes": d.size_diff,
+                "count": d.count,
+                "count_diff": d.count_diff,
+            }
+            for d in diffs[:top]
+        ]
+        return {
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": overhead,
+            "group_by": group_by,
+            "top": sites,
+        }
+
+    def cancel_memory(self) -> None:
+        """Abandon a memory profile started with start_memory()."""
+        self._stop_memory()
+
+    def _stop_memory(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self._memory_lock.release()
+
+
+PROFILER = LiveProfiler()
@@ -0,0 +1,311 @@
+"""
+Raster Service for HeatGuard API
+
+Builds lat/lon grids server-side, scores them with the heat risk model in
+vectorized chunks and encodes the result as compact binary or PNG rasters.
+"""
+
+import asyncio
+import logging
+import math
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.config import (
+    RASTER_BOUNDS,
+    RASTER_CACHE_SIZE,
+    RASTER_CACHE_TTL_SECONDS,
+    RASTER_FORECAST_ANCHOR_STEP,
+    RASTER_FORECAST_CONCURRENCY,
+    RASTER_FORECAST_MAX_ANCHORS,
+)
+from app.services import model_service, weather_service
+from app.services.date_utils import compute_day_of_year, compute_month
+from app.services.model_registry import ModelArtifacts
+
+logger = logging.getLogger(__name__)
+
+# Value used in the risk-class band for cells outside RASTER_BOUNDS
+NODATA = 255
+
+# RGBA palette indexed by risk label; index 4 is the transparent nodata colour
+PALETTE = [
+    (34, 197, 94, 255),    # Green
+    (234, 179, 8, 255),    # Yellow
+    (249, 115, 22, 255),   # Orange
+    (220, 38, 38, 255),    # Red
+    (0, 0, 0, 0),          # nodata
+]
+
+TILE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class Raster:
+    """A scored grid. Row 0 is the northern edge, column 0 the western edge."""
+    lats: np.ndarray            # (height,) cell-centre latitudes
+    lons: np.ndarray            # (width,) cell-centre longitudes
+    risk: np.ndarray            # (height, width) uint8 risk label, NODATA outside bounds
+    probability: np.ndarray     # (height, width) float16 probability of the assigned label
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.risk.shape
+
+
+class RasterCache:
+    """Small thread-safe LRU with a per-entry TTL for scored rasters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Raster]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Raster]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, raster = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return raster
+
+    def put(self, key: Hashable, raster: Raster) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), raster)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+RASTER_CACHE = RasterCache(RASTER_CACHE_SIZE, RASTER_CACHE_TTL_SECONDS)
+
+
+def bbox_axes(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+              resolution: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cell-centre axes for a regular lat/lon grid over a bounding box.
+
+    Args:
+        lat_min, lat_max, lon_min, lon_max: Bounding box in degrees
+        resolution: Cell size in degrees
+
+    Returns:
+        (lats, lons) where lats runs north to south and lons west to east
+    """
+    height = max(1, int(math.ceil(round((lat_max - lat_min) / resolution, 9))))
+    width = max(1, int(math.ceil(round((lon_max - lon_min) / resolution, 9))))
+    lats = lat_max - (np.arange(height) + 0.5) * resolution
+    lons = lon_min + (np.arange(width) + 0.5) * resolution
+    return lats, lons
+
+
+def tile_axes(z: int, x: int, y: int, size: int = TILE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pixel-centre axes for a Web Mercator (XYZ / slippy map) tile.
+
+    Returns:
+        (lats, lons) where lats runs north to south and lons west to east
+    """
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y + offsets) / n))))
+    return lats, lons
+
+
+def _in_bounds_mask(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat_ok = (lats >= RASTER_BOUNDS["lat_min"]) & (lats <= RASTER_BOUNDS["lat_max"])
+    lon_ok = (lons >= RASTER_BOUNDS["lon_min"]) & (lons <= RASTER_BOUNDS["lon_max"])
+    return lat_ok[:, None] & lon_ok[None, :]
+
+
+async def forecast_tmax_field(lats: np.ndarray, lons: np.ndarray, target_date: date) -> np.ndarray:
+    """
+    Build a tmax field by sampling OpenWeather on a coarse anchor grid.
+
+    Each raster cell takes the forecast daily maximum of its nearest anchor.
+
+    Args:
+        lats: (height,) cell latitudes
+        lons: (width,) cell longitudes
+        target_date: Forecast day to use
+
+    Returns:
+        (height, width) float32 array of tmax in Celsius
+
+    Raises:
+        HTTPException(422): If target_date is outside the forecast window
+    """
+    lat_lo, lat_hi = float(lats.min()), float(lats.max())
+    lon_lo, lon_hi = float(lons.min()), float(lons.max())
+
+    step = RASTER_FORECAST_ANCHOR_STEP
+    while True:
+        n_lat = max(1, int(math.ceil((lat_hi - lat_lo) / step + 1e-9)))
+        n_lon = max(1, int(math.ceil((lon_hi - lon_lo) / step + 1e-9)))
+        if n_lat * n_lon <= RASTER_FORECAST_MAX_ANCHORS:
+            break
+        step *= 1.5
+
+    anchor_lats = lat_lo + (np.arange(n_lat) + 0.5) * step
+    anchor_lons = lon_lo + (np.arange(n_lon) + 0.5) * step
+    semaphore = asyncio.Semaphore(RASTER_FORECAST_CONCURRENCY)
+
+    async def anchor_tmax(lat: float, lon: float) -> Optional[float]:
+        async with semaphore:
+            payload = await weather_service.fetch_openweather_forecast(round(lat, 4), round(lon, 4))
+        for day in weather_service.extract_daily_max_temps(payload):
+            if day["date"] == target_date:
+                return day["tmax_c"]
+        return None
+
+    values = await asyncio.gather(*(
+        anchor_tmax(float(a_lat), float(a_lon)) for a_lat in anchor_lats for a_lon in anchor_lons
+    ))
+    if any(v is None for v in values):
+        raise HTTPException(
+            status_code=422,
+            detail=f"No forecast available for {target_date.isoformat()}; use source=constant"
+        )
+    anchors = np.asarray(values, dtype=np.float32).reshape(n_lat, n_lon)
+
+    row_idx = np.clip(((lats - lat_lo) / step).astype(np.int64), 0, n_lat - 1)
+    col_idx = np.clip(((lons - lon_lo) / step).astype(np.int64), 0, n_lon - 1)
+    return anchors[row_idx[:, None], col_idx[None, :]]
+
+
+def score_grid(lats: np.ndarray, lons: np.ndarray, target_date: date, tmax: np.ndarray,
+               artifacts: ModelArtifacts) -> Raster:
+    """
+    Score every in-bounds cell of a grid with the heat risk model.
+
+    Rows are assembled and scored in INFERENCE_CHUNK_SIZE blocks by
+    model_service.predict_proba_matrix, so memory stays bounded for large grids.
+
+    Args:
+        lats: (height,) cell latitudes
+        lons: (width,) cell longitudes
+        target_date: Date used for day_of_year and month features
+        tmax: (height, width) tmax field in Celsius
+        artifacts: Model version to score with
+
+    Returns:
+        Scored Raster
+    """
+    height, width = len(lats), len(lons)
+    mask = _in_bounds_mask(lats, lons)
+    rows, cols = np.nonzero(mask)
+
+    risk = np.full((height, width), NODATA, dtype=np.uint8)
+    probability = np.zeros((height, width), dtype=np.float16)
+
+    if len(rows):
+        columns: Dict[str, np.ndarray] = {
+            "tmax_c": tmax[rows, cols],
+            "day_of_year": np.full(len(rows), compute_day_of_year(target_date)),
+            "month": np.full(len(rows), compute_month(target_date)),
+            "lat": lats[rows],
+            "lon": lons[cols],
+        }
+        X = np.column_stack([columns[c] for c in artifacts.feature_columns]).astype(np.float64)
+        proba = model_service.predict_proba_matrix(X, artifacts=artifacts)
+        labels = proba.argmax(axis=1)
+        risk[rows, cols] = labels.astype(np.uint8)
+        probability[rows, cols] = proba[np.arange(len(labels)), labels].astype(np.float16)
+
+    return Raster(lats=lats, lons=lons, risk=risk, probability=probability)
+
+
+async def build_raster(cache_key: Hashable, lats: np.ndarray, lons: np.ndarray, target_date: date,
+                       source: str, tmax_c: Optional[float], artifacts: ModelArtifacts) -> Raster:
+    """
+    Return a cached raster or build the tmax field and score it.
+
+    Args:
+        cache_key: Key identifying the grid geometry (bbox/resolution or tile)
+        lats, lons: Grid axes
+        target_date: Date to score
+        source: "constant" (uniform tmax_c) or "forecast" (OpenWeather anchors)
+        tmax_c: Temperature for the constant source
+        artifacts: Model version to score with; part of the cache key so a
+                   hot-swapped model never serves rasters from its predecessor
+
+    Returns:
+        Scored Raster
+    """
+    key = (artifacts.version, artifacts.fingerprint, cache_key, target_date, source, tmax_c)
+    cached = RASTER_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    if source == "constant":
+        if tmax_c is None:
+            raise HTTPException(status_code=422, detail="tmax_c is required when source=constant")
+        tmax = np.full((len(lats), len(lons)), tmax_c, dtype=np.float32)
+    else:
+        tmax = await forecast_tmax_field(lats, lons, target_date)
+
+    started = time.perf_counter()
+    raster = await asyncio.to_thread(score_grid, lats, lons, target_date, tmax, artifacts)
+    logger.info(
+        "Scored %dx%d raster for %s (%s) in %.1f ms",
+        raster.shape[0], raster.shape[1], target_date, source, (time.perf_counter() - started) * 1000,
+    )
+    RASTER_CACHE.put(key, raster)
+    return raster
+
+
+def encode_binary(raster: Raster) -> bytes:
+    """
+    Encode a raster as raw bands: uint8 risk labels followed by little-endian float16 probabilities.
+
+    Both bands are row-major (height, width), north-up.
+    """
+    return raster.risk.tobytes() + raster.probability.astype("<f2").tobytes()
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def encode_png(raster: Raster) -> bytes:
+    """
+    Encode the risk-label band as an 8-bit palette PNG (nodata is transparent).
+    """
+    height, width = raster.shape
+    indices = np.where(raster.risk == NODATA, len(PALETTE) - 1, raster.risk).astype(np.uint8)
+    # Each scanline is prefixed with filter type 0 (None)
+    scanlines = np.zeros((height, width + 1), dtype=np.uint8)
+    scanlines[:, 1:] = indices
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)
+    plte = bytes(channel for rgba in PALETTE for channel in rgba[:3])
+    trns = bytes(rgba[3] for rgba in PALETTE)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"PLTE", plte),
+        _png_chunk(b"tRNS", trns),
+        _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)),
+        _png_chunk(b"IEND", b""),
+    ])
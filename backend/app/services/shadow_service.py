@@ -0,0 +1,182 @@
+"""
+Shadow Evaluation Service for HeatGuard API
+
+Mirrors a sampled fraction of prediction batches to a secondary model
+version on a background thread pool and accumulates agreement and
+probability-drift statistics. The primary response never waits on the
+shadow model: submission is a non-blocking hand-off and batches are
+dropped when the pool is saturated.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import (
+    SHADOW_MAX_PENDING,
+    SHADOW_MAX_ROWS,
+    SHADOW_MODEL_VERSION,
+    SHADOW_SAMPLE_RATE,
+    SHADOW_WORKERS,
+)
+from app.services.model_registry import REGISTRY, ModelArtifacts
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """Compares the primary model against a shadow version off the request path."""
+
+    def __init__(self, version: str, sample_rate: float, workers: int,
+                 max_pending: int, max_rows: int):
+        self.version = version
+        self.sample_rate = sample_rate if version else 0.0
+        self.max_pending = max_pending
+        self.max_rows = max_rows
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rng = random.Random()
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.batches_sampled = 0
+            self.batches_dropped = 0
+            self.batches_skipped = 0
+            self.errors = 0
+            self.rows_compared = 0
+            self.rows_agreed = 0
+            self.abs_diff_sum = 0.0
+            self.max_abs_diff = 0.0
+            self.shadow_seconds = 0.0
+            self.confusion: Optional[np.ndarray] = None
+            self.primary_versions: Dict[str, int] = {}
+
+    # -- request path ------------------------------------------------------
+
+    def submit(self, X: np.ndarray, primary_proba: np.ndarray, primary: ModelArtifacts) -> None:
+        """
+        Maybe mirror one primary batch to the shadow model.
+
+        Must stay cheap: a random draw, a bounded copy and an executor hand-off.
+
+        Args:
+            X: Raw (unscaled) features in primary.feature_columns order
+            primary_proba: Primary class probabilities for X
+            primary: Artifacts that produced primary_proba
+        """
+        if not self.enabled or len(X) == 0 or self._rng.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if primary.version == self.version:
+                self.batches_skipped += 1
+                return
+            if self._pending >= self.max_pending:
+                self.batches_dropped += 1
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="shadow")
+
+        if len(X) > self.max_rows:
+            idx = np.sort(np.random.default_rng().choice(len(X), self.max_rows, replace=False))
+            X, primary_proba = X[idx], primary_proba[idx]
+        else:
+            X, primary_proba = np.array(X, copy=True), np.array(primary_proba, copy=True)
+
+        self._executor.submit(self._evaluate, X, primary_proba, primary.version, list(primary.feature_columns))
+
+    # -- background --------------------------------------------------------
+
+    def _evaluate(self, X: np.ndarray, primary_proba: np.ndarray, primary_version: str,
+                  primary_columns: List[str]) -> None:
+        try:
+            started = time.perf_counter()
+            shadow = REGISTRY.get(self.version)
+            frame = pd.DataFrame(X, columns=primary_columns).reindex(columns=shadow.feature_columns, fill_value=0.0)
+            shadow_proba = shadow.model.predict_proba(shadow.scaler.transform(frame))
+            elapsed = time.perf_counter() - started
+            self._record(primary_proba, np.asarray(shadow_proba, dtype=np.float32), primary_version, elapsed)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning("Shadow evaluation against %s failed: %s", self.version, e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, primary_proba: np.ndarray, shadow_proba: np.ndarray,
+                primary_version: str, elapsed: float) -> None:
+        n_classes = max(primary_proba.shape[1], shadow_proba.shape[1])
+        primary_labels = primary_proba.argmax(axis=1)
+        shadow_labels = shadow_proba.argmax(axis=1)
+        if primary_proba.shape[1] == shadow_proba.shape[1]:
+            # Total-variation distance between the two class distributions per row
+            diff = 0.5 * np.abs(primary_proba - shadow_proba).sum(axis=1)
+        else:
+            diff = np.ones(len(primary_proba), dtype=np.float32)
+        confusion = np.bincount(primary_labels * n_classes + shadow_labels,
+                                minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+        with self._lock:
+            self.batches_sampled += 1
+            self.rows_compared += len(primary_labels)
+            self.rows_agreed += int((primary_labels == shadow_labels).sum())
+            self.abs_diff_sum += float(diff.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(diff.max()))
+            self.shadow_seconds += elapsed
+            if self.confusion is None or self.confusion.shape != confusion.shape:
+                self.confusion = confusion
+            else:
+                self.confusion += confusion
+            self.primary_versions[primary_version] = self.primary_versions.get(primary_version, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self.rows_compared
+            return {
+                "enabled": self.enabled,
+                "shadow_version": self.version or None,
+                "sample_rate": self.sample_rate,
+                "primary_versions": dict(self.primary_versions),
+                "batches_sampled": self.batches_sampled,
+                "batches_dropped": self.batches_dropped,
+                "batches_skipped": self.batches_skipped,
+                "pending": self._pending,
+                "errors": self.errors,
+                "rows_compared": rows,
+                "label_agreement": round(self.rows_agreed / rows, 6) if rows else None,
+                "mean_probability_drift": round(self.abs_diff_sum / rows, 6) if rows else None,
+                "max_probability_drift": round(self.max_abs_diff, 6) if rows else None,
+                "mean_shadow_batch_ms": (
+                    round(self.shadow_seconds / self.batches_sampled * 1000, 3) if self.batches_sampled else None
+                ),
+                # confusion[primary_label][shadow_label]
+                "confusion": self.confusion.tolist() if self.confusion is not None else None,
+            }
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+SHADOW = ShadowEvaluator(
+    version=SHADOW_MODEL_VERSION,
+    sample_rate=SHADOW_SAMPLE_RATE,
+    workers=SHADOW_WORKERS,
+    max_pending=SHADOW_MAX_PENDING,
+    max_rows=SHADOW_MAX_ROWS,
+)
@@ -0,0 +1,386 @@
+"""
+Risk Subscription Service for HeatGuard API
+
+Pushes district forecast risk to subscribed clients (Server-Sent Events or
+WebSocket) instead of having every dashboard poll `/predict/bulk` and
+`/forecast/5days` for every district it shows.
+
+Once per refresh cycle the broadcaster fetches the 5-day forecast for every
+district that any subscriber (or the alert engine, see alert_service.py)
+watches, scores the district-days whose inputs changed in one model call
+and diffs the labels against the previous cycle (every scored district-day
+is also offered to the prediction history). Each subscriber is
+then sent only the changed district-days it watches. Subscribers watching
+the same districts (typically the same state) share one encoded message, so
+a cycle costs one computation however many clients are connected.
+
+Each worker process runs its own cycle; forecasts come through the shared
+weather cache, so extra workers do not multiply OpenWeather calls.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    SUBSCRIPTION_FETCH_CONCURRENCY,
+    SUBSCRIPTION_MAX_SUBSCRIBERS,
+    SUBSCRIPTION_QUEUE_SIZE,
+    SUBSCRIPTION_REFRESH_SECONDS,
+    get_risk_level,
+)
+from app.services import district_store, model_service
+from app.services.alert_service import ALERTS
+from app.services.date_utils import compute_date_features_array
+from app.services.history_service import HISTORY
+from app.services.weather_service import extract_daily_max_temps, fetch_openweather_forecast
+from app.utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of a message when the subscription is closed
+CLOSED = object()
+
+
+class SubscriptionLimitError(Exception):
+    """Raised when a worker already serves SUBSCRIPTION_MAX_SUBSCRIBERS subscribers."""
+
+
+class Subscriber:
+    """One connected client and the district rows it watches."""
+
+    __slots__ = ("id", "rows", "row_set", "group", "unmatched", "queue", "connected_at")
+
+    def __init__(self, subscriber_id: int, rows: np.ndarray, unmatched: List[str]):
+        self.id = subscriber_id
+        self.rows = rows
+        self.row_set = frozenset(rows.tolist())
+        # Subscribers with the same rows share encoded messages
+        self.group = rows.tobytes()
+        self.unmatched = unmatched
+        self.queue: "asyncio.Queue[Any]" = asyncio.Queue(max(SUBSCRIPTION_QUEUE_SIZE, 1))
+        self.connected_at = time.time()
+
+    async def next(self, timeout: Optional[float] = None) -> Any:
+        """
+        Next (event, payload) pair, CLOSED, or None if timeout passes first.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def put(self, message: Any) -> bool:
+        """Queue a message without waiting; False if the queue is full."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset(self, message: Any) -> None:
+        """Drop everything undelivered and queue message in its place."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class RiskBroadcaster:
+    """Scores subscribed districts once per cycle and fans out the changes."""
+
+    def __init__(self, refresh_seconds: float = SUBSCRIPTION_REFRESH_SECONDS,
+                 max_subscribers: int = SUBSCRIPTION_MAX_SUBSCRIBERS,
+                 fetch_concurrency: int = SUBSCRIPTION_FETCH_CONCURRENCY):
+        self.refresh_seconds = refresh_seconds
+        self.max_subscribers = max_subscribers
+        self.fetch_concurrency = max(fetch_concurrency, 1)
+        self._subscribers: Dict[int, Subscriber] = {}
+        self._ids = itertools.count(1)
+        # District row -> ISO date -> district-day item as sent to clients
+        self._items: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.cycle = 0
+        self.model_version: Optional[str] = None
+        self.generated_at: Optional[str] = None
+        self.cycles = 0
+        self.last_cycle_seconds: Optional[float] = None
+        self.district_days_scored = 0
+        self.changes = 0
+        self.messages_encoded = 0
+        self.messages_queued = 0
+        self.resyncs = 0
+        self.fetch_errors = 0
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the refresh loop (no-op if running or refresh_seconds <= 0)."""
+        if self.refresh_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Refreshing subscribed district risk every %gs", self.refresh_seconds)
+
+    async def stop(self) -> None:
+        """Stop the refresh loop and end every open subscription."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for subscriber in list(self._subscribers.values()):
+            subscriber.reset(CLOSED)
+        self._subscribers.clear()
+
+    async def _run(self) -> None:
+        while True:
+            # The first cycle runs right away, so alert states are covered from startup
+            if len(self.watched_rows()):
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error("Risk refresh cycle failed: %s", e, exc_info=True)
+            await asyncio.sleep(self.refresh_seconds)
+
+    # -- subscriptions -----------------------------------------------------
+
+    async def subscribe(self, rows: np.ndarray, unmatched: Optional[List[str]] = None) -> Subscriber:
+        """
+        Register a subscriber for district rows and queue its first snapshot.
+
+        Rows nobody watched before are scored first, so the snapshot is
+        complete; concurrent subscribers to the same new rows share that work.
+
+        Raises:
+            SubscriptionLimitError: If this worker is at max_subscribers
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            raise SubscriptionLimitError(f"Subscriber limit of {self.max_subscribers} reached")
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        self.start()
+        await self._score_new_rows(rows)
+
+        # No await from here on, so no cycle can run between the snapshot and registration
+        subscriber = Subscriber(next(self._ids), rows, unmatched or [])
+        self._subscribers[subscriber.id] = subscriber
+        subscriber.put(self._snapshot(subscriber))
+        logger.debug("Subscriber %d watching %d districts", subscriber.id, len(rows))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Forget a subscriber; its districts stop being scored from the next cycle."""
+        self._subscribers.pop(subscriber.id, None)
+
+    # -- refresh -----------------------------------------------------------
+
+    async def refresh(self) -> int:
+        """
+        Run one cycle over every watched district and broadcast the changes.
+
+        Returns:
+            Number of district-days whose risk changed (or appeared)
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            watched = self.watched_rows()
+            # Districts nobody watches any more are dropped, not rescored
+            for row in set(self._items) - set(watched.tolist()):
+                del self._items[row]
+            changes = await self._update(watched)
+            self.cycle += 1
+            self.cycles += 1
+            self.last_cycle_seconds = round(time.perf_counter() - started, 4)
+            self._broadcast(changes)
+        n_changes = sum(len(items) for items in changes.values())
+        logger.info("Risk cycle %d: %d districts, %d district-days changed in %.2fs",
+                    self.cycle, len(watched), n_changes, self.last_cycle_seconds)
+        return n_changes
+
+    async def _score_new_rows(self, rows: np.ndarray) -> None:
+        if all(row in self._items for row in rows.tolist()):
+            return
+        async with self._lock:
+            # Another subscriber may have scored them while this one waited
+            new_rows = np.array([row for row in rows.tolist() if row not in self._items], dtype=np.int64)
+            if len(new_rows):
+                await self._update(new_rows)
+
+    def watched_rows(self) -> np.ndarray:
+        """Rows of every subscriber plus the alert engine's states."""
+        rows = [s.rows for s in self._subscribers.values()]
+        rows.append(ALERTS.watched_rows())
+        return np.unique(np.concatenate(rows))
+
+    async def _update(self, rows: np.ndarray) -> Dict[int, List[Dict[str, Any]]]:
+        """Rescore rows and merge into the current items; returns changed items per row."""
+        scored = await self._score(rows)
+        today = date.today().isoformat()
+        changes: Dict[int, List[Dict[str, Any]]] = {}
+        for row, items in scored.items():
+            previous = self._items.get(row, {})
+            if items is None:
+                # A failed fetch keeps the row's earlier items until the next cycle
+                self._items[row] = {day: item for day, item in previous.items() if day >= today}
+                continue
+            # Days that left the forecast window are dropped; only label changes are sent,
+            # new tmax/probability values of unchanged days reach clients in snapshots
+            self._items[row] = items
+            for day, item in items.items():
+                old = previous.get(day)
+                if old is None or old["risk_label"] != item["risk_label"]:
+                    changes.setdefault(row, []).append(
+                        dict(item, previous_risk_label=old["risk_label"] if old is not None else None)
+                    )
+        self.changes += sum(len(items) for items in changes.values())
+        return changes
+
+    async def _score(self, rows: np.ndarray) -> Dict[int, Optional[Dict[str, Dict[str, Any]]]]:
+        """
+        Fetch forecasts for rows and score their district-days.
+
+        Scoring goes through the alert engine, which only sends district-days
+        with new inputs to the model and logs threshold crossings.
+
+        Returns:
+            Items per row keyed by ISO date; None for rows whose forecast failed
+        """
+        store = district_store.get_store()
+        lats, lons = store.coordinates(rows)
+        # Districts without geocodes sit at (0, 0); there is no forecast for them
+        located = (lats != 0.0) | (lons != 0.0)
+        result: Dict[int, Optional[Dict[str, Dict[str, Any]]]] = {row: {} for row in rows[~located].tolist()}
+        rows, lats, lons = rows[located], lats[located], lons[located]
+        if not len(rows):
+            return result
+
+        # Neighbouring districts often share a forecast cell; fetch each cell once
+        coords, inverse = np.unique(np.column_stack([lats, lons]), axis=0, return_inverse=True)
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def fetch(lat: float, lon: float) -> Optional[List[Dict[str, Any]]]:
+            async with semaphore:
+                try:
+                    return extract_daily_max_temps(await fetch_openweather_forecast(lat, lon))
+                except Exception as e:
+                    self.fetch_errors += 1
+                    logger.warning("Forecast for lat=%s, lon=%s failed: %s", lat, lon, e)
+                    return None
+
+        daily = await asyncio.gather(*(fetch(float(lat), float(lon)) for lat, lon in coords))
+
+        row_idx: List[int] = []
+        day_list: List[date] = []
+        tmax_list: List[float] = []
+        for i, row in enumerate(rows.tolist()):
+            days = daily[inverse[i]]
+            result[row] = None if days is None else {}
+            for day in days or ():
+                row_idx.append(i)
+                day_list.append(day["date"])
+                tmax_list.append(day["tmax_c"])
+        if not row_idx:
+            return result
+
+        artifacts = model_service.get_artifacts()
+        idx = np.asarray(row_idx, dtype=np.int64)
+        dates = np.asarray(day_list, dtype="datetime64[D]")
+        tmax = np.asarray(tmax_list, dtype=np.float64)
+        day_of_year, month = compute_date_features_array(dates)
+        columns = {"tmax_c": tmax, "day_of_year": day_of_year, "month": month, "lat": lats[idx], "lon": lons[idx]}
+        X = np.column_stack([columns[c] for c in artifacts.feature_columns]).astype(np.float64)
+        # Scoring and the history append are CPU-bound; keep them off the event loop
+        labels, confidence = await asyncio.to_thread(
+            ALERTS.score, rows[idx], [d.isoformat() for d in day_list], X, artifacts
+        )
+        await asyncio.to_thread(
+            HISTORY.record, [store.ids[row] for row in rows[idx].tolist()], dates, tmax, labels, confidence,
+            artifacts.version,
+        )
+
+        self.model_version = artifacts.version
+        self.generated_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.district_days_scored += len(labels)
+        for k in range(len(labels)):
+            row = int(rows[idx[k]])
+            day = day_list[k].isoformat()
+            label = int(labels[k])
+            result[row][day] = {
+                "district_id": store.ids[row],
+                "name": store.name(row),
+                "state": store.state(row),
+                "date": day,
+                "tmax_c": tmax_list[k],
+                "risk_label": label,
+                "risk_level": get_risk_level(label),
+                "probability": round(float(confidence[k]), 4),
+            }
+        return result
+
+    # -- fan-out -----------------------------------------------------------
+
+    def _message(self, event: str, items: List[Dict[str, Any]], **extra: Any) -> Tuple[str, bytes]:
+        self.messages_encoded += 1
+        return event, dumps({
+            "type": event,
+            "cycle": self.cycle,
+            "generated_at": self.generated_at,
+            "model_version": self.model_version,
+            **extra,
+            "updates": items,
+        })
+
+    def _snapshot(self, subscriber: Subscriber) -> Tuple[str, bytes]:
+        items = [item for row in subscriber.rows.tolist()
+                 for _, item in sorted(self._items.get(row, {}).items())]
+        extra = {"unmatched_district_ids": subscriber.unmatched} if subscriber.unmatched else {}
+        return self._message("snapshot", items, **extra)
+
+    def _broadcast(self, changes: Dict[int, List[Dict[str, Any]]]) -> None:
+        if not changes:
+            return
+        groups: Dict[bytes, List[Subscriber]] = {}
+        for subscriber in self._subscribers.values():
+            groups.setdefault(subscriber.group, []).append(subscriber)
+
+        changed_rows = sorted(changes)
+        for subscribers in groups.values():
+            row_set = subscribers[0].row_set
+            items = [item for row in changed_rows if row in row_set for item in changes[row]]
+            if not items:
+                continue
+            message = self._message("update", items)
+            for subscriber in subscribers:
+                if subscriber.put(message):
+                    self.messages_queued += 1
+                else:
+                    # Too far behind for deltas to help; one snapshot replaces the backlog
+                    subscriber.reset(self._snapshot(subscriber))
+                    self.resyncs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "subscriber_groups": len({s.group for s in self._subscribers.values()}),
+            "watched_districts": len(self.watched_rows()),
+            "refresh_seconds": self.refresh_seconds,
+            "cycle": self.cycle,
+            "generated_at": self.generated_at,
+            "model_version": self.model_version,
+            "last_cycle_seconds": self.last_cycle_seconds,
+            "district_days_scored": self.district_days_scored,
+            "changes": self.changes,
+            "messages_encoded": self.messages_encoded,
+            "messages_queued": self.messages_queued,
+            "resyncs": self.resyncs,
+            "fetch_errors": self.fetch_errors,
+        }
+
+
+BROADCASTER = RiskBroadcaster()
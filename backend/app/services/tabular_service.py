@@ -0,0 +1,242 @@
+"""
+Tabular Scoring Service for HeatGuard API
+
+Reads CSV or Parquet station data in bounded row batches, derives model
+features, scores each batch with model_service and writes the batch back
+with risk columns appended, in the same format it came in.
+
+Input files need `lat`, `lon` and `tmax_c` columns plus either a `date`
+column (YYYY-MM-DD) or both `day_of_year` and `month`. Any other columns
+are passed through unchanged.
+"""
+
+import io
+import logging
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.config import RISK_LABEL_TO_LEVEL
+from app.services import model_service
+from app.services.model_registry import ModelArtifacts
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+REQUIRED_COLUMNS = ("lat", "lon", "tmax_c")
+OUTPUT_COLUMNS = ("risk_label", "risk_level", "risk_probability")
+
+Source = Union[str, BinaryIO]
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """
+    Decide between CSV and Parquet from the upload's name or content type.
+
+    Raises:
+        ValueError: If neither identifies a supported format
+    """
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith((".parquet", ".pq")) or "parquet" in content_type:
+        return "parquet"
+    if name.endswith((".csv", ".csv.gz", ".txt")) or content_type in ("text/csv", "application/csv", "text/plain"):
+        return "csv"
+    raise ValueError(f"Unsupported file type {filename!r}; upload a .csv or .parquet file")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("Parquet support requires pyarrow, which is not installed") from e
+    return pq
+
+
+def iter_frames(source: Source, fmt: str, batch_rows: int, skip_batches: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Yield the input as DataFrames of at most batch_rows rows.
+
+    Args:
+        source: File path or binary file object
+        fmt: "csv" or "parquet"
+        batch_rows: Rows per yielded batch
+        skip_batches: Leading batches to skip without building DataFrames
+                      where the format allows it (used to resume jobs)
+    """
+    if fmt == "parquet":
+        pq = _require_pyarrow()
+        parquet = pq.ParquetFile(source)
+        for index, batch in enumerate(parquet.iter_batches(batch_size=batch_rows)):
+            if index >= skip_batches:
+                yield batch.to_pandas()
+        return
+
+    skip_rows = skip_batches * batch_rows
+    reader = pd.read_csv(source, chunksize=batch_rows,
+                         skiprows=(lambda i: 0 < i <= skip_rows) if skip_rows else None)
+    try:
+        yield from reader
+    finally:
+        # The caller may already have closed an uploaded file object
+        if not getattr(source, "closed", False):
+            reader.close()
+
+
+def count_rows(path: str, fmt: str) -> int:
+    """Row count for progress reporting (CSV: data lines, so approximate with quoted newlines)."""
+    if fmt == "parquet":
+        return _require_pyarrow().ParquetFile(path).metadata.num_rows
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def feature_matrix(df: pd.DataFrame, feature_columns: List[str]) -> np.ndarray:
+    """
+    Build the raw feature matrix for one batch.
+
+    Raises:
+        ValueError: If required columns are missing or values cannot be parsed
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if "date" not in df.columns and not {"day_of_year", "month"} <= set(df.columns):
+        missing.append("date (or day_of_year and month)")
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    columns = {}
+    for name in REQUIRED_COLUMNS:
+        values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            raise ValueError(f"Column {name!r} has missing or non-numeric values")
+        columns[name] = values
+
+    if "date" in df.columns:
+        dates = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+        if dates.isna().any():
+            raise ValueError("Column 'date' has missing values or values not in YYYY-MM-DD format")
+        columns["day_of_year"] = dates.dt.dayofyear.to_numpy(dtype=np.float64)
+        columns["month"] = dates.dt.month.to_numpy(dtype=np.float64)
+    else:
+        for name in ("day_of_year", "month"):
+            values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+            if np.isnan(values).any():
+                raise ValueError(f"Column {name!r} has missing or non-numeric values")
+            columns[name] = values
+
+    unknown = [c for c in feature_columns if c not in columns]
+    if unknown:
+        logger.warning("Tabular scoring missing features (defaulting to 0): %s", unknown)
+    return np.column_stack([columns.get(c, np.zeros(len(df))) for c in feature_columns])
+
+
+def score_frame(df: pd.DataFrame, artifacts: ModelArtifacts, shadow: bool = True) -> pd.DataFrame:
+    """
+    Score one batch and return it with risk_label, risk_level and
+    risk_probability (probability of the assigned label) appended.
+    """
+    X = feature_matrix(df, artifacts.feature_columns)
+    proba = model_service.predict_proba_matrix(X, artifacts=artifacts, shadow=shadow)
+    labels = proba.argmax(axis=1)
+    levels = np.array([RISK_LABEL_TO_LEVEL.get(i, "Unknown") for i in range(proba.shape[1])], dtype=object)
+
+    out = df.copy(deep=False)
+    out["risk_label"] = labels.astype(np.int8)
+    out["risk_level"] = levels[labels]
+    out["risk_probability"] = proba[np.arange(len(labels)), labels].astype(np.float64).round(6)
+    return out
+
+
+def write_frame(df: pd.DataFrame, target: Source, fmt: str) -> None:
+    """Write one annotated batch as a complete CSV or Parquet file."""
+    if fmt == "parquet":
+        _require_pyarrow()
+        df.to_parquet(target, index=False)
+    else:
+        df.to_csv(target, index=False)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footers record absolute offsets, so this must not reset on drain
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _scored_batches(first: pd.DataFrame, rest: Iterable[pd.DataFrame],
+                    artifacts: ModelArtifacts) -> Iterator[pd.DataFrame]:
+    yield first
+    for frame in rest:
+        yield score_frame(frame, artifacts)
+
+
+def stream_scored(first: pd.DataFrame, rest: Iterable[pd.DataFrame], fmt: str,
+                  artifacts: ModelArtifacts) -> Iterator[bytes]:
+    """
+    Encode an already scored first batch, then score and encode the rest one
+    batch at a time.
+
+    CSV output repeats the header only once; Parquet output writes one row
+    group per batch and the footer at the end. Only one batch is held in
+    memory at a time.
+    """
+    batches = _scored_batches(first, rest, artifacts)
+    if fmt == "parquet":
+        import pyarrow as pa
+        pq = _require_pyarrow()
+
+        sink = _ChunkSink()
+        writer = None
+        for batch in batches:
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            elif not table.schema.equals(writer.schema):
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            yield sink.drain()
+        if writer is not None:
+            writer.close()
+        yield sink.drain()
+        return
+
+    header = True
+    for batch in batches:
+        buffer = io.StringIO()
+        batch.to_csv(buffer, index=False, header=header)
+        header = False
+        yield buffer.getvalue().encode()
@@ -0,0 +1,429 @@
+"""
+Threshold Service for HeatGuard API
+
+Per-district tmax breakpoint tables. For a fixed district and calendar day
+the model's risk label only depends on tmax_c, and the tree ensemble can
+only change its output where tmax crosses one of its own split thresholds
+on that feature (a few dozen values). Between two adjacent thresholds the
+label is constant, so the label for any tmax is fully described by which
+threshold interval it falls into.
+
+The precompute (benchmarks/thresholds.py) bisects over those intervals for
+every located district x calendar slot (a distinct day_of_year/month pair)
+to find the first interval at each risk level, and stores the interval
+indices as a compact uint8 array next to the model file. A lookup is then
+a `searchsorted` of tmax into the thresholds plus a comparison against at
+most three breakpoints, with no model call.
+
+Tables are tied to the model artifacts and district data they were built
+from; a table whose tokens no longer match is ignored until rebuilt.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import BASE_MODEL_VERSION, INFERENCE_CHUNK_SIZE, MODELS_DIR, THRESHOLD_TABLE_FILE
+from app.services import district_store, model_service
+from app.services.date_utils import compute_date_features_array
+from app.services.model_registry import ModelArtifacts, get_project_root
+
+logger = logging.getLogger(__name__)
+
+TMAX_COLUMN = "tmax_c"
+
+
+# =============================================================================
+# Model and data tokens
+# =============================================================================
+
+def model_token(artifacts: ModelArtifacts) -> str:
+    """Token of a version's artifact files (names, sizes and mtimes)."""
+    parts = [(Path(path).name, size, mtime) for path, size, mtime in artifacts.fingerprint]
+    return hashlib.blake2b(repr((artifacts.version, parts)).encode(), digest_size=8).hexdigest()
+
+
+_store_token: Tuple[Any, str] = (None, "")
+
+
+def store_token(store: district_store.DistrictStore) -> str:
+    """Token of the district ids and coordinates a table's rows refer to."""
+    global _store_token
+    if _store_token[0] is not store:
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update("\n".join(store.ids).encode())
+        digest.update(np.ascontiguousarray(store.lat, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(store.lon, dtype=np.float64).tobytes())
+        _store_token = (store, digest.hexdigest())
+    return _store_token[1]
+
+
+# =============================================================================
+# Candidate breakpoints
+# =============================================================================
+
+_split_cache: Dict[Tuple[str, str], np.ndarray] = {}
+
+
+def split_thresholds(artifacts: ModelArtifacts) -> np.ndarray:
+    """
+    Distinct tmax split thresholds of a model version, in raw degrees Celsius.
+
+    Raises:
+        ValueError: If the model has no tmax_c feature or cannot be compiled
+    """
+    key = (artifacts.version, model_token(artifacts))
+    cached = _split_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if TMAX_COLUMN not in artifacts.feature_columns:
+        raise ValueError(f"Model version {artifacts.version} has no {TMAX_COLUMN} feature")
+    column = artifacts.feature_columns.index(TMAX_COLUMN)
+    compiled = artifacts.compiled
+    if compiled is None:
+        from app.services.tree_compiler import compile_model
+
+        compiled = compile_model(artifacts.model)
+
+    splits = compiled.threshold[(compiled.feature == column) & np.isfinite(compiled.threshold)]
+    scaled = np.unique(splits).astype(np.float64)
+    mean = getattr(artifacts.scaler, "mean_", None)
+    scale = getattr(artifacts.scaler, "scale_", None)
+    if mean is not None and scale is not None:
+        raw = scaled * scale[column] + mean[column]
+    else:
+        X = np.zeros((len(scaled), len(artifacts.feature_columns)))
+        X[:, column] = scaled
+        raw = np.asarray(artifacts.scaler.inverse_transform(X))[:, column]
+    raw = np.unique(raw)
+    _split_cache[key] = raw
+    return raw
+
+
+def _representatives(thresholds: np.ndarray) -> np.ndarray:
+    # One tmax inside each of the len(thresholds) + 1 intervals; interval j
+    # is [thresholds[j-1], thresholds[j]) with open ends at both sides
+    if not len(thresholds):
+        return np.zeros(1)
+    midpoints = (thresholds[:-1] + thresholds[1:]) / 2
+    return np.concatenate([[thresholds[0] - 1.0], midpoints, [thresholds[-1] + 1.0]])
+
+
+def _feature_matrix(artifacts: ModelArtifacts, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.column_stack([columns[c] for c in artifacts.feature_columns]).astype(np.float64)
+
+
+def _labels(artifacts: ModelArtifacts, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    # Straight to the model: these rows are synthetic, so they must neither
+    # fill the prediction cache nor be mirrored to shadow evaluation
+    X = _feature_matrix(artifacts, columns)
+    labels = np.empty(len(X), dtype=np.int8)
+    for start in range(0, len(X), INFERENCE_CHUNK_SIZE):
+        chunk = X[start:start + INFERENCE_CHUNK_SIZE]
+        proba = model_service.predict_proba_scaled(model_service.scale_features(chunk, artifacts), artifacts)
+        labels[start:start + len(chunk)] = np.asarray(proba).argmax(axis=1)
+    return labels
+
+
+def n_classes(artifacts: ModelArtifacts) -> int:
+    classes = getattr(artifacts.model, "classes_", None)
+    return len(classes) if classes is not None else artifacts.compiled.n_classes
+
+
+# =============================================================================
+# Tables
+# =============================================================================
+
+def calendar_slots() -> Tuple[np.ndarray, np.ndarray]:
+    """Every distinct (day_of_year, month) pair of a leap and a non-leap year."""
+    days = np.arange(np.datetime64("2023-01-01"), np.datetime64("2025-01-01"), dtype="datetime64[D]")
+    day_of_year, month = compute_date_features_array(days)
+    pairs = np.unique(np.stack([day_of_year, month], axis=1), axis=0)
+    return pairs[:, 0].astype(np.int16), pairs[:, 1].astype(np.int8)
+
+
+@dataclass(frozen=True)
+class ThresholdTable:
+    """Breakpoint interval indices per (district row, calendar slot, risk level)."""
+    version: str
+    model_token: str
+    store_token: str
+    thresholds: np.ndarray      # (T,) sorted tmax split thresholds, degrees Celsius
+    breakpoints: np.ndarray     # (n_districts, n_slots, n_classes - 1) uint8; T + 1 = never reached
+    slot_doy: np.ndarray        # (n_slots,) day_of_year of each slot
+    slot_month: np.ndarray      # (n_slots,) month of each slot
+    located: np.ndarray         # (n_districts,) bool, rows with coordinates (the others are not tabled)
+    meta: Dict[str, Any] = field(default_factory=dict)
+    slot_of: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        slot_of = np.full((367, 13), -1, dtype=np.int16)
+        slot_of[self.slot_doy.astype(np.intp), self.slot_month.astype(np.intp)] = np.arange(len(self.slot_doy))
+        object.__setattr__(self, "slot_of", slot_of)
+
+    @property
+    def unreachable(self) -> int:
+        return len(self.thresholds) + 1
+
+    def covers(self, rows: np.ndarray) -> bool:
+        return bool(len(rows)) and bool(self.located[rows].all())
+
+    def slots(self, dates: np.ndarray) -> np.ndarray:
+        day_of_year, month = compute_date_features_array(dates)
+        return self.slot_of[day_of_year, month]
+
+    def row_breakpoints(self, row: int, dates: np.ndarray) -> np.ndarray:
+        """(n_dates, n_classes - 1) interval indices for one tabled district."""
+        return self.breakpoints[row, self.slots(dates)]
+
+    def horizon_labels(self, rows: np.ndarray, dates: np.ndarray, tmax: np.ndarray) -> np.ndarray:
+        """
+        Risk labels for a districts x dates x scenarios cross product.
+
+        Args:
+            rows: (n_districts,) tabled district rows (see covers)
+            dates: (n_dates,) datetime64[D] array
+            tmax: (n_scenarios, n_dates) tmax in Celsius
+
+        Returns:
+            uint8 array of shape (n_districts, n_dates, n_scenarios)
+        """
+        bp = self.breakpoints[rows][:, self.slots(dates)]                  # (d, n, k)
+        interval = np.searchsorted(self.thresholds, tmax.T, side="right")  # (n, s)
+        return (bp[:, :, None, :] <= interval[None, :, :, None]).sum(axis=-1, dtype=np.uint8)
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.thresholds, self.breakpoints, self.slot_doy, self.slot_month,
+                                      self.located, self.slot_of))
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        meta = dict(self.meta, version=self.version, model_token=self.model_token, store_token=self.store_token)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # np.savez appends .npz to names without it, so the temp name keeps the suffix
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez_compressed(
+            tmp_path, thresholds=self.thresholds, breakpoints=self.breakpoints, slot_doy=self.slot_doy,
+            slot_month=self.slot_month, located=self.located, meta=np.array(json.dumps(meta)),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ThresholdTable":
+        with np.load(path, allow_pickle=False) as f:
+            meta = json.loads(str(f["meta"]))
+            return cls(
+                version=meta.pop("version"), model_token=meta.pop("model_token"),
+                store_token=meta.pop("store_token"), thresholds=f["thresholds"], breakpoints=f["breakpoints"],
+                slot_doy=f["slot_doy"], slot_month=f["slot_month"], located=f["located"], meta=meta,
+            )
+
+
+def table_path(version: str) -> Path:
+    models_dir = get_project_root() / MODELS_DIR
+    if version == BASE_MODEL_VERSION:
+        return models_dir / THRESHOLD_TABLE_FILE
+    return models_dir / version / THRESHOLD_TABLE_FILE
+
+
+def build_table(artifacts: ModelArtifacts, store: Optional[district_store.DistrictStore] = None,
+                progress: Optional[Callable[[str], None]] = None) -> ThresholdTable:
+    """
+    Bisect the model for every located district x calendar slot.
+
+    For each risk level k = 1..n_classes-1 the first threshold interval whose
+    label is >= k is found by bisection, starting from level k-1's
+    breakpoint. Labels are memoized per (cell, interval), so intervals probed
+    for one level are not scored again for the next. This assumes the label
+    does not decrease as tmax rises; verify_table measures how well that
+    holds against a full scan.
+    """
+    store = store or district_store.get_store()
+    started = time.perf_counter()
+    thresholds = split_thresholds(artifacts)
+    points = _representatives(thresholds)
+    n_intervals = len(points)
+    levels = n_classes(artifacts) - 1
+    if n_intervals + 1 > np.iinfo(np.uint8).max:
+        raise ValueError(f"{len(thresholds)} tmax thresholds do not fit a uint8 table")
+
+    slot_doy, slot_month = calendar_slots()
+    located = (store.lat != 0) | (store.lon != 0)
+    located_rows = np.nonzero(located)[0]
+    n_slots = len(slot_doy)
+    cell_row = np.repeat(located_rows, n_slots)
+    cell_slot = np.tile(np.arange(n_slots), len(located_rows))
+    n_cells = len(cell_row)
+
+    memo = np.full((n_cells, n_intervals), -1, dtype=np.int8)
+    evaluated = 0
+
+    def label_at(cells: np.ndarray, intervals: np.ndarray) -> np.ndarray:
+        nonlocal evaluated
+        unknown = memo[cells, intervals] < 0
+        if unknown.any():
+            c, j = cells[unknown], intervals[unknown]
+            rows, slots = cell_row[c], cell_slot[c]
+            memo[c, j] = _labels(artifacts, {
+                TMAX_COLUMN: points[j],
+                "day_of_year": slot_doy[slots],
+                "month": slot_month[slots],
+                "lat": store.lat[rows],
+                "lon": store.lon[rows],
+            })
+            evaluated += len(c)
+        return memo[cells, intervals]
+
+    cell_bp = np.empty((n_cells, levels), dtype=np.int64)
+    lower = np.zeros(n_cells, dtype=np.int64)
+    for k in range(1, levels + 1):
+        lo, hi = lower.copy(), np.full(n_cells, n_intervals, dtype=np.int64)
+        while True:
+            active = np.nonzero(lo < hi)[0]
+            if not len(active):
+                break
+            mid = (lo[active] + hi[active]) // 2
+            reached = label_at(active, mid) >= k
+            hi[active[reached]] = mid[reached]
+            lo[active[~reached]] = mid[~reached] + 1
+        cell_bp[:, k - 1] = lo
+        lower = lo
+        if progress:
+            progress(f"level {k}/{levels}: {evaluated} model rows scored")
+
+    breakpoints = np.full((len(store), n_slots, levels), n_intervals, dtype=np.uint8)
+    breakpoints[cell_row, cell_slot] = cell_bp
+    seconds = time.perf_counter() - started
+    return ThresholdTable(
+        version=artifacts.version,
+        model_token=model_token(artifacts),
+        store_token=store_token(store),
+        thresholds=thresholds,
+        breakpoints=breakpoints,
+        slot_doy=slot_doy,
+        slot_month=slot_month,
+        located=located,
+        meta={
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "cells": n_cells,
+            "intervals": n_intervals,
+            "model_rows": evaluated,
+            "full_scan_rows": n_cells * n_intervals,
+            "build_seconds": round(seconds, 1),
+        },
+    )
+
+
+def verify_table(table: ThresholdTable, artifacts: ModelArtifacts, cells: int = 2000,
+                 seed: int = 0, store: Optional[district_store.DistrictStore] = None) -> Dict[str, Any]:
+    """
+    Compare table labels with the model over every interval of sampled cells.
+
+    Returns:
+        Agreement over all sampled (cell, interval) pairs and the share of
+        cells whose label does not decrease with tmax
+    """
+    store = store or district_store.get_store()
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(np.nonzero(table.located)[0], cells)
+    slots = rng.integers(0, len(table.slot_doy), cells)
+    points = _representatives(table.thresholds)
+    n_intervals = len(points)
+
+    flat_row, flat_slot = np.repeat(rows, n_intervals), np.repeat(slots, n_intervals)
+    model = _labels(artifacts, {
+        TMAX_COLUMN: np.tile(points, cells),
+        "day_of_year": table.slot_doy[flat_slot],
+        "month": table.slot_month[flat_slot],
+        "lat": store.lat[flat_row],
+        "lon": store.lon[flat_row],
+    }).reshape(cells, n_intervals)
+    bp = table.breakpoints[rows, slots]
+    tabled = (bp[:, None, :] <= np.arange(n_intervals)[None, :, None]).sum(axis=-1)
+    return {
+        "cells": cells,
+        "intervals": n_intervals,
+        "agreement": round(float((tabled == model).mean()), 6),
+        "cells_exact": round(float((tabled == model).all(axis=1).mean()), 6),
+        "monotone_cells": round(float((np.diff(model, axis=1) >= 0).all(axis=1).mean()), 6),
+    }
+
+
+_tables: Dict[str, Tuple[Tuple, Optional[ThresholdTable]]] = {}
+
+
+def get_table(artifacts: ModelArtifacts) -> Optional[ThresholdTable]:
+    """
+    The breakpoint table of a model version, or None if absent or stale.
+
+    Loaded once per file version; a table built for other artifacts or
+    other district data is ignored (and logged once).
+    """
+    path = table_path(artifacts.version)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    store = district_store.get_store()
+    key = (mtime, model_token(artifacts), store_token(store))
+    cached = _tables.get(artifacts.version)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    table: Optional[ThresholdTable] = None
+    try:
+        loaded = ThresholdTable.load(path)
+        if loaded.model_token != key[1] or loaded.store_token != key[2]:
+            logger.warning("Ignoring stale tmax threshold table %s (rebuild with benchmarks/thresholds.py)", path)
+        else:
+            table = loaded
+            logger.info("Loaded tmax threshold table for model version %s (%d thresholds, %.1f MB)",
+                        artifacts.version, len(table.thresholds), table.nbytes() / 1e6)
+    except Exception as e:
+        logger.error("Could not load tmax threshold table %s: %s", path, e)
+    _tables[artifacts.version] = (key, table)
+    return table
+
+
+def compute_breakpoints(artifacts: ModelArtifacts, lat: float, lon: float,
+                        dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Breakpoints for one location straight from the model, without a table.
+
+    Scores every threshold interval of every date (a few hundred rows), so
+    the result is exact even where the label is not monotone in tmax.
+
+    Returns:
+        Tuple of (thresholds, (n_dates, n_classes - 1) interval indices)
+    """
+    thresholds = split_thresholds(artifacts)
+    points = _representatives(thresholds)
+    n_intervals, n_dates = len(points), len(dates)
+    day_of_year, month = compute_date_features_array(dates)
+    labels = _labels(artifacts, {
+        TMAX_COLUMN: np.tile(points, n_dates),
+        "day_of_year": np.repeat(day_of_year, n_intervals),
+        "month": np.repeat(month, n_intervals),
+        "lat": np.full(n_dates * n_intervals, lat),
+        "lon": np.full(n_dates * n_intervals, lon),
+    }).reshape(n_dates, n_intervals)
+    levels = np.arange(1, n_classes(artifacts))
+    reached = labels[:, :, None] >= levels[None, None, :]
+    # First interval at each level; argmax is 0 for "never", hence the where
+    breakpoints = np.where(reached.any(axis=1), reached.argmax(axis=1), n_intervals)
+    return thresholds, breakpoints
+
+
+def breakpoint_tmax(thresholds: np.ndarray, interval: int) -> Optional[float]:
+    """Lowest tmax inside a threshold interval (None for the open lower interval)."""
+    return float(thresholds[interval - 1]) if 0 < interval <= len(thresholds) else None
@@ -0,0 +1,223 @@
+"""
+Tree Compiler for HeatGuard API
+
+Flattens a fitted XGBoost tree ensemble into contiguous NumPy node arrays
+and evaluates it for a whole batch with vectorized gathers, skipping
+XGBoost's per-call DMatrix and predictor setup.
+
+Every tree is laid out as a complete binary tree of the ensemble's maximum
+depth (children of slot i at 2i+1 and 2i+2). Leaves above the bottom level
+are pushed down as pass-through nodes that always go left and carry their
+value to the bottom-level slot, so each batch takes exactly max_depth steps
+with no per-row branching. Splits use XGBoost's rule: go left when
+float32(x) < threshold, and follow the default direction for missing values.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Soft cap on rows x trees node indices held at once while evaluating
+EVAL_BLOCK_CELLS = 1 << 20
+
+
+@dataclass(frozen=True)
+class CompiledEnsemble:
+    """A multi-class tree ensemble as flat arrays, ready for predict_proba."""
+    depth: int
+    n_classes: int
+    feature: np.ndarray         # (n_trees, 2**depth - 1) int32 split feature per internal slot
+    threshold: np.ndarray       # (n_trees, 2**depth - 1) float32, +inf for pass-through slots
+    default_left: np.ndarray    # (n_trees, 2**depth - 1) bool, direction for NaN inputs
+    leaf_value: np.ndarray      # (n_trees, 2**depth) float32 value of each bottom-level slot
+    tree_class: np.ndarray      # (n_trees,) int32 output class of each tree, sorted
+    class_start: np.ndarray     # (n_classes,) index of each class's first tree
+    base_margin: np.ndarray     # (n_classes,) float32 margin before any tree
+
+    @property
+    def n_trees(self) -> int:
+        return self.feature.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.default_left, self.leaf_value,
+                                      self.tree_class, self.class_start, self.base_margin))
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """
+        Raw per-class margins for scaled features.
+
+        Args:
+            X: (n_rows, n_features) scaled feature matrix
+
+        Returns:
+            (n_rows, n_classes) float32 margins
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        margins = np.empty((n_rows, self.n_classes), dtype=np.float32)
+        block = max(1, EVAL_BLOCK_CELLS // max(self.n_trees, 1))
+        for start in range(0, n_rows, block):
+            margins[start:start + block] = self._margin_block(X[start:start + block])
+        return margins
+
+    def _margin_block(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_features = X.shape
+        n_internal = self.feature.shape[1]
+        has_missing = bool(np.isnan(X).any())
+
+        # Flat views so one gather covers every (row, tree) pair. node holds the
+        # global slot (tree * n_internal + local slot) of each pair.
+        feature = self.feature.reshape(-1)
+        threshold = self.threshold.reshape(-1)
+        default_left = self.default_left.reshape(-1)
+        X_flat = X.reshape(-1)
+        tree_base = np.arange(self.n_trees, dtype=np.intp) * n_internal
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+
+        node = np.broadcast_to(tree_base, (n_rows, self.n_trees)).copy()
+        local = np.zeros_like(node)
+        for _ in range(self.depth):
+            column = np.take(feature, node)
+            column += row_offset
+            value = np.take(X_flat, column)
+            go_right = value >= np.take(threshold, node)
+            if has_missing:
+                missing = np.isnan(value)
+                go_right[missing] = ~np.take(default_left, node)[missing]
+            # local -> 2 * local + 1 + go_right, and the global slot moves by the same amount
+            step = local + 1
+            step += go_right
+            local += step
+            node += step
+        # Bottom-level local slots map to leaf columns local - n_internal
+        leaf = local - n_internal
+        leaf += (np.arange(self.n_trees, dtype=np.intp) * (n_internal + 1))[None, :]
+        values = np.take(self.leaf_value.reshape(-1), leaf)
+        # Trees are stored grouped by class, so each class is one contiguous run
+        sums = np.add.reduceat(values, self.class_start, axis=1, dtype=np.float64)
+        return (sums + self.base_margin).astype(np.float32)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities (softmax of the margins) for scaled features.
+
+        Returns:
+            (n_rows, n_classes) float32 array
+        """
+        margins = self.predict_margin(X)
+        margins -= margins.max(axis=1, keepdims=True)
+        np.exp(margins, out=margins)
+        margins /= margins.sum(axis=1, keepdims=True)
+        return margins
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.predict_margin(X).argmax(axis=1)
+
+
+def _base_margin(booster: Any, n_classes: int, n_features: int) -> np.ndarray:
+    """Margin of an empty ensemble, read back from XGBoost rather than re-derived."""
+    import xgboost as xgb
+
+    # One round is enough: the base margin does not depend on the trees
+    empty = json.loads(booster[:1].save_raw("json"))
+    for tree in empty["learner"]["gradient_booster"]["model"]["trees"]:
+        for field in ("split_conditions", "base_weights"):
+            tree[field] = [0.0 if child == -1 else v for v, child in zip(tree[field], tree["left_children"])]
+    zeroed = xgb.Booster()
+    zeroed.load_model(bytearray(json.dumps(empty).encode()))
+    probe = xgb.DMatrix(np.zeros((1, n_features), dtype=np.float32))
+    return zeroed.predict(probe, output_margin=True).reshape(-1)[:n_classes].astype(np.float32)
+
+
+def compile_model(model: Any) -> CompiledEnsemble:
+    """
+    Compile a fitted XGBClassifier (or Booster) into a CompiledEnsemble.
+
+    Raises:
+        ValueError: If the model uses features the flat layout cannot express
+                    (non-gbtree boosters, non-softmax objectives or categorical splits)
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    dump: Dict[str, Any] = json.loads(booster.save_raw("json"))
+    learner = dump["learner"]
+    gbm = learner["gradient_booster"]
+    if gbm.get("name") != "gbtree":
+        raise ValueError(f"Only gbtree boosters can be compiled, got {gbm.get('name')}")
+    objective = learner["objective"]["name"]
+    if objective not in ("multi:softprob", "multi:softmax"):
+        raise ValueError(f"Only multi-class softmax objectives can be compiled, got {objective}")
+
+    trees = gbm["model"]["trees"]
+    tree_info = gbm["model"]["tree_info"]
+    n_classes = max(int(learner["learner_model_param"].get("num_class", "0")), 1)
+    n_features = int(learner["learner_model_param"]["num_feature"])
+
+    def node_depth(tree: Dict[str, Any]) -> int:
+        depth, stack = 0, [(0, 0)]
+        while stack:
+            nid, d = stack.pop()
+            if tree["left_children"][nid] == -1:
+                depth = max(depth, d)
+            else:
+                stack.append((tree["left_children"][nid], d + 1))
+                stack.append((tree["right_children"][nid], d + 1))
+        return depth
+
+    for tree in trees:
+        if any(t != 0 for t in tree.get("split_type", [])):
+            raise ValueError("Categorical splits cannot be compiled")
+
+    depth = max(1, max(node_depth(t) for t in trees))
+    n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+    feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+    threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+    default_left = np.ones((len(trees), n_internal), dtype=bool)
+    leaf_value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+
+    # Group trees by output class (stable, so boosting order is kept within a class)
+    tree_class = np.asarray(tree_info, dtype=np.int32)
+    order = np.argsort(tree_class, kind="stable")
+    tree_class = tree_class[order]
+    if not np.array_equal(np.unique(tree_class), np.arange(n_classes)):
+        raise ValueError("Every class must have at least one tree")
+    trees = [trees[i] for i in order]
+
+    for t, tree in enumerate(trees):
+        left, right = tree["left_children"], tree["right_children"]
+        split_index, split_condition = tree["split_indices"], tree["split_conditions"]
+        dflt = tree["default_left"]
+        # (source node, slot in the complete layout, level)
+        stack = [(0, 0, 0)]
+        while stack:
+            nid, slot, level = stack.pop()
+            if left[nid] == -1:
+                # Leaf: walk left down to the bottom level
+                while slot < n_internal:
+                    slot = 2 * slot + 1
+                leaf_value[t, slot - n_internal] = split_condition[nid]
+                continue
+            feature[t, slot] = split_index[nid]
+            threshold[t, slot] = split_condition[nid]
+            default_left[t, slot] = bool(dflt[nid])
+            stack.append((left[nid], 2 * slot + 1, level + 1))
+            stack.append((right[nid], 2 * slot + 2, level + 1))
+
+    compiled = CompiledEnsemble(
+        depth=depth,
+        n_classes=n_classes,
+        feature=feature,
+        threshold=threshold,
+        default_left=default_left,
+        leaf_value=leaf_value,
+        tree_class=tree_class,
+        class_start=np.searchsorted(tree_class, np.arange(n_classes)).astype(np.intp),
+        base_margin=_base_margin(booster, n_classes, n_features),
+    )
+    logger.debug("Compiled %d trees of depth %d (%d bytes)", compiled.n_trees, depth, compiled.nbytes)
+    return compiled
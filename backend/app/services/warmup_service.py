@@ -0,0 +1,167 @@
+"""
+Startup Warm-up for HeatGuard API
+
+The model is loaded and run once before the app starts (model_registry),
+but the first real requests still pay for everything else that is set up
+lazily: FastAPI building its validators and serializers on the first call
+of each route, XGBoost allocating its prediction buffers for larger
+batches, the district store encoding its JSON responses, the threshold
+table being read from disk, and the first TCP + TLS handshake with
+OpenWeather.
+
+Right after startup, WARMUP runs a representative set of requests through
+the full app in-process, primes the district caches and opens upstream
+connections. /ready answers 503 until it is done, so a load balancer sends
+traffic only to warm workers, while /health keeps answering as the
+liveness probe. On shutdown /ready turns 503 again so the worker is taken
+out of rotation before it stops.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from app.config import WARMUP_BULK_ROWS, WARMUP_ENABLED, WARMUP_HTTP_CONNECTIONS
+from app.services import district_store, threshold_service, weather_service
+from app.services.model_service import get_artifacts, is_model_loaded
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+STOPPING = "stopping"
+
+# Peer address of the in-process warm-up requests, so they never use up
+# the rate limit of a real client
+WARMUP_CLIENT = ("heatguard-warmup", 0)
+
+
+def _points(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Points spread over the IMD grid, the year and the tmax range."""
+    rng = np.random.default_rng(seed)
+    days = np.datetime64("2025-01-01") + rng.integers(0, 365, n)
+    return [
+        {"lat": round(lat, 3), "lon": round(lon, 3), "tmax_c": round(tmax, 1), "date": str(day)}
+        for lat, lon, tmax, day in zip(rng.uniform(8.0, 35.0, n).tolist(), rng.uniform(68.0, 97.0, n).tolist(),
+                                       rng.uniform(25.0, 48.0, n).tolist(), days.tolist())
+    ]
+
+
+class Warmup:
+    """Runs the warm-up once per startup and tracks readiness."""
+
+    def __init__(self, enabled: bool = WARMUP_ENABLED, bulk_rows: int = WARMUP_BULK_ROWS,
+                 http_connections: int = WARMUP_HTTP_CONNECTIONS):
+        self.enabled = enabled
+        self.bulk_rows = bulk_rows
+        self.http_connections = http_connections
+        self.status = STARTING
+        self.steps: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.duration_ms: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY and is_model_loaded()
+
+    def start(self, app) -> None:
+        """Warm up in the background; /ready turns true when it is done."""
+        self.steps, self.errors, self.duration_ms = {}, {}, None
+        if not self.enabled:
+            self.status = READY
+            return
+        self.status = WARMING
+        self._task = asyncio.create_task(self._run(app))
+
+    async def stop(self) -> None:
+        """Report not ready (so load balancers drain the worker) and cancel a running warm-up."""
+        self.status = STOPPING
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _step(self, name: str, coro) -> None:
+        started = time.perf_counter()
+        try:
+            await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # A failed step leaves that path cold but must not keep the worker out of rotation
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            self.errors[name] = str(e) or type(e).__name__
+        self.steps[name] = round((time.perf_counter() - started) * 1000.0, 1)
+
+    async def _run(self, app) -> None:
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app, client=WARMUP_CLIENT)
+        async with httpx.AsyncClient(transport=transport, base_url="http://warmup", timeout=60.0) as client:
+            await self._step("http_pool", self._http_pool())
+            await self._step("district_caches", self._district_caches())
+            await self._step("predict_single", self._predict_single(client))
+            await self._step("predict_bulk", self._predict_bulk(client))
+            await self._step("districts", self._districts(client))
+        self.duration_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        if self.status == WARMING:
+            self.status = READY
+        logger.info("Warm-up finished in %.0f ms (%s)", self.duration_ms,
+                    ", ".join(f"{k} {v:.0f} ms" for k, v in self.steps.items()))
+
+    async def _http_pool(self) -> None:
+        opened = await weather_service.warm_http_pool(self.http_connections)
+        logger.debug("Opened %d upstream connections", opened)
+
+    async def _district_caches(self) -> None:
+        store = district_store.get_store()
+        store.records_json("all", store.all_rows())
+        for state in store.state_names():
+            store.records_json(f"state:{district_store.norm(state)}", store.rows_for_state(state))
+        # Read from disk on first use by /predict/horizon and /districts/{id}/thresholds
+        await asyncio.to_thread(threshold_service.get_table, get_artifacts())
+
+    async def _request(self, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> None:
+        response = await client.request(method, url, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} answered {response.status_code}")
+
+    async def _predict_single(self, client: httpx.AsyncClient) -> None:
+        # Dated and undated points take different validation paths
+        for point in _points(2, seed=1):
+            await self._request(client, "POST", "/predict/single", json=point)
+        await self._request(client, "POST", "/predict/single", json={"lat": 28.6, "lon": 77.2, "tmax_c": 41.0})
+
+    async def _predict_bulk(self, client: httpx.AsyncClient) -> None:
+        await self._request(client, "POST", "/predict/bulk", json={"points": _points(8, seed=2)})
+        await self._request(client, "POST", "/predict/bulk", json={"points": _points(self.bulk_rows, seed=3)})
+
+    async def _districts(self, client: httpx.AsyncClient) -> None:
+        store = district_store.get_store()
+        await self._request(client, "GET", "/districts")
+        await self._request(client, "GET", "/districts/states")
+        states = store.state_names()
+        if states:
+            await self._request(client, "GET", "/districts/by-state", params={"state": states[0]})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "status": self.status,
+            "model_loaded": is_model_loaded(),
+            "warmup_enabled": self.enabled,
+            "warmup_ms": self.duration_ms,
+            "steps_ms": dict(self.steps),
+            "errors": dict(self.errors),
+        }
+
+
+WARMUP = Warmup()
@@ -2,22 +2,124 @@
 Weather Service for HeatGuard API
 
 Handles fetching weather forecasts from OpenWeather API.
+
+Forecasts and geocoding results are cached in the two-tier cache
+(app/services/cache_service.py), shared by all workers, so each location is
+fetched from OpenWeather at most once per WEATHER_CACHE_TTL_SECONDS.
+Upstream calls go through one pooled client per worker, which keeps
+connections alive between calls.
 """
 
+import asyncio
 import logging
 from datetime import datetime, date
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from collections import defaultdict
 
 import httpx
 from fastapi import HTTPException
 
-from app.config import OPENWEATHER_API_KEY, OPENWEATHER_BASE_URL
+from app.config import (
+    GEOCODE_CACHE_TTL_SECONDS,
+    OPENWEATHER_API_KEY,
+    OPENWEATHER_BASE_URL,
+    OPENWEATHER_GEOCODE_URL,
+    OPENWEATHER_KEEPALIVE_SECONDS,
+    OPENWEATHER_MAX_CONNECTIONS,
+    WEATHER_CACHE_COORD_DECIMALS,
+    WEATHER_CACHE_TTL_SECONDS,
+)
+from app.services.cache_service import CACHE
+from app.utils.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The worker's pooled upstream client, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=OPENWEATHER_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENWEATHER_MAX_CONNECTIONS,
+                keepalive_expiry=OPENWEATHER_KEEPALIVE_SECONDS,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the pooled client and its connections (on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def warm_http_pool(connections: int) -> int:
+    """
+    Open keep-alive connections to OpenWeather ahead of the first forecast.
+
+    Each connection is opened with a keyless request, which OpenWeather
+    answers with 401 without counting against the API quota; the connection
+    then stays in the pool for the next real call.
+
+    Args:
+        connections: Connections to open
+
+    Returns:
+        Connections opened (0 without an API key, when no upstream calls
+        will be made anyway)
+    """
+    if not OPENWEATHER_API_KEY or connections <= 0:
+        return 0
+    client = get_http_client()
+
+    async def probe(url: str) -> bool:
+        try:
+            await client.head(url, timeout=10.0)
+            return True
+        except httpx.RequestError as e:
+            logger.warning("Could not open a connection to %s: %s", url, e)
+            return False
+
+    # Forecast and geocoding live on different hosts / schemes
+    urls = [OPENWEATHER_BASE_URL] * connections + [OPENWEATHER_GEOCODE_URL]
+    return sum(await asyncio.gather(*(probe(url) for url in urls)))
+
 
 async def fetch_openweather_forecast(lat: float, lon: float) -> Dict[str, Any]:
+    """
+    Raw OpenWeather 5-day/3-hour forecast JSON for a location, cached.
+
+    Coordinates are rounded to WEATHER_CACHE_COORD_DECIMALS before both the
+    cache lookup and the upstream call, so nearby requests share one entry.
+    Concurrent misses for the same location make a single upstream call.
+
+    Args:
+        lat: Latitude of the location
+        lon: Longitude of the location
+
+    Returns:
+        Raw JSON response from OpenWeather API (shared; do not modify)
+
+    Raises:
+        HTTPException(500): If OpenWeather API key is not configured
+        HTTPException(502): If OpenWeather API returns an error
+    """
+    lat = round(lat, WEATHER_CACHE_COORD_DECIMALS)
+    lon = round(lon, WEATHER_CACHE_COORD_DECIMALS)
+    key = f"forecast:{lat:.{WEATHER_CACHE_COORD_DECIMALS}f}:{lon:.{WEATHER_CACHE_COORD_DECIMALS}f}"
+    return await CACHE.namespace("weather").get_or_load(
+        key, lambda: request_openweather_forecast(lat, lon), WEATHER_CACHE_TTL_SECONDS,
+    )
+
+
+async def request_openweather_forecast(lat: float, lon: float) -> Dict[str, Any]:
     """
     Calls OpenWeather 5-day/3-hour forecast API and returns the raw JSON.
 
@@ -48,26 +150,30 @@ async def fetch_openweather_forecast(lat: float, lon: float) -> Dict[str, Any]:
     }
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(OPENWEATHER_BASE_URL, params=params)
-
-            if response.status_code != 200:
-                logger.error(f"OpenWeather API error: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"Failed to fetch forecast from OpenWeather: {response.status_code}"
-                )
-
+        client = get_http_client()
+        with span("weather.upstream") as upstream:
+            response = await client.get(OPENWEATHER_BASE_URL, params=params, timeout=30.0)
+            upstream.set("http.response.status_code", response.status_code)
+
+        if response.status_code != 200:
+            logger.error("OpenWeather API error: %s - %s", response.status_code, response.text)
+            raise HTTPException(
+                status_code=502,
+                detail=f"Failed to fetch forecast from OpenWeather: {response.status_code}"
+            )
+
+        with span("weather.decode", bytes=len(response.content)):
             return response.json()
 
     except httpx.RequestError as e:
-        logger.error(f"Request error when calling OpenWeather: {e}")
+        logger.error("Request error when calling OpenWeather: %s", e)
         raise HTTPException(
             status_code=502,
             detail="Failed to connect to OpenWeather API"
         )
 
 
+@traced("weather.extract")
 def extract_daily_max_temps(openweather_json: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Extract daily maximum temperatures from OpenWeather 5-day/3-hour forecast.
@@ -113,7 +219,7 @@ def extract_daily_max_temps(openweather_json: Dict[str, Any]) -> List[Dict[str,
             daily_data[forecast_date]["humidities"].append(humidity)
 
         except (ValueError, KeyError) as e:
-            logger.warning(f"Error parsing forecast item: {e}")
+            logger.warning("Error parsing forecast item: %s", e)
             continue
 
     # Get today's date to filter future days only
@@ -140,7 +246,37 @@ def extract_daily_max_temps(openweather_json: Dict[str, Any]) -> List[Dict[str,
     return result[:5]
 
 
-async def search_location_by_name(query: str) -> List[Dict[str, Any]]:
+async def search_location_by_name(query: str, strict: bool = False) -> List[Dict[str, Any]]:
+    """
+    Search for a location by name using OpenWeather Geocoding API, cached.
+
+    Args:
+        query: City name to search for (e.g., "Mumbai", "Delhi,IN")
+        strict: Raise on upstream errors instead of returning [], so an
+            empty list always means the geocoder knows no such place
+
+    Returns:
+        List of matching locations with lat, lon, name, state, country
+
+    Raises:
+        HTTPException(500): If the API key is not configured
+        HTTPException(502): If strict and the geocoder failed
+    """
+    key = "geocode:" + " ".join(query.lower().split())
+
+    async def load():
+        # Nothing found is cheap to ask again; leave it uncached
+        return await request_geocode(query) or None
+
+    try:
+        return await CACHE.namespace("weather").get_or_load(key, load, GEOCODE_CACHE_TTL_SECONDS) or []
+    except HTTPException as e:
+        if strict or e.status_code != 502:
+            raise
+        return []
+
+
+async def request_geocode(query: str) -> List[Dict[str, Any]]:
     """
     Search for a location by name using OpenWeather Geocoding API.
 
@@ -149,6 +285,10 @@ async def search_location_by_name(query: str) -> List[Dict[str, Any]]:
 
     Returns:
         List of matching locations with lat, lon, name, state, country
+
+    Raises:
+        HTTPException(500): If the API key is not configured
+        HTTPException(502): If the geocoder answers with an error or cannot be reached
     """
     if not OPENWEATHER_API_KEY:
         logger.error("OpenWeather API key not configured")
@@ -157,8 +297,6 @@ async def search_location_by_name(query: str) -> List[Dict[str, Any]]:
             detail="OpenWeather API key not configured"
         )
 
-    # OpenWeather Geocoding API endpoint
-    url = "http://api.openweathermap.org/geo/1.0/direct"
     params = {
         "q": query,
         "limit": 5,
@@ -166,15 +304,22 @@ async def search_location_by_name(query: str) -> List[Dict[str, Any]]:
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
+        client = get_http_client()
+        with span("weather.geocode"):
+            response = await client.get(OPENWEATHER_GEOCODE_URL, params=params, timeout=10.0)
 
-            if response.status_code != 200:
-                logger.error(f"OpenWeather Geocoding API error: {response.status_code}")
-                return []
+        if response.status_code != 200:
+            logger.error("OpenWeather Geocoding API error: %s", response.status_code)
+            raise HTTPException(
+                status_code=502,
+                detail=f"Failed to geocode with OpenWeather: {response.status_code}"
+            )
 
-            return response.json()
+        return response.json()
 
     except httpx.RequestError as e:
-        logger.error(f"Request error when calling OpenWeather Geocoding: {e}")
-        return []
+        logger.error("Request error when calling OpenWeather Geocoding: %s", e)
+        raise HTTPException(
+            status_code=502,
+            detail=f"Failed to connect to OpenWeather Geocoding: {str(e)}"
+        )
@@ -0,0 +1,146 @@
+"""
+Sparse Fieldsets and Cursor Pagination for HeatGuard API
+
+`fields=a,b,c` trims each result object to the listed fields, and
+`limit=` / `cursor=` split a long result list into pages. Both are opt-in:
+without them the endpoints answer exactly as before.
+
+Cursors are opaque URL-safe tokens carrying the next offset, the page size
+and a fingerprint of the query they belong to, so a cursor replayed
+against a different query is rejected instead of silently skipping rows.
+The next page's cursor is sent in the X-Next-Cursor header, with a
+Link: <...>; rel="next" header for GET endpoints and the total result
+count in X-Total-Count, so list-shaped response bodies keep their shape.
+"""
+
+import base64
+import binascii
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from app.config import PAGE_MAX_LIMIT
+from app.utils.responses import dumps, loads
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+# Headers browsers may read from cross-origin responses
+EXPOSED_HEADERS = [NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, "Link"]
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str],
+                 always: Sequence[str] = ()) -> Optional[FrozenSet[str]]:
+    """
+    Parse a comma-separated `fields` query parameter.
+
+    Args:
+        fields: The raw parameter; None or empty selects every field
+        allowed: Field names the endpoint can return
+        always: Fields included whether listed or not (e.g. ids)
+
+    Returns:
+        The selected field names, or None for all fields
+
+    Raises:
+        HTTPException: 422 for unknown field names
+    """
+    if not fields or not fields.strip():
+        return None
+    selected = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = selected.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(allowed)}",
+        )
+    return frozenset(selected.union(always))
+
+
+def ordered(selected: Optional[FrozenSet[str]], allowed: Sequence[str]) -> List[str]:
+    """Selected fields in the endpoint's canonical order (all fields for None)."""
+    return [f for f in allowed if selected is None or f in selected]
+
+
+@dataclass(frozen=True)
+class Page:
+    """The slice of results one request returns."""
+    start: int
+    end: int
+    total: int
+    limit: Optional[int]
+    next_cursor: Optional[str]
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None
+
+    def headers(self, request: Optional[Request] = None) -> Dict[str, str]:
+        """Pagination headers; Link only for GET requests, whose URL can be replayed."""
+        if not self.paginated:
+            return {}
+        headers = {TOTAL_COUNT_HEADER: str(self.total)}
+        if self.next_cursor is not None:
+            headers[NEXT_CURSOR_HEADER] = self.next_cursor
+            if request is not None and request.method == "GET":
+                url = request.url.include_query_params(cursor=self.next_cursor, limit=self.limit)
+                headers["Link"] = f'<{url}>; rel="next"'
+        return headers
+
+    def apply(self, response: Response, request: Optional[Request] = None) -> None:
+        response.headers.update(self.headers(request))
+
+
+def _fingerprint(query: str) -> str:
+    return hashlib.blake2b(query.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def encode_cursor(offset: int, limit: int, query: str) -> str:
+    token = dumps([offset, limit, _fingerprint(query)])
+    return base64.urlsafe_b64encode(token).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, query: str) -> Tuple[int, int]:
+    """
+    Raises:
+        HTTPException: 422 for a malformed cursor or one issued for another query
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset, limit, fingerprint = loads(raw)
+        offset, limit = int(offset), int(limit)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Malformed cursor")
+    if fingerprint != _fingerprint(query) or offset < 0 or limit < 1:
+        raise HTTPException(status_code=422, detail="Cursor does not belong to this query")
+    return offset, limit
+
+
+def paginate(total: int, query: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """
+    Resolve the page of `total` results a request asks for.
+
+    Args:
+        total: Number of results of the whole query
+        query: Canonical description of the query (path and the parameters
+               that change the result list), bound into the cursors
+        limit: Page size; the cursor's page size when omitted with a cursor
+        cursor: Cursor from the previous page's X-Next-Cursor header
+
+    Raises:
+        HTTPException: 422 for an invalid cursor or limit
+    """
+    if limit is not None and not 1 <= limit <= PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {PAGE_MAX_LIMIT}")
+    if cursor:
+        offset, cursor_limit = decode_cursor(cursor, query)
+        limit = limit or cursor_limit
+    elif limit is None:
+        return Page(0, total, total, None, None)
+    else:
+        offset = 0
+    start = min(offset, total)
+    end = min(start + limit, total)
+    next_cursor = encode_cursor(end, limit, query) if end < total else None
+    return Page(start, end, total, limit, next_cursor)
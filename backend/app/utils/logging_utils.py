@@ -2,39 +2,231 @@
 Logging Utilities for HeatGuard API
 
 Provides logging configuration and setup.
+
+Records are handed to a QueueHandler and written by a background
+QueueListener thread, so request handlers never block on stdout; message
+arguments are also merged there, which keeps `logger.debug("...%s", obj)`
+free when the level is disabled and cheap when it is not. The JSON format
+emits one object per line with the trace id of the request that logged it
+and any `extra={...}` fields.
+
+Per-route sampling: AccessLogMiddleware decides once per request, from the
+longest matching prefix in LOG_SAMPLE_RATES, whether that request's access
+line and INFO/DEBUG records are kept. Warnings and errors always pass.
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
 import sys
-from typing import Optional
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from app.config import (
+    LOG_ASYNC,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_DEFAULT,
+    LOG_SAMPLE_RATES,
+)
+from app.utils import tracing
+from app.utils.responses import dumps
+
+DEFAULT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Whether INFO/DEBUG records of the current request are kept
+_REQUEST_SAMPLED: ContextVar[bool] = ContextVar("heatguard_log_sampled", default=True)
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class LogSampler:
+    """Per-path-prefix sampling rates for request-scoped logs."""
+
+    def __init__(self, rates: Dict[str, float], default: float = 1.0):
+        # Longest prefix first, so the most specific rule wins
+        self.rules = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self.default = default
+        self._cache: Dict[str, float] = {}
+        self._rng = random.Random()
+
+    @property
+    def active(self) -> bool:
+        return self.default < 1.0 or any(rate < 1.0 for _, rate in self.rules)
+
+    def rate_for(self, path: str) -> float:
+        rate = self._cache.get(path)
+        if rate is None:
+            rate = next((r for prefix, r in self.rules if path.startswith(prefix)), self.default)
+            # Paths with ids in them are unbounded; only cache a bounded number
+            if len(self._cache) < 4096:
+                self._cache[path] = rate
+        return rate
+
+    def sample(self, path: str) -> bool:
+        rate = self.rate_for(path)
+        return rate >= 1.0 or (rate > 0.0 and self._rng.random() < rate)
+
+
+SAMPLER = LogSampler(LOG_SAMPLE_RATES, LOG_SAMPLE_DEFAULT)
+
+
+def set_request_sampled(sampled: bool):
+    """Mark the current request as kept or sampled away; returns a reset token."""
+    return _REQUEST_SAMPLED.set(sampled)
+
+
+def reset_request_sampled(token) -> None:
+    _REQUEST_SAMPLED.reset(token)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Drops INFO/DEBUG records of requests sampled away and stamps the trace id.
+
+    Runs on the calling thread before the record is queued, where the
+    request's context variables are still visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not _REQUEST_SAMPLED.get():
+            return False
+        trace = tracing.current_trace()
+        if trace is not None:
+            record.trace_id = trace.trace_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, context, extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                  + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        try:
+            return dumps(entry).decode()
+        except TypeError:
+            # Unserializable extra; fall back to its repr rather than losing the record
+            return dumps({k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+                          for k, v in entry.items()}).decode()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that defers all formatting to the listener thread.
+
+    The stock prepare() merges args into the message on the calling thread;
+    records stay in-process here, so they are queued untouched. When the
+    queue is full the record is dropped and counted instead of blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 def setup_logging(
-    level: int = logging.INFO,
-    log_format: Optional[str] = None
+    level: Optional[int] = None,
+    log_format: Optional[str] = None,
+    structured: Optional[bool] = None,
+    use_queue: Optional[bool] = None,
 ) -> None:
     """
     Configure logging for the application.
 
+    Safe to call more than once; each call replaces the previous setup.
+
     Args:
-        level: Logging level (default: INFO)
-        log_format: Custom log format string (optional)
+        level: Logging level (default: LOG_LEVEL)
+        log_format: Custom log format string for text output (optional)
+        structured: Emit JSON lines (default: LOG_FORMAT == "json")
+        use_queue: Write from a background thread (default: LOG_ASYNC)
     """
-    if log_format is None:
-        log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    global _listener, _queue_handler
+
+    if level is None:
+        level = logging.getLevelName(LOG_LEVEL)
+        if not isinstance(level, int):
+            level = logging.INFO
+    if structured is None:
+        structured = LOG_FORMAT == "json"
+    if use_queue is None:
+        use_queue = LOG_ASYNC
+
+    shutdown_logging()
 
-    # Configure root logger
-    logging.basicConfig(
-        level=level,
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if structured else logging.Formatter(log_format or DEFAULT_LOG_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if use_queue:
+        _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(RequestContextFilter())
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler)
+        _listener.start()
+        root.addHandler(_queue_handler)
+    else:
+        stream_handler.addFilter(RequestContextFilter())
+        root.addHandler(stream_handler)
+    root.setLevel(level)
 
     # Set specific log levels for noisy libraries
     logging.getLogger("uvicorn").setLevel(logging.INFO)
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    if structured or use_queue:
+        # Route uvicorn's records through the same (JSON / queued) handler
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread, if one is running."""
+    global _listener, _queue_handler
+    # Detach first so nothing is queued after the listener has drained
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+atexit.register(shutdown_logging)
 
 
 def get_logger(name: str) -> logging.Logger:
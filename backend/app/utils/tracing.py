@@ -0,0 +1,416 @@
+"""
+Request Tracing for HeatGuard API
+
+Lightweight in-process spans for breaking a request's latency down by stage
+(upstream call, JSON decoding, feature extraction, inference, serialization).
+
+    with span("weather.upstream", url=OPENWEATHER_BASE_URL):
+        response = await client.get(...)
+
+TracingMiddleware (app/middleware.py) opens one trace per HTTP request and
+reports the per-stage totals in a `Server-Timing` response header. Finished
+traces can also be exported in the OpenTelemetry OTLP/JSON format, either
+appended to a local file (one ExportTraceServiceRequest per line, as read by
+the collector's otlpjsonfile receiver) or POSTed to an OTLP/HTTP collector.
+
+Outside a traced request span() returns a shared no-op object, so the cost of
+instrumentation with tracing disabled is one context variable lookup.
+"""
+
+import functools
+import inspect
+import itertools
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+from app.config import (
+    TRACE_EXPORT,
+    TRACE_EXPORT_PATH,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_SAMPLE_RATE,
+    TRACE_SERVICE_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+# Span kinds and status codes of the OTLP data model
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER = 1, 2
+STATUS_CODE_ERROR = 2
+
+EXPORT_MAX_QUEUE = 2048
+EXPORT_BATCH_TRACES = 256
+EXPORT_INTERVAL_SECONDS = 2.0
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_TRACE: ContextVar[Optional["Trace"]] = ContextVar("heatguard_trace", default=None)
+# Id of the innermost open span (0 is the trace's root span)
+_PARENT: ContextVar[int] = ContextVar("heatguard_span_parent", default=0)
+
+
+class Span:
+    """
+    One timed stage. Times are perf_counter_ns readings; span ids are small
+    integers, turned into random OTLP ids only when the trace is exported.
+    """
+    __slots__ = ("name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, span_id: int, parent_id: Optional[int], start_ns: int,
+                 attributes: Optional[Dict[str, Any]] = None, kind: int = SPAN_KIND_INTERNAL):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes if attributes is not None else {}
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans of one request. Spans may be added from worker threads."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, remote_parent_id: Optional[str] = None,
+                 sampled: bool = False):
+        self._trace_id = trace_id
+        self.remote_parent_id = remote_parent_id
+        self.sampled = sampled
+        # Wall-clock anchor for export; durations come from perf_counter_ns
+        self.wall_start_ns = time.time_ns()
+        self.perf_start_ns = time.perf_counter_ns()
+        self.root = Span(name, 0, None, self.perf_start_ns, kind=SPAN_KIND_SERVER)
+        self.spans: List[Span] = []
+        self.response_start_ns: Optional[int] = None
+        # next() on a count is atomic, so threads can allocate ids too
+        self._ids = itertools.count(1)
+
+    @property
+    def trace_id(self) -> str:
+        if self._trace_id is None:
+            self._trace_id = f"{random.getrandbits(128):032x}"
+        return self._trace_id
+
+    def next_span_id(self) -> int:
+        return next(self._ids)
+
+    def finish(self) -> None:
+        self.root.end_ns = time.perf_counter_ns()
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: summed duration per stage name in first
+        seen order, plus `parse` (request start to endpoint start),
+        `serialize` (endpoint end to response start) and `total`.
+        """
+        now = self.response_start_ns or time.perf_counter_ns()
+        totals: Dict[str, float] = {}
+        endpoint: Optional[Span] = None
+        for s in list(self.spans):
+            if s.name == "endpoint":
+                endpoint = s
+            totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+        metrics = []
+        if endpoint is not None:
+            metrics.append(("parse", (endpoint.start_ns - self.perf_start_ns) / 1e6))
+        metrics.extend(totals.items())
+        if endpoint is not None and endpoint.end_ns is not None:
+            metrics.append(("serialize", (now - endpoint.end_ns) / 1e6))
+        metrics.append(("total", (now - self.perf_start_ns) / 1e6))
+        return ", ".join(f"{name};dur={ms:.2f}" for name, ms in metrics)
+
+    def to_otlp_spans(self) -> List[Dict[str, Any]]:
+        offset = self.wall_start_ns - self.perf_start_ns
+        # Random per-trace base so span ids are unique across traces
+        base = random.getrandbits(64)
+
+        def otlp_id(span_id: int) -> str:
+            return f"{(base + span_id) & 0xFFFFFFFFFFFFFFFF:016x}"
+
+        out = []
+        for s in [self.root, *self.spans]:
+            end_ns = s.end_ns or self.root.end_ns or time.perf_counter_ns()
+            item: Dict[str, Any] = {
+                "traceId": self.trace_id,
+                "spanId": otlp_id(s.span_id),
+                "name": s.name,
+                "kind": s.kind,
+                "startTimeUnixNano": str(s.start_ns + offset),
+                "endTimeUnixNano": str(end_ns + offset),
+                "attributes": [_otlp_attribute(k, v) for k, v in s.attributes.items()],
+            }
+            if s.parent_id is not None:
+                item["parentSpanId"] = otlp_id(s.parent_id)
+            elif self.remote_parent_id:
+                item["parentSpanId"] = self.remote_parent_id
+            if s.error:
+                item["status"] = {"code": STATUS_CODE_ERROR, "message": s.error}
+            out.append(item)
+        return out
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class _ActiveSpan:
+    """Context manager returned by span() inside a traced request."""
+    __slots__ = ("_trace", "_span", "_token")
+
+    def __init__(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        self._trace = trace
+        self._span = Span(name, trace.next_span_id(), _PARENT.get(), 0, attributes)
+        self._token: Optional[Token] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self._span.attributes[key] = value
+
+    def __enter__(self) -> "_ActiveSpan":
+        self._span.start_ns = time.perf_counter_ns()
+        self._token = _PARENT.set(self._span.span_id)
+        self._trace.spans.append(self._span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._span.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self._span.error = exc_type.__name__
+        _PARENT.reset(self._token)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Time a block as a child of the current span.
+
+    Args:
+        name: Stage name, reported in Server-Timing (use dotted tokens, e.g. "model.inference")
+        **attributes: Exported span attributes; the yielded object's set() adds more
+
+    Returns:
+        A context manager; a shared no-op one when the request is not traced
+    """
+    trace = _TRACE.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _ActiveSpan(trace, name, attributes)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of span() for whole functions, sync or async."""
+    def decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                trace = _TRACE.get()
+                if trace is None:
+                    return await fn(*args, **kwargs)
+                with _ActiveSpan(trace, name, {}):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _TRACE.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with _ActiveSpan(trace, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+def start_trace(name: str, traceparent: Optional[str] = None) -> Trace:
+    """
+    Create a request trace, joining the caller's trace when a valid W3C
+    traceparent header is given (its sampled flag forces export).
+    """
+    sampled = TRACE_SAMPLE_RATE >= 1.0 or random.random() < TRACE_SAMPLE_RATE
+    if traceparent:
+        match = _TRACEPARENT.match(traceparent.strip().lower())
+        if match and match.group(1) != "0" * 32:
+            sampled = sampled or bool(int(match.group(3), 16) & 1)
+            return Trace(name, match.group(1), match.group(2), sampled)
+    return Trace(name, sampled=sampled)
+
+
+def activate(trace: Optional[Trace]) -> Token:
+    return _TRACE.set(trace)
+
+
+def deactivate(token: Token) -> None:
+    _TRACE.reset(token)
+
+
+class TracedRoute(APIRoute):
+    """
+    APIRoute that times its endpoint as an "endpoint" span, so request
+    parsing and response serialization show up as separate stages.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        super().__init__(path, traced("endpoint")(endpoint), **kwargs)
+
+
+# -- export ------------------------------------------------------------------
+
+class TraceExporter:
+    """
+    Background OTLP/JSON exporter. Traces are queued without blocking the
+    request and written in batches; when the queue is full they are dropped.
+
+    Args:
+        mode: "file", "otlp", or "" to disable export
+        path: File that batches are appended to (mode "file")
+        endpoint: OTLP/HTTP traces URL (mode "otlp")
+        service_name: Reported as the service.name resource attribute
+    """
+
+    def __init__(self, mode: str, path: str, endpoint: str, service_name: str):
+        self.mode = mode
+        self.path = Path(path)
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=EXPORT_MAX_QUEUE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("file", "otlp")
+
+    def submit(self, trace: Trace) -> None:
+        if not self.enabled or not trace.sampled:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Trace] = []
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_TRACES:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._export(batch)
+
+    def _payload(self, traces: List[Trace]) -> bytes:
+        spans = [s for trace in traces for s in trace.to_otlp_spans()]
+        return json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "heatguard"}, "spans": spans}],
+            }],
+        }, separators=(",", ":")).encode("utf-8")
+
+    def _export(self, traces: List[Trace]) -> None:
+        try:
+            payload = self._payload(traces)
+            if self.mode == "file":
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "ab") as f:
+                    f.write(payload + b"\n")
+            else:
+                import httpx
+
+                response = httpx.post(self.endpoint, content=payload, timeout=5.0,
+                                      headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+            self.exported += len(traces)
+        except Exception as e:
+            self.failed += len(traces)
+            logger.warning("Trace export of %d trace(s) failed: %s", len(traces), e)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush queued traces and stop the export thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode or None,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queued": self._queue.qsize(),
+        }
+
+
+def _export_path() -> str:
+    path = Path(TRACE_EXPORT_PATH)
+    if path.is_absolute():
+        return str(path)
+    return str(Path(__file__).resolve().parents[2] / path)
+
+
+EXPORTER = TraceExporter(TRACE_EXPORT, _export_path(), TRACE_OTLP_ENDPOINT, TRACE_SERVICE_NAME)
+if TRACE_EXPORT and not EXPORTER.enabled:
+    logger.warning("Unknown HEATGUARD_TRACE_EXPORT %r; expected 'file' or 'otlp'", TRACE_EXPORT)
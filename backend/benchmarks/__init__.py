@@ -0,0 +1,5 @@
+"""
+HeatGuard API Benchmarks
+
+Reproducible load-test and latency benchmarks for the HeatGuard API.
+"""
@@ -0,0 +1,202 @@
+"""
+HeatGuard Admission Control Benchmark
+
+Starts a uvicorn worker (with the stubbed weather provider) in a child
+process and runs a mixed load against it: several clients keep posting
+large /predict/bulk batches, retrying after Retry-After when turned away,
+while interactive clients call /predict/single and /districts/by-state at a
+steady pace. The same load runs with admission control off and on, and the
+report compares the interactive latency, the bulk throughput and what the
+admission controller queued and rejected.
+
+The server runs in its own process because bulk requests hold its event
+loop while they parse and score; a load generator sharing that loop would
+stall with it and under-report the interactive latency.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_admission --output admission.json
+    python -m benchmarks.bench_admission --bulk-clients 16 --bulk-rows 50000 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+import orjson
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.bench_api import _free_port, _random_point  # noqa: E402
+
+# Each simulated client sends its own id, so per-client rate limits apply
+# per client rather than to the load generator's single address
+CLIENT_HEADER = "x-bench-client"
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+            "max": round(float(ms.max()), 2)}
+
+
+async def run_load(client: httpx.AsyncClient, args: argparse.Namespace, states: List[str]) -> Dict[str, Any]:
+    """Run the mixed load for args.duration seconds."""
+    rng = random.Random(args.seed)
+    bulk_body = orjson.dumps({"points": [_random_point(rng) for _ in range(args.bulk_rows)]})
+    deadline = time.perf_counter() + args.duration
+    bulk = {"completed": 0, "rejected": 0, "latencies": []}
+    interactive = {"completed": 0, "rejected": 0, "errors": 0, "latencies": []}
+
+    async def bulk_client(n: int) -> None:
+        headers = {"content-type": "application/json", CLIENT_HEADER: f"bulk-{n}"}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/predict/bulk", content=bulk_body, headers=headers)
+            if response.status_code == 200:
+                bulk["completed"] += 1
+                bulk["latencies"].append(time.perf_counter() - started)
+            else:
+                bulk["rejected"] += 1
+                await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+
+    async def interactive_client(n: int) -> None:
+        client_rng = random.Random(args.seed + n)
+        headers = {CLIENT_HEADER: f"interactive-{n}"}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if client_rng.random() < 0.5:
+                response = await client.post("/predict/single", json=_random_point(client_rng), headers=headers)
+            else:
+                response = await client.get("/districts/by-state", params={"state": client_rng.choice(states)},
+                                            headers=headers)
+            elapsed = time.perf_counter() - started
+            if response.status_code in (429, 503):
+                interactive["rejected"] += 1
+            elif response.status_code >= 400:
+                interactive["errors"] += 1
+            else:
+                interactive["completed"] += 1
+                interactive["latencies"].append(elapsed)
+            await asyncio.sleep(max(args.interval_ms / 1000.0 - elapsed, 0.0))
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(bulk_client(n) for n in range(args.bulk_clients)),
+        *(interactive_client(n) for n in range(args.interactive_clients)),
+    )
+    elapsed = time.perf_counter() - started
+    return {
+        "duration_s": round(elapsed, 2),
+        "interactive": {
+            "completed": interactive["completed"],
+            "rejected": interactive["rejected"],
+            "errors": interactive["errors"],
+            "latency_ms": _percentiles(interactive["latencies"]),
+        },
+        "bulk": {
+            "completed": bulk["completed"],
+            "rejected": bulk["rejected"],
+            "rows_per_s": round(bulk["completed"] * args.bulk_rows / elapsed, 1),
+            "latency_ms": _percentiles(bulk["latencies"]),
+        },
+    }
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            if time.perf_counter() > deadline:
+                raise
+        await asyncio.sleep(0.2)
+
+
+async def run_config(args: argparse.Namespace, admission: bool, states: List[str]) -> Dict[str, Any]:
+    """Start a server with admission control on or off and run the load against it."""
+    port = _free_port()
+    env = dict(os.environ, HEATGUARD_ADMISSION="1" if admission else "0",
+               HEATGUARD_ADMISSION_CLIENT_HEADER=CLIENT_HEADER, HEATGUARD_LOG_LEVEL="WARNING")
+    cmd = [sys.executable, "-m", "benchmarks.stubs", "--port", str(port),
+           "--upstream-latency-ms", str(args.upstream_latency_ms)]
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limits = httpx.Limits(max_connections=args.bulk_clients + args.interactive_clients + 2)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=300.0) as client:
+            await _wait_ready(client)
+            result = await run_load(client, args, states)
+            if admission:
+                result["admission"] = (await client.get("/health/admission")).json()["classes"]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return result
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.services.district_store import get_store
+
+    states = get_store().state_names() or ["Maharashtra"]
+    results = {}
+    for name, admission in (("admission_off", False), ("admission_on", True)):
+        results[name] = result = await run_config(args, admission, states)
+        print(f"{name:14s} interactive {result['interactive']['completed']} ok "
+              f"p50={result['interactive']['latency_ms']['p50']}ms "
+              f"p99={result['interactive']['latency_ms']['p99']}ms  "
+              f"bulk {result['bulk']['rows_per_s']} rows/s", file=sys.stderr)
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HeatGuard admission control benchmark")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per configuration")
+    parser.add_argument("--bulk-clients", type=int, default=8)
+    parser.add_argument("--bulk-rows", type=int, default=20000, help="Points per /predict/bulk request")
+    parser.add_argument("--interactive-clients", type=int, default=8)
+    parser.add_argument("--interval-ms", type=float, default=50.0,
+                        help="Pause between an interactive client's requests")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="Also write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": asyncio.run(run(args)),
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
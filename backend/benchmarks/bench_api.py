@@ -0,0 +1,427 @@
+"""
+HeatGuard API Load Test
+
+Drives the FastAPI `app` either in-process (ASGI transport, no sockets) or
+over a real uvicorn server, against a stubbed weather provider, and reports
+throughput, p50/p95/p99 latency and peak RSS per scenario as JSON.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_api --mode both --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.stubs import install_weather_stub  # noqa: E402
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000]
+
+
+@dataclass
+class Scenario:
+    """A named request generator run against the API."""
+    name: str
+    make_request: Callable[[random.Random], Dict[str, Any]]
+    rows_per_request: int = 1
+
+
+@dataclass
+class ScenarioResult:
+    """Aggregated timings for one scenario in one transport mode."""
+    mode: str
+    scenario: str
+    requests: int
+    concurrency: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    rows_per_s: float
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    peak_rss_mb: float = 0.0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (Linux reports KiB)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / (1024 * 1024)
+    return rss / 1024
+
+
+def _random_point(rng: random.Random) -> Dict[str, Any]:
+    d = date(2024, 1, 1) + timedelta(days=rng.randrange(366))
+    return {
+        "date": d.isoformat(),
+        "lat": round(rng.uniform(8.0, 35.0), 4),
+        "lon": round(rng.uniform(68.0, 97.0), 4),
+        "tmax_c": round(rng.uniform(25.0, 48.0), 1),
+    }
+
+
+def station_file(rows: int, fmt: str, seed: int = 0) -> bytes:
+    """A synthetic station-data upload for /predict/file, as CSV or Parquet bytes."""
+    import io
+
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    offsets = rng.integers(0, 366, rows)
+    df = pd.DataFrame({
+        "station": np.arange(rows),
+        "lat": rng.uniform(8.0, 35.0, rows).round(4),
+        "lon": rng.uniform(68.0, 97.0, rows).round(4),
+        "tmax_c": rng.uniform(25.0, 48.0, rows).round(1),
+        "date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(offsets, unit="D")).strftime("%Y-%m-%d"),
+    })
+    buffer = io.BytesIO()
+    if fmt == "parquet":
+        df.to_parquet(buffer, index=False)
+    else:
+        df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def build_scenarios(batch_sizes: List[int], states: List[str], queries: List[str],
+                    file_rows: int = 20000) -> List[Scenario]:
+    """
+    Build the standard scenario list.
+
+    Args:
+        batch_sizes: Point counts to use for /predict/bulk
+        states: State names to cycle through for /districts/by-state
+        queries: Search terms to cycle through for /districts/search
+        file_rows: Rows per upload for the /predict/file scenarios
+
+    Returns:
+        List of scenarios in execution order
+    """
+    scenarios = [
+        Scenario(
+            "predict_single",
+            lambda rng: {"method": "POST", "url": "/predict/single", "json": _random_point(rng)},
+        ),
+    ]
+
+    for size in batch_sizes:
+        scenarios.append(Scenario(
+            f"predict_bulk_{size}",
+            lambda rng, size=size: {
+                "method": "POST",
+                "url": "/predict/bulk",
+                "json": {"points": [_random_point(rng) for _ in range(size)]},
+            },
+            rows_per_request=size,
+        ))
+    if batch_sizes:
+        # Label-only results for the largest batch (sparse fieldset)
+        size = max(batch_sizes)
+        scenarios.append(Scenario(
+            f"predict_bulk_{size}_labels",
+            lambda rng, size=size: {
+                "method": "POST",
+                "url": "/predict/bulk",
+                "params": {"fields": "risk_label"},
+                "json": {"points": [_random_point(rng) for _ in range(size)]},
+            },
+            rows_per_request=size,
+        ))
+
+    scenarios.extend([
+        Scenario(
+            "forecast_5days",
+            lambda rng: {
+                "method": "GET",
+                "url": "/forecast/5days",
+                "params": {"lat": round(rng.uniform(8.0, 35.0), 3), "lon": round(rng.uniform(68.0, 97.0), 3)},
+            },
+            rows_per_request=5,
+        ),
+        Scenario(
+            "heatmap_raster",
+            lambda rng: {
+                "method": "GET",
+                "url": "/heatmap/raster",
+                "params": {
+                    "lat_min": 6, "lat_max": 38, "lon_min": 68, "lon_max": 98, "resolution": 0.25,
+                    "tmax_c": round(rng.uniform(30.0, 46.0), 1),
+                },
+            },
+            rows_per_request=128 * 120,
+        ),
+        Scenario("districts", lambda rng: {"method": "GET", "url": "/districts"}),
+        Scenario(
+            "districts_sparse",
+            lambda rng: {"method": "GET", "url": "/districts", "params": {"fields": "id,name"}},
+        ),
+        Scenario(
+            "districts_by_state",
+            lambda rng: {"method": "GET", "url": "/districts/by-state", "params": {"state": rng.choice(states)}},
+        ),
+        Scenario(
+            "districts_search",
+            lambda rng: {"method": "GET", "url": "/districts/search", "params": {"q": rng.choice(queries)}},
+        ),
+    ])
+
+    # The same upload is reused for every request; building it per request
+    # would dominate memory for large files
+    try:
+        import pyarrow  # noqa: F401
+        formats = ["csv", "parquet"]
+    except ImportError:
+        formats = ["csv"]
+    for fmt in formats:
+        payload = station_file(file_rows, fmt)
+        scenarios.append(Scenario(
+            f"predict_file_{fmt}",
+            lambda rng, fmt=fmt, payload=payload: {
+                "method": "POST",
+                "url": "/predict/file",
+                "files": {"file": (f"stations.{fmt}", payload, "application/octet-stream")},
+            },
+            rows_per_request=file_rows,
+        ))
+    return scenarios
+
+
+def summarize(mode: str, scenario: Scenario, latencies: List[float], errors: int,
+              duration: float, concurrency: int) -> ScenarioResult:
+    """Turn raw per-request latencies (seconds) into a ScenarioResult."""
+    n = len(latencies)
+    lat_ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    if n:
+        p50, p95, p99 = np.percentile(lat_ms, [50, 95, 99])
+        latency = {
+            "mean": round(float(lat_ms.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(lat_ms.max()), 3),
+        }
+    else:
+        latency = {}
+    ok = n - errors
+    return ScenarioResult(
+        mode=mode,
+        scenario=scenario.name,
+        requests=n,
+        concurrency=concurrency,
+        errors=errors,
+        duration_s=round(duration, 4),
+        throughput_rps=round(n / duration, 2) if duration > 0 else 0.0,
+        rows_per_s=round(ok * scenario.rows_per_request / duration, 2) if duration > 0 else 0.0,
+        latency_ms=latency,
+        peak_rss_mb=round(peak_rss_mb(), 1),
+    )
+
+
+async def run_scenario(client: httpx.AsyncClient, mode: str, scenario: Scenario,
+                       n_requests: int, concurrency: int, warmup: int, seed: int) -> ScenarioResult:
+    """
+    Fire `n_requests` requests for a scenario with bounded concurrency.
+
+    Requests are generated up front from a seeded RNG so that every run and
+    every mode sees exactly the same payloads.
+    """
+    rng = random.Random(seed)
+    requests = [scenario.make_request(rng) for _ in range(warmup + n_requests)]
+
+    for req in requests[:warmup]:
+        await client.request(**req)
+
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for req in requests[warmup:]:
+        queue.put_nowait(req)
+
+    async def worker() -> None:
+        nonlocal errors
+        while True:
+            try:
+                req = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.request(**req)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    return summarize(mode, scenario, latencies, errors, duration, concurrency)
+
+
+async def run_in_process(app, scenarios: List[Scenario], args: argparse.Namespace) -> List[ScenarioResult]:
+    """Run all scenarios through httpx's ASGI transport, including the app lifespan."""
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+            for scenario in scenarios:
+                results.append(await run_scenario(
+                    client, "inprocess", scenario, args.requests, args.concurrency, args.warmup, args.seed))
+                print_result(results[-1])
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(app, scenarios: List[Scenario], args: argparse.Namespace) -> List[ScenarioResult]:
+    """
+    Run all scenarios over a real uvicorn server started on a background thread.
+
+    The server shares this process so the weather stubs stay in effect; peak
+    RSS therefore covers both server and load generator.
+    """
+    import uvicorn
+
+    port = _free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120.0) as client:
+            for scenario in scenarios:
+                results.append(await run_scenario(
+                    client, "uvicorn", scenario, args.requests, args.concurrency, args.warmup, args.seed))
+                print_result(results[-1])
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+    return results
+
+
+def print_result(result: ScenarioResult) -> None:
+    lat = result.latency_ms
+    print(
+        f"[{result.mode:9s}] {result.scenario:22s} "
+        f"{result.throughput_rps:9.1f} req/s  "
+        f"p50={lat.get('p50', 0):8.2f}ms p95={lat.get('p95', 0):8.2f}ms p99={lat.get('p99', 0):8.2f}ms  "
+        f"errors={result.errors} rss={result.peak_rss_mb:.0f}MiB",
+        file=sys.stderr,
+    )
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HeatGuard API load test")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-sizes", default=",".join(str(s) for s in DEFAULT_BATCH_SIZES),
+                        help="Comma-separated /predict/bulk batch sizes")
+    parser.add_argument("--file-rows", type=int, default=20000, help="Rows per /predict/file upload")
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenario name filter")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="Artificial delay for stubbed OpenWeather calls")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="Write JSON results to this path (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    from app.config import API_VERSION
+    from app.main import app
+    from app.services.district_store import get_store
+
+    install_weather_stub(args.upstream_latency_ms)
+    # The load generator's own per-request client logs would be mixed into the server's
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    store = get_store()
+    states = store.state_names() or ["Maharashtra"]
+    queries = [store.name(r)[:5] for r in range(0, len(store), 37)] or ["Pune"]
+    batch_sizes = [int(s) for s in args.batch_sizes.split(",") if s.strip()]
+    scenarios = build_scenarios(batch_sizes, states, queries, args.file_rows)
+    if args.scenarios:
+        wanted = {s.strip() for s in args.scenarios.split(",")}
+        scenarios = [s for s in scenarios if s.name in wanted]
+
+    results: List[ScenarioResult] = []
+    if args.mode in ("inprocess", "both"):
+        results.extend(asyncio.run(run_in_process(app, scenarios, args)))
+    if args.mode in ("uvicorn", "both"):
+        results.extend(asyncio.run(run_uvicorn(app, scenarios, args)))
+
+    report = {
+        "meta": {
+            "api_version": API_VERSION,
+            "git_revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "concurrency": args.concurrency,
+                "batch_sizes": batch_sizes,
+                "file_rows": args.file_rows,
+                "upstream_latency_ms": args.upstream_latency_ms,
+                "seed": args.seed,
+            },
+        },
+        "results": [asdict(r) for r in results],
+    }
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+    return 0 if all(r.errors == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
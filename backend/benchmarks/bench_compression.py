@@ -0,0 +1,216 @@
+"""
+HeatGuard Response Compression Benchmark
+
+Fetches real response bodies from the in-process API (stubbed weather
+provider, identity encoding) and measures, for every codec and level the
+compression middleware can use, the CPU time spent compressing against the
+bytes saved. Also compares stdlib json against orjson encoding of the same
+JSON payloads.
+
+A codec pays off while the transfer time it saves exceeds the CPU time it
+costs; `break_even_mbps` is the link speed above which it no longer does
+(for one request on one core, ignoring that compression overlaps with
+sending).
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_compression --output compression.json
+    python -m benchmarks.bench_compression --scenarios predict_bulk_1000,districts --levels gzip:1,6
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.bench_api import build_scenarios  # noqa: E402
+from benchmarks.stubs import install_weather_stub  # noqa: E402
+
+DEFAULT_LEVELS = {
+    "gzip": [1, 6, 9],
+    "br": [1, 4, 6, 11],
+    "zstd": [1, 3, 6, 12],
+}
+DEFAULT_SCENARIOS = [
+    "predict_single", "predict_bulk_10", "predict_bulk_100", "predict_bulk_1000", "predict_bulk_10000",
+    "forecast_5days", "districts", "districts_by_state", "districts_search", "heatmap_raster",
+    "predict_file_csv",
+]
+
+
+def codec(name: str, level: int) -> Callable[[bytes], bytes]:
+    """One-shot compressor for a Content-Encoding token and level."""
+    from app.middleware import BrotliEncoder, GzipEncoder, ZstdEncoder
+
+    encoder = {"gzip": GzipEncoder, "br": BrotliEncoder, "zstd": ZstdEncoder}[name]
+    return lambda body: encoder(level).encode(body)
+
+
+def time_call(fn: Callable[[], Any], min_seconds: float = 0.2, max_repeats: int = 200) -> float:
+    """Median seconds per call over enough repeats to fill min_seconds."""
+    fn()
+    timings: List[float] = []
+    deadline = time.perf_counter() + min_seconds
+    while len(timings) < 3 or (time.perf_counter() < deadline and len(timings) < max_repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+async def fetch_payloads(names: List[str], bulk_sizes: List[int], seed: int) -> Dict[str, Dict[str, Any]]:
+    from app.main import app
+    from app.services import district_store
+
+    store = district_store.get_store()
+    states = store.state_names()
+    queries = ["pur", "bad", "nagar", "ganj"]
+    scenarios = {s.name: s for s in build_scenarios(bulk_sizes, states, queries, file_rows=20000)}
+    rng = random.Random(seed)
+
+    payloads: Dict[str, Dict[str, Any]] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in names:
+                if name not in scenarios:
+                    print(f"Skipping unknown scenario {name}", file=sys.stderr)
+                    continue
+                request = scenarios[name].make_request(rng)
+                if name == "districts_by_state":
+                    # The largest state, rather than a random one
+                    request["params"] = {"state": "Uttar Pradesh"}
+                request["headers"] = {"Accept-Encoding": "identity"}
+                response = await client.request(**request)
+                if response.status_code != 200:
+                    print(f"Skipping {name}: HTTP {response.status_code}", file=sys.stderr)
+                    continue
+                payloads[name] = {
+                    "content_type": response.headers.get("content-type", ""),
+                    "body": response.content,
+                }
+    return payloads
+
+
+def measure_serialization(body: bytes) -> Optional[Dict[str, float]]:
+    """Encode time of the parsed payload with stdlib json and orjson, in ms."""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    content = json.loads(body)
+    stdlib_s = time_call(lambda: json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode())
+    orjson_s = time_call(lambda: orjson.dumps(content))
+    return {
+        "stdlib_json_ms": round(stdlib_s * 1000, 3),
+        "orjson_ms": round(orjson_s * 1000, 3),
+        "speedup": round(stdlib_s / orjson_s, 2),
+    }
+
+
+def measure_codecs(body: bytes, levels: Dict[str, List[int]]) -> List[Dict[str, Any]]:
+    results = []
+    for name, name_levels in levels.items():
+        for level in name_levels:
+            try:
+                compress = codec(name, level)
+                compressed = compress(body)
+            except ImportError:
+                continue
+            seconds = time_call(lambda: compress(body))
+            saved = len(body) - len(compressed)
+            results.append({
+                "encoding": name,
+                "level": level,
+                "bytes": len(compressed),
+                "ratio": round(len(body) / max(len(compressed), 1), 2),
+                "saved_bytes": saved,
+                "cpu_ms": round(seconds * 1000, 3),
+                "mb_per_s": round(len(body) / seconds / 1e6, 1),
+                "break_even_mbps": round(saved * 8 / seconds / 1e6, 1) if saved > 0 else 0.0,
+            })
+    return results
+
+
+def parse_levels(spec: str) -> Dict[str, List[int]]:
+    """'gzip:1,6;zstd:3' -> {'gzip': [1, 6], 'zstd': [3]}"""
+    if not spec:
+        return DEFAULT_LEVELS
+    levels = {}
+    for part in spec.split(";"):
+        name, _, values = part.partition(":")
+        levels[name.strip()] = [int(v) for v in values.split(",") if v.strip()]
+    return levels
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    for name, entry in report["payloads"].items():
+        print(f"\n{name}  ({entry['bytes']} bytes, {entry['content_type']})", file=sys.stderr)
+        if entry.get("serialization"):
+            s = entry["serialization"]
+            print(f"  encode: json {s['stdlib_json_ms']} ms, orjson {s['orjson_ms']} ms ({s['speedup']}x)",
+                  file=sys.stderr)
+        for c in entry["codecs"]:
+            print(f"  {c['encoding']:>4}-{c['level']:<2}  {c['bytes']:>9} B  x{c['ratio']:<6}  "
+                  f"{c['cpu_ms']:>8} ms  {c['mb_per_s']:>7} MB/s  break-even {c['break_even_mbps']} Mbit/s",
+                  file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure response compression cost against bytes saved")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS),
+                        help="Comma-separated bench_api scenario names to fetch payloads from")
+    parser.add_argument("--levels", default="", help="Codec levels, e.g. 'gzip:1,6;br:4;zstd:1,3'")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="Also write the JSON report to this path")
+    args = parser.parse_args(argv)
+
+    install_weather_stub()
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    bulk_sizes = sorted({int(n.rsplit("_", 1)[1]) for n in names if n.startswith("predict_bulk_")}) or [1]
+    payloads = asyncio.run(fetch_payloads(names, bulk_sizes, args.seed))
+    levels = parse_levels(args.levels)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "levels": levels,
+        },
+        "payloads": {},
+    }
+    for name, payload in payloads.items():
+        body = payload["body"]
+        entry = {
+            "content_type": payload["content_type"],
+            "bytes": len(body),
+            "codecs": measure_codecs(body, levels),
+        }
+        if "json" in payload["content_type"]:
+            entry["serialization"] = measure_serialization(body)
+        report["payloads"][name] = entry
+
+    print_table(report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
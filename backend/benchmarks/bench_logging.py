@@ -0,0 +1,144 @@
+"""
+HeatGuard Logging Overhead Benchmark
+
+Runs bench_api scenarios in a fresh process per logging configuration (the
+logging setup is read from the environment at import) with the server's
+stdout sent to a log sink, and reports throughput per configuration side by
+side, together with the volume of log output.
+
+Sinks:
+    file  - a regular file, as with `uvicorn ... > api.log`
+    pipe  - a pipe drained by a reader thread, as with a container log driver
+    slow  - a pipe drained at --sink-kbps, as with a terminal or a congested
+            log shipper; a full pipe blocks every synchronous write
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_logging --sink pipe --output logging.json
+    python -m benchmarks.bench_logging --sink slow --sink-kbps 256 --configs sync,async_json_sampled
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Environment per configuration, applied on top of the caller's environment
+CONFIGS: Dict[str, Dict[str, str]] = {
+    # Synchronous writes, no access log: the logging setup before queueing was added
+    "sync": {"HEATGUARD_LOG_ASYNC": "0", "HEATGUARD_ACCESS_LOG": "0"},
+    "sync_access": {"HEATGUARD_LOG_ASYNC": "0", "HEATGUARD_ACCESS_LOG": "1"},
+    "async_access": {"HEATGUARD_LOG_ASYNC": "1", "HEATGUARD_ACCESS_LOG": "1"},
+    "async_json": {"HEATGUARD_LOG_ASYNC": "1", "HEATGUARD_ACCESS_LOG": "1", "HEATGUARD_LOG_FORMAT": "json"},
+    "async_json_sampled": {
+        "HEATGUARD_LOG_ASYNC": "1", "HEATGUARD_ACCESS_LOG": "1", "HEATGUARD_LOG_FORMAT": "json",
+        "HEATGUARD_LOG_SAMPLE_DEFAULT": "0.01",
+    },
+}
+DEFAULT_SCENARIOS = ["predict_single", "forecast_5days", "districts"]
+
+
+class _Drain(threading.Thread):
+    """Reads a pipe to EOF, optionally throttled to a byte rate."""
+
+    def __init__(self, stream, kbps: Optional[float] = None):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.kbps = kbps
+        self.bytes = 0
+
+    def run(self) -> None:
+        chunk = 4096
+        while True:
+            data = self.stream.read1(chunk) if hasattr(self.stream, "read1") else self.stream.read(chunk)
+            if not data:
+                return
+            self.bytes += len(data)
+            if self.kbps:
+                time.sleep(len(data) / (self.kbps * 1024.0))
+
+
+def run_config(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run bench_api once under one logging configuration."""
+    env = dict(os.environ, **CONFIGS[name])
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "bench.json"
+        cmd = [
+            sys.executable, "-m", "benchmarks.bench_api",
+            "--mode", "inprocess",
+            "--scenarios", args.scenarios,
+            "--requests", str(args.requests),
+            "--concurrency", str(args.concurrency),
+            "--output", str(output),
+        ]
+        log_path = Path(tmp) / "api.log"
+        if args.sink == "file":
+            with open(log_path, "wb") as sink:
+                subprocess.run(cmd, cwd=BACKEND_DIR, env=env, stdout=sink, stderr=subprocess.DEVNULL, check=False)
+            log_bytes = log_path.stat().st_size
+        else:
+            proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL)
+            drain = _Drain(proc.stdout, args.sink_kbps if args.sink == "slow" else None)
+            drain.start()
+            proc.wait()
+            drain.join()
+            log_bytes = drain.bytes
+        report = json.loads(output.read_text(encoding="utf-8"))
+
+    results = {r["scenario"]: r for r in report["results"]}
+    row = {"config": name, "env": CONFIGS[name], "log_bytes": log_bytes, "scenarios": {}}
+    for scenario, r in results.items():
+        row["scenarios"][scenario] = {
+            "throughput_rps": r["throughput_rps"],
+            "p50_ms": r["latency_ms"].get("p50"),
+            "p99_ms": r["latency_ms"].get("p99"),
+        }
+    return row
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HeatGuard logging overhead benchmark")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="Comma-separated configuration names")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sink", choices=["file", "pipe", "slow"], default="pipe")
+    parser.add_argument("--sink-kbps", type=float, default=256.0, help="Drain rate of the slow sink")
+    parser.add_argument("--output", default="", help="Write JSON results to this path (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    names = [c.strip() for c in args.configs.split(",") if c.strip()]
+    unknown = [c for c in names if c not in CONFIGS]
+    if unknown:
+        print(f"Unknown configuration(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    rows = []
+    for name in names:
+        row = run_config(name, args)
+        rows.append(row)
+        summary = "  ".join(f"{s}={v['throughput_rps']:.1f}rps" for s, v in row["scenarios"].items())
+        print(f"{name:20s} {summary}  log={row['log_bytes'] / 1024:.0f}KiB", file=sys.stderr)
+
+    payload = json.dumps({"sink": args.sink, "sink_kbps": args.sink_kbps if args.sink == "slow" else None,
+                          "requests": args.requests, "concurrency": args.concurrency, "results": rows}, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+HeatGuard Startup Warm-up Benchmark
+
+Measures what the first request to each endpoint costs on a freshly
+started worker, with the startup warm-up off and on. For every endpoint a
+new uvicorn worker (with the stubbed weather provider) is started; the
+benchmark waits until the worker reports healthy (/health without the
+warm-up, /ready with it), then times the first request and the median of
+the following ones.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_startup --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.bench_api import _free_port, _random_point  # noqa: E402
+
+ENDPOINTS: Dict[str, Callable[[random.Random], Dict[str, Any]]] = {
+    "predict_single": lambda rng: {"method": "POST", "url": "/predict/single", "json": _random_point(rng)},
+    "predict_bulk_100": lambda rng: {
+        "method": "POST", "url": "/predict/bulk", "json": {"points": [_random_point(rng) for _ in range(100)]},
+    },
+    "predict_bulk_5000": lambda rng: {
+        "method": "POST", "url": "/predict/bulk", "json": {"points": [_random_point(rng) for _ in range(5000)]},
+    },
+    "districts": lambda rng: {"method": "GET", "url": "/districts"},
+    "districts_by_state": lambda rng: {"method": "GET", "url": "/districts/by-state", "params": {"state": "Rajasthan"}},
+    "forecast_5days": lambda rng: {
+        "method": "GET", "url": "/forecast/5days",
+        "params": {"lat": round(rng.uniform(8.0, 35.0), 2), "lon": round(rng.uniform(68.0, 97.0), 2)},
+    },
+}
+
+
+async def measure(args: argparse.Namespace, endpoint: str, warmup: bool) -> Dict[str, Any]:
+    """Start a fresh worker and time the first and later requests to one endpoint."""
+    port = _free_port()
+    # Admission control off: the repeated bulk requests would exceed the per-client bulk rate
+    env = dict(os.environ, HEATGUARD_WARMUP="1" if warmup else "0", HEATGUARD_ADMISSION="0",
+               HEATGUARD_LOG_LEVEL="WARNING")
+    cmd = [sys.executable, "-m", "benchmarks.stubs", "--port", str(port),
+           "--upstream-latency-ms", str(args.upstream_latency_ms)]
+    started = time.perf_counter()
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    rng = random.Random(args.seed)
+    probe = "/ready" if warmup else "/health"
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120.0) as client:
+            while True:
+                try:
+                    if (await client.get(probe)).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() - started > 120.0:
+                    raise RuntimeError(f"Worker did not report {probe} within 120 s")
+                await asyncio.sleep(0.02)
+            serving_after = time.perf_counter() - started
+
+            latencies = []
+            for _ in range(1 + args.repeats):
+                request = ENDPOINTS[endpoint](rng)
+                t0 = time.perf_counter()
+                response = await client.request(**request)
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                response.raise_for_status()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {
+        "serving_after_s": round(serving_after, 2),
+        "first_ms": round(latencies[0], 2),
+        "steady_ms": round(float(np.median(latencies[1:])), 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    results: Dict[str, Any] = {}
+    for endpoint in endpoints:
+        results[endpoint] = {}
+        for name, warmup in (("warmup_off", False), ("warmup_on", True)):
+            runs = [await measure(args, endpoint, warmup) for _ in range(args.runs)]
+            results[endpoint][name] = {
+                key: round(float(np.median([r[key] for r in runs])), 2) for key in runs[0]
+            }
+            print(f"{endpoint:20s} {name:10s} first={results[endpoint][name]['first_ms']:8.2f}ms "
+                  f"steady={results[endpoint][name]['steady_ms']:8.2f}ms", file=sys.stderr)
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HeatGuard first-request latency with and without warm-up")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--runs", type=int, default=3, help="Fresh workers per endpoint and configuration")
+    parser.add_argument("--repeats", type=int, default=20, help="Requests after the first, for the steady state")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="Also write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k != "output"},
+        },
+        "results": asyncio.run(run(args)),
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark Regression Check
+
+Compares two JSON reports written by `benchmarks.bench_api` and exits
+non-zero if any scenario regressed beyond the allowed tolerance.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.compare baseline.json candidate.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+def _index(report: Dict) -> Dict[Tuple[str, str], Dict]:
+    return {(r["mode"], r["scenario"]): r for r in report.get("results", [])}
+
+
+def compare_reports(baseline: Dict, candidate: Dict, tolerance: float) -> List[str]:
+    """
+    Compare two benchmark reports scenario by scenario.
+
+    Args:
+        baseline: Parsed baseline report
+        candidate: Parsed candidate report
+        tolerance: Allowed relative regression (0.15 == 15%)
+
+    Returns:
+        List of human-readable regression descriptions (empty if none)
+    """
+    regressions = []
+    base_index = _index(baseline)
+    for key, cand in _index(candidate).items():
+        base = base_index.get(key)
+        if base is None:
+            continue
+        label = f"{key[0]}/{key[1]}"
+
+        for pct in ("p50", "p95", "p99"):
+            b = base["latency_ms"].get(pct)
+            c = cand["latency_ms"].get(pct)
+            if b and c and c > b * (1 + tolerance):
+                regressions.append(f"{label}: {pct} {b:.2f}ms -> {c:.2f}ms (+{(c / b - 1) * 100:.1f}%)")
+
+        b_rps, c_rps = base["throughput_rps"], cand["throughput_rps"]
+        if b_rps and c_rps < b_rps * (1 - tolerance):
+            regressions.append(f"{label}: throughput {b_rps:.1f} -> {c_rps:.1f} req/s")
+
+        b_rss, c_rss = base.get("peak_rss_mb"), cand.get("peak_rss_mb")
+        if b_rss and c_rss and c_rss > b_rss * (1 + tolerance):
+            regressions.append(f"{label}: peak RSS {b_rss:.0f} -> {c_rss:.0f} MiB")
+
+        if cand["errors"] > base["errors"]:
+            regressions.append(f"{label}: errors {base['errors']} -> {cand['errors']}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two HeatGuard benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    candidate = json.loads(Path(args.candidate).read_text(encoding="utf-8"))
+    regressions = compare_reports(baseline, candidate, args.tolerance)
+
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions beyond tolerance.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
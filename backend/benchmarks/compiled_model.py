@@ -0,0 +1,116 @@
+"""
+HeatGuard Compiled Ensemble Check
+
+Verifies that the NumPy-compiled tree ensemble (app/services/tree_compiler.py)
+assigns exactly the same risk class as XGBoost, and times both evaluators on
+already-scaled features.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.compiled_model --rows 100000 --output compiled.json
+    python -m benchmarks.compiled_model --version lite --batch-sizes 1,5,100,10000
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import model_service  # noqa: E402
+from app.services.model_compression import sample_inputs  # noqa: E402
+from app.services.model_registry import BASE_MODEL_VERSION, load_version  # noqa: E402
+from app.services.tree_compiler import compile_model  # noqa: E402
+
+DEFAULT_BATCH_SIZES = [1, 5, 100, 10000]
+
+
+def verify(model: Any, compiled: Any, X_scaled: np.ndarray) -> Dict[str, Any]:
+    reference = model.predict_proba(X_scaled)
+    proba = compiled.predict_proba(X_scaled)
+    mismatched = np.nonzero(reference.argmax(axis=1) != proba.argmax(axis=1))[0]
+    return {
+        "rows": len(X_scaled),
+        "class_mismatches": int(len(mismatched)),
+        "first_mismatched_rows": mismatched[:10].tolist(),
+        "max_abs_probability_diff": float(np.abs(reference - proba).max()),
+        "bit_identical_probability_share": round(float((reference == proba).mean()), 6),
+    }
+
+
+def time_call(fn: Callable[[np.ndarray], Any], batch: np.ndarray, repeats: int) -> float:
+    """Mean of the fastest half of `repeats` calls, in microseconds."""
+    fn(batch)
+    timings = []
+    for _ in range(max(repeats, 2)):
+        started = time.perf_counter()
+        fn(batch)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return float(np.mean(timings[: max(1, len(timings) // 2)])) * 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verify and benchmark the compiled tree ensemble")
+    parser.add_argument("--version", default=BASE_MODEL_VERSION, help="Model version to compile")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows used for the agreement check")
+    parser.add_argument("--batch-sizes", default=",".join(str(s) for s in DEFAULT_BATCH_SIZES))
+    parser.add_argument("--repeats", type=int, default=30, help="Timed calls per batch size")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="", help="Also write the JSON report to this path")
+    args = parser.parse_args(argv)
+
+    artifacts = load_version(args.version)
+    started = time.perf_counter()
+    compiled = compile_model(artifacts.model)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    X = sample_inputs(artifacts.feature_columns, args.rows, args.seed).to_numpy(dtype=np.float64)
+    X_scaled = model_service.scale_features(X, artifacts)
+
+    latency: Dict[str, Dict[str, float]] = {}
+    for size in (int(s) for s in args.batch_sizes.split(",") if s.strip()):
+        batch = X_scaled[:size]
+        repeats = args.repeats if size < 1000 else max(3, args.repeats // 6)
+        xgb_us = time_call(artifacts.model.predict_proba, batch, repeats)
+        compiled_us = time_call(compiled.predict_proba, batch, repeats)
+        latency[str(size)] = {
+            "xgboost_us": round(xgb_us, 1),
+            "compiled_us": round(compiled_us, 1),
+            "speedup": round(xgb_us / compiled_us, 2),
+        }
+
+    report = {
+        "meta": {
+            "version": args.version,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "compiled": {
+            "trees": compiled.n_trees,
+            "depth": compiled.depth,
+            "bytes": compiled.nbytes,
+            "compile_ms": round(compile_ms, 1),
+        },
+        "agreement": verify(artifacts.model, compiled, X_scaled),
+        "latency": latency,
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload)
+    print(payload)
+    return 0 if report["agreement"]["class_mismatches"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+HeatGuard Lite Model Tooling
+
+Builds the compressed "lite" model variant into models/lite/ and reports how
+closely it tracks the full model and how much faster it scores on CPU.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.lite_model build
+    python -m benchmarks.lite_model report --threads 1 --output lite_report.json
+
+Serve it with HEATGUARD_MODEL_VARIANT=lite.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import joblib
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.config import LITE_MODEL_VERSION, MODEL_PATH, MODELS_DIR  # noqa: E402
+from app.services import model_compression  # noqa: E402
+from app.services.model_registry import BASE_MODEL_VERSION, load_version  # noqa: E402
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+
+def lite_model_path() -> Path:
+    return BACKEND_DIR / MODELS_DIR / LITE_MODEL_VERSION / Path(MODEL_PATH).name
+
+
+def build(args: argparse.Namespace) -> int:
+    full = load_version(BASE_MODEL_VERSION)
+    X = model_compression.sample_inputs(full.feature_columns, args.calibration_rows, args.seed)
+    lite, info = model_compression.compress_model(
+        full.model, full.scaler, X, min_agreement=args.min_agreement, max_drift=args.max_drift,
+        max_alert_downgrades=args.max_alert_downgrades,
+    )
+    if lite is full.model:
+        print("No pruned ensemble met the targets; nothing written", file=sys.stderr)
+        return 1
+
+    path = lite_model_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write next to the target and rename so the registry never sees a partial file
+    tmp_path = path.with_suffix(".tmp")
+    joblib.dump(lite, tmp_path, compress=3)
+    os.replace(tmp_path, path)
+
+    info["size_bytes"] = path.stat().st_size
+    info["full_size_bytes"] = (BACKEND_DIR / MODEL_PATH).stat().st_size
+    print(json.dumps(info, indent=2))
+    return 0
+
+
+def report(args: argparse.Namespace) -> int:
+    if not lite_model_path().exists():
+        print(f"{lite_model_path()} not found; run the build first", file=sys.stderr)
+        return 1
+    full = load_version(BASE_MODEL_VERSION)
+    lite = load_version(LITE_MODEL_VERSION)
+    # A different seed from the build keeps calibration and evaluation rows apart
+    X = model_compression.sample_inputs(full.feature_columns, args.rows, args.seed + 1)
+    batch_sizes = [int(s) for s in args.batch_sizes.split(",") if s.strip()]
+
+    latency = {}
+    for name, artifacts in (("full", full), ("lite", lite)):
+        latency[name] = model_compression.measure_latency(
+            artifacts.model, artifacts.scaler, X, batch_sizes, args.repeats, args.threads,
+        )
+    speedup = {
+        size: round(latency["full"][size]["per_row_us"] / latency["lite"][size]["per_row_us"], 2)
+        for size in latency["full"]
+    }
+
+    result = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "threads": args.threads,
+            "rows": args.rows,
+            "seed": args.seed + 1,
+        },
+        "models": {
+            "full": {
+                "trees": model_compression.tree_count(full.model),
+                "size_bytes": (BACKEND_DIR / MODEL_PATH).stat().st_size,
+            },
+            "lite": {
+                "trees": model_compression.tree_count(lite.model),
+                "size_bytes": lite_model_path().stat().st_size,
+            },
+        },
+        "agreement": model_compression.compare_models(full.model, lite.model, full.scaler, X),
+        "latency": latency,
+        "per_row_speedup": speedup,
+    }
+
+    payload = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload)
+    print(payload)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build and evaluate the lite model variant")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Prune the base model into models/lite/")
+    build_parser.add_argument("--min-agreement", type=float, default=0.999,
+                              help="Required share of rows with the full model's risk label")
+    build_parser.add_argument("--max-drift", type=float, default=0.005,
+                              help="Allowed mean total-variation distance of probabilities")
+    build_parser.add_argument("--max-alert-downgrades", type=int, default=0,
+                              help="Allowed calibration rows rated Orange/Red (ALERT_MIN_LABEL or "
+                                   "above) by the full model that the lite model rates lower")
+    build_parser.add_argument("--calibration-rows", type=int, default=50000)
+    build_parser.add_argument("--seed", type=int, default=1234)
+
+    report_parser = sub.add_parser("report", help="Compare the lite and full models")
+    report_parser.add_argument("--rows", type=int, default=50000, help="Evaluation rows")
+    report_parser.add_argument("--batch-sizes", default=",".join(str(s) for s in DEFAULT_BATCH_SIZES))
+    report_parser.add_argument("--repeats", type=int, default=20, help="Timed calls per batch size")
+    report_parser.add_argument("--threads", type=int, default=None,
+                               help="XGBoost threads (default: the model's setting, all cores)")
+    report_parser.add_argument("--seed", type=int, default=1234)
+    report_parser.add_argument("--output", default="", help="Also write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args(argv)
+    return build(args) if args.command == "build" else report(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
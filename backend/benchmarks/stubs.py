@@ -0,0 +1,146 @@
+"""
+Stubbed Upstream Providers for Benchmarks
+
+Replaces the OpenWeather forecast and geocoding calls with deterministic,
+in-process fakes so benchmarks measure HeatGuard itself rather than the
+network or the upstream rate limits.
+
+Run as a module to serve the app with the stubs installed, e.g. as the
+server process of a benchmark:
+    python -m benchmarks.stubs --port 8000 --upstream-latency-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DISTRICTS_PATH = BASE_DIR / "data" / "districts.json"
+
+
+def build_forecast_payload(lat: float, lon: float) -> Dict[str, Any]:
+    """
+    Build a synthetic OpenWeather 5-day/3-hour forecast payload.
+
+    The shape matches what `extract_daily_max_temps` expects: 40 three-hour
+    steps starting at today's midnight (UTC), temperatures in Kelvin.
+
+    Args:
+        lat: Latitude of the location
+        lon: Longitude of the location
+
+    Returns:
+        Dict shaped like the OpenWeather /forecast response
+    """
+    start = datetime.combine(datetime.now(timezone.utc).date(), time())
+    base_c = 30.0 + (25.0 - abs(lat - 23.0)) * 0.4
+    steps = []
+    for i in range(40):
+        ts = start + timedelta(hours=3 * i)
+        diurnal = 6.0 * math.sin((ts.hour - 6) / 24.0 * 2 * math.pi)
+        temp_k = base_c + diurnal + (i // 8) * 0.5 + 273.15
+        steps.append({
+            "dt": int(ts.replace(tzinfo=timezone.utc).timestamp()),
+            "dt_txt": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "main": {"temp": temp_k, "temp_max": temp_k, "humidity": 40 + (i % 5) * 5},
+        })
+    return {
+        "cod": "200",
+        "cnt": len(steps),
+        "list": steps,
+        "city": {"name": f"Stub {lat:.2f},{lon:.2f}", "coord": {"lat": lat, "lon": lon}},
+    }
+
+
+def _load_geocoder_rows() -> List[Dict[str, Any]]:
+    with DISTRICTS_PATH.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    rows = data["districts"] if isinstance(data, dict) else data
+    return [
+        {
+            "name": row.get("district", ""),
+            "state": row.get("state", ""),
+            "country": "IN",
+            "lat": 20.0 + (i % 15),
+            "lon": 72.0 + (i % 18),
+        }
+        for i, row in enumerate(rows)
+    ]
+
+
+def install_weather_stub(upstream_latency_ms: float = 0.0) -> None:
+    """
+    Replace the OpenWeather calls with deterministic in-process fakes.
+
+    Every `app.*` module that imported the original functions by name is
+    patched as well, so routers pick up the stubs. The cache L2 is switched
+    to the in-process memory backend, so call this before the first cache use.
+
+    Args:
+        upstream_latency_ms: Artificial delay added to each fake upstream call
+    """
+    from app.services import weather_service
+    from app.services.cache_service import CACHE
+    from app.utils.tracing import span
+
+    # Fake forecasts and geocodes go through the real two-tier cache; keep
+    # them out of the shared L2 (the on-disk SQLite file, Redis) so a real
+    # server started later never serves them
+    CACHE.use_backend("memory")
+
+    geocoder_rows = _load_geocoder_rows()
+    delay = upstream_latency_ms / 1000.0
+
+    async def fake_request_openweather_forecast(lat: float, lon: float) -> Dict[str, Any]:
+        # Same span name as the real call, so Server-Timing breakdowns match
+        with span("weather.upstream"):
+            if delay:
+                await asyncio.sleep(delay)
+            return build_forecast_payload(lat, lon)
+
+    async def fake_request_geocode(query: str) -> List[Dict[str, Any]]:
+        if delay:
+            await asyncio.sleep(delay)
+        # "name,state,country" like the real API; only the name is matched
+        q = query.split(",")[0].strip().lower()
+        return [r for r in geocoder_rows if q in r["name"].lower()][:5]
+
+    # The upstream calls are replaced, so the forecast cache in front of them stays in play
+    replacements = {
+        id(weather_service.request_openweather_forecast): fake_request_openweather_forecast,
+        id(weather_service.request_geocode): fake_request_geocode,
+    }
+
+    for name, module in list(sys.modules.items()):
+        if module is None or not (name == "app" or name.startswith("app.")):
+            continue
+        for attr, value in list(vars(module).items()):
+            if id(value) in replacements:
+                setattr(module, attr, replacements[id(value)])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the HeatGuard app with stubbed upstream providers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    install_weather_stub(args.upstream_latency_ms)
+    from app.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
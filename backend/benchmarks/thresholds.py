@@ -0,0 +1,133 @@
+"""
+HeatGuard tmax Threshold Tables
+
+Precomputes the per-district tmax breakpoint table of a model version
+(app/services/threshold_service.py) and reports how it compares with the
+model, in agreement and lookup latency.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.thresholds build
+    python -m benchmarks.thresholds build --version lite
+    python -m benchmarks.thresholds report --output thresholds_report.json
+
+The API picks a table up on the next request; rebuild it after deploying a
+new model version or changing the district data.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services import district_store, horizon_service, threshold_service  # noqa: E402
+from app.services.model_registry import BASE_MODEL_VERSION, load_version  # noqa: E402
+
+
+def build(args: argparse.Namespace) -> int:
+    artifacts = load_version(args.version)
+    table = threshold_service.build_table(artifacts, progress=logging.info)
+    path = threshold_service.table_path(args.version)
+    table.save(path)
+
+    info = dict(table.meta, version=args.version, path=str(path.relative_to(BACKEND_DIR)),
+                thresholds=len(table.thresholds), size_bytes=path.stat().st_size,
+                verification=threshold_service.verify_table(table, artifacts, cells=args.verify_cells))
+    print(json.dumps(info, indent=2))
+    return 0
+
+
+def _best_us(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1e6, 1)
+
+
+def report(args: argparse.Namespace) -> int:
+    artifacts = load_version(args.version)
+    table = threshold_service.get_table(artifacts)
+    if table is None:
+        print(f"No current table at {threshold_service.table_path(args.version)}; run build first",
+              file=sys.stderr)
+        return 1
+
+    store = district_store.get_store()
+    rng = np.random.default_rng(args.seed)
+    located = np.nonzero(table.located)[0]
+    dates = np.arange(np.datetime64("2025-04-01"), np.datetime64("2025-04-06"), dtype="datetime64[D]")
+
+    latency = {}
+    for districts in (1, 40, len(located)):
+        rows = rng.choice(located, districts, replace=False)
+        lats, lons = store.coordinates(rows)
+        tmax = rng.uniform(25, 48, (1, len(dates)))
+        # Fresh temperatures per call, so small batches miss the prediction cache
+        model_us = _best_us(lambda: horizon_service.score_horizon(
+            lats, lons, dates, rng.uniform(25, 48, (1, len(dates))), artifacts=artifacts), args.repeats)
+        table_us = _best_us(lambda: table.horizon_labels(rows, dates, tmax), args.repeats)
+        labels, _ = horizon_service.score_horizon(lats, lons, dates, tmax, artifacts=artifacts)
+        latency[f"{districts}x{len(dates)}"] = {
+            "model_us": model_us,
+            "table_us": table_us,
+            "speedup": round(model_us / table_us, 1),
+            "agreement": round(float((table.horizon_labels(rows, dates, tmax) == labels).mean()), 6),
+        }
+
+    result = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "version": args.version,
+        },
+        "table": dict(table.meta, thresholds=len(table.thresholds), nbytes=table.nbytes()),
+        "verification": threshold_service.verify_table(table, artifacts, cells=args.verify_cells,
+                                                       seed=args.seed),
+        "latency": latency,
+    }
+    payload = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload)
+    print(payload)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build and evaluate per-district tmax threshold tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Bisect the model and write the version's table")
+    build_parser.add_argument("--version", default=BASE_MODEL_VERSION, help="Model version")
+    build_parser.add_argument("--verify-cells", type=int, default=2000,
+                              help="District-days scanned in full to check the table")
+
+    report_parser = sub.add_parser("report", help="Compare table lookups with the model")
+    report_parser.add_argument("--version", default=BASE_MODEL_VERSION, help="Model version")
+    report_parser.add_argument("--verify-cells", type=int, default=5000)
+    report_parser.add_argument("--repeats", type=int, default=20, help="Timed calls per case")
+    report_parser.add_argument("--seed", type=int, default=1234)
+    report_parser.add_argument("--output", default="", help="Also write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args(argv)
+    return build(args) if args.command == "build" else report(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())